@@ -2,6 +2,12 @@
 ASGI config for backend project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Requests to /api/events/ are served by the live donation event stream
+(donations.events); everything else goes to Django, which resolves URLs
+against backend.urls_async: the hot read endpoints there are async views
+(donations.async_views), so one worker serves many slow clients at once.
+Each process follows the donation event log from its first request on, so
+its streams and response cache hear other processes' events.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
@@ -9,8 +15,36 @@ https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 
 import os
 
-from django.core.asgi import get_asgi_application
+import django
+from django.core.handlers.asgi import ASGIHandler
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
 
-application = get_asgi_application()
+ASYNC_URLCONF = 'backend.urls_async'
+
+
+class AsyncURLConfHandler(ASGIHandler):
+    """Django's ASGI handler, resolving URLs against ASYNC_URLCONF."""
+
+    async def get_response_async(self, request):
+        request.urlconf = ASYNC_URLCONF
+        return await super().get_response_async(request)
+
+
+# what get_asgi_application() does, with the handler above
+django.setup(set_prefix=False)
+django_application = AsyncURLConfHandler()
+
+# imported after Django is set up
+from donations.events import event_stream_app, follower  # noqa: E402
+
+EVENT_STREAM_PATH = '/api/events'
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'http':
+        follower.ensure_running()
+    if scope['type'] == 'http' and scope['path'].rstrip('/') == EVENT_STREAM_PATH:
+        await event_stream_app(scope, receive, send)
+        return
+    await django_application(scope, receive, send)
@@ -0,0 +1,146 @@
+# backend/compression.py
+"""
+Response compression negotiated from Accept-Encoding.
+
+Bodies of API types (JSON, MessagePack, CSV, metrics text) are sent
+brotli- or gzip-encoded, whichever the client ranks higher (brotli on a
+tie, and only when the brotli package is installed). Buffered bodies are
+compressed only from COMPRESSION_MIN_BYTES: below that the saving is
+lost in headers and framing. Streamed exports are compressed chunk by
+chunk and flushed per chunk, so a download still starts at once.
+
+HTML is left alone. Admin pages carry CSRF tokens, and compressing a
+secret next to attacker-influenced text is what BREACH exploits.
+"""
+import gzip
+import zlib
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+
+try:
+    import brotli
+except ImportError:  # optional, see module docstring
+    brotli = None
+
+COMPRESSIBLE_TYPES = ("application/json", "application/msgpack", "text/csv", "text/plain")
+# preference order on equal q-values
+CODINGS = ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def min_bytes():
+    return getattr(settings, "COMPRESSION_MIN_BYTES", 1024)
+
+
+def gzip_level():
+    return getattr(settings, "COMPRESSION_GZIP_LEVEL", 6)
+
+
+def brotli_quality():
+    return getattr(settings, "COMPRESSION_BROTLI_QUALITY", 5)
+
+
+def accepted_codings(header):
+    """{coding: q} from an Accept-Encoding header."""
+    ranks = {}
+    for item in header.split(","):
+        name, _, params = item.partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            key, _, value = param.partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        ranks[name] = q
+    return ranks
+
+
+def choose_coding(header):
+    """The coding to use for a request's Accept-Encoding, or None for identity."""
+    ranks = accepted_codings(header or "")
+    best, best_q = None, 0.0
+    for coding in CODINGS:
+        q = ranks.get(coding, ranks.get("*", 0.0))
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+def compressible(response):
+    content_type = response.get("Content-Type", "").split(";")[0].strip().lower()
+    return content_type in COMPRESSIBLE_TYPES or content_type.endswith("+json")
+
+
+def compress(coding, content):
+    if coding == "br":
+        return brotli.compress(content, quality=brotli_quality())
+    return gzip.compress(content, compresslevel=gzip_level(), mtime=0)
+
+
+def compress_stream(coding, chunks):
+    if coding == "br":
+        compressor = brotli.Compressor(quality=brotli_quality())
+        for chunk in chunks:
+            yield compressor.process(chunk) + compressor.flush()
+        yield compressor.finish()
+        return
+    compressor = zlib.compressobj(gzip_level(), zlib.DEFLATED, zlib.MAX_WBITS | 16)  # gzip container
+    for chunk in chunks:
+        yield compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+    yield compressor.flush()
+
+
+class CompressionMiddleware:
+    async_capable = True
+    sync_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self.process_response(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return self.process_response(request, await self.get_response(request))
+
+    def process_response(self, request, response):
+        if response.has_header("Content-Encoding") or not compressible(response):
+            return response
+        if response.streaming:
+            # async iterators (ASGI) are passed through as they are
+            if getattr(response, "is_async", False):
+                return response
+        elif len(response.content) < min_bytes():
+            return response
+
+        patch_vary_headers(response, ("Accept-Encoding",))
+        coding = choose_coding(request.META.get("HTTP_ACCEPT_ENCODING"))
+        if coding is None:
+            return response
+
+        if response.streaming:
+            response.streaming_content = compress_stream(coding, response.streaming_content)
+            response.headers.pop("Content-Length", None)
+        else:
+            compressed = compress(coding, response.content)
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response["Content-Length"] = str(len(compressed))
+
+        # a strong validator promises byte-identical bodies across encodings
+        etag = response.get("ETag")
+        if etag and etag.startswith('"'):
+            response["ETag"] = f"W/{etag}"
+        response["Content-Encoding"] = coding
+        return response
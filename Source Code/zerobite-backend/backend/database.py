@@ -0,0 +1,383 @@
+# backend/database.py
+"""
+Database settings from the environment, and read replicas.
+
+databases_from_env() builds DATABASES from DB_* variables (defaults are
+the local MySQL setup). Connections persist for DB_CONN_MAX_AGE seconds
+and are health-checked before reuse. With the PostgreSQL backend,
+DB_POOL=1 uses Django's connection pool instead. DB_REPLICAS lists read
+replicas as host[:port] entries, or as file names for SQLite. They become
+the aliases replica1, replica2, ...
+
+ReplicaRouter sends reads to the replica chosen for the current request.
+ReplicaRoutingMiddleware picks one only for GET/HEAD requests to the
+views in REPLICA_READ_VIEWS. Everything else, writes included, uses the
+primary. Reads stay on the primary for READ_YOUR_WRITES_SECONDS after a
+write by the same user (see pin_primary), so clients never see their
+own change missing; other users' reads stay on the replicas. The pins
+live on DATABASE_PIN_CACHE_ALIAS, so point that at a shared backend when
+there are several workers.
+
+Every REPLICA_HEALTH_INTERVAL seconds each replica's replication lag is
+measured. One that lags more than REPLICA_MAX_LAG_SECONDS, cannot be
+reached, or is not replicating is skipped until a later check passes.
+With no healthy replica, reads go to the primary.
+"""
+import contextvars
+import logging
+import random
+import threading
+import time
+from collections import namedtuple
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from django.db import DatabaseError, connections
+from django.urls import Resolver404, resolve
+
+logger = logging.getLogger(__name__)
+
+PIN_PREFIX = "db:pin"
+SAFE_METHODS = ("GET", "HEAD")
+
+# the alias reads of the current request go to; None = the primary
+_read_alias = contextvars.ContextVar("read_alias", default=None)
+
+
+# ---------------- Settings ---------------- #
+
+def _flag(value):
+    return str(value).strip().lower() in ("1", "true", "yes", "on")
+
+
+def _host_port(entry, default_port):
+    host, _, port = entry.strip().rpartition(":")
+    if not host:  # no port given
+        return entry.strip(), default_port
+    return host, port
+
+
+def databases_from_env(environ):
+    """(DATABASES, replica aliases) from DB_* environment variables."""
+    engine = environ.get("DB_ENGINE", "django.db.backends.mysql")
+    sqlite = engine.endswith("sqlite3")
+    conn_max_age = environ.get("DB_CONN_MAX_AGE", "60")
+    primary = {
+        "ENGINE": engine,
+        "NAME": environ.get("DB_NAME", "zerobite_db"),
+        "USER": environ.get("DB_USER", "root"),
+        "PASSWORD": environ.get("DB_PASSWORD", "12345"),
+        "HOST": environ.get("DB_HOST", "localhost"),
+        "PORT": environ.get("DB_PORT", "3306"),
+        # "none": keep connections open for good
+        "CONN_MAX_AGE": None if conn_max_age.lower() == "none" else int(conn_max_age),
+        # a persistent connection is pinged before a request reuses it
+        "CONN_HEALTH_CHECKS": True,
+        "OPTIONS": {},
+    }
+    if sqlite:
+        for key in ("USER", "PASSWORD", "HOST", "PORT"):
+            primary[key] = ""
+    if _flag(environ.get("DB_POOL", "")):
+        if not engine.endswith("postgresql"):
+            raise ImproperlyConfigured(
+                "DB_POOL needs the PostgreSQL backend; other backends keep "
+                "connections open with DB_CONN_MAX_AGE instead."
+            )
+        # the pool replaces persistent connections
+        primary["OPTIONS"]["pool"] = True
+        primary["CONN_MAX_AGE"] = 0
+
+    databases = {"default": primary}
+    replicas = []
+    for i, entry in enumerate(filter(None, environ.get("DB_REPLICAS", "").split(",")), start=1):
+        replica = {**primary, "OPTIONS": dict(primary["OPTIONS"]), "TEST": {"MIRROR": "default"}}
+        if sqlite:
+            replica["NAME"] = entry.strip()
+        else:
+            replica["HOST"], replica["PORT"] = _host_port(entry, primary["PORT"])
+            replica["USER"] = environ.get("DB_REPLICA_USER", primary["USER"])
+            replica["PASSWORD"] = environ.get("DB_REPLICA_PASSWORD", primary["PASSWORD"])
+            # an unreachable replica should fail its health check fast
+            replica["OPTIONS"]["connect_timeout"] = int(environ.get("DB_REPLICA_CONNECT_TIMEOUT", "2"))
+        alias = f"replica{i}"
+        databases[alias] = replica
+        replicas.append(alias)
+    return databases, replicas
+
+
+def replicas():
+    return getattr(settings, "DATABASE_REPLICAS", ())
+
+
+def read_views():
+    return getattr(settings, "REPLICA_READ_VIEWS", ())
+
+
+def max_lag():
+    return getattr(settings, "REPLICA_MAX_LAG_SECONDS", 5)
+
+
+def health_interval():
+    return getattr(settings, "REPLICA_HEALTH_INTERVAL", 5)
+
+
+def read_your_writes_seconds():
+    return getattr(settings, "READ_YOUR_WRITES_SECONDS", 10)
+
+
+# ---------------- Read-your-writes pins ---------------- #
+
+def get_cache():
+    return caches[getattr(settings, "DATABASE_PIN_CACHE_ALIAS", "default")]
+
+
+def _pin_key(user_id):
+    return f"{PIN_PREFIX}:user:{user_id}"
+
+
+def pin_primary(user_id):
+    """Keep a user's reads on the primary for READ_YOUR_WRITES_SECONDS after their write."""
+    if replicas():
+        get_cache().set(_pin_key(user_id), 1, timeout=read_your_writes_seconds())
+
+
+def is_pinned(user_id):
+    # anonymous requests have no writes of their own to see
+    return user_id is not None and get_cache().get(_pin_key(user_id)) is not None
+
+
+async def ais_pinned(user_id):
+    """is_pinned() for async code, without a blocking cache read on the event loop."""
+    return user_id is not None and await get_cache().aget(_pin_key(user_id)) is not None
+
+
+def token_user_id(request):
+    """The user id in a request's JWT, or None if it has no valid token."""
+    from rest_framework_simplejwt.authentication import JWTAuthentication
+    from rest_framework_simplejwt.exceptions import AuthenticationFailed
+    from rest_framework_simplejwt.settings import api_settings
+
+    auth = JWTAuthentication()
+    header = auth.get_header(request)
+    try:
+        raw = auth.get_raw_token(header) if header is not None else None
+        if raw is None:
+            return None
+        return auth.get_validated_token(raw).get(api_settings.USER_ID_CLAIM)
+    except AuthenticationFailed:
+        return None
+
+
+# ---------------- Replica health ---------------- #
+
+ReplicaStatus = namedtuple("ReplicaStatus", "lag healthy checked")
+
+
+def replica_lag(connection):
+    """Seconds `connection`'s database is behind its source; None if it is not replicating."""
+    with connection.cursor() as cursor:
+        if connection.vendor == "mysql":
+            try:
+                cursor.execute("SHOW REPLICA STATUS")
+            except DatabaseError:  # before MySQL 8.0.22
+                cursor.execute("SHOW SLAVE STATUS")
+            row = cursor.fetchone()
+            if row is None:
+                return None
+            status = dict(zip((column[0] for column in cursor.description), row))
+            lag = status.get("Seconds_Behind_Source", status.get("Seconds_Behind_Master"))
+            return None if lag is None else float(lag)
+        if connection.vendor == "postgresql":
+            cursor.execute(
+                "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+                "ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END"
+            )
+            lag = cursor.fetchone()[0]
+            return None if lag is None else float(lag)
+        # SQLite and the like have no replication to fall behind on
+        cursor.execute("SELECT 1")
+        return 0.0
+
+
+class ReplicaHealth:
+    """Lag and health of each replica, measured at most every REPLICA_HEALTH_INTERVAL seconds."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.statuses = {}
+
+    def check(self, alias):
+        try:
+            lag = replica_lag(connections[alias])
+        except DatabaseError as exc:
+            logger.warning("replica %s unreachable: %s", alias, exc)
+            lag = None
+        healthy = lag is not None and lag <= max_lag()
+        previous = self.statuses.get(alias)
+        if previous is not None and previous.healthy != healthy:
+            logger.warning("replica %s %s rotation (lag %s)", alias, "back in" if healthy else "out of", lag)
+        status = self.statuses[alias] = ReplicaStatus(lag, healthy, time.monotonic())
+        return status
+
+    def is_due(self, alias):
+        status = self.statuses.get(alias)
+        return status is None or time.monotonic() - status.checked >= health_interval()
+
+    def status(self, alias):
+        status = self.statuses.get(alias)
+        if not self.is_due(alias):
+            return status
+        # one thread re-checks; the others go on with the last result unless there is none yet
+        if not self.lock.acquire(blocking=status is None):
+            return status
+        try:
+            return self.check(alias) if self.is_due(alias) else self.statuses[alias]
+        finally:
+            self.lock.release()
+
+    def healthy(self):
+        return [alias for alias in replicas() if self.status(alias).healthy]
+
+    def pick(self):
+        """A healthy replica at random, or None."""
+        healthy = self.healthy()
+        return random.choice(healthy) if healthy else None
+
+    async def apick(self):
+        # checks query the replicas, which async code must do in a thread
+        if any(self.is_due(alias) for alias in replicas()):
+            return await sync_to_async(self.pick)()
+        return self.pick()
+
+    def snapshot(self):
+        return dict(self.statuses)
+
+    def reset(self):
+        self.statuses.clear()
+
+
+health = ReplicaHealth()
+
+
+# ---------------- Routing ---------------- #
+
+def read_alias():
+    """The database the current request's reads go to; None for the primary."""
+    return _read_alias.get()
+
+
+def _is_read_view(request):
+    if request.method not in SAFE_METHODS or not replicas():
+        return False
+    try:
+        match = resolve(request.path_info, getattr(request, "urlconf", None))
+    except Resolver404:
+        return False
+    return match.url_name in read_views()
+
+
+def read_alias_for(request):
+    """The replica a request's reads should use, or None for the primary."""
+    if not _is_read_view(request) or is_pinned(token_user_id(request)):
+        return None
+    return health.pick()
+
+
+async def aread_alias_for(request):
+    if not _is_read_view(request) or await ais_pinned(token_user_id(request)):
+        return None
+    return await health.apick()
+
+
+def _pinned(alias, chunks):
+    """Route the reads of a streamed body, made as it is sent, to `alias` too."""
+    chunks = iter(chunks)
+    while True:
+        token = _read_alias.set(alias)
+        try:
+            chunk = next(chunks)
+        except StopIteration:
+            return
+        finally:
+            _read_alias.reset(token)
+        yield chunk
+
+
+async def _apinned(alias, chunks):
+    """_pinned() for an async streamed body."""
+    chunks = aiter(chunks)
+    while True:
+        token = _read_alias.set(alias)
+        try:
+            chunk = await anext(chunks)
+        except StopAsyncIteration:
+            return
+        finally:
+            _read_alias.reset(token)
+        yield chunk
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        return _read_alias.get()
+
+    def db_for_write(self, model, **hints):
+        return "default"
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # replicas hold the primary's data, so objects from any of them relate
+        same = {"default", *replicas()}
+        if obj1._state.db in same and obj2._state.db in same:
+            return True
+        return None
+
+
+class ReplicaRoutingMiddleware:
+    """Route reads of replica-safe views to a replica and pin users to the primary after they write."""
+    async_capable = True
+    sync_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        alias = read_alias_for(request)
+        if alias is None:
+            return self.after_write(request, self.get_response(request))
+        token = _read_alias.set(alias)
+        try:
+            response = self.get_response(request)
+        finally:
+            _read_alias.reset(token)
+        return self.route_stream(alias, response)
+
+    async def __acall__(self, request):
+        alias = await aread_alias_for(request)
+        if alias is None:
+            return self.after_write(request, await self.get_response(request))
+        token = _read_alias.set(alias)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _read_alias.reset(token)
+        return self.route_stream(alias, response)
+
+    def route_stream(self, alias, response):
+        if response.streaming:
+            pinned = _apinned if response.is_async else _pinned
+            response.streaming_content = pinned(alias, response.streaming_content)
+        return response
+
+    def after_write(self, request, response):
+        if request.method not in SAFE_METHODS and response.status_code < 400 and replicas():
+            user_id = token_user_id(request)
+            if user_id is not None:
+                pin_primary(user_id)
+        return response
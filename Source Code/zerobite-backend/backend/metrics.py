@@ -0,0 +1,369 @@
+# backend/metrics.py
+"""
+Per-view request metrics in the Prometheus text format.
+
+MetricsMiddleware records, for every request, the latency (histogram),
+the number and total time of database queries, and the response size,
+labelled by URL name, method and status. The counters live in process
+memory; with METRICS_DIR set each worker also dumps them to
+<METRICS_DIR>/<pid>-<start id>.json every METRICS_FLUSH_SECONDS, and
+/metrics sums every file, so any worker can answer a scrape for the whole
+server. Files of exited workers are kept: counters must never go
+backwards. The random start id keeps a new worker that the OS gave a
+dead worker's pid from overwriting that worker's file.
+
+Queries are timed by a wrapper on every database connection that adds
+to the current request's QueryTimer (a context variable), so queries an
+async view runs through the async ORM, in another thread, count too.
+
+/metrics is not public: with METRICS_TOKEN set a scrape needs it as a
+bearer token, otherwise only METRICS_ALLOWED_IPS (loopback by default)
+may scrape.
+"""
+import atexit
+import contextvars
+import hmac
+import ipaddress
+import json
+import os
+import secrets
+import tempfile
+import threading
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import HttpResponse, HttpResponseForbidden
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+METRICS_PATH = "/metrics"
+UNMATCHED = "<unmatched>"
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class Series:
+    __slots__ = ("count", "buckets", "seconds", "queries", "query_seconds", "bytes")
+
+    def __init__(self):
+        self.count = 0
+        self.buckets = [0] * len(LATENCY_BUCKETS)
+        self.seconds = 0.0
+        self.queries = 0
+        self.query_seconds = 0.0
+        self.bytes = 0
+
+    def observe(self, seconds, queries, query_seconds, size):
+        self.count += 1
+        self.seconds += seconds
+        self.queries += queries
+        self.query_seconds += query_seconds
+        self.bytes += size
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if seconds <= bound:
+                self.buckets[i] += 1
+                break
+
+    def as_list(self):
+        return [self.count, self.buckets, self.seconds, self.queries, self.query_seconds, self.bytes]
+
+    @classmethod
+    def from_list(cls, values):
+        series = cls()
+        (series.count, buckets, series.seconds, series.queries, series.query_seconds, series.bytes) = values
+        series.buckets = list(buckets)
+        return series
+
+    def merge(self, other):
+        self.count += other.count
+        self.buckets = [a + b for a, b in zip(self.buckets, other.buckets)]
+        self.seconds += other.seconds
+        self.queries += other.queries
+        self.query_seconds += other.query_seconds
+        self.bytes += other.bytes
+
+
+class Registry:
+    """Metrics of this process, keyed by (view, method, status)."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.series = {}
+        self.last_flush = time.monotonic()
+        self.pid = self.start_id = None
+
+    def observe(self, labels, seconds, queries, query_seconds, size):
+        with self.lock:
+            series = self.series.get(labels)
+            if series is None:
+                series = self.series[labels] = Series()
+            series.observe(seconds, queries, query_seconds, size)
+
+    def snapshot(self):
+        with self.lock:
+            return {labels: Series.from_list(s.as_list()) for labels, s in self.series.items()}
+
+    def reset(self):
+        with self.lock:
+            self.series.clear()
+
+    # ---------------- Cross-process files ---------------- #
+
+    def filename(self):
+        """<pid>-<start id>.json; a forked worker gets a start id of its own."""
+        pid = os.getpid()
+        if self.pid != pid:
+            self.pid, self.start_id = pid, secrets.token_hex(4)
+        return f"{pid}-{self.start_id}.json"
+
+    def path(self):
+        directory = metrics_dir()
+        return os.path.join(directory, self.filename()) if directory else None
+
+    def flush(self):
+        path = self.path()
+        if path is None:
+            return
+        payload = [[list(labels), s.as_list()] for labels, s in self.snapshot().items()]
+        directory = os.path.dirname(path)
+        fd, tmp = tempfile.mkstemp(dir=directory, prefix=".metrics-", suffix=".tmp")
+        with os.fdopen(fd, "w") as fh:
+            json.dump(payload, fh)
+        os.replace(tmp, path)  # readers never see a half-written file
+        self.last_flush = time.monotonic()
+
+    def maybe_flush(self):
+        if metrics_dir() and time.monotonic() - self.last_flush >= getattr(settings, "METRICS_FLUSH_SECONDS", 5):
+            self.flush()
+
+
+registry = Registry()
+
+
+def metrics_dir():
+    return getattr(settings, "METRICS_DIR", None)
+
+
+@atexit.register
+def _flush_on_exit():
+    try:
+        registry.flush()
+    except Exception:
+        pass
+
+
+def collect():
+    """Series of every worker: this process from memory, the others from their files."""
+    merged = registry.snapshot()
+    directory = metrics_dir()
+    if not directory or not os.path.isdir(directory):
+        return merged
+    own = registry.filename()
+    for name in os.listdir(directory):
+        if not name.endswith(".json") or name == own:
+            continue
+        try:
+            with open(os.path.join(directory, name)) as fh:
+                rows = json.load(fh)
+        except (OSError, ValueError):
+            continue
+        for labels, values in rows:
+            labels = tuple(labels)
+            series = Series.from_list(values)
+            if labels in merged:
+                merged[labels].merge(series)
+            else:
+                merged[labels] = series
+    return merged
+
+
+# ---------------- Middleware ---------------- #
+
+class QueryTimer:
+    __slots__ = ("count", "seconds")
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.seconds += time.perf_counter() - started
+
+
+# the timer of the request being handled; copied into the threads the async ORM runs in
+_query_timer = contextvars.ContextVar("query_timer", default=None)
+
+
+def time_query(execute, sql, params, many, context):
+    timer = _query_timer.get()
+    if timer is None:
+        return execute(sql, params, many, context)
+    return timer(execute, sql, params, many, context)
+
+
+def install_query_timer(connection, **kwargs):
+    if time_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(time_query)
+
+
+connection_created.connect(install_query_timer)
+
+
+class MetricsMiddleware:
+    async_capable = True
+    sync_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def start(self):
+        # connections opened before this module was loaded
+        for conn in connections.all(initialized_only=True):
+            install_query_timer(conn)
+        timer = QueryTimer()
+        return timer, _query_timer.set(timer), time.perf_counter()
+
+    def finish(self, request, response, timer, started):
+        elapsed = time.perf_counter() - started
+        match = getattr(request, "resolver_match", None)
+        view = (match.url_name or match.view_name) if match else UNMATCHED
+        # streamed bodies are produced after this point; their size is unknown here
+        size = 0 if response.streaming else len(response.content)
+        registry.observe((view, request.method, str(response.status_code)), elapsed, timer.count, timer.seconds, size)
+        registry.maybe_flush()
+        return response
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if request.path == METRICS_PATH:
+            return self.get_response(request)
+
+        timer, token, started = self.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            _query_timer.reset(token)
+        return self.finish(request, response, timer, started)
+
+    async def __acall__(self, request):
+        if request.path == METRICS_PATH:
+            return await self.get_response(request)
+
+        timer, token, started = self.start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _query_timer.reset(token)
+        return self.finish(request, response, timer, started)
+
+
+# ---------------- Exposition ---------------- #
+
+def _labels(view, method, status, **extra):
+    pairs = {"view": view, "method": method, "status": status, **extra}
+    escaped = (
+        f'{k}="{str(v).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"'
+        for k, v in pairs.items()
+    )
+    return "{" + ",".join(escaped) + "}"
+
+
+def render(series_by_labels, extra_lines=()):
+    lines = [
+        "# HELP zerobite_http_request_duration_seconds Time spent handling requests, per view.",
+        "# TYPE zerobite_http_request_duration_seconds histogram",
+    ]
+    ordered = sorted(series_by_labels.items())
+    for labels, s in ordered:
+        cumulative = 0
+        for bound, n in zip(LATENCY_BUCKETS, s.buckets):
+            cumulative += n
+            lines.append(f"zerobite_http_request_duration_seconds_bucket{_labels(*labels, le=bound)} {cumulative}")
+        lines.append(f"zerobite_http_request_duration_seconds_bucket{_labels(*labels, le='+Inf')} {s.count}")
+        lines.append(f"zerobite_http_request_duration_seconds_sum{_labels(*labels)} {s.seconds:.6f}")
+        lines.append(f"zerobite_http_request_duration_seconds_count{_labels(*labels)} {s.count}")
+
+    counters = (
+        ("zerobite_http_db_queries_total", "Database queries run while handling requests.", "queries", "{}"),
+        ("zerobite_http_db_query_seconds_total", "Time spent in database queries.", "query_seconds", "{:.6f}"),
+        ("zerobite_http_response_bytes_total", "Response body bytes (streamed bodies not counted).", "bytes", "{}"),
+    )
+    for name, help_text, attr, fmt in counters:
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} counter")
+        for labels, s in ordered:
+            lines.append(f"{name}{_labels(*labels)} {fmt.format(getattr(s, attr))}")
+
+    lines.extend(extra_lines)
+    return "\n".join(lines) + "\n"
+
+
+def _cache_lines():
+    from donations.response_cache import cache_stats
+
+    stats = cache_stats()
+    return [
+        "# HELP zerobite_donation_response_cache_total Donation response cache lookups by result.",
+        "# TYPE zerobite_donation_response_cache_total counter",
+        f'zerobite_donation_response_cache_total{{result="hit"}} {stats["hits"]}',
+        f'zerobite_donation_response_cache_total{{result="miss"}} {stats["misses"]}',
+    ]
+
+
+def _replica_lines():
+    from .database import health
+
+    statuses = sorted(health.snapshot().items())
+    if not statuses:
+        return []
+    lines = [
+        "# HELP zerobite_db_replica_lag_seconds Replication lag at the last health check (-1: unknown).",
+        "# TYPE zerobite_db_replica_lag_seconds gauge",
+    ]
+    lines += [
+        f'zerobite_db_replica_lag_seconds{{alias="{alias}"}} {-1 if s.lag is None else s.lag}'
+        for alias, s in statuses
+    ]
+    lines += [
+        "# HELP zerobite_db_replica_healthy Whether the replica is in the read rotation.",
+        "# TYPE zerobite_db_replica_healthy gauge",
+    ]
+    lines += [f'zerobite_db_replica_healthy{{alias="{alias}"}} {int(s.healthy)}' for alias, s in statuses]
+    return lines
+
+
+def allowed_networks():
+    return [
+        ipaddress.ip_network(network, strict=False)
+        for network in getattr(settings, "METRICS_ALLOWED_IPS", ("127.0.0.1", "::1"))
+    ]
+
+
+def scrape_allowed(request):
+    """The bearer token when METRICS_TOKEN is set, else a METRICS_ALLOWED_IPS client."""
+    token = getattr(settings, "METRICS_TOKEN", None)
+    if token:
+        header = request.META.get("HTTP_AUTHORIZATION") or ""
+        return hmac.compare_digest(header.encode(), f"Bearer {token}".encode())
+    try:
+        address = ipaddress.ip_address(request.META.get("REMOTE_ADDR") or "")
+    except ValueError:
+        return False
+    return any(address in network for network in allowed_networks())
+
+
+def metrics_view(request):
+    """GET /metrics — Prometheus scrape target, for METRICS_TOKEN or METRICS_ALLOWED_IPS only."""
+    if not scrape_allowed(request):
+        return HttpResponseForbidden("metrics token required\n")
+    registry.maybe_flush()
+    return HttpResponse(render(collect(), _cache_lines() + _replica_lines()), content_type=CONTENT_TYPE)
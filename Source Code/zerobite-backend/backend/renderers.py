@@ -0,0 +1,125 @@
+# backend/renderers.py
+"""
+Wire formats of the API, chosen by the Accept header (or ?format=).
+
+FastJSONRenderer (application/json, the default) emits what DRF's
+JSONRenderer does for compact UTF-8 output, through orjson when it is
+installed. Whatever orjson does not encode natively (Decimal, lazy
+strings, datetimes left in the data, ...) goes through DRF's
+JSONEncoder.default, so values come out as before. Indented output
+(?format=json; indent=2, the browsable API) and a missing orjson fall
+back to the stock renderer.
+
+ColumnarJSONRenderer (application/vnd.zerobite.columnar+json) sends
+lists as a column header plus rows of values, so keys are not repeated
+per row. MessagePackRenderer (application/msgpack) needs the msgpack
+package; without it the format is not offered (406 if it is the only
+one accepted).
+"""
+from operator import itemgetter
+
+from rest_framework.negotiation import DefaultContentNegotiation
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:  # optional, see module docstring
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # optional, see module docstring
+    msgpack = None
+
+LINE_SEPARATORS = (b"\xe2\x80\xa8", b"\xe2\x80\xa9")
+
+
+class FastJSONRenderer(JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or data is None or self.ensure_ascii or not self.compact:
+            return super().render(data, accepted_media_type, renderer_context)
+        if self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        ret = orjson.dumps(
+            data,
+            default=self.encoder_class().default,
+            # datetimes are formatted by DRF's encoder (milliseconds, "Z"), not orjson
+            option=orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME,
+        )
+        # same strict-javascript-subset escaping as JSONRenderer
+        if LINE_SEPARATORS[0] in ret or LINE_SEPARATORS[1] in ret:
+            ret = ret.replace(LINE_SEPARATORS[0], b"\\u2028").replace(LINE_SEPARATORS[1], b"\\u2029")
+        return ret
+
+
+# ---------------- Columnar JSON ---------------- #
+
+def to_columns(rows):
+    """
+    [{"id": 1, "name": "a"}, ...] -> {"columns": ["id", "name"], "rows": [[1, "a"], ...]}.
+    Rows missing a column get null there.
+    """
+    if not rows:
+        return {"columns": [], "rows": []}
+    columns = list(rows[0])
+    first = rows[0].keys()
+    if all(row.keys() == first for row in rows):
+        if len(columns) == 1:
+            return {"columns": columns, "rows": [[row[columns[0]]] for row in rows]}
+        values = itemgetter(*columns)
+        return {"columns": columns, "rows": [list(values(row)) for row in rows]}
+
+    seen = set(columns)
+    for row in rows:
+        for key in row:
+            if key not in seen:
+                seen.add(key)
+                columns.append(key)
+    return {"columns": columns, "rows": [[row.get(column) for column in columns] for row in rows]}
+
+
+def _is_rows(value):
+    return isinstance(value, list) and all(isinstance(row, dict) for row in value)
+
+
+def columnar(data):
+    """Lists of objects, bare or as a paginated page's `results`, in columns; anything else as it is."""
+    if _is_rows(data):
+        return to_columns(data)
+    if isinstance(data, dict) and _is_rows(data.get("results")):
+        return {**data, "results": to_columns(data["results"])}
+    return data
+
+
+class ColumnarJSONRenderer(FastJSONRenderer):
+    media_type = "application/vnd.zerobite.columnar+json"
+    format = "columnar"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return super().render(columnar(data), accepted_media_type, renderer_context)
+
+
+# ---------------- MessagePack ---------------- #
+
+class MessagePackRenderer(BaseRenderer):
+    media_type = "application/msgpack"
+    format = "msgpack"
+    charset = None
+    render_style = "binary"
+    available = msgpack is not None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        # values outside msgpack's types (Decimal, datetime, ...) as in JSON
+        return msgpack.packb(data, default=JSONEncoder().default, use_bin_type=True)
+
+
+class AvailableRendererNegotiation(DefaultContentNegotiation):
+    """Content negotiation that skips renderers whose optional package is missing."""
+
+    def select_renderer(self, request, renderers, format_suffix=None):
+        renderers = [renderer for renderer in renderers if getattr(renderer, "available", True)]
+        return super().select_renderer(request, renderers, format_suffix)
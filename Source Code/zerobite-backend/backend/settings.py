@@ -2,6 +2,8 @@
 from pathlib import Path
 import os
 
+from backend.database import databases_from_env
+
 EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
 
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -14,6 +16,9 @@ ALLOWED_HOSTS = []  # add hostnames in production
 # Custom user model
 AUTH_USER_MODEL = 'users.User'
 
+# one indexed lookup for username or email, one password hash (users/backends.py)
+AUTHENTICATION_BACKENDS = ['users.backends.UsernameOrEmailBackend']
+
 # CORS (development)
 CORS_ALLOWED_ORIGINS = [
     'http://localhost:3000',
@@ -43,6 +48,8 @@ INSTALLED_APPS = [
 
 # Middleware: corsheaders must be before CommonMiddleware
 MIDDLEWARE = [
+    'backend.metrics.MetricsMiddleware',  # first, so it times the whole stack
+    'backend.compression.CompressionMiddleware',  # before anything else that reads the body
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -51,6 +58,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'backend.database.ReplicaRoutingMiddleware',  # last, so streamed bodies it routes are compressed after
 ]
 
 ROOT_URLCONF = 'backend.urls'
@@ -73,27 +81,74 @@ TEMPLATES = [
 # REST Framework + JWT
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "users.authentication.CachedJWTAuthentication",
     ),
     "DEFAULT_PERMISSION_CLASSES": (
         "rest_framework.permissions.AllowAny",
     ),
+    # JSON (orjson when installed), columnar JSON and MessagePack by Accept (backend/renderers.py)
+    "DEFAULT_RENDERER_CLASSES": (
+        "backend.renderers.FastJSONRenderer",
+        "backend.renderers.ColumnarJSONRenderer",
+        "backend.renderers.MessagePackRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ),
+    "DEFAULT_CONTENT_NEGOTIATION_CLASS": "backend.renderers.AvailableRendererNegotiation",
 }
 
+# Default page size of the keyset-paginated feeds and lists
+# (donations/pagination.py); clients may ask for up to 100 with ?page_size=
+DONATION_FEED_PAGE_SIZE = 20
+
 WSGI_APPLICATION = 'backend.wsgi.application'
 
-# Database — MySQL (make sure mysqlclient is installed)
-DATABASES = {
+# Database — MySQL (make sure mysqlclient is installed), configured from
+# DB_ENGINE, DB_NAME, DB_USER, DB_PASSWORD, DB_HOST, DB_PORT and
+# DB_CONN_MAX_AGE (backend/database.py); DB_REPLICAS adds read replicas
+DATABASES, DATABASE_REPLICAS = databases_from_env(os.environ)
+DATABASE_ROUTERS = ['backend.database.ReplicaRouter']
+
+# GET/HEAD views whose reads may go to a replica
+REPLICA_READ_VIEWS = [
+    'donation-list-create',
+    'donation-detail-delete',
+    'admin-user-list',
+    'admin-donation-list',
+    'admin-export-donations',
+    'admin-export-orders',
+]
+# replicas further behind than this leave the rotation until they catch up;
+# lag is re-measured every REPLICA_HEALTH_INTERVAL seconds
+REPLICA_MAX_LAG_SECONDS = 5
+REPLICA_HEALTH_INTERVAL = 5
+# reads stay on the primary this long after a write (longer than the lag allowed)
+READ_YOUR_WRITES_SECONDS = 10
+DATABASE_PIN_CACHE_ALIAS = 'default'
+
+# Cache — locmem per process by default; point DONATION_CACHE_ALIAS at a
+# shared backend (Redis/Memcached) to share cached responses across workers
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.mysql',
-        'NAME': 'zerobite_db',
-        'USER': 'root',
-        'PASSWORD': '12345',
-        'HOST': 'localhost',
-        'PORT': '3306',
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'zerobite',
     }
 }
 
+# Anonymous donation list/detail response cache (donations/response_cache.py)
+DONATION_CACHE_ALIAS = 'default'
+DONATION_CACHE_TIMEOUT = 60  # seconds
+
+# Donation event log (donations/events.py): ASGI processes poll it every
+# EVENT_LOG_POLL_SECONDS for events other processes published, such as the
+# expiry sweeper's; rows older than EVENT_LOG_RETENTION_SECONDS are pruned
+EVENT_LOG_POLL_SECONDS = 1
+EVENT_LOG_RETENTION_SECONDS = 300
+
+# JWT user lookups (users/authentication.py); saves and deletes invalidate,
+# the timeout bounds staleness in other processes when the cache is local
+USER_AUTH_CACHE_ALIAS = 'default'
+USER_AUTH_CACHE_TIMEOUT = 60  # seconds
+
 # Password validation (defaults)
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',},
@@ -115,6 +170,39 @@ STATICFILES_DIRS = [BASE_DIR / "static"]  # dev-only project static files
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Donation image processing (donations/images.py): background worker threads
+# (0 = process inline after commit) and the format of the resized variants
+DONATION_IMAGE_WORKERS = 2
+DONATION_IMAGE_FORMAT = "WEBP"  # falls back to JPEG if Pillow lacks WebP
+# larger uploads, and anything that is not a JPEG/PNG/WebP image, get a 400
+DONATION_IMAGE_MAX_BYTES = 10 * 1024 * 1024
+
+# Most rows a ?q= text search returns (donations/search.py)
+DONATION_SEARCH_LIMIT = 50
+# Most rows a ?lat=&lng=&radius_km= nearby search returns, nearest first
+DONATION_NEARBY_LIMIT = 100
+
+# Donations claimed or expired this many days ago move to the archive
+# tables when `manage.py archive_donations` runs (donations/archive.py)
+ARCHIVE_AFTER_DAYS = 30
+
+# Request metrics served at /metrics (backend/metrics.py). With several
+# worker processes, point METRICS_DIR at a directory they all share so any
+# worker's scrape covers every process. /metrics is never public: set
+# METRICS_TOKEN to require it as a bearer token ("Authorization: Bearer
+# <token>") from any address; while it is unset only clients in
+# METRICS_ALLOWED_IPS (addresses or networks, e.g. "10.0.0.0/8") may scrape
+METRICS_DIR = None
+METRICS_FLUSH_SECONDS = 5
+METRICS_TOKEN = None
+METRICS_ALLOWED_IPS = ['127.0.0.1', '::1']
+
+# gzip/brotli by Accept-Encoding for API bodies of at least this many bytes
+# (backend/compression.py); brotli needs the brotli package
+COMPRESSION_MIN_BYTES = 1024
+COMPRESSION_GZIP_LEVEL = 6
+COMPRESSION_BROTLI_QUALITY = 5
+
 # Fallback donation image URL (frontend can request this)
 DEFAULT_DONATION_IMAGE_URL = "/static/default_donation.jpg"
 
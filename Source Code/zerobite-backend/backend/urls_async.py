@@ -0,0 +1,21 @@
+# backend/urls_async.py
+"""
+URLconf of the ASGI app (backend/asgi.py). The hot read endpoints are
+served by async views (donations/async_views.py) on the same paths and
+names; everything else is backend/urls.py.
+"""
+from django.urls import path
+
+from donations.async_views import (
+    DonationDetailAsyncView, DonationListAsyncView, DonationUserStatsAsyncView, OrderListAsyncView,
+)
+
+from .urls import urlpatterns as sync_urlpatterns
+
+urlpatterns = [
+    path("api/donations/", DonationListAsyncView.as_view(), name="donation-list-create"),
+    path("api/donations/<int:pk>/", DonationDetailAsyncView.as_view(), name="donation-detail-delete"),
+    path("api/donations/user_stats/", DonationUserStatsAsyncView.as_view(), name="donation-user-stats"),
+    path("api/orders/", OrderListAsyncView.as_view(), name="orders-list-create"),
+    *sync_urlpatterns,
+]
@@ -0,0 +1,133 @@
+# donations/archive.py
+"""
+Hot/cold split of the donation tables.
+
+Claimed and expired donations never come back to the feed, yet they
+used to stay in donations_donation (and its indexes) forever. Once one
+has been claimed or expired for ARCHIVE_AFTER_DAYS, archive_donations()
+moves it, with its images and orders, to ArchivedDonation,
+ArchivedDonationImage and ArchivedOrder. Each batch is moved in its own
+transaction. Rows keep their primary keys and column names, and the
+image files stay where they are. Request matches of an archived donation
+are deleted with it.
+
+The feed, detail, search, matching and claims only read the hot tables,
+which stay about as small as the live set. The history views merge in
+the archive: a donor's posts and stats, a user's orders, the admin
+exports, the admin donation list and the admin user list counts.
+"""
+import heapq
+from datetime import timedelta
+from itertools import chain
+from operator import itemgetter
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import (
+    ArchivedDonation, ArchivedDonationImage, ArchivedOrder, Donation, DonationImage, DonationTableState, Order,
+)
+from .response_cache import invalidate_donations
+from .signals import deletes_batched
+
+# hot model -> archive model; the archive has every column of the hot table
+ARCHIVES = (
+    (Donation, ArchivedDonation),
+    (DonationImage, ArchivedDonationImage),
+    (Order, ArchivedOrder),
+)
+
+
+def archive_after_days():
+    return getattr(settings, "ARCHIVE_AFTER_DAYS", 30)
+
+
+def columns(model):
+    return [field.attname for field in model._meta.concrete_fields]
+
+
+def archivable(cutoff):
+    """Donations claimed or expired since before `cutoff` (updated_at is set by the claim and the sweeper)."""
+    return Donation.objects.filter(
+        Q(is_claimed=True, updated_at__lte=cutoff)
+        | Q(expiry_time__lte=cutoff)
+        | Q(is_expired=True, updated_at__lte=cutoff)
+    )
+
+
+def archive_batch(pks, cutoff, now=None):
+    """Move the donations among `pks` that are still archivable; returns how many moved."""
+    now = now or timezone.now()
+    with transaction.atomic():
+        # re-check under lock: a row may have been edited or deleted since it was picked
+        ids = list(archivable(cutoff).filter(pk__in=pks).select_for_update().values_list("pk", flat=True))
+        if not ids:
+            return 0
+        for model, archive in ARCHIVES:
+            related = {"pk__in": ids} if model is Donation else {"donation_id__in": ids}
+            rows = model.objects.filter(**related).order_by().values(*columns(model))
+            extra = {"archived_at": now} if archive is ArchivedDonation else {}
+            archive.objects.bulk_create([archive(**row, **extra) for row in rows], batch_size=500)
+        # images, orders and request matches go with them; one touch for the batch, not one per row
+        with deletes_batched():
+            Donation.objects.filter(pk__in=ids).delete()
+        DonationTableState.touch_deleted()
+    # cached responses and list change tokens may still include them
+    invalidate_donations(ids)
+    return len(ids)
+
+
+def archive_donations(now=None, batch_size=500, max_batches=None, log=None):
+    """
+    Archive every donation claimed or expired more than ARCHIVE_AFTER_DAYS
+    ago, `batch_size` per transaction. Returns how many were moved.
+    """
+    log = log or (lambda message: None)
+    now = now or timezone.now()
+    cutoff = now - timedelta(days=archive_after_days())
+    moved = batches = 0
+    last_pk = 0
+    while max_batches is None or batches < max_batches:
+        pks = list(
+            archivable(cutoff).filter(pk__gt=last_pk).order_by("pk").values_list("pk", flat=True)[:batch_size]
+        )
+        if not pks:
+            break
+        count = archive_batch(pks, cutoff, now)
+        moved += count
+        batches += 1
+        last_pk = pks[-1]
+        log(f"batch {batches}: archived {count} donation(s), up to id {last_pk}")
+    return moved
+
+
+# ---------------- Reading both ---------------- #
+
+def newest_first(*row_lists, field="created_at"):
+    """.values() rows of a table and its archive as one list, newest first by (field, id)."""
+    return sorted(chain(*row_lists), key=itemgetter(field, "id"), reverse=True)
+
+
+def by_pk(*row_iterators):
+    """Merge value tuples that each iterator yields in primary-key order (the pk first)."""
+    return heapq.merge(*row_iterators, key=itemgetter(0))
+
+
+async def aby_pk(*row_iterators):
+    """by_pk() over async iterators."""
+    heads = []
+    for index, rows in enumerate(row_iterators):
+        row = await anext(rows, None)
+        if row is not None:
+            heads.append((row[0], index, row))
+    heapq.heapify(heads)
+    while heads:
+        _, index, row = heads[0]
+        yield row
+        following = await anext(row_iterators[index], None)
+        if following is None:
+            heapq.heappop(heads)
+        else:
+            heapq.heapreplace(heads, (following[0], index, following))
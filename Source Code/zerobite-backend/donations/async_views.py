@@ -0,0 +1,192 @@
+# donations/async_views.py
+"""
+Async versions of the hot read endpoints: the donation list and detail,
+user stats and the order list. backend/asgi.py serves them on the same
+URLs as the DRF views (backend/urls_async.py); under WSGI nothing
+changes.
+
+GET and HEAD run on the event loop. Authentication, the response cache
+and the ETag check need no thread (the cache through its async API), and
+queries go through Django's async ORM, so a slow client or query does
+not hold a worker thread. Responses are the DRF views' (same rows
+builders, pagination, validators, negotiation, error handling and
+renderers, from an instance of the DRF view; the tests compare them).
+The DRF view still serves anything else: other methods, ?q= and nearby
+searches, the browsable API.
+"""
+from asgiref.sync import sync_to_async
+from django.http import Http404, HttpResponse
+from django.urls import reverse
+from django.utils import timezone
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import exceptions
+from rest_framework.renderers import BrowsableAPIRenderer
+from rest_framework.response import Response
+
+from .archive import newest_first
+from .conditional import add_validators, adonation_detail_change_token, adonation_list_change_token, not_modified
+from .fieldsets import requested
+from .models import ArchivedDonation, Donation
+from .pagination import KeysetPagination
+from .response_cache import acached, adetail_key, alist_key
+from .rows import DonationRows, OrderHistoryRows
+from .views import (
+    DonationListCreateAPIView, DonationRetrieveDestroyAPIView, DonationUserStatsAPIView, OrderListCreateView,
+    add_counts, archived_orders, donation_counts, donation_feed, user_orders,
+)
+
+READ_METHODS = ("GET", "HEAD")
+
+
+class AsyncReadView(View):
+    """
+    GET/HEAD through read(), on an instance of `drf_view`: its request,
+    content negotiation, permissions, throttles, error handling and
+    renderers. Only authentication is run here, so that authenticators
+    with an aauthenticate() stay on the event loop. Every other request
+    goes to `drf_view`.
+    """
+    drf_view = None
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        cls.sync_view = staticmethod(sync_to_async(cls.drf_view.as_view()))
+        return csrf_exempt(super().as_view(**initkwargs))
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.method in READ_METHODS:
+            return self.get(request, *args, **kwargs)
+        return self.sync_view(request, *args, **kwargs)
+
+    def handles(self, request):
+        """False to leave a GET to the DRF view."""
+        return True
+
+    async def read(self, request, *args, **kwargs):
+        """The response to an authenticated, permitted read; by default the DRF view's, in a thread."""
+        handler = getattr(self.api_view, request.method.lower())
+        return await sync_to_async(handler)(request, *args, **kwargs)
+
+    async def get(self, request, *args, **kwargs):
+        view = self.api_view = self.drf_view()
+        view.setup(request, *args, **kwargs)
+        view.headers = view.default_response_headers
+        request = view.request = view.initialize_request(request, *args, **kwargs)
+        view.format_kwarg = view.get_format_suffix(**kwargs)
+        try:
+            request.accepted_renderer, request.accepted_media_type = view.perform_content_negotiation(request)
+        except exceptions.NotAcceptable as exc:
+            return self.finalize(request, view.handle_exception(exc))
+        if isinstance(request.accepted_renderer, BrowsableAPIRenderer) or not self.handles(request):
+            return await self.sync_view(request._request, *args, **kwargs)
+        try:
+            await self.authenticate(request)
+            # request.user is set, so this authenticates nothing again
+            view.initial(request, *args, **kwargs)
+            response = await self.read(request, *args, **kwargs)
+        except Exception as exc:
+            response = view.handle_exception(exc)
+        return self.finalize(request, response)
+
+    async def authenticate(self, request):
+        """Request._authenticate(), awaiting aauthenticate() where an authenticator has one."""
+        for authenticator in request.authenticators:
+            try:
+                if hasattr(authenticator, "aauthenticate"):
+                    result = await authenticator.aauthenticate(request)
+                else:
+                    result = await sync_to_async(authenticator.authenticate)(request)
+            except exceptions.APIException:
+                request._not_authenticated()
+                raise
+            if result is not None:
+                request._authenticator = authenticator
+                request.user, request.auth = result
+                return
+        request._not_authenticated()
+
+    def finalize(self, request, response):
+        response = self.api_view.finalize_response(request, response, *self.args, **self.kwargs)
+        if isinstance(response, Response):
+            # rendered here, so the handler has nothing left to render in a thread
+            rendered = HttpResponse(response.rendered_content, status=response.status_code)
+            for key, value in response.items():
+                rendered[key] = value
+            response = rendered
+        return response
+
+    async def cached(self, request, key, build):
+        """build() -> (status, data), through the response cache for anonymous users."""
+        if request.user.is_authenticated:
+            status, data = await build()
+            return Response(data, status=status)
+        status, data, result = await acached(key, build)
+        return Response(data, status=status, headers={"X-Cache": result})
+
+
+class DonationListAsyncView(AsyncReadView):
+    drf_view = DonationListCreateAPIView
+
+    def handles(self, request):
+        # searches return evaluated lists through the serializer
+        params = request.query_params
+        return not (params.get("q", "").strip() or "lat" in params or "lng" in params)
+
+    async def read(self, request):
+        etag, last_modified = await adonation_list_change_token(request)
+        response = not_modified(request, etag, last_modified)
+        if response is None:
+            response = await self.cached(request, await alist_key(request.query_params), lambda: self.page(request))
+        return add_validators(response, etag, last_modified)
+
+    async def page(self, request):
+        builder = DonationRows(request, *requested(request))
+        paginator = KeysetPagination()
+        queryset = builder.values(donation_feed(request.query_params), paginator.ordering_field)
+        rows = await builder.abuild(await paginator.apaginate_queryset(queryset, request))
+        return 200, paginator.get_paginated_response(rows).data
+
+
+class DonationDetailAsyncView(AsyncReadView):
+    drf_view = DonationRetrieveDestroyAPIView
+
+    async def read(self, request, pk):
+        etag, last_modified = await adonation_detail_change_token(request, pk)
+        key = await adetail_key(pk, request.query_params)
+        if etag is None:  # no such donation; the 404 comes from building it
+            return await self.cached(request, key, lambda: self.donation(request, pk))
+        response = not_modified(request, etag, last_modified)
+        if response is None:
+            response = await self.cached(request, key, lambda: self.donation(request, pk))
+        return add_validators(response, etag, last_modified)
+
+    async def donation(self, request, pk):
+        builder = DonationRows(request, *requested(request))
+        rows = await builder.abuild(builder.values(Donation.objects.filter(pk=pk)))
+        if not rows:
+            raise Http404(f"No {Donation._meta.object_name} matches the given query.")
+        return 200, rows[0]
+
+
+class DonationUserStatsAsyncView(AsyncReadView):
+    drf_view = DonationUserStatsAPIView
+
+    async def read(self, request):
+        counts = donation_counts(timezone.now())
+        stats = add_counts(
+            await Donation.objects.filter(donor=request.user).aaggregate(**counts),
+            await ArchivedDonation.objects.filter(donor=request.user).aaggregate(**counts),
+        )
+        stats["posts_url"] = request.build_absolute_uri(reverse("donation-user-posts"))
+        return Response(stats)
+
+
+class OrderListAsyncView(AsyncReadView):
+    drf_view = OrderListCreateView
+
+    async def read(self, request):
+        builder = OrderHistoryRows(request, *requested(request))
+        orders = [row async for row in builder.values(user_orders(request.user), "created_at")]
+        archived = [row async for row in builder.values(archived_orders(request.user), "created_at")]
+        return Response(await builder.abuild(newest_first(orders, archived)))
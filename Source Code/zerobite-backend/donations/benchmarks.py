@@ -0,0 +1,242 @@
+# donations/benchmarks.py
+"""
+Shared helpers for the bench_* management commands.
+
+Benchmarks always run against a throwaway test database created the same
+way `manage.py test` does, so they never touch real data.
+"""
+import logging
+import os
+import random
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import connections
+from django.test.runner import DiscoverRunner
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.utils import timezone
+
+from .models import Donation, DonationImage, Order
+
+User = get_user_model()
+
+# roughly the area the frontend map starts on
+BASE_LAT = 12.9716
+BASE_LNG = 77.5946
+
+# vocabulary for realistic donation text (search benchmarks)
+DISHES = [
+    "biryani", "dal", "paneer", "roti", "naan", "idli", "dosa", "sambar", "rice", "curry",
+    "bread", "sandwich", "pasta", "pizza", "salad", "soup", "noodles", "burger", "cake", "muffins",
+    "bananas", "apples", "oranges", "milk", "yogurt", "cheese", "lentils", "vegetables", "khichdi", "upma",
+]
+ADJECTIVES = ["fresh", "leftover", "homemade", "spicy", "sweet", "vegan", "warm", "packed", "frozen", "baked"]
+FILLER = ["from", "our", "kitchen", "event", "catering", "lunch", "dinner", "surplus", "today", "servings"]
+AREAS = [
+    "Indiranagar", "Koramangala", "Jayanagar", "Whitefield", "Malleshwaram",
+    "Hebbal", "Yelahanka", "Banashankari", "Marathahalli", "Basavanagudi",
+]
+# one row in RARE_EVERY mentions RARE_TERM
+RARE_TERM = "jackfruit"
+RARE_EVERY = 10_000
+
+
+@contextmanager
+def benchmark_database(verbosity=0, threaded=False):
+    """
+    Create a test database for the duration of the block. With threaded=True
+    a SQLite stand-in is put in a temporary file instead of shared memory so
+    several threads can write to it.
+    """
+    tmp_path = None
+    if threaded and connections["default"].vendor == "sqlite":
+        fd, tmp_path = tempfile.mkstemp(suffix=".sqlite3", prefix="zerobite-bench-")
+        os.close(fd)
+        connections["default"].settings_dict.setdefault("TEST", {})["NAME"] = tmp_path
+
+    # expected 4xx responses (lost claims, ...) would flood the output
+    request_logger = logging.getLogger("django.request")
+    old_level = request_logger.level
+    request_logger.setLevel(logging.ERROR)
+
+    setup_test_environment()
+    runner = DiscoverRunner(verbosity=verbosity, interactive=False)
+    old_config = runner.setup_databases()
+    try:
+        yield
+    finally:
+        runner.teardown_databases(old_config)
+        teardown_test_environment()
+        request_logger.setLevel(old_level)
+        if tmp_path and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+@contextmanager
+def existing_database():
+    """Run against the configured database as-is; only the test client setup (ALLOWED_HOSTS, ...) is applied."""
+    setup_test_environment()
+    try:
+        yield
+    finally:
+        teardown_test_environment()
+
+
+def seed_users(count, role="restaurant", prefix="bench", password_hash=""):
+    users = [
+        User(
+            username=f"{prefix}_{role}_{i}", email=f"{prefix}_{role}_{i}@example.com",
+            email_normalized=f"{prefix}_{role}_{i}@example.com", role=role, password=password_hash,
+        )
+        for i in range(count)
+    ]
+    User.objects.bulk_create(users, batch_size=1000)
+    return list(User.objects.filter(username__startswith=f"{prefix}_{role}_"))
+
+
+def seed_donations(count, donors, expiry_spread=timedelta(hours=6), past_fraction=0.1,
+                   spread_km=25, seed=0, batch_size=1000, text=None):
+    """
+    Bulk-insert `count` donations around BASE_LAT/BASE_LNG. `past_fraction`
+    of them already have an expiry_time in the past but are not flagged.
+    `text(rng, i)` may return (name, description, location) for each row.
+    """
+    rng = random.Random(seed)
+    now = timezone.now()
+    deg = spread_km / 111.32
+    rows = []
+    for i in range(count):
+        if rng.random() < past_fraction:
+            expiry = now - timedelta(seconds=rng.randint(1, 3600))
+        else:
+            expiry = now + timedelta(seconds=rng.randint(1, int(expiry_spread.total_seconds())))
+        name, description, location = text(rng, i) if text else (f"Meal {i}", "Seeded for benchmarking", "Bench City")
+        rows.append(Donation(
+            donor=donors[i % len(donors)],
+            donor_name=f"Donor {i % len(donors)}",
+            name=name,
+            description=description,
+            quantity=rng.randint(1, 50),
+            expiry_time=expiry,
+            location=location,
+            latitude=round(BASE_LAT + rng.uniform(-deg, deg), 6),
+            longitude=round(BASE_LNG + rng.uniform(-deg, deg), 6),
+        ))
+        if len(rows) >= batch_size:
+            Donation.objects.bulk_create(rows, batch_size=batch_size)
+            rows = []
+    Donation.objects.bulk_create(rows, batch_size=batch_size)
+    return count
+
+
+BENCH_PASSWORD = "bench-pass-123"
+
+
+def seed_dataset(donations, users=None, images_per_donation=2, claimed_fraction=0.3, seed=0,
+                 prefix="bench", batch_size=5000, log=None):
+    """
+    Seed a realistic dataset: donors, NGOs and one admin (all with
+    BENCH_PASSWORD), `donations` food donations with text and image rows,
+    and an order for every claimed donation. `users` defaults to one
+    donor per 100 donations plus half as many NGOs. Returns
+    {"donors": [...], "ngos": [...], "admin": user}.
+    """
+    log = log or (lambda message: None)
+    rng = random.Random(seed)
+    password_hash = make_password(BENCH_PASSWORD)
+    donor_count = users or max(10, donations // 100)
+    ngo_count = max(5, donor_count // 2)
+
+    donors = seed_users(donor_count, role="restaurant", prefix=prefix, password_hash=password_hash)
+    ngos = seed_users(ngo_count, role="ngo", prefix=prefix, password_hash=password_hash)
+    admin = User.objects.create(
+        username=f"{prefix}_admin", email=f"{prefix}_admin@example.com", role="other",
+        is_staff=True, password=password_hash,
+    )
+    log(f"users: {donor_count} donors, {ngo_count} ngos, 1 admin")
+
+    first_pk = (Donation.objects.order_by("-pk").values_list("pk", flat=True).first() or 0)
+    seed_donations(donations, donors, past_fraction=0.1, seed=seed, batch_size=batch_size, text=food_text)
+    new_ids = Donation.objects.filter(pk__gt=first_pk).order_by("pk").values_list("pk", flat=True)
+    log(f"donations: {donations}")
+
+    image_count = order_count = 0
+    images, orders, claimed = [], [], []
+    for pk in new_ids.iterator(chunk_size=batch_size):
+        for n in range(images_per_donation):
+            images.append(DonationImage(
+                donation_id=pk, image=f"donation_images/{prefix}_{pk}_{n}.jpg",
+                thumbnail=f"donation_images/variants/{prefix}_{pk}_{n}_thumbnail.webp",
+                card=f"donation_images/variants/{prefix}_{pk}_{n}_card.webp",
+                full=f"donation_images/variants/{prefix}_{pk}_{n}_full.webp",
+                width=1600, height=1200, processed_at=timezone.now(),
+            ))
+        if rng.random() < claimed_fraction:
+            claimed.append(pk)
+            orders.append(Order(donation_id=pk, user=rng.choice(ngos), confirmation_note="seeded pickup"))
+        if len(images) >= batch_size:
+            DonationImage.objects.bulk_create(images, batch_size=batch_size)
+            image_count += len(images)
+            images = []
+        if len(orders) >= batch_size:
+            Order.objects.bulk_create(orders, batch_size=batch_size)
+            Donation.objects.filter(pk__in=claimed).update(is_claimed=True, updated_at=timezone.now())
+            order_count += len(orders)
+            orders, claimed = [], []
+    DonationImage.objects.bulk_create(images, batch_size=batch_size)
+    Order.objects.bulk_create(orders, batch_size=batch_size)
+    Donation.objects.filter(pk__in=claimed).update(is_claimed=True, updated_at=timezone.now())
+    log(f"images: {image_count + len(images)}, orders: {order_count + len(orders)}")
+    return {"donors": donors, "ngos": ngos, "admin": admin}
+
+
+def load_dataset(prefix="bench"):
+    """The users of a dataset seeded earlier by seed_dataset(), or None."""
+    admin = User.objects.filter(username=f"{prefix}_admin").first()
+    if admin is None:
+        return None
+    return {
+        "donors": list(User.objects.filter(username__startswith=f"{prefix}_restaurant_").order_by("pk")),
+        "ngos": list(User.objects.filter(username__startswith=f"{prefix}_ngo_").order_by("pk")),
+        "admin": admin,
+    }
+
+
+def food_text(rng, i):
+    """(name, description, location) for seed_donations(text=...)."""
+    name = f"{rng.choice(ADJECTIVES).title()} {rng.choice(DISHES)}"
+    words = rng.sample(DISHES, 2) + rng.sample(FILLER, 4)
+    if i % RARE_EVERY == 0:
+        words.append(RARE_TERM)
+    rng.shuffle(words)
+    return name, " ".join(words), f"{rng.choice(AREAS)}, Bengaluru"
+
+
+def timed_loop(func, seconds=None, iterations=None):
+    """
+    Call func() repeatedly for `seconds` (or `iterations` times).
+    Returns a list of per-call latencies in seconds.
+    """
+    latencies = []
+    deadline = time.perf_counter() + seconds if seconds else None
+    while True:
+        if iterations is not None and len(latencies) >= iterations:
+            break
+        if deadline is not None and time.perf_counter() >= deadline:
+            break
+        start = time.perf_counter()
+        func()
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    k = min(len(ordered) - 1, max(0, int(round(pct / 100.0 * (len(ordered) - 1)))))
+    return ordered[k]
@@ -0,0 +1,120 @@
+# donations/conditional.py
+import hashlib
+from calendar import timegm
+
+from django.db.models import Max
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+from .models import Donation, DonationTableState
+
+
+def _latest(*values):
+    values = [v for v in values if v is not None]
+    return max(values) if values else None
+
+
+def _weak_etag(*parts):
+    digest = hashlib.sha1("|".join(str(p) for p in parts).encode("utf-8")).hexdigest()[:20]
+    # weak: remaining_seconds in the body moves with the clock
+    return f'W/"{digest}"'
+
+
+def _media_type(request):
+    # JSON, columnar JSON and MessagePack bodies of the same rows are different entities
+    return getattr(request, "accepted_media_type", None)
+
+
+def _list_token(request, last_updated, last_expired, last_deleted):
+    last_modified = _latest(last_updated, last_expired, last_deleted)
+    query = sorted(request.query_params.lists())
+    etag = _weak_etag("list", last_modified and last_modified.isoformat(), query, _media_type(request))
+    return etag, last_modified
+
+
+def _last_expired(now):
+    return Donation.objects.filter(expiry_time__lte=now).order_by("-expiry_time").values_list("expiry_time", flat=True)
+
+
+def _last_deleted():
+    return DonationTableState.objects.filter(pk=1).values_list("last_deleted_at", flat=True)
+
+
+def donation_list_change_token(request):
+    """
+    (etag, last_modified) for the donation list, from the newest updated_at,
+    the latest expiry_time already passed and the deletion marker. A row
+    crossing its expiry_time counts as a change even before the sweeper
+    flags it.
+    """
+    now = timezone.now()
+    # separate lookups so each is a single index seek; one aggregate
+    # carrying both would scan the table
+    last_updated = Donation.objects.aggregate(value=Max("updated_at"))["value"]
+    return _list_token(request, last_updated, _last_expired(now).first(), _last_deleted().first())
+
+
+async def adonation_list_change_token(request):
+    now = timezone.now()
+    last_updated = (await Donation.objects.aaggregate(value=Max("updated_at")))["value"]
+    return _list_token(request, last_updated, await _last_expired(now).afirst(), await _last_deleted().afirst())
+
+
+def _detail_row(pk):
+    return Donation.objects.filter(pk=pk).values_list("updated_at", "expiry_time")
+
+
+def _detail_token(request, pk, row):
+    if row is None:
+        return None, None
+    updated_at, expiry_time = row
+    if expiry_time and expiry_time > timezone.now():
+        expiry_time = None
+    last_modified = _latest(updated_at, expiry_time)
+    query = sorted(request.query_params.lists())
+    etag = _weak_etag("detail", pk, last_modified and last_modified.isoformat(), query, _media_type(request))
+    return etag, last_modified
+
+
+def donation_detail_change_token(request, pk):
+    return _detail_token(request, pk, _detail_row(pk).first())
+
+
+async def adonation_detail_change_token(request, pk):
+    return _detail_token(request, pk, await _detail_row(pk).afirst())
+
+
+def not_modified(request, etag, last_modified):
+    """The 304 response for a conditional request the validators satisfy, else None."""
+    timestamp = timegm(last_modified.utctimetuple()) if last_modified else None
+    return get_conditional_response(request, etag=etag, last_modified=timestamp)
+
+
+def add_validators(response, etag, last_modified):
+    if response.status_code in (200, 304):
+        response["ETag"] = etag
+        if last_modified is not None:
+            response["Last-Modified"] = http_date(timegm(last_modified.utctimetuple()))
+    return response
+
+
+class ConditionalGetMixin:
+    """
+    Answer If-None-Match / If-Modified-Since with 304 before any queryset
+    is evaluated or serialized. Views provide get_change_token().
+    """
+
+    def get_change_token(self, request, *args, **kwargs):
+        """(etag, last_modified) of what the request would return; an etag of None answers it normally."""
+        return None, None
+
+    def get(self, request, *args, **kwargs):
+        etag, last_modified = self.get_change_token(request, *args, **kwargs)
+        if etag is None:
+            return super().get(request, *args, **kwargs)
+
+        response = not_modified(request, etag, last_modified)
+        if response is None:
+            response = super().get(request, *args, **kwargs)
+        return add_validators(response, etag, last_modified)
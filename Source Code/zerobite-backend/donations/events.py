@@ -0,0 +1,342 @@
+# donations/events.py
+"""
+Live donation events (created / claimed / expired / deleted) pushed to
+clients as Server-Sent Events from backend/asgi.py.
+
+Views and the expiry sweeper publish through `publish_event()`, which
+sends a JSON message on the in-process `LocalChannel` once the surrounding
+transaction commits, and records it in the DonationEvent log as part of
+that transaction. Listeners in the publishing process (the response cache,
+the SSE broker) hear it from the channel. Every ASGI process runs an
+`EventLogFollower`, which replays the events other processes logged onto
+its own channel. `EventBroker` listens on the channel and fans events out
+to the asyncio queues of the connected subscribers.
+"""
+import asyncio
+import json
+import logging
+import threading
+import uuid
+from datetime import timedelta
+from urllib.parse import parse_qs
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .geo import MAX_RADIUS_KM, haversine_km, parse_coordinate
+from .models import DonationEvent
+
+logger = logging.getLogger(__name__)
+
+EVENT_TYPES = ("created", "claimed", "expired", "deleted")
+KEEPALIVE_SECONDS = 15
+SUBSCRIBER_QUEUE_SIZE = 100
+# tells this process's events apart from other processes' in the log
+PROCESS_ID = uuid.uuid4().hex
+# log rows may commit out of id order; rows this recent are re-read until seen
+EVENT_LOG_LAG = timedelta(seconds=5)
+# prune the log every this many polls
+EVENT_LOG_PRUNE_EVERY = 60
+
+
+def poll_seconds():
+    return getattr(settings, "EVENT_LOG_POLL_SECONDS", 1)
+
+
+def retention():
+    return timedelta(seconds=getattr(settings, "EVENT_LOG_RETENTION_SECONDS", 300))
+
+
+class LocalChannel:
+    """In-process pub/sub channel carrying JSON strings."""
+
+    def __init__(self):
+        self._listeners = []
+        self._lock = threading.Lock()
+
+    def publish(self, message):
+        with self._lock:
+            listeners = list(self._listeners)
+        for listener in listeners:
+            try:
+                listener(message)
+            except Exception:
+                logger.exception("event listener failed")
+
+    def subscribe(self, listener):
+        with self._lock:
+            self._listeners.append(listener)
+
+
+class EventFilter:
+    """What a subscriber wants to hear about: event types, donor role and/or an area."""
+
+    def __init__(self, types=None, role=None, lat=None, lng=None, radius_km=None):
+        self.types = set(types or EVENT_TYPES)
+        self.role = role.lower() if role else None
+        self.lat = lat
+        self.lng = lng
+        self.radius_km = radius_km
+
+    @classmethod
+    def from_query_string(cls, query_string):
+        params = {k: v[-1] for k, v in parse_qs(query_string).items()}
+
+        types = None
+        if params.get("types"):
+            types = [t.strip() for t in params["types"].split(",") if t.strip()]
+            if any(t not in EVENT_TYPES for t in types):
+                raise ValueError(f"types must be a subset of {', '.join(EVENT_TYPES)}")
+
+        lat = lng = radius_km = None
+        if "lat" in params or "lng" in params:
+            lat = parse_coordinate(params.get("lat"), 90)
+            lng = parse_coordinate(params.get("lng"), 180)
+            if lat is None or lng is None:
+                raise ValueError("lat and lng must be valid coordinates")
+            try:
+                radius_km = float(params.get("radius_km") or 10)
+            except ValueError:
+                raise ValueError("radius_km must be a number")
+            if not 0 < radius_km <= MAX_RADIUS_KM:
+                raise ValueError(f"radius_km must be between 0 and {MAX_RADIUS_KM:g}")
+
+        return cls(types=types, role=params.get("role"), lat=lat, lng=lng, radius_km=radius_km)
+
+    def matches(self, event):
+        if event.get("type") not in self.types:
+            return False
+        donation = event.get("donation") or {}
+        if self.role and (donation.get("donor_role") or "").lower() != self.role:
+            return False
+        if self.lat is not None:
+            if donation.get("latitude") is None or donation.get("longitude") is None:
+                return False
+            distance = haversine_km(self.lat, self.lng, donation["latitude"], donation["longitude"])
+            if distance > self.radius_km:
+                return False
+        return True
+
+
+class Subscription:
+    def __init__(self, event_filter, maxsize=SUBSCRIBER_QUEUE_SIZE):
+        self.filter = event_filter
+        self.queue = asyncio.Queue(maxsize=maxsize)
+
+    def offer(self, event):
+        # a slow client loses its oldest events rather than holding memory
+        if self.queue.full():
+            self.queue.get_nowait()
+        self.queue.put_nowait(event)
+
+
+class EventBroker:
+    """Fans channel messages out to subscribers on the ASGI event loop."""
+
+    def __init__(self, channel):
+        self._subscriptions = set()
+        self._loop = None
+        channel.subscribe(self._on_message)
+
+    def __len__(self):
+        return len(self._subscriptions)
+
+    def subscribe(self, event_filter):
+        """Must be called from the event loop that serves the stream."""
+        self._loop = asyncio.get_running_loop()
+        subscription = Subscription(event_filter)
+        self._subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        self._subscriptions.discard(subscription)
+
+    def _on_message(self, message):
+        # called from whichever thread published (usually a sync view thread)
+        loop = self._loop
+        if loop is None or loop.is_closed() or not self._subscriptions:
+            return
+        loop.call_soon_threadsafe(self._dispatch, json.loads(message))
+
+    def _dispatch(self, event):
+        for subscription in list(self._subscriptions):
+            if subscription.filter.matches(event):
+                subscription.offer(event)
+
+
+class EventLogFollower:
+    """
+    Replays events other processes wrote to the DonationEvent log onto the
+    local channel, once every EVENT_LOG_POLL_SECONDS. Started by the ASGI
+    application (backend/asgi.py) on the loop serving requests.
+    """
+
+    def __init__(self, channel):
+        self.channel = channel
+        self.since = None
+        self.seen = {}
+        self.polls = 0
+        self._task = None
+
+    def ensure_running(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self.run())
+
+    async def run(self):
+        while True:
+            try:
+                await self.poll()
+            except Exception:
+                logger.exception("event log poll failed")
+            await asyncio.sleep(poll_seconds())
+
+    async def poll(self, now=None):
+        """Publish the events logged since the last poll by other processes; returns how many."""
+        now = now or timezone.now()
+        first = self.since is None
+        rows = (
+            DonationEvent.objects.filter(created_at__gte=(self.since or now) - EVENT_LOG_LAG)
+            .order_by("pk").values_list("pk", "created_at", "message")
+        )
+        messages = []
+        async for pk, created_at, message in rows:
+            if pk in self.seen:
+                continue
+            self.seen[pk] = created_at
+            # the first poll only learns what is already there
+            if not first and json.loads(message).get("origin") != PROCESS_ID:
+                messages.append(message)
+        self.since = now
+        self.seen = {pk: at for pk, at in self.seen.items() if at >= now - EVENT_LOG_LAG * 2}
+
+        if messages:
+            # listeners such as the response cache are synchronous
+            await sync_to_async(self.publish_all)(messages)
+        self.polls += 1
+        if self.polls % EVENT_LOG_PRUNE_EVERY == 0:
+            await DonationEvent.objects.filter(created_at__lt=now - retention()).adelete()
+        return len(messages)
+
+    def publish_all(self, messages):
+        for message in messages:
+            self.channel.publish(message)
+
+
+channel = LocalChannel()
+broker = EventBroker(channel)
+follower = EventLogFollower(channel)
+
+
+# ---------------- Publishing (sync side) ---------------- #
+
+def donation_payload(donation, donor_role=None):
+    """Small, public subset of a donation used in event messages."""
+    if donor_role is None:
+        donor = getattr(donation, "donor", None)
+        donor_role = getattr(donor, "role", None)
+    expiry = donation.expiry_time
+    return {
+        "id": donation.pk,
+        "name": donation.name,
+        "quantity": donation.quantity,
+        "location": donation.location,
+        "latitude": float(donation.latitude) if donation.latitude is not None else None,
+        "longitude": float(donation.longitude) if donation.longitude is not None else None,
+        "expiry_time": expiry.isoformat() if expiry else None,
+        "donor_role": donor_role,
+    }
+
+
+def publish_event(event_type, payload):
+    """Log an event for other processes and publish it here once the current transaction commits."""
+    publish_events(event_type, [payload])
+
+
+def publish_events(event_type, payloads):
+    """publish_event() for several donations, logged with one INSERT."""
+    messages = [json.dumps({"type": event_type, "donation": payload, "origin": PROCESS_ID}) for payload in payloads]
+    DonationEvent.objects.bulk_create([DonationEvent(message=message) for message in messages])
+
+    def publish():
+        for message in messages:
+            channel.publish(message)
+
+    transaction.on_commit(publish)
+
+
+# ---------------- SSE endpoint (ASGI) ---------------- #
+
+def _cors_headers(scope):
+    origin = dict(scope.get("headers") or []).get(b"origin", b"").decode("latin-1")
+    if origin and origin in getattr(settings, "CORS_ALLOWED_ORIGINS", []):
+        return [(b"access-control-allow-origin", origin.encode("latin-1")), (b"vary", b"Origin")]
+    return []
+
+
+async def _plain_response(send, status, text, extra_headers=()):
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", b"text/plain; charset=utf-8"), *extra_headers],
+    })
+    await send({"type": "http.response.body", "body": text.encode("utf-8")})
+
+
+async def _wait_for_disconnect(receive):
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            return
+
+
+async def event_stream_app(scope, receive, send):
+    """
+    GET /api/events/?types=created,claimed&role=restaurant&lat=..&lng=..&radius_km=..
+
+    Each connection is one coroutine waiting on its queue, so a single
+    process can hold thousands of idle subscribers.
+    """
+    cors = _cors_headers(scope)
+    if scope["method"] != "GET":
+        await _plain_response(send, 405, "Method not allowed", cors)
+        return
+    try:
+        event_filter = EventFilter.from_query_string(scope.get("query_string", b"").decode("latin-1"))
+    except ValueError as exc:
+        await _plain_response(send, 400, str(exc), cors)
+        return
+
+    subscription = broker.subscribe(event_filter)
+    disconnected = asyncio.ensure_future(_wait_for_disconnect(receive))
+    try:
+        await send({
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [
+                (b"content-type", b"text/event-stream"),
+                (b"cache-control", b"no-cache"),
+                (b"x-accel-buffering", b"no"),
+                *cors,
+            ],
+        })
+        await send({"type": "http.response.body", "body": b": connected\n\n", "more_body": True})
+
+        while not disconnected.done():
+            next_event = asyncio.ensure_future(subscription.queue.get())
+            done, _ = await asyncio.wait(
+                {next_event, disconnected}, timeout=KEEPALIVE_SECONDS, return_when=asyncio.FIRST_COMPLETED
+            )
+            if next_event in done:
+                event = next_event.result()
+                chunk = f"event: {event['type']}\ndata: {json.dumps(event['donation'])}\n\n"
+            else:
+                next_event.cancel()
+                if disconnected.done():
+                    break
+                chunk = ": keepalive\n\n"
+            await send({"type": "http.response.body", "body": chunk.encode("utf-8"), "more_body": True})
+    finally:
+        broker.unsubscribe(subscription)
+        disconnected.cancel()
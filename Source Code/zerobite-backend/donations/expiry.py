@@ -0,0 +1,133 @@
+# donations/expiry.py
+import heapq
+import logging
+import threading
+from datetime import timedelta
+
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from .events import donation_payload, publish_event
+from .models import Donation
+
+logger = logging.getLogger(__name__)
+
+
+class ExpirySweeper:
+    """
+    Flips `is_expired` on donations once their expiry_time passes.
+
+    Upcoming expiry times are kept in a min-heap of (expiry_time, pk). The
+    heap is refilled from the database every `refresh_interval` seconds with
+    rows expiring inside the next `horizon`, so the sweeper only ever holds
+    the near future in memory. A refresh that finds an edited expiry_time
+    queues the row again; the entry with the old time is skipped when it
+    comes up. Due rows are re-read when popped and flipped with one UPDATE
+    per `batch_size` ids.
+
+    The sweeper usually runs in its own process (manage.py
+    expire_donations). Its "expired" events reach other processes through
+    the event log (donations/events.py), and the response cache generations
+    it bumps live on DONATION_CACHE_ALIAS, which must be shared.
+    """
+
+    def __init__(self, horizon=timedelta(minutes=15), refresh_interval=30, batch_size=500):
+        self.horizon = horizon
+        self.refresh_interval = refresh_interval
+        self.batch_size = batch_size
+        self._heap = []
+        self._queued = {}  # pk -> the expiry_time of its live heap entry
+        self._next_refresh = None
+
+    def __len__(self):
+        return len(self._queued)
+
+    def queue(self, pk, expiry_time):
+        if self._queued.get(pk) == expiry_time:
+            return False
+        heapq.heappush(self._heap, (expiry_time, pk))
+        self._queued[pk] = expiry_time
+        return True
+
+    def refresh(self, now=None):
+        """Queue every unflagged donation expiring before now + horizon."""
+        now = now or timezone.now()
+        rows = (
+            Donation.objects.filter(
+                is_expired=False,
+                expiry_time__isnull=False,
+                expiry_time__lte=now + self.horizon,
+            )
+            .order_by()
+            .values_list("pk", "expiry_time")
+        )
+        added = sum(self.queue(pk, expiry_time) for pk, expiry_time in rows.iterator())
+        self._next_refresh = now + timedelta(seconds=self.refresh_interval)
+        return added
+
+    def sweep(self, now=None):
+        """Flag every queued donation that is due. Returns rows updated."""
+        now = now or timezone.now()
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            expiry_time, pk = heapq.heappop(self._heap)
+            if self._queued.get(pk) != expiry_time:
+                continue  # superseded by an entry with the edited expiry_time
+            del self._queued[pk]
+            due.append(pk)
+
+        updated = 0
+        for start in range(0, len(due), self.batch_size):
+            updated += self.expire_batch(due[start:start + self.batch_size], now)
+        return updated
+
+    def expire_batch(self, pks, now):
+        """Flag the rows among `pks` that are still due; requeue the ones whose expiry moved later."""
+        with transaction.atomic():
+            # re-read under lock: rows may have been edited, flagged or deleted since they were queued
+            rows = list(
+                Donation.objects.filter(pk__in=pks, is_expired=False, expiry_time__isnull=False)
+                .select_related("donor").select_for_update(of=("self",)).only(
+                    "pk", "name", "quantity", "location", "latitude", "longitude", "expiry_time", "donor__role",
+                )
+            )
+            expired = [d for d in rows if d.expiry_time <= now]
+            for donation in rows:
+                if donation.expiry_time > now and donation.expiry_time <= now + self.horizon:
+                    self.queue(donation.pk, donation.expiry_time)
+            if not expired:
+                return 0
+            updated = Donation.objects.filter(pk__in=[d.pk for d in expired]).due_for_expiry(now).update(
+                is_expired=True, updated_at=timezone.now(),
+            )
+            for donation in expired:
+                publish_event("expired", donation_payload(donation))
+        return updated
+
+    def seconds_until_next(self, now=None):
+        """How long the run loop may sleep before something needs doing."""
+        now = now or timezone.now()
+        wake_at = self._next_refresh or now
+        if self._heap and self._heap[0][0] < wake_at:
+            wake_at = self._heap[0][0]
+        return max(0.0, (wake_at - now).total_seconds())
+
+    def run_once(self, now=None):
+        now = now or timezone.now()
+        if self._next_refresh is None or now >= self._next_refresh:
+            self.refresh(now)
+        return self.sweep(now)
+
+    def run(self, stop_event=None):
+        """Loop until stop_event is set (forever if none is given)."""
+        stop_event = stop_event or threading.Event()
+        while not stop_event.is_set():
+            close_old_connections()
+            try:
+                updated = self.run_once()
+            except Exception:
+                logger.exception("expiry sweep failed")
+                updated = 0
+            if updated:
+                logger.info("marked %d donation(s) expired", updated)
+            stop_event.wait(self.seconds_until_next())
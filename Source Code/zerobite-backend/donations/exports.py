@@ -0,0 +1,212 @@
+# donations/exports.py
+"""
+Streaming CSV/NDJSON exports of donations and orders.
+
+Rows are read in keyset chunks as the body is sent. Under WSGI that is a
+plain generator. Under ASGI, Django would buffer a synchronous iterator
+whole before sending the first byte, so the body is an async iterator
+over the async ORM instead.
+"""
+import csv
+import json
+from datetime import datetime
+
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from rest_framework.exceptions import NotFound
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
+from rest_framework.views import APIView
+
+from .archive import aby_pk, by_pk
+from .filters import filter_created, filter_donations, filter_orders
+from .models import ArchivedDonation, ArchivedOrder, Donation, Order
+
+EXPORT_CHUNK_SIZE = 2000
+
+DONATION_COLUMNS = (
+    "id", "created_at", "updated_at", "name", "description", "quantity", "expiry_time",
+    "location", "latitude", "longitude", "donor_id", "donor__username", "donor_name",
+    "contact_number", "is_claimed", "is_expired",
+)
+ORDER_COLUMNS = (
+    "id", "created_at", "donation_id", "donation__name", "user_id", "user__username",
+    "confirmation_note", "latitude", "longitude",
+)
+
+
+def iter_rows(queryset, columns, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Yield value tuples in primary-key order, one keyset chunk at a time.
+    Unlike .iterator(), this keeps memory flat on MySQL too, where the
+    driver buffers the whole result set of a single query.
+    """
+    last_pk = None
+    while True:
+        chunk = queryset.order_by("pk")
+        if last_pk is not None:
+            chunk = chunk.filter(pk__gt=last_pk)
+        rows = list(chunk.values_list(*columns)[:chunk_size])
+        if not rows:
+            return
+        yield from rows
+        last_pk = rows[-1][0]
+
+
+async def aiter_rows(queryset, columns, chunk_size=EXPORT_CHUNK_SIZE):
+    """iter_rows() through the async ORM."""
+    last_pk = None
+    while True:
+        chunk = queryset.order_by("pk")
+        if last_pk is not None:
+            chunk = chunk.filter(pk__gt=last_pk)
+        rows = [row async for row in chunk.values_list(*columns)[:chunk_size]]
+        if not rows:
+            return
+        for row in rows:
+            yield row
+        last_pk = rows[-1][0]
+
+
+class _Echo:
+    """csv.writer target that hands back each line instead of buffering it."""
+
+    def write(self, value):
+        return value
+
+
+# a spreadsheet runs a cell starting with one of these as a formula
+FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+
+def _cell(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def _csv_cell(value):
+    """_cell(), with user text that a spreadsheet would evaluate quoted with a leading '."""
+    value = _cell(value)
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+class CSVFormat:
+    content_type = "text/csv; charset=utf-8"
+
+    def __init__(self, columns):
+        self.columns = columns
+        self.writer = csv.writer(_Echo())
+
+    def header(self):
+        return self.writer.writerow(self.columns)
+
+    def line(self, row):
+        return self.writer.writerow([_csv_cell(v) for v in row])
+
+
+class NDJSONFormat:
+    content_type = "application/x-ndjson"
+
+    def __init__(self, columns):
+        self.columns = columns
+
+    def header(self):
+        return None
+
+    def line(self, row):
+        return json.dumps(dict(zip(self.columns, (_cell(v) for v in row))), default=str) + "\n"
+
+
+def stream(out, rows):
+    header = out.header()
+    if header is not None:
+        yield header
+    for row in rows:
+        yield out.line(row)
+
+
+async def astream(out, rows):
+    header = out.header()
+    if header is not None:
+        yield header
+    async for row in rows:
+        yield out.line(row)
+
+
+FORMATS = {"csv": CSVFormat, "ndjson": NDJSONFormat}
+
+
+class ExportView(APIView):
+    """
+    Base for streaming exports of `model`: ?from=&to= (created_at range),
+    plus the filters each export adds. The format comes from the URL
+    suffix. Rows of `archive_model` (donations/archive.py) are merged in,
+    in id order.
+    """
+    permission_classes = [IsAuthenticated, IsAdminUser]
+    model = None
+    archive_model = None
+    columns = ()
+    filename = "export"
+
+    def get_queryset(self, params):
+        return self.filter_queryset(self.model.objects.all(), params)
+
+    def get_archive_queryset(self, params):
+        if self.archive_model is None:
+            return None
+        return self.filter_queryset(self.archive_model.objects.all(), params)
+
+    def filter_queryset(self, queryset, params):
+        """The export's query-string filters (donations/filters.py)."""
+        return filter_created(queryset, params)
+
+    def get(self, request, fmt, format=None):
+        if fmt not in FORMATS:
+            raise NotFound(f"Unknown export format '{fmt}'. Use csv or ndjson.")
+        out = FORMATS[fmt](self.columns)
+        querysets = [self.get_queryset(request.query_params)]
+        archived = self.get_archive_queryset(request.query_params)
+        if archived is not None:
+            querysets.append(archived)
+
+        if isinstance(request._request, ASGIRequest):
+            body = astream(out, aby_pk(*(aiter_rows(queryset, self.columns) for queryset in querysets)))
+        else:
+            body = stream(out, by_pk(*(iter_rows(queryset, self.columns) for queryset in querysets)))
+        response = StreamingHttpResponse(body, content_type=out.content_type)
+        stamp = timezone.now().strftime("%Y%m%d-%H%M%S")
+        response["Content-Disposition"] = f'attachment; filename="{self.filename}-{stamp}.{fmt}"'
+        response["X-Accel-Buffering"] = "no"
+        return response
+
+
+class DonationExportView(ExportView):
+    """
+    GET /api/admin/export/donations.csv|.ndjson  (admin only)
+    Filters: same as /api/admin/donations/ (see donations/filters.py)
+    """
+    model = Donation
+    archive_model = ArchivedDonation
+    columns = DONATION_COLUMNS
+    filename = "donations"
+
+    def filter_queryset(self, queryset, params):
+        return filter_donations(queryset, params)
+
+
+class OrderExportView(ExportView):
+    """
+    GET /api/admin/export/orders.csv|.ndjson  (admin only)
+    Filters: from, to (order created_at), claimed, expired (of the donation)
+    """
+    model = Order
+    archive_model = ArchivedOrder
+    columns = ORDER_COLUMNS
+    filename = "orders"
+
+    def filter_queryset(self, queryset, params):
+        return filter_orders(queryset, params)
@@ -0,0 +1,123 @@
+# donations/fieldsets.py
+"""
+Sparse fieldsets for the donation and order endpoints.
+
+?fields=id,name,latitude keeps only those fields, in the serializer's
+order; a dotted name narrows a nested object instead of dropping it
+(?fields=id,donation_details.name). ?expand=donor replaces the id of a
+relation listed in the serializer's Meta.expandable_fields with the
+related object; dotted names expand inside nested objects
+(?expand=donation_details.donor). Unknown names are a 400, so a typo
+never silently returns everything.
+
+Both list paths honour the same parameters: SparseFieldsMixin on the
+serializers, and donations/rows.py on .values() rows.
+"""
+from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+
+FIELDS_PARAM = "fields"
+EXPAND_PARAM = "expand"
+
+
+def parse_paths(value):
+    """
+    'a,b.c,b.d' -> {'a': None, 'b': {'c': None, 'd': None}}. None stands
+    for "all of it"; a name given both bare and dotted counts as bare.
+    Returns None when nothing was given.
+    """
+    tree = {}
+    for path in (value or "").split(","):
+        parts = [part.strip() for part in path.split(".")]
+        if not all(parts):
+            continue
+        node = tree
+        for part in parts[:-1]:
+            if part in node and node[part] is None:
+                node = None
+                break
+            node = node.setdefault(part, {})
+        if node is not None:
+            node[parts[-1]] = None
+    return tree or None
+
+
+def requested(request):
+    """(fields, expand) trees of a read request; (None, None) for writes and internal use."""
+    if request is None or request.method not in ("GET", "HEAD"):
+        return None, None
+    params = getattr(request, "query_params", request.GET)
+    return parse_paths(params.get(FIELDS_PARAM)), parse_paths(params.get(EXPAND_PARAM))
+
+
+def unknown_names_error(param, path, names):
+    listed = ", ".join(f"{path}{name}" for name in sorted(names))
+    return ValidationError({param: f"Unknown field(s): {listed}."})
+
+
+def select(names, selection, path=""):
+    """The members of `names` kept by `selection`, in order."""
+    if selection is None:
+        return list(names)
+    unknown = set(selection) - set(names)
+    if unknown:
+        raise unknown_names_error(FIELDS_PARAM, path, unknown)
+    return [name for name in names if name in selection]
+
+
+def check_expand(expand, expandable, nested, path=""):
+    """400 unless every ?expand= name is expandable here or leads into a nested object."""
+    if not expand:
+        return
+    unknown = {
+        name for name, sub in expand.items()
+        if name not in expandable and not (sub is not None and name in nested)
+    }
+    if unknown:
+        raise unknown_names_error(EXPAND_PARAM, path, unknown)
+
+
+class SparseFieldsMixin:
+    """
+    Serializer side of ?fields= / ?expand=. The outermost serializer reads
+    the query string from context['request']; nested serializers get
+    their part of it from their parent.
+    """
+
+    def _fieldset(self):
+        if hasattr(self, "_sparse"):
+            return self._sparse
+        parent = self.parent
+        if isinstance(parent, serializers.ListSerializer):
+            parent = parent.parent
+        if parent is not None:
+            return None, None
+        return requested(self.context.get("request"))
+
+    def get_fields(self):
+        fields = super().get_fields()
+        selection, expand = self._fieldset()
+        path = getattr(self, "_sparse_path", "")
+        if selection is None and expand is None:
+            return fields
+
+        expandable = getattr(self.Meta, "expandable_fields", {})
+        nested = {
+            name for name, field in fields.items()
+            if isinstance(getattr(field, "child", field), SparseFieldsMixin)
+        }
+        check_expand(expand, expandable, nested, path)
+        kept = {name: fields[name] for name in select(fields, selection, path)}
+
+        for name in kept:
+            sub = selection.get(name) if selection else None
+            sub_expand = expand.get(name) if expand else None
+            if expand and name in expand and name in expandable:
+                kept[name] = expandable[name](read_only=True)
+            target = getattr(kept[name], "child", kept[name])
+            if isinstance(target, SparseFieldsMixin):
+                target._sparse = (sub, sub_expand)
+                target._sparse_path = f"{path}{name}."
+            elif sub is not None:
+                raise unknown_names_error(FIELDS_PARAM, f"{path}{name}.", sub)
+        return kept
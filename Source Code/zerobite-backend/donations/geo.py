@@ -0,0 +1,111 @@
+# donations/geo.py
+import math
+from decimal import ROUND_CEILING, ROUND_FLOOR, Decimal, InvalidOperation
+
+from django.conf import settings
+from django.db.models import Q
+
+EARTH_RADIUS_KM = 6371.0088
+# bounding boxes are widened by this fraction so rows on the circle's edge
+# survive float error and the 6-decimal rounding of the box corners
+BOX_MARGIN = 0.01
+
+DEFAULT_RADIUS_KM = 10.0
+MAX_RADIUS_KM = 50.0
+
+
+def nearby_limit():
+    return getattr(settings, "DONATION_NEARBY_LIMIT", 100)
+
+
+def parse_coordinate(value, limit):
+    """Parse a lat/lng query value, returning a float or None if invalid."""
+    if value is None or value == "":
+        return None
+    try:
+        number = float(Decimal(str(value)))
+    except (InvalidOperation, ValueError):
+        return None
+    if math.isnan(number) or abs(number) > limit:
+        return None
+    return number
+
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    """Great-circle distance in kilometres between two points."""
+    lat1, lng1, lat2, lng2 = map(math.radians, (float(lat1), float(lng1), float(lat2), float(lng2)))
+    dlat = lat2 - lat1
+    dlng = lng2 - lng1
+    a = math.sin(dlat / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin(dlng / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def bounding_box(lat, lng, radius_km):
+    """
+    Return (min_lat, max_lat, lng_ranges) enclosing a circle of radius_km.
+    lng_ranges is a list of (min_lng, max_lng) so boxes crossing the
+    antimeridian are split in two.
+    """
+    # angular radius on the same sphere haversine_km measures on
+    angle = radius_km / EARTH_RADIUS_KM * (1 + BOX_MARGIN)
+    dlat = math.degrees(angle)
+    min_lat = max(-90.0, lat - dlat)
+    max_lat = min(90.0, lat + dlat)
+
+    # near the poles every longitude is within reach
+    cos_lat = math.cos(math.radians(lat))
+    if max_lat >= 90.0 or min_lat <= -90.0 or math.sin(angle) >= cos_lat:
+        return min_lat, max_lat, [(-180.0, 180.0)]
+
+    # widest longitude offset on the circle
+    dlng = math.degrees(math.asin(math.sin(angle) / cos_lat))
+
+    min_lng = lng - dlng
+    max_lng = lng + dlng
+    if min_lng < -180.0:
+        return min_lat, max_lat, [(min_lng + 360.0, 180.0), (-180.0, max_lng)]
+    if max_lng > 180.0:
+        return min_lat, max_lat, [(min_lng, 180.0), (-180.0, max_lng - 360.0)]
+    return min_lat, max_lat, [(min_lng, max_lng)]
+
+
+def degrees(value, rounding):
+    """A box corner as a Decimal of the columns' 6 places, rounded outward."""
+    return Decimal(repr(value)).quantize(Decimal("0.000001"), rounding=rounding)
+
+
+def bounding_box_q(lat, lng, radius_km, lat_field="latitude", lng_field="longitude"):
+    """
+    Build a Q object selecting rows inside the bounding box. The range
+    predicates use the (latitude, longitude) index on MySQL and SQLite alike.
+    """
+    min_lat, max_lat, lng_ranges = bounding_box(lat, lng, radius_km)
+    lng_q = Q()
+    for lo, hi in lng_ranges:
+        lng_q |= Q(**{
+            f"{lng_field}__gte": degrees(lo, ROUND_FLOOR),
+            f"{lng_field}__lte": degrees(hi, ROUND_CEILING),
+        })
+    return Q(**{
+        f"{lat_field}__gte": degrees(min_lat, ROUND_FLOOR),
+        f"{lat_field}__lte": degrees(max_lat, ROUND_CEILING),
+    }) & lng_q
+
+
+def within_radius(objects, lat, lng, radius_km, lat_attr="latitude", lng_attr="longitude"):
+    """
+    Exact haversine check over prefiltered candidates. Returns the objects
+    within radius_km sorted nearest first, each with `distance_km` set.
+    """
+    nearby = []
+    for obj in objects:
+        obj_lat = getattr(obj, lat_attr)
+        obj_lng = getattr(obj, lng_attr)
+        if obj_lat is None or obj_lng is None:
+            continue
+        distance = haversine_km(lat, lng, obj_lat, obj_lng)
+        if distance <= radius_km:
+            obj.distance_km = round(distance, 3)
+            nearby.append(obj)
+    nearby.sort(key=lambda o: (o.distance_km, -o.pk))
+    return nearby
@@ -0,0 +1,177 @@
+# donations/images.py
+"""
+Off-request processing of uploaded donation photos.
+
+Uploads are checked by validate_upload() (a JPEG, PNG or WebP image of
+at most DONATION_IMAGE_MAX_BYTES; anything else is a 400), stored
+untouched and queued here once the request's transaction commits. A small thread pool then writes the thumbnail /
+card / full variants (EXIF stripped, orientation applied) and records the
+original's width and height on the DonationImage.
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connection, transaction
+from django.utils import timezone
+from PIL import Image, ImageOps, UnidentifiedImageError, features
+from rest_framework.exceptions import ValidationError
+
+from .models import Donation, DonationImage
+from .response_cache import invalidate_donation
+
+logger = logging.getLogger(__name__)
+
+# longest-side bounds of each variant
+VARIANT_SIZES = {
+    "thumbnail": (240, 240),
+    "card": (640, 640),
+    "full": (1600, 1600),
+}
+VARIANT_QUALITY = 80
+
+# what validate_upload() accepts
+UPLOAD_FORMATS = {"JPEG", "PNG", "WEBP"}
+MAX_UPLOAD_PIXELS = 50_000_000
+
+# EXIF orientations that swap width and height
+_TRANSPOSED_ORIENTATIONS = {5, 6, 7, 8}
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def variant_format():
+    """(PIL format, file extension) for the variants."""
+    fmt = getattr(settings, "DONATION_IMAGE_FORMAT", "WEBP").upper()
+    if fmt == "WEBP" and features.check("webp"):
+        return "WEBP", "webp"
+    return "JPEG", "jpg"
+
+
+def max_upload_bytes():
+    return getattr(settings, "DONATION_IMAGE_MAX_BYTES", 10 * 1024 * 1024)
+
+
+def validate_upload(upload, field="images"):
+    """Raise a ValidationError on `field` unless `upload` is an image we can process."""
+    if upload.size > max_upload_bytes():
+        raise ValidationError({field: f"Images must be at most {max_upload_bytes() // (1024 * 1024)} MB."})
+    try:
+        with Image.open(upload) as im:
+            fmt, (width, height) = im.format, im.size
+            im.verify()
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError, SyntaxError, ValueError):
+        raise ValidationError({field: "Upload a valid image."})
+    finally:
+        upload.seek(0)
+    if fmt not in UPLOAD_FORMATS:
+        raise ValidationError({field: f"Use {', '.join(sorted(UPLOAD_FORMATS))} images."})
+    if width * height > MAX_UPLOAD_PIXELS:
+        raise ValidationError({field: "Image dimensions are too large."})
+
+
+def render_variants(fileobj):
+    """
+    Decode an image once and return ((width, height), {variant: bytes}).
+    The variants carry no EXIF; orientation is baked into the pixels.
+    """
+    fmt, _ = variant_format()
+    with Image.open(fileobj) as im:
+        width, height = im.size
+        orientation = im.getexif().get(0x0112)
+        if orientation in _TRANSPOSED_ORIENTATIONS:
+            width, height = height, width
+        # let the JPEG decoder downscale while decoding; much cheaper for phone photos
+        im.draft("RGB", VARIANT_SIZES["full"])
+        im = ImageOps.exif_transpose(im)
+        if im.mode not in ("RGB", "RGBA"):
+            im = im.convert("RGB")
+        if fmt == "JPEG" and im.mode != "RGB":
+            im = im.convert("RGB")
+
+        rendered = {}
+        # largest first so each variant is resized from the previous one
+        for name in sorted(VARIANT_SIZES, key=lambda n: -VARIANT_SIZES[n][0]):
+            im.thumbnail(VARIANT_SIZES[name], Image.LANCZOS)
+            buf = BytesIO()
+            im.save(buf, fmt, quality=VARIANT_QUALITY)
+            rendered[name] = buf.getvalue()
+    return (width, height), rendered
+
+
+def process_image(image_id):
+    """Build the variants of one DonationImage. Returns True on success."""
+    try:
+        image = DonationImage.objects.get(pk=image_id)
+    except DonationImage.DoesNotExist:
+        return False
+    if not image.image:
+        return False
+
+    with image.image.open("rb") as fh:
+        (width, height), rendered = render_variants(fh)
+
+    _, ext = variant_format()
+    for name, data in rendered.items():
+        field = getattr(image, name)
+        if field:
+            field.delete(save=False)
+        field.save(f"{image.donation_id}_{image.pk}_{name}.{ext}", ContentFile(data), save=False)
+
+    image.width = width
+    image.height = height
+    image.processed_at = timezone.now()
+    image.save(update_fields=["thumbnail", "card", "full", "width", "height", "processed_at"])
+    # cached responses, and clients holding the list/detail ETags (built
+    # from updated_at, see conditional.py), still point at the original
+    Donation.objects.filter(pk=image.donation_id).update(updated_at=timezone.now())
+    invalidate_donation(image.donation_id)
+    return True
+
+
+def _process_logged(image_id):
+    try:
+        process_image(image_id)
+    except Exception:
+        logger.exception("processing donation image %s failed", image_id)
+
+
+def _run(image_id):
+    try:
+        _process_logged(image_id)
+    finally:
+        # worker threads hold their own connection
+        connection.close()
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, "DONATION_IMAGE_WORKERS", 2),
+                thread_name_prefix="donation-images",
+            )
+        return _executor
+
+
+def enqueue(image_ids):
+    """Process the given images after the current transaction commits."""
+    image_ids = list(image_ids)
+    if not image_ids:
+        return
+
+    def submit():
+        if getattr(settings, "DONATION_IMAGE_WORKERS", 2) <= 0:
+            for image_id in image_ids:
+                _process_logged(image_id)
+            return
+        executor = get_executor()
+        for image_id in image_ids:
+            executor.submit(_run, image_id)
+
+    transaction.on_commit(submit)
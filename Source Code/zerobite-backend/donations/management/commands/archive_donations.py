@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from donations.archive import archive_after_days, archive_donations
+
+
+class Command(BaseCommand):
+    help = (
+        "Move donations claimed or expired more than ARCHIVE_AFTER_DAYS ago, "
+        "with their images and orders, to the archive tables, one batch per "
+        "transaction. Safe to run from cron while the site is up."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument("--max-batches", type=int, default=None,
+                            help="Stop after this many batches (the next run carries on).")
+
+    def handle(self, *args, **options):
+        log = self.stdout.write if options["verbosity"] > 1 else None
+        moved = archive_donations(batch_size=options["batch_size"], max_batches=options["max_batches"], log=log)
+        self.stdout.write(self.style.SUCCESS(
+            f"Archived {moved} donation(s) claimed or expired more than {archive_after_days()} day(s) ago."
+        ))
@@ -0,0 +1,292 @@
+import json
+import platform
+import time
+from datetime import timedelta
+from itertools import count
+
+import django
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from donations.benchmarks import (
+    BASE_LAT, BASE_LNG, BENCH_PASSWORD, benchmark_database, existing_database, load_dataset, percentile,
+    seed_dataset,
+)
+from donations.models import Donation
+
+User = get_user_model()
+
+RESULT_VERSION = 1
+
+
+class Scenario:
+    """
+    One endpoint call. `path` and `data` may be callables taking the value
+    returned by `setup()`, which runs before every iteration (untimed) to
+    create whatever a destructive call consumes.
+    """
+
+    def __init__(self, name, method, path, user=None, data=None, format=None, setup=None, iterations=None):
+        self.name = name
+        self.method = method
+        self.path = path
+        self.user = user
+        self.data = data
+        self.format = format
+        self.setup = setup
+        self.iterations = iterations
+
+
+class Command(BaseCommand):
+    help = (
+        "Drive every endpoint of donations/urls.py, donations/urls_admin.py and "
+        "users/urls.py in-process and report p50/p95 latency, queries per "
+        "request and response bytes. Writes JSON with --output and compares "
+        "against a stored run with --baseline."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--donations", type=int, default=10_000, help="Dataset size (10k to 1M).")
+        parser.add_argument("--iterations", type=int, default=20)
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--existing", action="store_true",
+                            help="Use the dataset `manage.py seed_data` put in the configured database "
+                                 "instead of seeding a throwaway one (destructive calls add/remove rows).")
+        parser.add_argument("--prefix", default="bench")
+        parser.add_argument("--only", default="", help="Comma-separated substrings of scenario names.")
+        parser.add_argument("--output", help="Write results as JSON to this file.")
+        parser.add_argument("--baseline", help="Compare against a JSON file written by --output.")
+        parser.add_argument("--tolerance", type=float, default=0.25,
+                            help="Allowed p50 slowdown before a scenario counts as a regression.")
+        parser.add_argument("--fail-on-regression", action="store_true")
+
+    def handle(self, *args, **options):
+        context = existing_database() if options["existing"] else benchmark_database()
+        with context:
+            if options["existing"]:
+                dataset = load_dataset(options["prefix"])
+                if dataset is None:
+                    raise CommandError("No seeded dataset found; run `manage.py seed_data` first.")
+                size = Donation.objects.count()
+            else:
+                started = time.perf_counter()
+                dataset = seed_dataset(options["donations"], seed=options["seed"], prefix=options["prefix"])
+                size = options["donations"]
+                self.stdout.write(f"seeded {size} donations in {time.perf_counter() - started:.1f}s")
+
+            scenarios = self.build_scenarios(dataset, options["prefix"])
+            if options["only"]:
+                wanted = [w.strip() for w in options["only"].split(",") if w.strip()]
+                scenarios = [s for s in scenarios if any(w in s.name for w in wanted)]
+
+            results = [self.run(s, options["iterations"]) for s in scenarios]
+
+        report = {
+            "version": RESULT_VERSION,
+            "meta": {
+                "donations": size,
+                "vendor": connection.vendor,
+                "iterations": options["iterations"],
+                "seed": options["seed"],
+                "python": platform.python_version(),
+                "django": django.get_version(),
+                "timestamp": timezone.now().isoformat(),
+            },
+            "results": results,
+        }
+        self.print_table(results)
+
+        if options["output"]:
+            with open(options["output"], "w") as fh:
+                json.dump(report, fh, indent=2)
+                fh.write("\n")
+            self.stdout.write(f"\nwrote {options['output']}")
+
+        if options["baseline"]:
+            with open(options["baseline"]) as fh:
+                baseline = json.load(fh)
+            regressions = self.compare(baseline, report, options["tolerance"])
+            if regressions and options["fail_on_regression"]:
+                raise CommandError(f"{len(regressions)} regression(s): {', '.join(regressions)}")
+
+    # ---------------- Scenarios ---------------- #
+
+    def build_scenarios(self, dataset, prefix):
+        donor = dataset["donors"][0]
+        ngo = dataset["ngos"][0]
+        admin = dataset["admin"]
+        sample = Donation.objects.filter(donor=donor).order_by("-pk").first() or Donation.objects.first()
+        serial = count()
+
+        def fresh_donation():
+            return Donation.objects.create(
+                donor=donor, name="Bench tray", description="benchmark", quantity=3,
+                expiry_time=timezone.now() + timedelta(hours=2),
+                latitude=BASE_LAT, longitude=BASE_LNG,
+            )
+
+        def fresh_user():
+            n = f"{time.time_ns()}_{next(serial)}"
+            return User.objects.create(username=f"{prefix}_tmp_{n}", email=f"{prefix}_tmp_{n}@example.com")
+
+        def new_identity():
+            n = f"{time.time_ns()}_{next(serial)}"
+            return {"username": f"{prefix}_new_{n}", "email": f"{prefix}_new_{n}@example.com",
+                    "password": "Bench-pass-123!", "role": "ngo"}
+
+        def donation_body(_=None):
+            return {"name": "Bench curry", "description": "benchmark", "quantity": 4,
+                    "expiry_time": (timezone.now() + timedelta(hours=3)).isoformat(),
+                    "location": "Bench City", "latitude": BASE_LAT, "longitude": BASE_LNG}
+
+        slow = 3  # password hashing or whole-table exports
+        return [
+            # donations/urls.py
+            Scenario("donations.list anon", "get", "/api/donations/"),
+            Scenario("donations.list auth", "get", "/api/donations/?page_size=50", user=ngo),
+            Scenario("donations.list nearby", "get",
+                     f"/api/donations/?lat={BASE_LAT}&lng={BASE_LNG}&radius_km=2", user=ngo),
+            Scenario("donations.list search", "get", "/api/donations/?q=paneer", user=ngo),
+            Scenario("donations.create", "post", "/api/donations/", user=donor, data=donation_body,
+                     format="multipart"),
+            Scenario("donations.bulk", "post", "/api/donations/bulk/", user=donor,
+                     data=lambda _: {"donations": [donation_body() for _ in range(20)]}, format="json"),
+            Scenario("donations.detail anon", "get", f"/api/donations/{sample.pk}/"),
+            Scenario("donations.detail auth", "get", f"/api/donations/{sample.pk}/", user=ngo),
+            Scenario("donations.delete", "delete", lambda d: f"/api/donations/{d.pk}/", user=donor,
+                     setup=fresh_donation),
+            Scenario("donations.claim", "patch", lambda d: f"/api/donations/{d.pk}/claim/", user=ngo,
+                     setup=fresh_donation),
+            Scenario("donations.user_stats", "get", "/api/donations/user_stats/", user=donor),
+            Scenario("donations.user_posts", "get", "/api/donations/user_stats/posts/", user=donor),
+            Scenario("orders.list", "get", "/api/orders/", user=ngo),
+            Scenario("orders.create", "post", "/api/orders/", user=ngo, setup=fresh_donation,
+                     data=lambda d: {"donation": d.pk, "confirmation_note": "bench"}, format="json"),
+            # donations/urls_admin.py
+            Scenario("admin.users", "get", "/api/admin/users/", user=admin),
+            Scenario("admin.users search", "get", f"/api/admin/users/?q={prefix}_ngo_1&role=ngo", user=admin),
+            Scenario("admin.donations", "get", "/api/admin/donations/", user=admin),
+            Scenario("admin.donations filtered", "get",
+                     f"/api/admin/donations/?claimed=false&expired=false&donor={donor.pk}", user=admin),
+            Scenario("admin.donations delete", "delete", lambda d: f"/api/admin/donations/{d.pk}/",
+                     user=admin, setup=fresh_donation),
+            Scenario("admin.export donations", "get", "/api/admin/export/donations.csv", user=admin,
+                     iterations=slow),
+            Scenario("admin.export orders", "get", "/api/admin/export/orders.ndjson", user=admin,
+                     iterations=slow),
+            # users/urls.py
+            Scenario("users.register", "post", "/api/register/", data=lambda _: new_identity(),
+                     format="json", iterations=slow),
+            Scenario("users.login username", "post", "/api/login/",
+                     data={"username": ngo.username, "password": BENCH_PASSWORD}, format="json", iterations=slow),
+            Scenario("users.login email", "post", "/api/login/",
+                     data={"username": ngo.email.upper(), "password": BENCH_PASSWORD}, format="json",
+                     iterations=slow),
+            Scenario("users.list", "get", "/api/users/", user=admin),
+            Scenario("users.delete", "delete", lambda u: f"/api/users/{u.pk}/", user=admin, setup=fresh_user),
+            Scenario("users.reset_password", "post", "/api/reset-password-direct/", user=admin,
+                     setup=fresh_user, data=lambda u: {"username": u.username, "password": "Reset-pass-123!"},
+                     format="json", iterations=slow),
+        ]
+
+    # ---------------- Runner ---------------- #
+
+    def client_for(self, user):
+        client = APIClient()
+        if user is not None:
+            # real bearer tokens so authentication is part of what is measured
+            client.credentials(HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(user).access_token}")
+        return client
+
+    def call(self, scenario, client, prepared):
+        path = scenario.path(prepared) if callable(scenario.path) else scenario.path
+        data = scenario.data(prepared) if callable(scenario.data) else scenario.data
+        kwargs = {"format": scenario.format} if scenario.format else {}
+        return getattr(client, scenario.method)(path, data, **kwargs)
+
+    def run(self, scenario, iterations):
+        iterations = min(iterations, scenario.iterations or iterations)
+        client = self.client_for(scenario.user)
+        for alias in caches:
+            caches[alias].clear()
+
+        queries = []
+
+        def count_query(execute, sql, params, many, context):
+            queries.append(sql)
+            return execute(sql, params, many, context)
+
+        # one warm-up call, then measured ones
+        latencies, query_counts = [], []
+        status = size = None
+        for i in range(iterations + 1):
+            prepared = scenario.setup() if scenario.setup else None
+            queries.clear()
+            with connection.execute_wrapper(count_query):
+                started = time.perf_counter()
+                response = self.call(scenario, client, prepared)
+                # streaming responses are produced while they are read
+                body = b"".join(response.streaming_content) if response.streaming else response.content
+                elapsed = time.perf_counter() - started
+            if i == 0:
+                continue
+            latencies.append(elapsed)
+            query_counts.append(len(queries))
+            status, size = response.status_code, len(body)
+
+        return {
+            "name": scenario.name,
+            "method": scenario.method.upper(),
+            "status": status,
+            "iterations": iterations,
+            "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+            "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+            "queries": max(query_counts),
+            "bytes": size,
+        }
+
+    # ---------------- Reporting ---------------- #
+
+    def print_table(self, results):
+        header = f"{'scenario':<28} {'status':>6} {'p50 ms':>9} {'p95 ms':>9} {'queries':>8} {'bytes':>10}"
+        self.stdout.write(header)
+        self.stdout.write("-" * len(header))
+        for r in results:
+            self.stdout.write(
+                f"{r['name']:<28} {r['status']:>6} {r['p50_ms']:9.1f} {r['p95_ms']:9.1f} "
+                f"{r['queries']:8d} {r['bytes']:10d}"
+            )
+
+    def compare(self, baseline, report, tolerance):
+        """Print per-scenario deltas; return the names that regressed."""
+        before = {r["name"]: r for r in baseline.get("results", [])}
+        if baseline.get("meta", {}).get("donations") != report["meta"]["donations"]:
+            self.stdout.write(self.style.WARNING(
+                f"baseline has {baseline.get('meta', {}).get('donations')} donations, "
+                f"this run {report['meta']['donations']}; latencies are not comparable"
+            ))
+
+        self.stdout.write(f"\n{'scenario':<28} {'p50 before':>10} {'p50 now':>9} {'change':>8} {'queries':>9}")
+        regressions = []
+        for r in report["results"]:
+            old = before.get(r["name"])
+            if old is None:
+                self.stdout.write(f"{r['name']:<28} {'(new)':>10}")
+                continue
+            change = (r["p50_ms"] - old["p50_ms"]) / old["p50_ms"] if old["p50_ms"] else 0.0
+            slower = change > tolerance and r["p50_ms"] - old["p50_ms"] > 1.0
+            more_queries = r["queries"] > old["queries"]
+            line = (
+                f"{r['name']:<28} {old['p50_ms']:10.1f} {r['p50_ms']:9.1f} {change:+8.0%} "
+                f"{old['queries']:>4}->{r['queries']:<4}"
+            )
+            if slower or more_queries or r["status"] != old["status"]:
+                regressions.append(r["name"])
+                line = self.style.ERROR(line + "  REGRESSION")
+            self.stdout.write(line)
+        return regressions
@@ -0,0 +1,82 @@
+import random
+import threading
+import time
+from collections import Counter
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Count
+from rest_framework.test import APIClient
+
+from donations.benchmarks import benchmark_database, seed_donations, seed_users
+from donations.models import Donation, Order
+
+
+class Command(BaseCommand):
+    help = (
+        "Multi-threaded claim contention benchmark: many NGOs race to confirm "
+        "orders for the same donations. Reports claims/sec and checks that no "
+        "donation was claimed twice."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--donations", type=int, default=200)
+        parser.add_argument("--threads", type=int, default=8)
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        with benchmark_database(threaded=True):
+            donors = seed_users(5)
+            ngos = seed_users(options["threads"], role="ngo")
+            seed_donations(options["donations"], donors, past_fraction=0)
+            donation_ids = list(Donation.objects.values_list("pk", flat=True))
+
+            outcomes = Counter()
+            lock = threading.Lock()
+            start_gate = threading.Barrier(options["threads"])
+
+            def worker(index):
+                client = APIClient()
+                client.force_authenticate(ngos[index])
+                ids = donation_ids[:]
+                random.Random(options["seed"] + index).shuffle(ids)
+                local = Counter()
+                start_gate.wait()
+                try:
+                    for pk in ids:
+                        response = client.post(
+                            "/api/orders/", {"donation": pk, "confirmation_note": "bench"}, format="json",
+                        )
+                        local[response.status_code] += 1
+                finally:
+                    connection.close()
+                with lock:
+                    outcomes.update(local)
+
+            threads = [threading.Thread(target=worker, args=(i,)) for i in range(options["threads"])]
+            started = time.perf_counter()
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+            elapsed = time.perf_counter() - started
+
+            attempts = sum(outcomes.values())
+            wins = outcomes[201]
+            double_claims = (
+                Order.objects.values("donation").annotate(n=Count("id")).filter(n__gt=1).count()
+            )
+            unclaimed = Donation.objects.filter(is_claimed=False).count()
+
+            self.stdout.write(f"threads          {options['threads']}")
+            self.stdout.write(f"donations        {len(donation_ids)}")
+            self.stdout.write(f"attempts         {attempts} ({attempts / elapsed:.1f}/s)")
+            self.stdout.write(f"claims           {wins} ({wins / elapsed:.1f}/s)")
+            self.stdout.write(f"status codes     {dict(sorted(outcomes.items()))}")
+            self.stdout.write(f"double claims    {double_claims}")
+            self.stdout.write(f"left unclaimed   {unclaimed}")
+
+            if double_claims or wins != len(donation_ids) or unclaimed:
+                self.stderr.write(self.style.ERROR("FAILED: claims were lost or duplicated"))
+            else:
+                self.stdout.write(self.style.SUCCESS("OK: every donation claimed exactly once"))
@@ -0,0 +1,300 @@
+import argparse
+import asyncio
+import os
+import resource
+import socket
+import subprocess
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from socketserver import ThreadingMixIn
+from urllib.parse import unquote
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test.utils import setup_test_environment
+from rest_framework_simplejwt.tokens import AccessToken
+
+from donations.benchmarks import benchmark_database, percentile, seed_dataset
+from donations.models import Donation
+
+HOST = "127.0.0.1"
+BACKLOG = 4096
+
+
+class Command(BaseCommand):
+    help = (
+        "Concurrency benchmark: --clients simultaneous HTTP clients against "
+        "the WSGI app (backend.wsgi, a thread-pool server like gunicorn's "
+        "gthread worker) and the ASGI app (backend.asgi, one event loop like "
+        "a uvicorn worker), each a single process on the same seeded "
+        "database. Clients cycle through the donation list and detail, user "
+        "stats and the order list; --slow-clients send their headers in two "
+        "parts, like clients on a poor network. Reports throughput, latency "
+        "percentiles, errors and the server's peak thread count. The servers "
+        "are minimal stdlib ones so the benchmark needs nothing installed; "
+        "deploy behind gunicorn/uvicorn."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--clients", type=int, default=1000, help="Simultaneous connections.")
+        parser.add_argument("--requests", type=int, default=5, help="Requests per client.")
+        parser.add_argument("--donations", type=int, default=2000)
+        parser.add_argument("--threads", type=int, default=32, help="WSGI worker threads.")
+        parser.add_argument("--slow-clients", type=int, default=0,
+                            help="Clients that pause --slow-delay seconds halfway through their headers.")
+        parser.add_argument("--slow-delay", type=float, default=0.5)
+        parser.add_argument("--servers", default="wsgi,asgi")
+        parser.add_argument("--timeout", type=float, default=120.0, help="Per-request timeout in seconds.")
+        # internal: run one server in a child process
+        parser.add_argument("--serve", choices=("wsgi", "asgi"), help=argparse.SUPPRESS)
+        parser.add_argument("--database", help=argparse.SUPPRESS)
+        parser.add_argument("--port", type=int, help=argparse.SUPPRESS)
+
+    def handle(self, *args, **options):
+        raise_fd_limit()
+        if options["serve"]:
+            return serve(options["serve"], options["database"], options["port"], options["threads"])
+
+        servers = [name.strip() for name in options["servers"].split(",") if name.strip()]
+        if not set(servers) <= {"wsgi", "asgi"}:
+            raise CommandError("--servers takes wsgi, asgi or both.")
+        with benchmark_database(threaded=True):
+            dataset = seed_dataset(options["donations"], images_per_donation=2)
+            database = connections["default"].settings_dict["NAME"]
+            connections.close_all()
+            requests = request_mix(dataset)
+
+            header = (f"{'server':<6} {'clients':>7} {'requests':>8} {'req/s':>8} {'p50 ms':>8} "
+                      f"{'p95 ms':>8} {'p99 ms':>8} {'errors':>6} {'threads':>7}")
+            self.stdout.write(header)
+            self.stdout.write("-" * len(header))
+            for name in servers:
+                result = self.run_server(name, database, requests, options)
+                latencies = result["latencies"]
+                self.stdout.write(
+                    f"{name:<6} {options['clients']:>7} {len(latencies) + result['errors']:>8} "
+                    f"{len(latencies) / result['elapsed']:8.1f} {percentile(latencies, 50) * 1000:8.1f} "
+                    f"{percentile(latencies, 95) * 1000:8.1f} {percentile(latencies, 99) * 1000:8.1f} "
+                    f"{result['errors']:>6} {result['threads']:>7}"
+                )
+                if result["failures"]:
+                    self.stdout.write(f"       failures: {dict(result['failures'].most_common(5))}")
+
+    def run_server(self, name, database, requests, options):
+        port = free_port()
+        command = [
+            sys.executable, os.path.join(settings.BASE_DIR, "manage.py"), "bench_concurrency",
+            "--serve", name, "--database", database, "--port", str(port), "--threads", str(options["threads"]),
+        ]
+        server = subprocess.Popen(command, stdout=subprocess.DEVNULL)
+        try:
+            wait_for_port(port, server)
+            return asyncio.run(drive(port, server.pid, requests, options))
+        finally:
+            server.terminate()
+            server.wait(timeout=30)
+
+
+def raise_fd_limit():
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft != hard:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind((HOST, 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_port(port, process, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise CommandError(f"server exited with status {process.returncode}")
+        try:
+            socket.create_connection((HOST, port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise CommandError(f"server did not listen on port {port} within {timeout}s")
+
+
+def request_mix(dataset):
+    """(path, Authorization header or None) pairs the clients cycle through."""
+    donor, ngo = dataset["donors"][0], dataset["ngos"][0]
+    pks = list(Donation.objects.filter(is_claimed=False).values_list("pk", flat=True)[:50])
+    donor_token = f"Bearer {AccessToken.for_user(donor)}"
+    ngo_token = f"Bearer {AccessToken.for_user(ngo)}"
+    mix = [("/api/donations/", None), ("/api/donations/user_stats/", donor_token), ("/api/orders/", ngo_token)]
+    mix += [(f"/api/donations/{pk}/", None) for pk in pks[:5]]
+    mix.append(("/api/donations/?page_size=20", ngo_token))
+    return mix
+
+
+# ---------------- Clients ---------------- #
+
+async def drive(port, server_pid, requests, options):
+    failures = Counter()
+    latencies = []
+    peak_threads = 0
+    done = asyncio.Event()
+
+    async def sample_threads():
+        nonlocal peak_threads
+        while not done.is_set():
+            peak_threads = max(peak_threads, thread_count(server_pid))
+            await asyncio.sleep(0.05)
+
+    async def client(index):
+        slow = index < options["slow_clients"]
+        for n in range(options["requests"]):
+            path, token = requests[(index + n) % len(requests)]
+            started = time.perf_counter()
+            try:
+                status = await asyncio.wait_for(
+                    fetch(port, path, token, options["slow_delay"] if slow else 0), options["timeout"],
+                )
+            except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError) as exc:
+                failures[type(exc).__name__] += 1
+                continue
+            if status >= 400:
+                failures[status] += 1
+            else:
+                latencies.append(time.perf_counter() - started)
+
+    # each request once first, so the server has imported and connected everything
+    await asyncio.gather(*(fetch(port, path, token) for path, token in requests))
+    sampler = asyncio.create_task(sample_threads())
+    started = time.perf_counter()
+    await asyncio.gather(*(client(i) for i in range(options["clients"])))
+    elapsed = time.perf_counter() - started
+    done.set()
+    await sampler
+    return {"latencies": latencies, "elapsed": elapsed, "errors": sum(failures.values()),
+            "failures": failures, "threads": peak_threads}
+
+
+async def fetch(port, path, token=None, pause=0):
+    """GET `path` on a new connection; the response status."""
+    reader, writer = await asyncio.open_connection(HOST, port)
+    try:
+        head = f"GET {path} HTTP/1.1\r\nHost: testserver\r\nAccept: application/json\r\nConnection: close\r\n"
+        if token:
+            head += f"Authorization: {token}\r\n"
+        if pause:
+            writer.write(head[:len(head) // 2].encode())
+            await writer.drain()
+            await asyncio.sleep(pause)
+            head = head[len(head) // 2:]
+        writer.write(f"{head}\r\n".encode())
+        await writer.drain()
+        status_line = await reader.readline()
+        await reader.read()  # the body, up to the server closing the connection
+        return int(status_line.split()[1])
+    finally:
+        writer.close()
+
+
+def thread_count(pid):
+    try:
+        with open(f"/proc/{pid}/status") as status:
+            for line in status:
+                if line.startswith("Threads:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return 0
+
+
+# ---------------- Servers ---------------- #
+
+def serve(name, database, port, threads):
+    connections["default"].settings_dict["NAME"] = database
+    # DEBUG off and the test client's Host allowed, as in the parent
+    setup_test_environment(debug=False)
+    if name == "wsgi":
+        from backend.wsgi import application
+
+        server = ThreadPoolWSGIServer((HOST, port), QuietHandler, threads=threads)
+        server.set_app(application)
+        server.serve_forever()
+    else:
+        from backend.asgi import application
+
+        asyncio.run(serve_asgi(application, port))
+
+
+class QuietHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+class ThreadPoolWSGIServer(ThreadingMixIn, WSGIServer):
+    """wsgiref's server with a fixed number of worker threads; other connections wait."""
+    request_queue_size = BACKLOG
+
+    def __init__(self, address, handler, threads):
+        self.pool = ThreadPoolExecutor(max_workers=threads)
+        super().__init__(address, handler)
+
+    def process_request(self, request, client_address):
+        self.pool.submit(self.process_request_thread, request, client_address)
+
+
+async def serve_asgi(application, port):
+    """A minimal HTTP/1.1 server for an ASGI app: one request per connection."""
+
+    async def handle(reader, writer):
+        try:
+            head = await reader.readuntil(b"\r\n\r\n")
+            request_line, *lines = head.decode("latin-1").rstrip("\r\n").split("\r\n")
+            method, target, _ = request_line.split(" ", 2)
+            headers = []
+            for line in lines:
+                key, _, value = line.partition(":")
+                headers.append((key.strip().lower().encode("latin-1"), value.strip().encode("latin-1")))
+            length = int(dict(headers).get(b"content-length", b"0"))
+            body = await reader.readexactly(length) if length else b""
+        except (asyncio.IncompleteReadError, ValueError, ConnectionError):
+            writer.close()
+            return
+
+        path, _, query = target.partition("?")
+        scope = {
+            "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": method,
+            "scheme": "http", "path": unquote(path), "raw_path": path.encode("latin-1"),
+            "query_string": query.encode("latin-1"), "root_path": "", "headers": headers,
+            "server": (HOST, port), "client": writer.get_extra_info("peername")[:2],
+        }
+        received = asyncio.Event()
+
+        async def receive():
+            if not received.is_set():
+                received.set()
+                return {"type": "http.request", "body": body, "more_body": False}
+            await asyncio.Future()  # the client never disconnects early here
+
+        async def send(message):
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                writer.write(f"HTTP/1.1 {status} {status}\r\n".encode())
+                for key, value in message.get("headers", ()):
+                    writer.write(key + b": " + value + b"\r\n")
+                writer.write(b"Connection: close\r\n\r\n")
+            elif message["type"] == "http.response.body":
+                writer.write(message.get("body", b""))
+                await writer.drain()
+
+        try:
+            await application(scope, receive, send)
+        finally:
+            writer.close()
+
+    server = await asyncio.start_server(handle, HOST, port, backlog=BACKLOG)
+    async with server:
+        await server.serve_forever()
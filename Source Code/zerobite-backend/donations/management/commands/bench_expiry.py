@@ -0,0 +1,69 @@
+import threading
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.test import Client
+from django.utils import timezone
+
+from donations.benchmarks import benchmark_database, percentile, seed_donations, seed_users, timed_loop
+from donations.expiry import ExpirySweeper
+from donations.models import Donation
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark GET /api/donations/ throughput with write-on-read expiry (legacy), "
+        "with reads only, and with the expiry sweeper running alongside."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--donations", type=int, default=2000)
+        parser.add_argument("--seconds", type=float, default=5.0, help="Duration of each run.")
+
+    def handle(self, *args, **options):
+        # the sweeper writes from its own thread
+        with benchmark_database(threaded=True):
+            donors = seed_users(20)
+            client = Client()
+
+            def legacy_read():
+                # what the list view used to do on every GET
+                Donation.objects.filter(
+                    expiry_time__isnull=False, expiry_time__lte=timezone.now(), is_expired=False
+                ).update(is_expired=True)
+                client.get("/api/donations/")
+
+            def read():
+                client.get("/api/donations/")
+
+            results = []
+            for mode in ("legacy", "sweeper-off", "sweeper-on"):
+                Donation.objects.all().delete()
+                # short expiry spread so rows keep expiring during the run
+                seed_donations(
+                    options["donations"], donors,
+                    expiry_spread=timedelta(seconds=options["seconds"] * 4), past_fraction=0.2,
+                )
+
+                stop = threading.Event()
+                worker = None
+                if mode == "sweeper-on":
+                    sweeper = ExpirySweeper(refresh_interval=1)
+                    worker = threading.Thread(target=sweeper.run, args=(stop,), daemon=True)
+                    worker.start()
+
+                try:
+                    latencies = timed_loop(legacy_read if mode == "legacy" else read, seconds=options["seconds"])
+                finally:
+                    stop.set()
+                    if worker:
+                        worker.join()
+
+                results.append((mode, latencies))
+
+            self.stdout.write(f"{'mode':<12} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8}")
+            for mode, latencies in results:
+                self.stdout.write(
+                    f"{mode:<12} {len(latencies) / options['seconds']:>8.1f} "
+                    f"{percentile(latencies, 50) * 1000:>8.1f} {percentile(latencies, 95) * 1000:>8.1f}"
+                )
@@ -0,0 +1,95 @@
+import random
+import shutil
+import statistics
+import tempfile
+import time
+from io import BytesIO
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+from PIL import Image
+from rest_framework.test import APIClient
+
+from donations.benchmarks import benchmark_database, seed_users
+from donations.models import DonationImage
+
+
+def phone_photo(seed, size=(4032, 3024)):
+    """A noisy JPEG roughly the size of a phone camera shot, with an EXIF block."""
+    rng = random.Random(seed)
+    small = Image.frombytes("RGB", (size[0] // 8, size[1] // 8), rng.randbytes(size[0] // 8 * size[1] // 8 * 3))
+    im = small.resize(size, Image.BILINEAR)
+    exif = Image.Exif()
+    exif[0x0112] = 6  # rotated 90° like most portrait phone shots
+    exif[0x010F] = "BenchCam"
+    buf = BytesIO()
+    im.save(buf, "JPEG", quality=92, exif=exif.tobytes())
+    return buf.getvalue()
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark donation upload latency with inline vs pooled image processing, "
+        "and the image bytes a list page pulls with originals vs card variants."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--uploads", type=int, default=5)
+        parser.add_argument("--images", type=int, default=2, help="Photos per donation.")
+        parser.add_argument("--workers", type=int, default=2)
+
+    def handle(self, *args, **options):
+        self.stdout.write("generating photos...")
+        photos = [phone_photo(i) for i in range(options["images"])]
+        media_root = tempfile.mkdtemp(prefix="zerobite-bench-media-")
+
+        try:
+            with override_settings(MEDIA_ROOT=media_root), benchmark_database(threaded=True):
+                donor = seed_users(1)[0]
+                client = APIClient()
+                client.force_authenticate(donor)
+
+                results = {}
+                for label, workers in (("inline", 0), ("worker pool", options["workers"])):
+                    with override_settings(DONATION_IMAGE_WORKERS=workers):
+                        latencies = []
+                        for i in range(options["uploads"]):
+                            files = [
+                                SimpleUploadedFile(f"photo{i}_{n}.jpg", data, content_type="image/jpeg")
+                                for n, data in enumerate(photos)
+                            ]
+                            start = time.perf_counter()
+                            response = client.post(
+                                "/api/donations/", {"name": f"Meal {i}", "quantity": 3, "images": files},
+                                format="multipart",
+                            )
+                            latencies.append(time.perf_counter() - start)
+                            assert response.status_code == 201, response.content
+                        results[label] = latencies
+
+                # wait for the pool to drain before measuring variants
+                deadline = time.time() + 120
+                while DonationImage.objects.filter(processed_at__isnull=True).exists() and time.time() < deadline:
+                    time.sleep(0.2)
+
+                original_bytes = []
+                card_bytes = []
+                for img in DonationImage.objects.all():
+                    original_bytes.append(img.image.size)
+                    if img.card:
+                        card_bytes.append(img.card.size)
+
+            self.stdout.write(f"{'upload mode':<14} {'mean ms':>9} {'max ms':>9}")
+            for label, latencies in results.items():
+                self.stdout.write(
+                    f"{label:<14} {statistics.mean(latencies) * 1000:>9.1f} {max(latencies) * 1000:>9.1f}"
+                )
+            if card_bytes:
+                orig = statistics.mean(original_bytes)
+                card = statistics.mean(card_bytes)
+                self.stdout.write(f"image bytes per list card: original {orig / 1024:.0f} KiB -> "
+                                  f"card variant {card / 1024:.0f} KiB ({orig / card:.0f}x smaller)")
+                self.stdout.write(f"20-card page: {orig * 20 / 1048576:.1f} MiB -> {card * 20 / 1048576:.2f} MiB")
+        finally:
+            shutil.rmtree(media_root, ignore_errors=True)
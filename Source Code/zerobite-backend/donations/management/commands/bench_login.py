@@ -0,0 +1,81 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client
+
+from donations.benchmarks import benchmark_database, percentile, seed_users, timed_loop
+from users.backends import UsernameOrEmailBackend
+
+User = get_user_model()
+PASSWORD = "bench-pass-123"
+
+
+def legacy_authenticate(identifier, password):
+    """What LoginView used to do: by username, then an iexact email scan and a second attempt."""
+    backend = ModelBackend()
+    user = backend.authenticate(None, username=identifier, password=password)
+    if user is None:
+        lookup = User.objects.filter(email__iexact=identifier).first()
+        if lookup:
+            user = backend.authenticate(None, username=lookup.username, password=password)
+    return user
+
+
+class Command(BaseCommand):
+    help = (
+        "Login benchmark: the old two-step flow against the single-query "
+        "username-or-email backend, by username, by email and with a wrong "
+        "password, plus POST /api/login/ end to end."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=100_000)
+        parser.add_argument("--iterations", type=int, default=20)
+
+    def handle(self, *args, **options):
+        with benchmark_database():
+            # one real hash shared by every seeded account keeps seeding fast
+            password_hash = make_password(PASSWORD)
+            seed_users(options["users"], role="ngo")
+            User.objects.update(password=password_hash)
+            target = User.objects.order_by("pk")[options["users"] // 2]
+
+            backend = UsernameOrEmailBackend()
+            client = Client()
+            cases = {
+                "username": (target.username, PASSWORD),
+                "email": (target.email.upper(), PASSWORD),
+                "wrong password": (target.email, "not-the-password"),
+            }
+            flows = {
+                "legacy": legacy_authenticate,
+                "backend": lambda ident, pw: backend.authenticate(None, username=ident, password=pw),
+                "endpoint": lambda ident, pw: client.post(
+                    "/api/login/", {"username": ident, "password": pw}, content_type="application/json"
+                ),
+            }
+
+            self.stdout.write(f"{options['users']} users, {connection.vendor}")
+            header = f"{'case':<15} {'flow':<9} {'p50 ms':>8} {'p95 ms':>8} {'logins/s':>9} {'queries':>8}"
+            self.stdout.write(header)
+            self.stdout.write("-" * len(header))
+            for case, (identifier, password) in cases.items():
+                for flow, func in flows.items():
+                    call = lambda: func(identifier, password)  # noqa: E731
+                    # the test client resets connection.queries per request; count at the cursor
+                    queries = []
+
+                    def count(execute, sql, params, many, context):
+                        queries.append(sql)
+                        return execute(sql, params, many, context)
+
+                    with connection.execute_wrapper(count):
+                        call()
+                    latencies = timed_loop(call, iterations=options["iterations"])
+                    self.stdout.write(
+                        f"{case:<15} {flow:<9} {percentile(latencies, 50) * 1000:8.1f} "
+                        f"{percentile(latencies, 95) * 1000:8.1f} {len(latencies) / sum(latencies):9.1f} "
+                        f"{len(queries):8d}"
+                    )
@@ -0,0 +1,132 @@
+import random
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.utils import timezone
+
+from donations.benchmarks import (
+    BASE_LAT, BASE_LNG, benchmark_database, percentile, seed_donations, seed_users, timed_loop,
+)
+from donations.geo import haversine_km
+from donations.matching import match_donation, match_request, place
+from donations.models import FOOD_TYPE_CHOICES, Donation, FoodRequest
+
+FOOD_TYPES = [value for value, _ in FOOD_TYPE_CHOICES]
+# requests and donations spread over a metro region this many km from the centre
+SPREAD_KM = 100
+
+
+def seed_requests(count, ngos, spread_km=SPREAD_KM, seed=0, batch_size=5000):
+    """Bulk-insert `count` open requests around BASE_LAT/BASE_LNG (tier and cell set by place())."""
+    rng = random.Random(seed)
+    now = timezone.now()
+    deg = spread_km / 111.32
+    rows = []
+    for i in range(count):
+        lat = round(BASE_LAT + rng.uniform(-deg, deg), 6)
+        lng = round(BASE_LNG + rng.uniform(-deg, deg), 6)
+        start = now + timedelta(hours=rng.uniform(-12, 36))
+        rows.append(place(FoodRequest(
+            ngo=ngos[i % len(ngos)],
+            food_type=rng.choice(FOOD_TYPES + [FoodRequest.ANY_FOOD_TYPE]),
+            quantity=rng.randint(1, 100),
+            latitude=lat,
+            longitude=lng,
+            radius_km=rng.choice((2, 3, 5, 10, 15)),
+            needed_from=start,
+            needed_until=start + timedelta(hours=rng.choice((4, 12, 24))),
+        )))
+        if len(rows) >= batch_size:
+            FoodRequest.objects.bulk_create(rows)
+            rows = []
+    FoodRequest.objects.bulk_create(rows)
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark incremental matching: new donations against open NGO "
+        "requests through the grid index, against scanning every open request, "
+        "and new requests against open donations."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=50_000)
+        parser.add_argument("--donations", type=int, default=100_000,
+                            help="Open donations already posted (for request -> donations).")
+        parser.add_argument("--iterations", type=int, default=2000)
+        parser.add_argument("--scan-iterations", type=int, default=20)
+
+    def handle(self, *args, **options):
+        with benchmark_database():
+            ngos = seed_users(200, role="ngo", prefix="benchngo")
+            donors = seed_users(50)
+            started = time.perf_counter()
+            seed_requests(options["requests"], ngos, spread_km=SPREAD_KM)
+            seed_donations(options["donations"], donors, past_fraction=0.1, spread_km=SPREAD_KM, batch_size=5000)
+            self.stdout.write(
+                f"seeded {options['requests']} requests and {options['donations']} donations "
+                f"in {time.perf_counter() - started:.1f}s ({connection.vendor})"
+            )
+
+            rng = random.Random(1)
+            deg = SPREAD_KM / 111.32
+            donor = donors[0]
+
+            def new_donation():
+                return Donation.objects.create(
+                    donor=donor, name="Bench meal", food_type=rng.choice(FOOD_TYPES),
+                    latitude=round(BASE_LAT + rng.uniform(-deg, deg), 6),
+                    longitude=round(BASE_LNG + rng.uniform(-deg, deg), 6),
+                    expiry_time=timezone.now() + timedelta(hours=rng.uniform(1, 12)),
+                )
+
+            matched = []
+            insert_only = timed_loop(new_donation, iterations=options["iterations"])
+            with_matching = timed_loop(lambda: matched.append(match_donation(new_donation())),
+                                       iterations=options["iterations"])
+
+            def scan():
+                # what matching costs without the index: every open request, checked in Python
+                donation = new_donation()
+                now = timezone.now()
+                return [
+                    r for r in FoodRequest.objects.open(now)
+                    if r.food_type in (donation.food_type, FoodRequest.ANY_FOOD_TYPE)
+                    and r.needed_from <= donation.expiry_time
+                    and haversine_km(donation.latitude, donation.longitude, r.latitude, r.longitude) <= r.radius_km
+                ]
+
+            scanned = timed_loop(scan, iterations=options["scan_iterations"])
+
+            def new_request():
+                start = timezone.now()
+                food_request = FoodRequest.objects.create(
+                    ngo=ngos[0], food_type=rng.choice(FOOD_TYPES + [FoodRequest.ANY_FOOD_TYPE]),
+                    latitude=round(BASE_LAT + rng.uniform(-deg, deg), 6),
+                    longitude=round(BASE_LNG + rng.uniform(-deg, deg), 6),
+                    radius_km=5, needed_from=start, needed_until=start + timedelta(hours=12),
+                )
+                match_request(food_request)
+
+            reverse = timed_loop(new_request, iterations=options["iterations"] // 4)
+
+            header = f"{'operation':<34} {'p50 ms':>8} {'p95 ms':>8} {'per minute':>11}"
+            self.stdout.write(header)
+            self.stdout.write("-" * len(header))
+            for label, latencies in (
+                ("donation insert only", insert_only),
+                ("donation insert + match (index)", with_matching),
+                ("donation insert + match (scan)", scanned),
+                ("request insert + match", reverse),
+            ):
+                mean = sum(latencies) / len(latencies)
+                self.stdout.write(
+                    f"{label:<34} {percentile(latencies, 50) * 1000:8.2f} "
+                    f"{percentile(latencies, 95) * 1000:8.2f} {60 / mean:11,.0f}"
+                )
+            self.stdout.write(
+                f"\nopen requests: {FoodRequest.objects.open().count()}, "
+                f"mean matches per donation: {sum(matched) / len(matched):.1f}"
+            )
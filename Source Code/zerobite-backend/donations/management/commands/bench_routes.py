@@ -0,0 +1,64 @@
+import random
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from donations import routing
+from donations.benchmarks import BASE_LAT, BASE_LNG, percentile
+from donations.routing import Stop, plan_route
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the pickup route planner on random stops around the city "
+        "centre: latency, distance and late stops, with and without NumPy, "
+        "against the starting tour (no improvement budget)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--stops", type=int, nargs="+", default=[10, 25, 50, 100])
+        parser.add_argument("--trials", type=int, default=30)
+        parser.add_argument("--spread-km", type=float, default=10)
+
+    def instances(self, count, trials, spread_km):
+        rng = random.Random(count)
+        now = timezone.now()
+        deg = spread_km / 111.32
+        for _ in range(trials):
+            yield now, [
+                Stop(i, BASE_LAT + rng.uniform(-deg, deg), BASE_LNG + rng.uniform(-deg, deg),
+                     now + timedelta(minutes=rng.uniform(120, 900)))
+                for i in range(count)
+            ]
+
+    def handle(self, *args, **options):
+        modes = [("numpy", routing.np), ("python", None)] if routing.np is not None else [("python", None)]
+        numpy = routing.np
+        header = f"{'stops':>5} {'mode':<7} {'p50 ms':>8} {'max ms':>8} {'km':>8} {'late':>6} {'start km':>8} {'start late':>10}"
+        self.stdout.write(header)
+        self.stdout.write("-" * len(header))
+        try:
+            for count in options["stops"]:
+                for mode, module in modes:
+                    routing.np = module
+                    latencies, km, late, start_km, start_late = [], 0.0, 0, 0.0, 0
+                    for now, stops in self.instances(count, options["trials"], options["spread_km"]):
+                        start = (BASE_LAT, BASE_LNG)
+                        started = time.perf_counter()
+                        route = plan_route(stops, start=start, now=now)
+                        latencies.append(time.perf_counter() - started)
+                        km += route["distance_km"]
+                        late += route["late_stops"]
+                        baseline = plan_route(stops, start=start, now=now, budget=0)
+                        start_km += baseline["distance_km"]
+                        start_late += baseline["late_stops"]
+                    trials = options["trials"]
+                    self.stdout.write(
+                        f"{count:>5} {mode:<7} {percentile(latencies, 50) * 1000:8.1f} "
+                        f"{max(latencies) * 1000:8.1f} {km / trials:8.1f} {late / trials:6.1f} "
+                        f"{start_km / trials:8.1f} {start_late / trials:10.1f}"
+                    )
+        finally:
+            routing.np = numpy
@@ -0,0 +1,90 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Q
+from django.test import Client
+
+from donations.benchmarks import (
+    RARE_TERM, benchmark_database, food_text, percentile, seed_donations, seed_users, timed_loop,
+)
+from donations.models import Donation
+from donations.response_cache import get_cache
+from donations.search import ranked, search_donations
+
+QUERIES = {
+    "common term": "rice",
+    "two terms": "spicy paneer",
+    "prefix": "biry",
+    "name + area": "dosa jayanagar",
+    "uncommon pair": "khichdi upma",
+    "rare term": RARE_TERM,
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark ?q= text search over donations: the full-text index "
+        "(FTS5 / MySQL FULLTEXT) against a LIKE '%term%' scan, at the query "
+        "layer and through GET /api/donations/."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--donations", type=int, default=1_000_000)
+        parser.add_argument("--iterations", type=int, default=20)
+        parser.add_argument("--scan-iterations", type=int, default=3,
+                            help="Iterations of the unindexed LIKE scan (slow at 1M rows).")
+
+    def handle(self, *args, **options):
+        with benchmark_database():
+            donors = seed_users(50)
+            started = time.perf_counter()
+            seed_donations(options["donations"], donors, past_fraction=0.1, text=food_text, batch_size=5000)
+            self.stdout.write(
+                f"seeded {options['donations']} donations in {time.perf_counter() - started:.1f}s "
+                f"({connection.vendor}, index maintained on insert)"
+            )
+
+            open_rows = Donation.objects.not_expired().filter(is_claimed=False)
+
+            def indexed(text):
+                return lambda: ranked(search_donations(open_rows, text))
+
+            def scan(text):
+                condition = Q()
+                for token in text.split():
+                    condition &= Q(name__icontains=token) | Q(description__icontains=token) | Q(
+                        location__icontains=token)
+                return lambda: list(open_rows.filter(condition).order_by("-created_at")[:50])
+
+            client = Client()
+
+            def endpoint(text):
+                def get():
+                    get_cache().clear()  # measure the uncached path
+                    client.get("/api/donations/", {"q": text})
+                return get
+
+            header = f"{'query':<14} {'mode':<9} {'p50 ms':>9} {'p95 ms':>9}"
+            self.stdout.write(header)
+            self.stdout.write("-" * len(header))
+            for label, text in QUERIES.items():
+                runs = (
+                    ("index", indexed(text), options["iterations"]),
+                    ("endpoint", endpoint(text), options["iterations"]),
+                    ("LIKE scan", scan(text), options["scan_iterations"]),
+                )
+                for mode, func, iterations in runs:
+                    latencies = timed_loop(func, iterations=iterations)
+                    self.stdout.write(
+                        f"{label:<14} {mode:<9} {percentile(latencies, 50) * 1000:9.1f} "
+                        f"{percentile(latencies, 95) * 1000:9.1f}"
+                    )
+
+            # incremental maintenance: cost of a write with the index attached
+            donation = Donation.objects.order_by("pk").first()
+            edits = timed_loop(
+                lambda: Donation.objects.filter(pk=donation.pk).update(name=f"Edited {time.perf_counter()}"),
+                iterations=200,
+            )
+            self.stdout.write(f"\ntext edit (re-index) p50 {percentile(edits, 50) * 1000:.2f} ms")
@@ -0,0 +1,81 @@
+from django.core.management.base import BaseCommand
+from django.db import connection
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from backend.renderers import FastJSONRenderer, orjson
+from donations.benchmarks import benchmark_database, seed_dataset, timed_loop
+from donations.fieldsets import requested
+from donations.models import Donation, Order
+from donations.rows import DonationRows, OrderRows
+from donations.serializers import DonationSerializer, OrderSerializer
+
+CASES = (
+    # (label, path, query string)
+    ("donations, all fields", "/api/donations/", ""),
+    ("donations, map fields", "/api/donations/", "fields=id,name,latitude,longitude,expiry_time"),
+    ("orders, all fields", "/api/orders/", ""),
+    ("orders, light", "/api/orders/", "fields=id,created_at,donation_details.name"),
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark list rendering in rows/sec: the model serializer with DRF's "
+        "JSON renderer (before), the serializer with the orjson renderer, and "
+        ".values() rows (donations/rows.py) with the orjson renderer (after). "
+        "Each run reads and renders one page, database time included."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--donations", type=int, default=5000)
+        parser.add_argument("--page-size", type=int, default=100)
+        parser.add_argument("--seconds", type=float, default=3.0, help="Time spent on each path.")
+
+    def handle(self, *args, **options):
+        page_size = options["page_size"]
+        with benchmark_database():
+            seed_dataset(options["donations"], images_per_donation=2)
+            self.stdout.write(
+                f"seeded {options['donations']} donations ({connection.vendor}), "
+                f"pages of {page_size}, orjson {'installed' if orjson else 'NOT installed'}\n"
+            )
+            factory = APIRequestFactory()
+            header = f"{'case':<24} {'path':<22} {'rows/s':>9} {'ms/page':>8} {'bytes/row':>9} {'speedup':>8}"
+            self.stdout.write(header)
+            self.stdout.write("-" * len(header))
+
+            for label, path, query in CASES:
+                request = Request(factory.get(f"{path}?{query}"))
+                context = {"request": request}
+                if path == "/api/orders/":
+                    queryset = Order.objects.with_related().order_by("-created_at")
+                    serializer_class, rows_class = OrderSerializer, OrderRows
+                else:
+                    queryset = Donation.objects.with_related().order_by("-created_at")
+                    serializer_class, rows_class = DonationSerializer, DonationRows
+
+                def serialized(renderer, queryset=queryset, serializer_class=serializer_class, context=context):
+                    return renderer.render(serializer_class(queryset[:page_size], many=True, context=context).data)
+
+                def from_rows(queryset=queryset, rows_class=rows_class, request=request):
+                    builder = rows_class(request, *requested(request))
+                    return FastJSONRenderer().render(builder.build(builder.values(queryset)[:page_size]))
+
+                paths = (
+                    ("serializer + json", lambda: serialized(JSONRenderer())),
+                    ("serializer + orjson", lambda: serialized(FastJSONRenderer())),
+                    ("values rows + orjson", from_rows),
+                )
+                baseline = None
+                for name, func in paths:
+                    size = len(func())
+                    latencies = timed_loop(func, seconds=options["seconds"])
+                    per_page = sum(latencies) / len(latencies)
+                    rate = page_size / per_page
+                    baseline = baseline or rate
+                    self.stdout.write(
+                        f"{label:<24} {name:<22} {rate:9,.0f} {per_page * 1000:8.2f} "
+                        f"{size / page_size:9.0f} {rate / baseline:7.1f}x"
+                    )
@@ -0,0 +1,79 @@
+import time
+
+from django.core.management.base import BaseCommand
+from rest_framework.test import APIClient
+
+from backend import compression, renderers
+from donations.benchmarks import benchmark_database, seed_dataset
+from donations.response_cache import get_cache
+
+FORMATS = (
+    ("json", "application/json"),
+    ("columnar", "application/vnd.zerobite.columnar+json"),
+    ("msgpack", "application/msgpack"),
+)
+ENCODINGS = ("identity", "gzip", "br")
+
+
+class Command(BaseCommand):
+    help = (
+        "Bytes per row on the wire for the donation and order lists in each "
+        "format (JSON, columnar JSON, MessagePack) and encoding (none, gzip, "
+        "brotli), through the full middleware stack, with the time each "
+        "response took."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--donations", type=int, default=5000)
+        parser.add_argument("--page-size", type=int, default=100)
+        parser.add_argument("--repeat", type=int, default=20, help="Requests timed per cell.")
+
+    def handle(self, *args, **options):
+        page_size = options["page_size"]
+        with benchmark_database():
+            dataset = seed_dataset(options["donations"], images_per_donation=2)
+            ngo = dataset["ngos"][0]
+            cases = (
+                ("donations, all fields", f"/api/donations/?page_size={page_size}&include_claimed=true", None),
+                ("donations, map fields", f"/api/donations/?page_size={page_size}&include_claimed=true"
+                                          "&fields=id,name,latitude,longitude,expiry_time", None),
+                ("orders, all fields", "/api/orders/", ngo),
+            )
+            missing = [name for name, module in (("msgpack", renderers.msgpack), ("brotli", compression.brotli))
+                       if module is None]
+            if missing:
+                self.stdout.write(f"not installed, skipped: {', '.join(missing)}")
+
+            header = f"{'case':<24} {'format':<9} {'encoding':<9} {'bytes/row':>9} {'vs json':>8} {'ms':>7}"
+            self.stdout.write(header)
+            self.stdout.write("-" * len(header))
+            for label, url, user in cases:
+                client = APIClient()
+                client.force_authenticate(user)
+                baseline = None
+                for name, media_type in FORMATS:
+                    if name == "msgpack" and renderers.msgpack is None:
+                        continue
+                    for encoding in ENCODINGS:
+                        if encoding == "br" and compression.brotli is None:
+                            continue
+                        headers = {"HTTP_ACCEPT": media_type, "HTTP_ACCEPT_ENCODING": encoding}
+                        # anonymous lists are cached: time the rendering and compression, not the queries
+                        get_cache().clear()
+                        response = client.get(url, **headers)
+                        assert response.status_code == 200, response.status_code
+                        if user is None:
+                            rows = len(client.get(url).json()["results"])
+                        else:
+                            rows = len(client.get(url).json())
+                        started = time.perf_counter()
+                        for _ in range(options["repeat"]):
+                            client.get(url, **headers)
+                        elapsed = (time.perf_counter() - started) / options["repeat"]
+
+                        per_row = len(response.content) / max(rows, 1)
+                        baseline = baseline or per_row
+                        self.stdout.write(
+                            f"{label:<24} {name:<9} {encoding:<9} {per_row:9.0f} "
+                            f"{per_row / baseline:7.0%} {elapsed * 1000:7.2f}"
+                        )
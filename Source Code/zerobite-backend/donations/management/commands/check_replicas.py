@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from backend.database import health, max_lag, replicas
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure the replication lag of each read replica (DB_REPLICAS) and "
+        "whether it would be in the read rotation. Fails if any is not, so it "
+        "can serve as a health probe."
+    )
+
+    def handle(self, *args, **options):
+        aliases = replicas()
+        if not aliases:
+            self.stdout.write("No read replicas configured; all reads use the primary.")
+            return
+
+        unhealthy = []
+        for alias in aliases:
+            status = health.check(alias)
+            lag = "not replicating or unreachable" if status.lag is None else f"{status.lag:.1f}s behind"
+            if status.healthy:
+                self.stdout.write(self.style.SUCCESS(f"{alias}: ok, {lag}"))
+            else:
+                unhealthy.append(alias)
+                self.stdout.write(self.style.ERROR(f"{alias}: out of rotation, {lag} (max {max_lag()}s)"))
+        if unhealthy:
+            raise CommandError(f"{len(unhealthy)} of {len(aliases)} replica(s) out of rotation.")
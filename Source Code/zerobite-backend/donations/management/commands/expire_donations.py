@@ -0,0 +1,35 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from donations.expiry import ExpirySweeper
+
+
+class Command(BaseCommand):
+    help = "Run the background sweeper that marks donations expired once their expiry_time passes."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--once", action="store_true", help="Flag everything already due and exit (cron mode).")
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument("--refresh-interval", type=int, default=30,
+                            help="Seconds between reloads of upcoming expiries from the database.")
+        parser.add_argument("--horizon", type=int, default=15,
+                            help="Minutes of upcoming expiries to keep queued in memory.")
+
+    def handle(self, *args, **options):
+        sweeper = ExpirySweeper(
+            horizon=timedelta(minutes=options["horizon"]),
+            refresh_interval=options["refresh_interval"],
+            batch_size=options["batch_size"],
+        )
+
+        if options["once"]:
+            updated = sweeper.run_once()
+            self.stdout.write(self.style.SUCCESS(f"Marked {updated} donation(s) expired."))
+            return
+
+        self.stdout.write("Expiry sweeper running (Ctrl+C to stop)...")
+        try:
+            sweeper.run()
+        except KeyboardInterrupt:
+            self.stdout.write("Stopped.")
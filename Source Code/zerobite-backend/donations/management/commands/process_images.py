@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from donations.images import process_image
+from donations.models import DonationImage
+
+
+class Command(BaseCommand):
+    help = "Build resized variants for donation images that have not been processed yet (e.g. after a restart)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--all", action="store_true", help="Reprocess every image, not only pending ones.")
+
+    def handle(self, *args, **options):
+        qs = DonationImage.objects.order_by("pk")
+        if not options["all"]:
+            qs = qs.filter(processed_at__isnull=True)
+
+        done = failed = 0
+        for image_id in qs.values_list("pk", flat=True).iterator():
+            try:
+                ok = process_image(image_id)
+            except Exception as exc:
+                self.stderr.write(f"image {image_id}: {exc}")
+                ok = False
+            if ok:
+                done += 1
+            else:
+                failed += 1
+
+        self.stdout.write(self.style.SUCCESS(f"Processed {done} image(s), {failed} failed."))
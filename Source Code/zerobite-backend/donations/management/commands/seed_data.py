@@ -0,0 +1,51 @@
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from donations.benchmarks import BENCH_PASSWORD, seed_dataset
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed the configured database (a local SQLite/MySQL stand-in) with a "
+        "benchmark dataset: users, donations with images, and orders. "
+        "Use with `manage.py bench_api --existing`."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--donations", type=int, default=10_000, help="10k to 1M.")
+        parser.add_argument("--users", type=int, default=None, help="Donor accounts (default donations/100).")
+        parser.add_argument("--images", type=int, default=2, help="Image rows per donation.")
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--prefix", default="bench", help="Username prefix of the seeded accounts.")
+        parser.add_argument("--clear", action="store_true",
+                            help="Delete accounts with this prefix (and their data) first.")
+        parser.add_argument("--force", action="store_true", help="Allow seeding with DEBUG off.")
+
+    def handle(self, *args, **options):
+        if not settings.DEBUG and not options["force"]:
+            raise CommandError("Refusing to seed with DEBUG off; pass --force if this really is a stand-in.")
+
+        prefix = options["prefix"]
+        existing = User.objects.filter(username__startswith=f"{prefix}_")
+        if options["clear"]:
+            deleted, _ = existing.delete()
+            self.stdout.write(f"cleared {deleted} rows")
+        elif existing.exists():
+            raise CommandError(f"Accounts with prefix '{prefix}_' already exist; pass --clear or another --prefix.")
+
+        db = connection.settings_dict["NAME"]
+        self.stdout.write(f"seeding {connection.vendor} database {db}")
+        started = time.perf_counter()
+        seed_dataset(
+            options["donations"], users=options["users"], images_per_donation=options["images"],
+            seed=options["seed"], prefix=prefix, log=self.stdout.write,
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"done in {time.perf_counter() - started:.1f}s; accounts {prefix}_* use password '{BENCH_PASSWORD}'"
+        ))
@@ -0,0 +1,194 @@
+# donations/matching.py
+"""
+Matching NGO requests and donations as either side is created.
+
+Each open request's radius is rounded up to a tier (RADIUS_TIERS_KM) and
+its location bucketed into that tier's lat/lng grid (geo_cell), whose
+cells are half the tier radius on a side. A new donation looks up, per
+tier, only the cells within that radius of it, for its own food type and
+'any', among requests whose window has not ended; the
+(status, food_type, radius_tier, geo_cell, needed_until) index answers
+that without touching requests elsewhere. The exact radius and window
+checks run on those few candidates.
+
+A new request goes the other way through the donations' bounding-box
+index, as the nearby search does (see donations/geo.py).
+
+Both directions write RequestMatch rows with one bulk INSERT.
+"""
+import math
+
+from django.db.models import Q
+from django.utils import timezone
+
+from .geo import bounding_box, bounding_box_q, haversine_km, within_radius
+from .models import Donation, FoodRequest, RequestMatch
+
+# a request's radius is rounded up to one of these for indexing
+RADIUS_TIERS_KM = (2, 5, 10, 25)
+MAX_REQUEST_RADIUS_KM = float(RADIUS_TIERS_KM[-1])
+# past this many cells (long boxes near the poles) query whole row ranges
+MAX_CELLS_IN_LIST = 200
+# most donations recorded for one new request, newest first
+MAX_MATCHES_PER_REQUEST = 200
+# sizes the grid cells; geo_cell values are stored, so changing it means re-placing every request
+GRID_KM_PER_DEGREE = 111.32
+
+
+class Grid:
+    """Square lat/lng cells half a tier's radius on a side, numbered row by row."""
+
+    def __init__(self, radius_km):
+        self.degrees = radius_km / 2 / GRID_KM_PER_DEGREE
+        self.rows = int(math.ceil(180 / self.degrees))
+        self.columns = int(math.ceil(360 / self.degrees))
+
+    def row(self, lat):
+        return min(self.rows - 1, max(0, int(math.floor((float(lat) + 90.0) / self.degrees))))
+
+    def column(self, lng):
+        return min(self.columns - 1, max(0, int(math.floor((float(lng) + 180.0) / self.degrees))))
+
+    def cell(self, lat, lng):
+        return self.row(lat) * self.columns + self.column(lng)
+
+    def cells_q(self, lat, lng, radius_km):
+        """Q on geo_cell selecting every cell that may lie within radius_km of the point."""
+        min_lat, max_lat, lng_ranges = bounding_box(lat, lng, radius_km)
+        rows = range(self.row(min_lat), self.row(max_lat) + 1)
+        spans = [(self.column(lo), self.column(hi)) for lo, hi in lng_ranges]
+
+        if len(rows) * sum(hi - lo + 1 for lo, hi in spans) <= MAX_CELLS_IN_LIST:
+            cells = [row * self.columns + col for row in rows for lo, hi in spans for col in range(lo, hi + 1)]
+            return Q(geo_cell__in=cells)
+
+        condition = Q()
+        for row in rows:
+            for lo, hi in spans:
+                condition |= Q(geo_cell__range=(row * self.columns + lo, row * self.columns + hi))
+        return condition
+
+
+GRIDS = {tier: Grid(tier) for tier in RADIUS_TIERS_KM}
+
+
+def radius_tier(radius_km):
+    for tier in RADIUS_TIERS_KM:
+        if radius_km <= tier:
+            return tier
+    return RADIUS_TIERS_KM[-1]
+
+
+def place(food_request):
+    """Set radius_tier and geo_cell from the request's radius and coordinates."""
+    food_request.radius_tier = radius_tier(food_request.radius_km)
+    if food_request.latitude is None or food_request.longitude is None:
+        food_request.geo_cell = None
+    else:
+        food_request.geo_cell = GRIDS[food_request.radius_tier].cell(food_request.latitude, food_request.longitude)
+    return food_request
+
+
+def _windows_overlap(request, donation, now):
+    if request.needed_until < now:
+        return False
+    return donation.expiry_time is None or request.needed_from <= donation.expiry_time
+
+
+def _food_types_for(food_type):
+    return [food_type, FoodRequest.ANY_FOOD_TYPE]
+
+
+# ---------------- Donation -> requests ---------------- #
+
+def candidate_requests(lat, lng, food_type, until=None, now=None):
+    """
+    Open requests whose grid cell and category could fit a donation at
+    (lat, lng) available until `until` (None: no expiry). Each tier is its
+    own lookup of the cells within that tier's radius, so small-radius
+    requests are found through small cells; the lookups are glued with
+    UNION ALL because an OR across tiers keeps planners from using the
+    whole index. The window start and the bounding box are checked in SQL
+    too, so rows that cannot match are never loaded.
+    """
+    lookups = []
+    for tier, grid in GRIDS.items():
+        lookup = FoodRequest.objects.open(now).filter(
+            grid.cells_q(lat, lng, tier),
+            bounding_box_q(lat, lng, tier),
+            radius_tier=tier,
+            food_type__in=_food_types_for(food_type),
+        )
+        if until is not None:
+            lookup = lookup.filter(needed_from__lte=until)
+        lookups.append(lookup.only(
+            "id", "ngo_id", "latitude", "longitude", "radius_km", "needed_from", "needed_until",
+        ).order_by())
+    return lookups[0].union(*lookups[1:], all=True)
+
+
+def requests_for_donation(donation, now=None):
+    """Open requests the donation can serve, each with `distance_km` set."""
+    if donation.latitude is None or donation.longitude is None:
+        return []
+    if donation.is_claimed or donation.has_expired:
+        return []
+    now = now or timezone.now()
+    lat, lng = float(donation.latitude), float(donation.longitude)
+
+    matches = []
+    for request in candidate_requests(lat, lng, donation.food_type, donation.expiry_time, now):
+        if not _windows_overlap(request, donation, now):
+            continue
+        distance = haversine_km(lat, lng, request.latitude, request.longitude)
+        if distance <= request.radius_km:
+            request.distance_km = round(distance, 3)
+            matches.append(request)
+    return matches
+
+
+def match_donation(donation, now=None):
+    """Record a new donation's matches; returns how many were written."""
+    rows = [
+        RequestMatch(request=request, donation=donation, ngo_id=request.ngo_id, donor_id=donation.donor_id,
+                     distance_km=request.distance_km)
+        for request in requests_for_donation(donation, now)
+    ]
+    RequestMatch.objects.bulk_create(rows, ignore_conflicts=True)
+    return len(rows)
+
+
+def match_donations(donations, now=None):
+    return sum(match_donation(donation, now) for donation in donations)
+
+
+# ---------------- Request -> donations ---------------- #
+
+def donations_for_request(request, now=None):
+    """Open donations that fit the request, nearest first, each with `distance_km` set."""
+    if request.latitude is None or request.longitude is None or request.status != FoodRequest.STATUS_OPEN:
+        return []
+    lat, lng = float(request.latitude), float(request.longitude)
+    radius_km = min(request.radius_km, MAX_REQUEST_RADIUS_KM)
+
+    candidates = (
+        Donation.objects.not_expired(now)
+        .filter(bounding_box_q(lat, lng, radius_km), is_claimed=False)
+        .filter(Q(expiry_time__isnull=True) | Q(expiry_time__gte=request.needed_from))
+        .only("id", "donor_id", "latitude", "longitude", "created_at")
+        .order_by("-created_at")
+    )
+    if request.food_type != FoodRequest.ANY_FOOD_TYPE:
+        candidates = candidates.filter(food_type=request.food_type)
+    return within_radius(candidates[:MAX_MATCHES_PER_REQUEST], lat, lng, radius_km)
+
+
+def match_request(request, now=None):
+    """Record a new (or re-targeted) request's matches; returns how many were written."""
+    rows = [
+        RequestMatch(request=request, donation=donation, ngo_id=request.ngo_id, donor_id=donation.donor_id,
+                     distance_km=donation.distance_km)
+        for donation in donations_for_request(request, now)
+    ]
+    RequestMatch.objects.bulk_create(rows, ignore_conflicts=True)
+    return len(rows)
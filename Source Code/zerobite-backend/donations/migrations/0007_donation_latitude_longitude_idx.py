@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:45
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('donations', '0006_order_donation_donations_d_donor_i_b67ace_idx_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='donation',
+            index=models.Index(fields=['latitude', 'longitude'], name='donations_d_latitud_5e7301_idx'),
+        ),
+    ]
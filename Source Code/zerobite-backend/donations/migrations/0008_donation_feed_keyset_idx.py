@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:47
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('donations', '0007_donation_latitude_longitude_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='donation',
+            index=models.Index(fields=['is_claimed', 'is_expired', 'created_at', 'id'], name='donations_d_is_clai_560268_idx'),
+        ),
+    ]
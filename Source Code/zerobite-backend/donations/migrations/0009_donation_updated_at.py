@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('donations', '0008_donation_feed_keyset_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DonationTableState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_deleted_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='donation',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.AddIndex(
+            model_name='donation',
+            index=models.Index(fields=['expiry_time'], name='donations_d_expiry__6ac6cf_idx'),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('donations', '0010_donation_donor_keyset_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='donationimage',
+            name='card',
+            field=models.ImageField(blank=True, null=True, upload_to='donation_images/variants/'),
+        ),
+        migrations.AddField(
+            model_name='donationimage',
+            name='full',
+            field=models.ImageField(blank=True, null=True, upload_to='donation_images/variants/'),
+        ),
+        migrations.AddField(
+            model_name='donationimage',
+            name='height',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='donationimage',
+            name='processed_at',
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='donationimage',
+            name='thumbnail',
+            field=models.ImageField(blank=True, null=True, upload_to='donation_images/variants/'),
+        ),
+        migrations.AddField(
+            model_name='donationimage',
+            name='width',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,36 @@
+from django.db import migrations
+
+from donations.search import FTS_TABLE, FULLTEXT_INDEX, install_sqlite_index
+
+
+def create_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == "mysql":
+        # InnoDB maintains FULLTEXT indexes itself on every write
+        schema_editor.execute(
+            f"ALTER TABLE donations_donation ADD FULLTEXT INDEX {FULLTEXT_INDEX} (name, description, location)"
+        )
+    elif connection.vendor == "sqlite":
+        install_sqlite_index(connection, rebuild=True)
+    # other backends use the icontains fallback in donations/search.py
+
+
+def drop_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == "mysql":
+        schema_editor.execute(f"ALTER TABLE donations_donation DROP INDEX {FULLTEXT_INDEX}")
+    elif connection.vendor == "sqlite":
+        for suffix in ("ai", "ad", "au"):
+            schema_editor.execute(f"DROP TRIGGER IF EXISTS {FTS_TABLE}_{suffix}")
+        schema_editor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('donations', '0012_admin_list_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,116 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:42
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('donations', '0013_donation_search_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FoodRequest',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('food_type', models.CharField(choices=[('any', 'Any'), ('cooked', 'Cooked meals'), ('bakery', 'Bakery'), ('produce', 'Fruit & vegetables'), ('dairy', 'Dairy'), ('packaged', 'Packaged food'), ('beverages', 'Beverages'), ('other', 'Other')], default='any', max_length=20)),
+                ('quantity', models.PositiveIntegerField(default=1)),
+                ('notes', models.TextField(blank=True)),
+                ('location', models.CharField(blank=True, max_length=255)),
+                ('latitude', models.DecimalField(blank=True, decimal_places=6, max_digits=9, null=True)),
+                ('longitude', models.DecimalField(blank=True, decimal_places=6, max_digits=9, null=True)),
+                ('radius_km', models.FloatField(default=10.0)),
+                ('radius_tier', models.PositiveSmallIntegerField(blank=True, editable=False, null=True)),
+                ('geo_cell', models.IntegerField(blank=True, editable=False, null=True)),
+                ('needed_from', models.DateTimeField()),
+                ('needed_until', models.DateTimeField()),
+                ('status', models.CharField(choices=[('open', 'Open'), ('fulfilled', 'Fulfilled'), ('cancelled', 'Cancelled')], default='open', max_length=20)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='RequestMatch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('distance_km', models.FloatField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.AddField(
+            model_name='donation',
+            name='food_type',
+            field=models.CharField(choices=[('cooked', 'Cooked meals'), ('bakery', 'Bakery'), ('produce', 'Fruit & vegetables'), ('dairy', 'Dairy'), ('packaged', 'Packaged food'), ('beverages', 'Beverages'), ('other', 'Other')], default='other', max_length=20),
+        ),
+        migrations.AddIndex(
+            model_name='donation',
+            index=models.Index(fields=['food_type', 'latitude', 'longitude'], name='donations_d_food_ty_1cec30_idx'),
+        ),
+        migrations.AddField(
+            model_name='foodrequest',
+            name='ngo',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='food_requests', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='requestmatch',
+            name='donation',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='request_matches', to='donations.donation'),
+        ),
+        migrations.AddField(
+            model_name='requestmatch',
+            name='donor',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='requestmatch',
+            name='ngo',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='requestmatch',
+            name='request',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='matches', to='donations.foodrequest'),
+        ),
+        migrations.AddIndex(
+            model_name='foodrequest',
+            index=models.Index(fields=['status', 'food_type', 'radius_tier', 'geo_cell', 'needed_until'], name='donations_f_status_4bbae6_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='foodrequest',
+            index=models.Index(fields=['latitude', 'longitude'], name='donations_f_latitud_8f54e4_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='foodrequest',
+            index=models.Index(fields=['status', 'created_at', 'id'], name='donations_f_status_cc64c3_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='foodrequest',
+            index=models.Index(fields=['ngo', 'created_at', 'id'], name='donations_f_ngo_id_cd48ea_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='requestmatch',
+            index=models.Index(fields=['ngo', 'created_at', 'id'], name='donations_r_ngo_id_56a9da_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='requestmatch',
+            index=models.Index(fields=['donor', 'created_at', 'id'], name='donations_r_donor_i_baa5d3_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='requestmatch',
+            index=models.Index(fields=['donation'], name='donations_r_donatio_810bfe_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='requestmatch',
+            constraint=models.UniqueConstraint(fields=('request', 'donation'), name='donations_requestmatch_unique'),
+        ),
+    ]
@@ -0,0 +1,84 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:28
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('donations', '0015_food_requests'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedDonation',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('donor_name', models.CharField(blank=True, max_length=100, null=True)),
+                ('contact_number', models.CharField(blank=True, max_length=20, null=True)),
+                ('name', models.CharField(max_length=200)),
+                ('description', models.TextField(blank=True)),
+                ('quantity', models.PositiveIntegerField(default=1)),
+                ('food_type', models.CharField(choices=[('cooked', 'Cooked meals'), ('bakery', 'Bakery'), ('produce', 'Fruit & vegetables'), ('dairy', 'Dairy'), ('packaged', 'Packaged food'), ('beverages', 'Beverages'), ('other', 'Other')], default='other', max_length=20)),
+                ('expiry_time', models.DateTimeField(blank=True, null=True)),
+                ('location', models.CharField(blank=True, max_length=255)),
+                ('latitude', models.DecimalField(blank=True, decimal_places=6, max_digits=9, null=True)),
+                ('longitude', models.DecimalField(blank=True, decimal_places=6, max_digits=9, null=True)),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('is_claimed', models.BooleanField(default=False)),
+                ('is_expired', models.BooleanField(default=False)),
+                ('archived_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('donor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_donations', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedDonationImage',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('image', models.ImageField(upload_to='donation_images/')),
+                ('uploaded_at', models.DateTimeField()),
+                ('thumbnail', models.ImageField(blank=True, null=True, upload_to='donation_images/variants/')),
+                ('card', models.ImageField(blank=True, null=True, upload_to='donation_images/variants/')),
+                ('full', models.ImageField(blank=True, null=True, upload_to='donation_images/variants/')),
+                ('width', models.PositiveIntegerField(blank=True, null=True)),
+                ('height', models.PositiveIntegerField(blank=True, null=True)),
+                ('processed_at', models.DateTimeField(blank=True, null=True)),
+                ('donation', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='images', to='donations.archiveddonation')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ArchivedOrder',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('confirmation_note', models.TextField(blank=True, null=True)),
+                ('latitude', models.DecimalField(blank=True, decimal_places=6, max_digits=9, null=True)),
+                ('longitude', models.DecimalField(blank=True, decimal_places=6, max_digits=9, null=True)),
+                ('created_at', models.DateTimeField()),
+                ('donation', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='orders', to='donations.archiveddonation')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_orders', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='archiveddonation',
+            index=models.Index(fields=['donor', 'created_at', 'id'], name='donations_a_donor_i_41aafe_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='archiveddonation',
+            index=models.Index(fields=['created_at', 'id'], name='donations_a_created_5e99a4_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedorder',
+            index=models.Index(fields=['user', 'created_at'], name='donations_a_user_id_8f13f6_idx'),
+        ),
+    ]
@@ -1,5 +1,6 @@
 from decimal import Decimal
 from django.db import models
+from django.db.models import Prefetch, Q
 from django.conf import settings
 from django.utils import timezone
 
@@ -7,6 +8,55 @@ from django.utils import timezone
 COORD_MAX_DIGITS = 9
 COORD_DECIMAL_PLACES = 6
 
+FOOD_TYPE_CHOICES = (
+    ('cooked', 'Cooked meals'),
+    ('bakery', 'Bakery'),
+    ('produce', 'Fruit & vegetables'),
+    ('dairy', 'Dairy'),
+    ('packaged', 'Packaged food'),
+    ('beverages', 'Beverages'),
+    ('other', 'Other'),
+)
+
+
+class DonationQuerySet(models.QuerySet):
+    """
+    Expiry is decided by expiry_time at read time; the is_expired flag is
+    flipped later by the expiry sweeper (see donations/expiry.py), so reads
+    never have to write.
+    """
+
+    def with_related(self):
+        """Load donor and images up front so serializing a page costs a fixed number of queries."""
+        return self.select_related("donor").prefetch_related(
+            Prefetch("images", queryset=DonationImage.objects.order_by("pk"))
+        )
+
+    def not_expired(self, now=None):
+        now = now or timezone.now()
+        return self.filter(is_expired=False).filter(
+            Q(expiry_time__isnull=True) | Q(expiry_time__gt=now)
+        )
+
+    def expired(self, now=None):
+        now = now or timezone.now()
+        return self.filter(Q(is_expired=True) | Q(expiry_time__lte=now))
+
+    def claim(self, pk, now=None):
+        """
+        Claim an open donation with one conditional UPDATE. Exactly one of
+        any number of concurrent callers gets True; the rest get False.
+        """
+        now = now or timezone.now()
+        return self.filter(pk=pk, is_claimed=False).not_expired(now).update(
+            is_claimed=True, updated_at=now,
+        ) == 1
+
+    def due_for_expiry(self, now=None):
+        """Rows whose expiry_time has passed but are not flagged yet."""
+        now = now or timezone.now()
+        return self.filter(is_expired=False, expiry_time__isnull=False, expiry_time__lte=now)
+
 
 class Donation(models.Model):
     DONOR_ROLE_CHOICES = (
@@ -24,6 +74,7 @@ class Donation(models.Model):
     name = models.CharField(max_length=200)
     description = models.TextField(blank=True)
     quantity = models.PositiveIntegerField(default=1)
+    food_type = models.CharField(max_length=20, choices=FOOD_TYPE_CHOICES, default='other')
 
     # expiry
     expiry_time = models.DateTimeField(null=True, blank=True)
@@ -50,46 +101,114 @@ class Donation(models.Model):
     )
 
     created_at = models.DateTimeField(auto_now_add=True)
+    # set on every edit, claim and expiry (bulk updates must pass it explicitly)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
     is_claimed = models.BooleanField(default=False)
     is_expired = models.BooleanField(default=False)
 
+    objects = DonationQuerySet.as_manager()
+
     class Meta:
         ordering = ['-created_at']
         indexes = [
             models.Index(fields=['is_claimed', 'is_expired', 'expiry_time']),
+            # latest passed expiry for the list's change token (donations/conditional.py)
+            models.Index(fields=['expiry_time']),
+            # keyset pagination of the open feed (see donations/pagination.py)
+            models.Index(fields=['is_claimed', 'is_expired', 'created_at', 'id']),
             models.Index(fields=['donor']),
+            # keyset pagination of a donor's own posts
+            models.Index(fields=['donor', 'created_at', 'id']),
+            # bounding-box prefilter for nearby search (see donations/geo.py)
+            models.Index(fields=['latitude', 'longitude']),
+            # admin list: name prefix search and unfiltered keyset pages
+            models.Index(fields=['name']),
+            models.Index(fields=['created_at', 'id']),
+            # open donations for a new NGO request (see donations/matching.py)
+            models.Index(fields=['food_type', 'latitude', 'longitude']),
         ]
 
     def __str__(self):
         donor_label = self.donor_name or getattr(self.donor, "username", "Unknown")
         return f"{self.name} ({self.quantity}) by {donor_label} — {self.location or 'No location'}"
 
-    def mark_if_expired(self):
+    @property
+    def has_expired(self):
         """
-        Mark this donation expired if expiry_time has passed.
-        Safe to call repeatedly.
+        True if flagged expired or expiry_time has passed.
+        Read-only: the sweeper is responsible for persisting the flag.
         """
-        if self.expiry_time and not self.is_expired and timezone.now() >= self.expiry_time:
-            self.is_expired = True
-            self.save(update_fields=['is_expired'])
+        if self.is_expired:
+            return True
+        return bool(self.expiry_time and timezone.now() >= self.expiry_time)
 
     @property
     def remaining_seconds(self):
         """Return seconds until expiry, or None if no expiry or already expired."""
-        if not self.expiry_time or self.is_expired:
+        if not self.expiry_time or self.has_expired:
             return None
         diff = (self.expiry_time - timezone.now()).total_seconds()
         return max(0, int(diff))
 
 
+class DonationTableState(models.Model):
+    """
+    Single-row bookkeeping for the donation table. Deleted rows leave no
+    updated_at behind, so their time is recorded here for the list's
+    Last-Modified / ETag (see donations/conditional.py).
+    """
+    last_deleted_at = models.DateTimeField(null=True, blank=True)
+
+    @classmethod
+    def touch_deleted(cls, when=None):
+        when = when or timezone.now()
+        if not cls.objects.filter(pk=1).update(last_deleted_at=when):
+            cls.objects.get_or_create(pk=1, defaults={"last_deleted_at": when})
+
+
+class DonationEvent(models.Model):
+    """
+    Log of published donation events (see donations/events.py). Each row is
+    written in the transaction that made the change, so processes other
+    than the publisher (the expiry sweeper, other workers) reach the event
+    streams through it. Rows are pruned after EVENT_LOG_RETENTION_SECONDS.
+    """
+    message = models.TextField()
+    created_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+
 class DonationImage(models.Model):
+    VARIANTS = ('thumbnail', 'card', 'full')
+
     donation = models.ForeignKey(Donation, on_delete=models.CASCADE, related_name='images')
+    # original upload, stored as-is so the request returns quickly
     image = models.ImageField(upload_to='donation_images/')
     uploaded_at = models.DateTimeField(auto_now_add=True)
 
+    # resized, EXIF-free variants written by the image workers (donations/images.py)
+    thumbnail = models.ImageField(upload_to='donation_images/variants/', blank=True, null=True)
+    card = models.ImageField(upload_to='donation_images/variants/', blank=True, null=True)
+    full = models.ImageField(upload_to='donation_images/variants/', blank=True, null=True)
+    width = models.PositiveIntegerField(null=True, blank=True)
+    height = models.PositiveIntegerField(null=True, blank=True)
+    processed_at = models.DateTimeField(null=True, blank=True, db_index=True)
+
     def __str__(self):
         return f"Image for donation {self.donation_id}"
 
+    def variant(self, name):
+        """The requested variant file, or the original until processing finishes."""
+        field = getattr(self, name, None) if name in self.VARIANTS else None
+        return field if field else self.image
+
+
+class OrderQuerySet(models.QuerySet):
+    def with_related(self):
+        """Load user, donation, donor and donation images for nested serialization."""
+        return self.select_related("donation__donor", "user").prefetch_related(
+            Prefetch("donation__images", queryset=DonationImage.objects.order_by("pk"))
+        )
+
 
 class Order(models.Model):
     """
@@ -115,6 +234,8 @@ class Order(models.Model):
 
     created_at = models.DateTimeField(auto_now_add=True)
 
+    objects = OrderQuerySet.as_manager()
+
     class Meta:
         ordering = ['-created_at']
         indexes = [
@@ -143,3 +264,225 @@ class Order(models.Model):
     #         if not donation.is_claimed:
     #             donation.is_claimed = True
     #             donation.save(update_fields=['is_claimed'])
+
+
+# ---------------- Archive ---------------- #
+# Donations claimed or expired for longer than ARCHIVE_AFTER_DAYS, moved
+# here with their images and orders by `manage.py archive_donations`
+# (donations/archive.py). Rows keep their primary key and every column of
+# the table they came from, under the same names.
+
+class ArchivedDonationQuerySet(DonationQuerySet):
+    def with_related(self):
+        return self.select_related("donor").prefetch_related(
+            Prefetch("images", queryset=ArchivedDonationImage.objects.order_by("pk"))
+        )
+
+
+class ArchivedDonation(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    donor_name = models.CharField(max_length=100, blank=True, null=True)
+    contact_number = models.CharField(max_length=20, blank=True, null=True)
+    name = models.CharField(max_length=200)
+    description = models.TextField(blank=True)
+    quantity = models.PositiveIntegerField(default=1)
+    food_type = models.CharField(max_length=20, choices=FOOD_TYPE_CHOICES, default='other')
+    expiry_time = models.DateTimeField(null=True, blank=True)
+    location = models.CharField(max_length=255, blank=True)
+    latitude = models.DecimalField(
+        max_digits=COORD_MAX_DIGITS,
+        decimal_places=COORD_DECIMAL_PLACES,
+        null=True,
+        blank=True,
+    )
+    longitude = models.DecimalField(
+        max_digits=COORD_MAX_DIGITS,
+        decimal_places=COORD_DECIMAL_PLACES,
+        null=True,
+        blank=True,
+    )
+    donor = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        related_name='archived_donations',
+        on_delete=models.CASCADE
+    )
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    is_claimed = models.BooleanField(default=False)
+    is_expired = models.BooleanField(default=False)
+    archived_at = models.DateTimeField(default=timezone.now)
+
+    objects = ArchivedDonationQuerySet.as_manager()
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            # a donor's posts, keyset-paginated
+            models.Index(fields=['donor', 'created_at', 'id']),
+            models.Index(fields=['created_at', 'id']),
+        ]
+
+    def __str__(self):
+        return f"{self.name} ({self.quantity}), archived"
+
+
+class ArchivedDonationImage(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    donation = models.ForeignKey(ArchivedDonation, on_delete=models.CASCADE, related_name='images')
+    # the files stay where they are
+    image = models.ImageField(upload_to='donation_images/')
+    uploaded_at = models.DateTimeField()
+    thumbnail = models.ImageField(upload_to='donation_images/variants/', blank=True, null=True)
+    card = models.ImageField(upload_to='donation_images/variants/', blank=True, null=True)
+    full = models.ImageField(upload_to='donation_images/variants/', blank=True, null=True)
+    width = models.PositiveIntegerField(null=True, blank=True)
+    height = models.PositiveIntegerField(null=True, blank=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    # serialized like a DonationImage (DonationImageSerializer)
+    VARIANTS = DonationImage.VARIANTS
+    variant = DonationImage.variant
+
+    def __str__(self):
+        return f"Image for archived donation {self.donation_id}"
+
+
+class ArchivedOrder(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    donation = models.ForeignKey(ArchivedDonation, on_delete=models.CASCADE, related_name="orders")
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="archived_orders")
+    confirmation_note = models.TextField(blank=True, null=True)
+    latitude = models.DecimalField(
+        max_digits=COORD_MAX_DIGITS,
+        decimal_places=COORD_DECIMAL_PLACES,
+        null=True,
+        blank=True,
+    )
+    longitude = models.DecimalField(
+        max_digits=COORD_MAX_DIGITS,
+        decimal_places=COORD_DECIMAL_PLACES,
+        null=True,
+        blank=True,
+    )
+    created_at = models.DateTimeField()
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', 'created_at']),
+        ]
+
+    def __str__(self):
+        return f"Archived order #{self.pk}"
+
+
+# ---------------- NGO requests ---------------- #
+
+class FoodRequestQuerySet(models.QuerySet):
+    def open(self, now=None):
+        """Requests still waiting for food whose window has not ended."""
+        now = now or timezone.now()
+        return self.filter(status=FoodRequest.STATUS_OPEN, needed_until__gte=now)
+
+
+class FoodRequest(models.Model):
+    """
+    An NGO's standing need: a food type and quantity, wanted within
+    radius_km of a point during [needed_from, needed_until]. New donations
+    are matched against open requests and vice versa (donations/matching.py).
+    """
+    STATUS_OPEN = 'open'
+    STATUS_CHOICES = (
+        ('open', 'Open'),
+        ('fulfilled', 'Fulfilled'),
+        ('cancelled', 'Cancelled'),
+    )
+    ANY_FOOD_TYPE = 'any'
+    FOOD_TYPE_CHOICES = ((ANY_FOOD_TYPE, 'Any'),) + FOOD_TYPE_CHOICES
+
+    ngo = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='food_requests')
+    food_type = models.CharField(max_length=20, choices=FOOD_TYPE_CHOICES, default=ANY_FOOD_TYPE)
+    quantity = models.PositiveIntegerField(default=1)
+    notes = models.TextField(blank=True)
+
+    location = models.CharField(max_length=255, blank=True)
+    latitude = models.DecimalField(
+        max_digits=COORD_MAX_DIGITS,
+        decimal_places=COORD_DECIMAL_PLACES,
+        null=True,
+        blank=True,
+    )
+    longitude = models.DecimalField(
+        max_digits=COORD_MAX_DIGITS,
+        decimal_places=COORD_DECIMAL_PLACES,
+        null=True,
+        blank=True,
+    )
+    radius_km = models.FloatField(default=10.0)
+    # radius rounded up to a tier and the cell of (latitude, longitude) in
+    # that tier's grid, set by save(); writes that skip save() must set them
+    # too (see donations/matching.py)
+    radius_tier = models.PositiveSmallIntegerField(null=True, blank=True, editable=False)
+    geo_cell = models.IntegerField(null=True, blank=True, editable=False)
+
+    needed_from = models.DateTimeField()
+    needed_until = models.DateTimeField()
+
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_OPEN)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = FoodRequestQuerySet.as_manager()
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            # requests a new donation could satisfy: category and grid cells
+            # by equality, then the end of the window as a range
+            models.Index(fields=['status', 'food_type', 'radius_tier', 'geo_cell', 'needed_until']),
+            # nearby list
+            models.Index(fields=['latitude', 'longitude']),
+            # open list, keyset-paginated
+            models.Index(fields=['status', 'created_at', 'id']),
+            models.Index(fields=['ngo', 'created_at', 'id']),
+        ]
+
+    def __str__(self):
+        return f"{self.get_food_type_display()} x{self.quantity} for {self.ngo_id} ({self.status})"
+
+    def save(self, *args, **kwargs):
+        from .matching import place
+
+        place(self)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'latitude', 'longitude', 'radius_km'} & set(update_fields):
+            kwargs['update_fields'] = set(update_fields) | {'radius_tier', 'geo_cell'}
+        super().save(*args, **kwargs)
+
+
+class RequestMatch(models.Model):
+    """
+    A donation that fits an open request when either of them was created.
+    ngo and donor are copied from the two sides so each user's matches are
+    one index range.
+    """
+    request = models.ForeignKey(FoodRequest, on_delete=models.CASCADE, related_name='matches')
+    donation = models.ForeignKey(Donation, on_delete=models.CASCADE, related_name='request_matches')
+    ngo = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+')
+    donor = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+')
+    distance_km = models.FloatField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        constraints = [
+            models.UniqueConstraint(fields=['request', 'donation'], name='donations_requestmatch_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['ngo', 'created_at', 'id']),
+            models.Index(fields=['donor', 'created_at', 'id']),
+            models.Index(fields=['donation']),
+        ]
+
+    def __str__(self):
+        return f"Request {self.request_id} <-> donation {self.donation_id}"
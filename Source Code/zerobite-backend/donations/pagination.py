@@ -0,0 +1,167 @@
+# donations/pagination.py
+import base64
+import json
+from datetime import datetime
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+def default_page_size():
+    return getattr(settings, "DONATION_FEED_PAGE_SIZE", 20)
+
+
+class KeysetPagination(BasePagination):
+    """
+    Newest-first keyset pagination on (ordering_field, id), created_at by default.
+
+    Each page is a range scan starting right after the last row of the
+    previous page, so page cost does not grow with depth the way OFFSET
+    does. Cursors are opaque base64 tokens; other query parameters
+    (filters, page_size) are carried over into the next/previous links;
+    a cursor that does not decode is a 400. Pages may be model instances
+    or .values() rows (see donations/rows.py).
+    """
+    page_size_query_param = "page_size"
+    max_page_size = 100
+    cursor_query_param = "cursor"
+    invalid_cursor_message = "Invalid cursor"
+    ordering_field = "created_at"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        return self.set_page(list(self.page_queryset(queryset, request)))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        return self.set_page([row async for row in self.page_queryset(queryset, request)])
+
+    def paginate_querysets(self, querysets, request, view=None):
+        """
+        One page over several querysets with disjoint ids, such as a table
+        and its archive (donations/archive.py): a page from each, merged.
+        """
+        rows = [row for queryset in querysets for row in self.page_queryset(queryset, request)]
+        rows.sort(key=self.row_key, reverse=not (self.cursor is not None and self.cursor[2]))
+        return self.set_page(rows[:self.page_size + 1])
+
+    def page_queryset(self, queryset, request):
+        """The rows of the requested page, plus one to learn whether another page exists."""
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+
+        field = self.ordering_field
+        self.cursor = self.decode_cursor(request)
+        if self.cursor is None:
+            queryset = queryset.order_by(f"-{field}", "-id")
+        else:
+            value, pk, reverse = self.cursor
+            if reverse:
+                queryset = queryset.filter(
+                    Q(**{f"{field}__gt": value}) | Q(**{field: value, "pk__gt": pk})
+                ).order_by(field, "id")
+            else:
+                queryset = queryset.filter(
+                    Q(**{f"{field}__lt": value}) | Q(**{field: value, "pk__lt": pk})
+                ).order_by(f"-{field}", "-id")
+        return queryset[:self.page_size + 1]
+
+    def set_page(self, rows):
+        reverse = self.cursor is not None and self.cursor[2]
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if reverse:
+            rows.reverse()
+            self.has_next = True
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = self.cursor is not None
+
+        self.page = rows
+        return rows
+
+    def get_page_size(self, request):
+        value = request.query_params.get(self.page_size_query_param)
+        if value:
+            try:
+                size = int(value)
+            except ValueError:
+                size = 0
+            if size > 0:
+                return min(size, self.max_page_size)
+        return default_page_size()
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(*self.row_key(self.page[-1]), reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            # walked past the newest row; the first page is the way back
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(*self.row_key(self.page[0]), reverse=True)
+
+    def row_key(self, row):
+        if isinstance(row, dict):
+            return row[self.ordering_field], row["id"]
+        return getattr(row, self.ordering_field), row.pk
+
+    def get_paginated_response(self, data):
+        return Response({
+            "next": self.get_next_link(),
+            "previous": self.get_previous_link(),
+            "results": data,
+        })
+
+    def encode_cursor(self, value, pk, reverse):
+        payload = json.dumps({"t": value.isoformat(), "i": pk, "r": int(reverse)}, separators=(",", ":"))
+        token = base64.urlsafe_b64encode(payload.encode("ascii")).decode("ascii")
+        return replace_query_param(self.base_url, self.cursor_query_param, token)
+
+    def decode_cursor(self, request):
+        token = request.query_params.get(self.cursor_query_param)
+        if not token:
+            return None
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(token.encode("ascii")).decode("ascii"))
+            value = datetime.fromisoformat(payload["t"])
+            if settings.USE_TZ and timezone.is_naive(value):
+                raise ValueError("cursor time without an offset")
+            return value, int(payload["i"]), bool(payload["r"])
+        except (TypeError, ValueError, KeyError, UnicodeError):
+            raise ValidationError({self.cursor_query_param: self.invalid_cursor_message})
+
+
+class CappedResults(list):
+    """
+    An already-ranked result list (text or nearby search), at most `limit`
+    rows of it; `truncated` is True when more rows matched.
+    """
+
+    def __init__(self, rows, limit):
+        super().__init__(rows[:limit])
+        self.limit = limit
+        self.truncated = len(rows) > limit
+
+    def response_body(self, data):
+        """The list response: the feed's page shape, plus the cap."""
+        return {
+            "next": None,
+            "previous": None,
+            "limit": self.limit,
+            "truncated": self.truncated,
+            "results": data,
+        }
+
+
+class UserKeysetPagination(KeysetPagination):
+    """Newest-first pages of users on (date_joined, id)."""
+    ordering_field = "date_joined"
@@ -0,0 +1,336 @@
+# donations/response_cache.py
+"""
+Shared cache of serialized donation list/detail responses for anonymous
+readers, on Django's cache framework (DONATION_CACHE_ALIAS, locmem by
+default; point the alias at Redis/Memcached to share it across workers).
+
+Keys embed a generation token: list keys share one, each detail key has
+its own. Donation events (see donations/events.py) replace the affected
+tokens, so stale entries become unreachable and simply age out. A
+response rebuilt from a replica (backend/database.py) within
+REPLICA_MAX_LAG_SECONDS of a change may predate it, so it is only cached
+until that window has passed. Entries keep the time they were stored,
+and hits count remaining_seconds down from it.
+
+Async views use the a*() functions, which go through the cache's async
+API (aget/aset/aadd) instead of blocking the event loop.
+"""
+import asyncio
+import json
+import math
+import time
+import uuid
+from contextlib import asynccontextmanager, contextmanager
+from datetime import datetime
+from hashlib import sha1
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils import timezone
+from rest_framework.response import Response
+
+from backend.database import max_lag, read_alias
+
+from .events import channel
+
+KEY_PREFIX = "donations:resp"
+CHANGED_KEY = f"{KEY_PREFIX}:changed"
+LOCK_TIMEOUT = 10
+LOCK_WAIT_SECONDS = 2.0
+LOCK_POLL_SECONDS = 0.05
+
+
+def get_cache():
+    return caches[getattr(settings, "DONATION_CACHE_ALIAS", "default")]
+
+
+def default_timeout():
+    return getattr(settings, "DONATION_CACHE_TIMEOUT", 60)
+
+
+# ---------------- Generations / invalidation ---------------- #
+
+def _generation(name):
+    cache = get_cache()
+    key = f"{KEY_PREFIX}:gen:{name}"
+    token = cache.get(key)
+    if token is None:
+        cache.add(key, uuid.uuid4().hex, timeout=None)
+        token = cache.get(key)
+    return token
+
+
+async def _ageneration(name):
+    cache = get_cache()
+    key = f"{KEY_PREFIX}:gen:{name}"
+    token = await cache.aget(key)
+    if token is None:
+        await cache.aadd(key, uuid.uuid4().hex, timeout=None)
+        token = await cache.aget(key)
+    return token
+
+
+def _bump(name):
+    get_cache().set(f"{KEY_PREFIX}:gen:{name}", uuid.uuid4().hex, timeout=None)
+
+
+def invalidate_donation(pk):
+    """Drop every cached list page and the detail entry of one donation."""
+    invalidate_donations([] if pk is None else [pk])
+
+
+def invalidate_donations(pks):
+    """invalidate_donation() for many donations at once: one cache write for all their tokens."""
+    names = ["list"] + [f"detail:{pk}" for pk in pks]
+    get_cache().set_many({f"{KEY_PREFIX}:gen:{name}": uuid.uuid4().hex for name in names}, timeout=None)
+    # replicas may not have the change yet; see _rebuild_timeout()
+    get_cache().set(CHANGED_KEY, time.time(), timeout=max_lag() + 1)
+
+
+def invalidate_for_event(message):
+    event = json.loads(message)
+    invalidate_donation((event.get("donation") or {}).get("id"))
+
+
+channel.subscribe(invalidate_for_event)
+
+
+def _digest(query_params):
+    normalized = json.dumps(sorted((k, sorted(v)) for k, v in query_params.lists()))
+    return sha1(normalized.encode("utf-8")).hexdigest()
+
+
+def _list_key(generation, query_params):
+    return f"{KEY_PREFIX}:list:{generation}:{_digest(query_params)}"
+
+
+def _detail_key(pk, generation, query_params):
+    # ?fields= / ?expand= change the body, so they are part of the key
+    key = f"{KEY_PREFIX}:detail:{pk}:{generation}"
+    return f"{key}:{_digest(query_params)}" if query_params else key
+
+
+def list_key(query_params):
+    return _list_key(_generation("list"), query_params)
+
+
+def detail_key(pk, query_params=None):
+    return _detail_key(pk, _generation(f"detail:{pk}"), query_params)
+
+
+async def alist_key(query_params):
+    return _list_key(await _ageneration("list"), query_params)
+
+
+async def adetail_key(pk, query_params=None):
+    return _detail_key(pk, await _ageneration(f"detail:{pk}"), query_params)
+
+
+# ---------------- Hit / miss counters ---------------- #
+
+def _count(name):
+    cache = get_cache()
+    key = f"{KEY_PREFIX}:stats:{name}"
+    try:
+        cache.incr(key)
+    except ValueError:
+        if not cache.add(key, 1, timeout=None):
+            cache.incr(key)
+
+
+async def _acount(name):
+    cache = get_cache()
+    key = f"{KEY_PREFIX}:stats:{name}"
+    try:
+        await cache.aincr(key)
+    except ValueError:
+        if not await cache.aadd(key, 1, timeout=None):
+            await cache.aincr(key)
+
+
+def cache_stats():
+    cache = get_cache()
+    return {
+        "hits": cache.get(f"{KEY_PREFIX}:stats:hits", 0),
+        "misses": cache.get(f"{KEY_PREFIX}:stats:misses", 0),
+    }
+
+
+# ---------------- Stampede guard ---------------- #
+
+@contextmanager
+def rebuild_lock(key):
+    """Yield True if this caller should rebuild `key`, False if another one already is."""
+    cache = get_cache()
+    lock_key = f"{key}:lock"
+    acquired = cache.add(lock_key, 1, timeout=LOCK_TIMEOUT)
+    try:
+        yield acquired
+    finally:
+        if acquired:
+            cache.delete(lock_key)
+
+
+@asynccontextmanager
+async def arebuild_lock(key):
+    """rebuild_lock() for async views."""
+    cache = get_cache()
+    lock_key = f"{key}:lock"
+    acquired = await cache.aadd(lock_key, 1, timeout=LOCK_TIMEOUT)
+    try:
+        yield acquired
+    finally:
+        if acquired:
+            await cache.adelete(lock_key)
+
+
+def wait_for(key):
+    """Poll briefly for a value another request is rebuilding."""
+    cache = get_cache()
+    deadline = time.monotonic() + LOCK_WAIT_SECONDS
+    while time.monotonic() < deadline:
+        time.sleep(LOCK_POLL_SECONDS)
+        value = cache.get(key)
+        if value is not None:
+            return value
+    return None
+
+
+async def await_for(key):
+    """wait_for() without holding a thread."""
+    cache = get_cache()
+    deadline = time.monotonic() + LOCK_WAIT_SECONDS
+    while time.monotonic() < deadline:
+        await asyncio.sleep(LOCK_POLL_SECONDS)
+        value = await cache.aget(key)
+        if value is not None:
+            return value
+    return None
+
+
+# ---------------- View mixin ---------------- #
+
+def _plain(data):
+    """Strip DRF ReturnDict/ReturnList wrappers so the data pickles cleanly."""
+    if isinstance(data, dict):
+        return {k: _plain(v) for k, v in data.items()}
+    if isinstance(data, list):
+        return [_plain(v) for v in data]
+    return data
+
+
+def _remaining_seconds(row, now):
+    if "remaining_seconds" in row:
+        seconds = row["remaining_seconds"]
+    else:
+        # ?fields= may have left out remaining_seconds but kept expiry_time
+        try:
+            seconds = int((datetime.fromisoformat(row["expiry_time"]) - now).total_seconds())
+        except (KeyError, TypeError, ValueError):
+            return None
+    return seconds if seconds and seconds > 0 else None
+
+
+def _rows(data):
+    rows = data.get("results", [data]) if isinstance(data, dict) else data
+    return [row for row in rows if isinstance(row, dict)]
+
+
+def _entry_timeout(data):
+    # don't keep a row past its expiry just because the sweeper hasn't run yet
+    now = timezone.now()
+    remaining = [seconds for seconds in (_remaining_seconds(row, now) for row in _rows(data)) if seconds is not None]
+    timeout = default_timeout()
+    if remaining:
+        timeout = min(timeout, max(1, min(remaining)))
+    return timeout
+
+
+def _rebuild_timeout(data, changed_at):
+    """
+    _entry_timeout(), but a response read from a replica less than
+    REPLICA_MAX_LAG_SECONDS after the last change (`changed_at`) is only
+    kept until then: the replica may not have had the change yet.
+    """
+    timeout = _entry_timeout(data)
+    if changed_at is not None and read_alias() is not None:
+        window = max_lag() - (time.time() - changed_at)
+        if window > 0:
+            timeout = min(timeout, max(1, math.ceil(window)))
+    return timeout
+
+
+def _entry(data):
+    return {"data": data, "stored": time.time()}
+
+
+def _aged(entry):
+    """The body of a cache entry, its remaining_seconds counted down to now."""
+    data = entry["data"]
+    elapsed = time.time() - entry["stored"]
+    for row in _rows(data):
+        if row.get("remaining_seconds"):
+            row["remaining_seconds"] = max(0, int(row["remaining_seconds"] - elapsed))
+    return data
+
+
+class CachedAnonymousGetMixin:
+    """Serve anonymous GETs from the shared response cache. Views provide get_response_cache_key()."""
+
+    def get_response_cache_key(self, request, *args, **kwargs):
+        """The cache key of the response to an anonymous request; None leaves it uncached."""
+        return None
+
+    def get(self, request, *args, **kwargs):
+        if request.user and request.user.is_authenticated:
+            return super().get(request, *args, **kwargs)
+        key = self.get_response_cache_key(request, *args, **kwargs)
+        if key is None:
+            return super().get(request, *args, **kwargs)
+
+        cache = get_cache()
+        entry = cache.get(key)
+        if entry is not None:
+            _count("hits")
+            return Response(_aged(entry), headers={"X-Cache": "HIT"})
+
+        _count("misses")
+        with rebuild_lock(key) as acquired:
+            if not acquired:
+                entry = wait_for(key)
+                if entry is not None:
+                    return Response(_aged(entry), headers={"X-Cache": "HIT"})
+
+            changed_at = cache.get(CHANGED_KEY)
+            response = super().get(request, *args, **kwargs)
+            if response.status_code == 200:
+                data = _plain(response.data)
+                cache.set(key, _entry(data), timeout=_rebuild_timeout(data, changed_at))
+            response["X-Cache"] = "MISS"
+            return response
+
+
+async def acached(key, build):
+    """
+    CachedAnonymousGetMixin.get() for async views: (status, data, "HIT"
+    or "MISS"). On a miss, `build` is awaited for (status, data).
+    """
+    cache = get_cache()
+    entry = await cache.aget(key)
+    if entry is not None:
+        await _acount("hits")
+        return 200, _aged(entry), "HIT"
+
+    await _acount("misses")
+    async with arebuild_lock(key) as acquired:
+        if not acquired:
+            entry = await await_for(key)
+            if entry is not None:
+                return 200, _aged(entry), "HIT"
+
+        changed_at = await cache.aget(CHANGED_KEY)
+        status, data = await build()
+        if status == 200:
+            data = _plain(data)
+            await cache.aset(key, _entry(data), timeout=_rebuild_timeout(data, changed_at))
+        return status, data, "MISS"
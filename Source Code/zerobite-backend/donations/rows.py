@@ -0,0 +1,343 @@
+# donations/rows.py
+"""
+List responses built from .values() rows instead of model serializers.
+
+DonationRows and OrderRows produce exactly what DonationSerializer and
+OrderSerializer would, ?fields= / ?expand= included (the tests compare
+the two). They read the page with .values() and build each selected
+field with one plain function call per row: no model instances and no
+serializer fields walked per row. Only the columns behind the selected
+fields are fetched. Images come from one extra query for the page, as
+with Donation.objects.with_related().
+
+ValuesListMixin puts a generic list view on this path. Results that a
+view has already evaluated (the nearby and text searches) still go
+through the serializer; capped search results keep their `limit` and
+`truncated` (pagination.CappedResults). abuild() is the same for async views. The
+*HistoryRows classes also read the images of archived donations
+(donations/archive.py).
+"""
+from operator import itemgetter
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.storage import FileSystemStorage
+from django.utils import timezone
+from django.utils.encoding import filepath_to_uri
+from rest_framework import serializers
+from rest_framework.response import Response
+
+from .archive import newest_first
+from .fieldsets import FIELDS_PARAM, check_expand, requested, select, unknown_names_error
+from .models import ArchivedDonationImage, Donation, DonationImage
+from .pagination import CappedResults
+from .serializers import (
+    DonationImageSerializer, DonationSerializer, OrderSerializer, UserSummarySerializer, default_thumbnail,
+)
+
+
+def _nullable(convert):
+    def represent(value):
+        return None if value is None else convert(value)
+    return represent
+
+
+_float = _nullable(float)
+
+
+def _decimal(model, name):
+    field = model._meta.get_field(name)
+    return _nullable(serializers.DecimalField(field.max_digits, field.decimal_places).to_representation)
+
+
+class Rows:
+    """
+    One serializer's representation of .values() rows whose columns sit
+    under `prefix` (a relation path such as "donation__").
+    """
+    serializer_class = None
+    # fields that are plain columns, returned as stored
+    plain = ()
+    # field -> Rows class of the related object (?expand=), read from the same row
+    expandable = {}
+    # field -> (Rows class, relation) of objects always embedded, read from the same row
+    nested = {}
+    # fields that take a dotted ?fields= selection of their own
+    with_subfields = ()
+
+    def __init__(self, request, selection=None, expand=None, prefix="", path=""):
+        self.request = request
+        self.prefix = prefix
+        self.now = timezone.now()
+        # the timezone DateTimeField would look up for every value
+        tz = timezone.get_current_timezone() if settings.USE_TZ else None
+        self.datetime = _nullable(serializers.DateTimeField(default_timezone=tz).to_representation)
+        self.children = []
+        self.columns = {prefix + "id"}
+        self.getters = []
+
+        check_expand(expand, self.expandable, self.nested, path)
+        for name in select(self.serializer_class.Meta.fields, selection, path):
+            sub = selection.get(name) if selection else None
+            sub_expand = expand.get(name) if expand else None
+            child_class, relation = self.nested.get(name, (None, None))
+            if expand and name in expand and name in self.expandable:
+                child_class, relation = self.expandable[name], name
+            if child_class is not None:
+                child = child_class(request, sub, sub_expand, f"{prefix}{relation}__", f"{path}{name}.")
+                self.children.append(child)
+                self.columns |= child.columns
+                self.getters.append((name, child.build_one))
+                continue
+            if sub is not None and name not in self.with_subfields:
+                raise unknown_names_error(FIELDS_PARAM, f"{path}{name}.", sub)
+            columns, getter = self.field(name, sub, path)
+            self.columns.update(prefix + column for column in columns)
+            self.getters.append((name, getter))
+
+    def key(self, column):
+        return self.prefix + column
+
+    def field(self, name, selection, path):
+        """
+        (columns, getter(row)) of one selected field. Names the serializer
+        does not have are a 400 before this is reached (fieldsets.select);
+        a serializer field with no getter here is a bug in this module.
+        """
+        if name in self.plain:
+            return (name,), itemgetter(self.key(name))
+        raise ImproperlyConfigured(
+            f"{type(self).__name__} cannot build {self.serializer_class.__name__}.{name}"
+        )
+
+    def converted(self, column, convert):
+        key = self.key(column)
+        return (column,), lambda row: convert(row[key])
+
+    def values(self, queryset, *extra):
+        return queryset.prefetch_related(None).values(*sorted(self.columns.union(extra)))
+
+    def prepare(self, rows):
+        """Load whatever the page needs beyond its own rows."""
+        for child in self.children:
+            child.prepare(rows)
+
+    async def aprepare(self, rows):
+        for child in self.children:
+            await child.aprepare(rows)
+
+    def build_one(self, row):
+        return {name: get(row) for name, get in self.getters}
+
+    def build(self, rows):
+        rows = list(rows)
+        self.prepare(rows)
+        return [self.build_one(row) for row in rows]
+
+    async def abuild(self, rows):
+        """build() for async views; `rows` is a list or a queryset (read with the async ORM)."""
+        rows = rows if isinstance(rows, list) else [row async for row in rows]
+        await self.aprepare(rows)
+        return [self.build_one(row) for row in rows]
+
+
+class UserRows(Rows):
+    serializer_class = UserSummarySerializer
+    plain = ("id", "username", "avatar", "role")
+
+
+class ImageRows(Rows):
+    serializer_class = DonationImageSerializer
+    plain = ("id", "width", "height")
+    storage = DonationImage._meta.get_field("image").storage
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.base_url = self.absolute_base_url()
+
+    def absolute_base_url(self):
+        """
+        The absolute media URL when a file's URL is that prefix plus the
+        quoted name (local storage), so it is built once per page instead
+        of going through storage.url() and build_absolute_uri() per file.
+        """
+        base = getattr(self.storage, "base_url", None)
+        if not isinstance(self.storage, FileSystemStorage) or not base or not base.startswith("/") \
+                or base.startswith("//"):
+            return None
+        return self.request.build_absolute_uri(base) if self.request else base
+
+    def url(self, name):
+        if not name:
+            return None
+        # names urljoin() would not simply append are left to the storage
+        if self.base_url is not None and ":" not in name and "./" not in name:
+            return self.base_url + filepath_to_uri(name).lstrip("/")
+        rel = self.storage.url(name)
+        return self.request.build_absolute_uri(rel) if self.request else rel
+
+    def field(self, name, selection, path):
+        if name == "image":
+            return ("image",), lambda row: self.url(row["image"])
+        if name == "image_url":
+            return ("full", "image"), lambda row: self.url(row["full"] or row["image"])
+        if name == "variants":
+            variants = DonationImage.VARIANTS
+            return variants + ("image",), lambda row: {v: self.url(row[v] or row["image"]) for v in variants}
+        if name == "uploaded_at":
+            return self.converted("uploaded_at", self.datetime)
+        return super().field(name, selection, path)
+
+
+class DonationRows(Rows):
+    serializer_class = DonationSerializer
+    plain = (
+        "id", "donor_name", "contact_number", "name", "description", "quantity", "food_type",
+        "location", "donor", "is_claimed",
+    )
+    expandable = {"donor": UserRows}
+    with_subfields = ("images",)
+    # the serializer fields for donor__<column>
+    donor_columns = {"donor_username": "username", "donor_avatar": "avatar", "donor_role": "role"}
+    # tables the images of the page's donations are in
+    image_models = (DonationImage,)
+
+    def __init__(self, *args, **kwargs):
+        self.images = self.thumbnails = None
+        self.image_rows = self.image_builder = None
+        super().__init__(*args, **kwargs)
+
+    def field(self, name, selection, path):
+        now = self.now
+        pk = self.key("id")
+        if name in self.donor_columns:
+            return self.converted(f"donor__{self.donor_columns[name]}", lambda value: value)
+        if name in ("expiry_time", "created_at"):
+            return self.converted(name, self.datetime)
+        if name in ("latitude", "longitude"):
+            return self.converted(name, _decimal(Donation, name))
+        if name == "remaining_seconds":
+            return self.converted(
+                "expiry_time", lambda expiry: None if not expiry else max(0, int((expiry - now).total_seconds())),
+            )
+        if name == "is_expired":
+            expired, expiry = self.key("is_expired"), self.key("expiry_time")
+            return ("is_expired", "expiry_time"), lambda row: bool(
+                row[expired] or (row[expiry] and now >= row[expiry])
+            )
+        if name in ("distance_km", "relevance"):
+            # only the nearby and text searches set these; they use the serializer
+            return (), lambda row: None
+        if name == "images":
+            self.image_rows = ImageRows(self.request, selection, None, "", f"{path}images.")
+            self.images = {}
+            return (), lambda row: self.images.get(row[pk], [])
+        if name == "thumbnail":
+            self.thumbnails = {}
+            default = default_thumbnail()
+            return (), lambda row: self.thumbnails.get(row[pk], default)
+        return super().field(name, selection, path)
+
+    def image_query(self, rows):
+        """The page's images, or None if no selected field needs them."""
+        if self.images is None and self.thumbnails is None:
+            return None
+        self.image_builder = self.image_rows or ImageRows(self.request, {"id": None})
+        columns = self.image_builder.columns | {"donation_id", "image", "card"}
+        ids = {row[self.key("id")] for row in rows}
+        if not ids:
+            return None
+        images, *archived = [
+            model.objects.filter(donation_id__in=ids).order_by().values(*sorted(columns)) for model in self.image_models
+        ]
+        if archived:
+            images = images.union(*archived, all=True)
+        return images.order_by("id")
+
+    def prepare(self, rows):
+        super().prepare(rows)
+        images = self.image_query(rows)
+        if images is not None:
+            self.add_images(images)
+
+    async def aprepare(self, rows):
+        await super().aprepare(rows)
+        images = self.image_query(rows)
+        if images is not None:
+            self.add_images([image async for image in images])
+
+    def add_images(self, images):
+        builder = self.image_builder
+        for image in images:
+            donation_id = image["donation_id"]
+            if self.images is not None:
+                self.images.setdefault(donation_id, []).append(builder.build_one(image))
+            if self.thumbnails is not None and donation_id not in self.thumbnails:
+                # the first image by pk, as DonationSerializer.get_thumbnail picks it
+                if image["image"]:
+                    self.thumbnails[donation_id] = builder.url(image["card"] or image["image"])
+                else:
+                    self.thumbnails[donation_id] = default_thumbnail()
+
+
+class OrderRows(Rows):
+    serializer_class = OrderSerializer
+    plain = ("id", "donation", "user", "confirmation_note")
+    expandable = {"user": UserRows}
+    nested = {"donation_details": (DonationRows, "donation")}
+
+    def field(self, name, selection, path):
+        if name in ("latitude", "longitude"):
+            return self.converted(name, _float)
+        if name == "created_at":
+            return self.converted(name, self.datetime)
+        return super().field(name, selection, path)
+
+
+class DonationHistoryRows(DonationRows):
+    """DonationRows for pages that include archived donations."""
+    image_models = (DonationImage, ArchivedDonationImage)
+
+
+class OrderHistoryRows(OrderRows):
+    """OrderRows for pages that include archived orders."""
+    nested = {"donation_details": (DonationHistoryRows, "donation")}
+
+
+class ValuesListMixin:
+    """
+    List views: build the page with `rows_class` from .values() instead of
+    the serializer. Lists the view has already evaluated are serialized.
+    Rows from get_archive_queryset() are merged in, newest first.
+    """
+    rows_class = None
+
+    def get_archive_queryset(self):
+        """The archived rows of the list (donations/archive.py), or None."""
+        return None
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        if isinstance(queryset, list):
+            data = self.get_serializer(queryset, many=True).data
+            if isinstance(queryset, CappedResults):
+                return Response(queryset.response_body(data))
+            return Response(data)
+
+        fields, expand = requested(request)
+        builder = self.rows_class(request, fields, expand)
+        ordering = getattr(self.paginator, "ordering_field", None)
+        archived = self.get_archive_queryset()
+        if archived is not None:
+            ordering = ordering or "created_at"
+            parts = [builder.values(queryset, ordering), builder.values(archived, ordering)]
+            if self.paginator is None:
+                return Response(builder.build(newest_first(*parts, field=ordering)))
+            page = self.paginator.paginate_querysets(parts, request, view=self)
+            return self.get_paginated_response(builder.build(page))
+
+        rows = builder.values(queryset, *([ordering] if ordering else []))
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(builder.build(page))
+        return Response(builder.build(rows))
@@ -0,0 +1,149 @@
+# donations/search.py
+"""
+Full-text search over donation name, description and location.
+
+MySQL uses an InnoDB FULLTEXT index, SQLite an external-content FTS5
+table kept in sync by triggers (both created in migration 0013), so the
+index follows every insert, edit and delete, bulk ones included. Other
+backends, or a SQLite build without FTS5, fall back to unranked
+icontains matching.
+
+SQLite drops a table's triggers when a migration rebuilds it, so they
+are re-created after every migrate (see donations/signals.py).
+
+The match runs on the connection of the queryset's database, which may
+be a replica. Results are capped at DONATION_SEARCH_LIMIT; the response
+says so with `limit` and `truncated` (see pagination.CappedResults).
+"""
+import re
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import BooleanField, FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+
+from .pagination import CappedResults
+
+FTS_TABLE = "donations_donation_fts"
+FULLTEXT_INDEX = "donations_donation_fulltext"
+SEARCH_FIELDS = ("name", "description", "location")
+
+# bm25 column weights: a hit in the name counts most
+FTS_WEIGHTS = (10.0, 2.0, 4.0)
+
+SQLITE_TRIGGERS = [
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON donations_donation BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, name, description, location)
+        VALUES (new.id, new.name, new.description, new.location);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON donations_donation BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, description, location)
+        VALUES ('delete', old.id, old.name, old.description, old.location);
+    END""",
+    # claims and expiry only touch flags; re-index on text edits alone
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au
+        AFTER UPDATE OF name, description, location ON donations_donation BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, description, location)
+        VALUES ('delete', old.id, old.name, old.description, old.location);
+        INSERT INTO {FTS_TABLE}(rowid, name, description, location)
+        VALUES (new.id, new.name, new.description, new.location);
+    END""",
+]
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+_fts_tables = {}
+
+
+def search_limit():
+    return getattr(settings, "DONATION_SEARCH_LIMIT", 50)
+
+
+def tokenize(text):
+    return _TOKEN_RE.findall((text or "").lower())
+
+
+def fts_match_expression(tokens):
+    """AND of quoted terms; the last one is a prefix so partial words still match."""
+    terms = [f'"{t}"' for t in tokens]
+    terms[-1] += "*"
+    return " ".join(terms)
+
+
+def sqlite_has_fts5(conn):
+    with conn.cursor() as cursor:
+        cursor.execute("PRAGMA compile_options")
+        return any("FTS5" in row[0] for row in cursor.fetchall())
+
+
+def install_sqlite_index(conn, rebuild=False):
+    """Create the FTS5 table and its triggers on a SQLite connection if missing."""
+    if conn.vendor != "sqlite" or not sqlite_has_fts5(conn):
+        return False
+    with conn.cursor() as cursor:
+        cursor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+            "name, description, location, "
+            "content='donations_donation', content_rowid='id', "
+            "tokenize='unicode61 remove_diacritics 2')"
+        )
+        for statement in SQLITE_TRIGGERS:
+            cursor.execute(statement)
+        if rebuild:
+            cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+    _fts_tables.pop(conn.settings_dict["NAME"], None)
+    return True
+
+
+def _has_fts_table(conn):
+    key = conn.settings_dict["NAME"]
+    if key not in _fts_tables:
+        _fts_tables[key] = FTS_TABLE in conn.introspection.table_names()
+    return _fts_tables[key]
+
+
+def _column(conn, name):
+    qn = conn.ops.quote_name
+    return f"{qn('donations_donation')}.{qn(name)}"
+
+
+def search_donations(queryset, text):
+    """
+    Restrict `queryset` to donations matching `text` and annotate a
+    `relevance` score (higher is better; None on the fallback path).
+    """
+    tokens = tokenize(text)
+    if not tokens:
+        return queryset.none()
+
+    conn = connections[queryset.db]
+    if conn.vendor == "mysql":
+        against = "MATCH ({}) AGAINST (%s IN NATURAL LANGUAGE MODE)".format(
+            ", ".join(_column(conn, f) for f in SEARCH_FIELDS)
+        )
+        phrase = " ".join(tokens)
+        return queryset.filter(
+            RawSQL(against, [phrase], output_field=BooleanField())
+        ).annotate(relevance=RawSQL(against, [phrase], output_field=FloatField()))
+
+    if conn.vendor == "sqlite" and _has_fts_table(conn):
+        weights = ", ".join(str(w) for w in FTS_WEIGHTS)
+        # join the FTS table so bm25() is computed in the same pass as the
+        # match; a correlated subquery would re-run the match for every row
+        return queryset.extra(
+            select={"relevance": f"-bm25({FTS_TABLE}, {weights})"},
+            tables=[FTS_TABLE],
+            where=[f"{FTS_TABLE}.rowid = {_column(conn, 'id')}", f"{FTS_TABLE} MATCH %s"],
+            params=[fts_match_expression(tokens)],
+        )
+
+    condition = Q()
+    for token in tokens:
+        condition &= Q(name__icontains=token) | Q(description__icontains=token) | Q(location__icontains=token)
+    return queryset.filter(condition).annotate(relevance=Value(None, output_field=FloatField()))
+
+
+def ranked(queryset, limit=None):
+    """Best matches first (newest first among ties), capped at `limit` rows."""
+    limit = limit or search_limit()
+    # one row past the cap tells whether the results were cut
+    return CappedResults(list(queryset.order_by("-relevance", "-created_at", "-id")[:limit + 1]), limit)
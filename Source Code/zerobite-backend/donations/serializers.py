@@ -1,57 +1,91 @@
 # donations/serializers.py
+from datetime import datetime, time
+
 from rest_framework import serializers
 from django.conf import settings
 from django.utils import timezone
 from django.contrib.auth import get_user_model
 
-from .models import Donation, DonationImage, Order
+from .fieldsets import SparseFieldsMixin
+from .images import enqueue as enqueue_image_processing, validate_upload
+from .matching import MAX_REQUEST_RADIUS_KM
+from .models import Donation, DonationImage, FoodRequest, Order, RequestMatch
 
 User = get_user_model()
 
+MAX_IMAGES_PER_DONATION = 5
+
 
 # ---------------- Donation image / donation serializers ---------------- #
 
-class DonationImageSerializer(serializers.ModelSerializer):
+def _media_url(field, request):
+    if not field:
+        return None
+    try:
+        rel = field.url
+    except Exception:
+        return None
+    if request:
+        return request.build_absolute_uri(rel)
+    return rel
+
+
+def default_thumbnail():
+    return getattr(settings, "DEFAULT_DONATION_IMAGE_URL", None) or "/static/default_donation.jpg"
+
+
+class UserSummarySerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    """A donor or order user in place of their id (?expand=donor, ?expand=user)."""
+
+    class Meta:
+        model = User
+        fields = ["id", "username", "avatar", "role"]
+
+
+class DonationImageSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     image_url = serializers.SerializerMethodField(read_only=True)
+    variants = serializers.SerializerMethodField(read_only=True)
 
     class Meta:
         model = DonationImage
-        fields = ("id", "image", "image_url", "uploaded_at")
-        read_only_fields = ("id", "image", "image_url", "uploaded_at")
+        fields = ("id", "image", "image_url", "variants", "width", "height", "uploaded_at")
+        read_only_fields = ("id", "image", "image_url", "variants", "width", "height", "uploaded_at")
 
     def get_image_url(self, obj):
-        if not obj.image:
-            return None
+        # the EXIF-free full-size variant once processed, the original until then
+        return _media_url(obj.variant("full"), self.context.get("request"))
+
+    def get_variants(self, obj):
         request = self.context.get("request")
-        try:
-            rel = obj.image.url
-        except Exception:
-            return None
-        if request:
-            return request.build_absolute_uri(rel)
-        return rel
+        return {name: _media_url(obj.variant(name), request) for name in DonationImage.VARIANTS}
 
 
-class DonationSerializer(serializers.ModelSerializer):
+class DonationSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     donor_username = serializers.ReadOnlyField(source="donor.username")
     donor_avatar = serializers.ReadOnlyField(source="donor.avatar")
     donor_role = serializers.ReadOnlyField(source="donor.role")
     images = DonationImageSerializer(many=True, read_only=True)
     remaining_seconds = serializers.SerializerMethodField(read_only=True)
     thumbnail = serializers.SerializerMethodField(read_only=True)
+    distance_km = serializers.SerializerMethodField(read_only=True)
+    relevance = serializers.SerializerMethodField(read_only=True)
+    is_expired = serializers.SerializerMethodField(read_only=True)
 
     class Meta:
         model = Donation
         fields = [
-            "id", "donor_name", "contact_number", "name", "description", "quantity",
+            "id", "donor_name", "contact_number", "name", "description", "quantity", "food_type",
             "expiry_time", "remaining_seconds", "location", "latitude", "longitude",
+            "distance_km", "relevance",
             "donor", "donor_username", "donor_avatar", "donor_role",
             "images", "thumbnail", "created_at", "is_claimed", "is_expired",
         ]
         read_only_fields = [
             "donor", "created_at", "donor_username", "donor_avatar",
-            "donor_role", "remaining_seconds", "is_expired", "thumbnail",
+            "donor_role", "remaining_seconds", "is_expired", "thumbnail", "distance_km",
+            "relevance",
         ]
+        expandable_fields = {"donor": UserSummarySerializer}
 
     def get_remaining_seconds(self, obj):
         expiry = getattr(obj, "expiry_time", None)
@@ -64,24 +98,38 @@ class DonationSerializer(serializers.ModelSerializer):
             return None
         return max(0, int(diff))
 
+    def get_is_expired(self, obj):
+        # the stored flag may lag behind expiry_time until the sweeper runs
+        return obj.has_expired
+
+    def get_distance_km(self, obj):
+        # only set by the nearby search (see geo.within_radius)
+        return getattr(obj, "distance_km", None)
+
+    def get_relevance(self, obj):
+        # only set by the text search (see search.search_donations)
+        return getattr(obj, "relevance", None)
+
+    def get_uploads(self):
+        """The photos posted with this donation: "images", or context["images_field"] (bulk intake)."""
+        request = self.context.get("request")
+        if not request:
+            return []
+        return request.FILES.getlist(self.context.get("images_field", "images"))[:MAX_IMAGES_PER_DONATION]
+
+    def validate(self, attrs):
+        for upload in self.get_uploads():
+            validate_upload(upload, self.context.get("images_field", "images"))
+        return attrs
+
     def get_thumbnail(self, obj):
-        imgs = getattr(obj, "images", None)
-        if imgs:
-            try:
-                first = imgs.first()
-            except Exception:
-                first = None
-            if first and first.image:
-                request = self.context.get("request")
-                rel = first.image.url
-                if request:
-                    return request.build_absolute_uri(rel)
-                return rel
-
-        default = getattr(settings, "DEFAULT_DONATION_IMAGE_URL", None)
-        if default:
-            return default
-        return "/static/default_donation.jpg"
+        # card-sized variant for list cards; images.all() is served from the
+        # prefetch cache (Donation.objects.with_related())
+        imgs = list(obj.images.all()) if obj.pk else []
+        first = imgs[0] if imgs else None
+        if first and first.image:
+            return _media_url(first.variant("card"), self.context.get("request"))
+        return default_thumbnail()
 
     def create(self, validated_data):
         request = self.context.get("request")
@@ -93,6 +141,10 @@ class DonationSerializer(serializers.ModelSerializer):
         else:
             donation = Donation.objects.create(**validated_data)
 
+        # store the originals now; resizing happens off-request
+        images = [DonationImage.objects.create(donation=donation, image=f) for f in self.get_uploads()]
+        enqueue_image_processing(img.pk for img in images)
+
         return donation
 
 
@@ -101,10 +153,16 @@ class DonationSerializer(serializers.ModelSerializer):
 class UserListSerializer(serializers.ModelSerializer):
     """Serializer for admin listing of users."""
     last_login = serializers.DateTimeField(read_only=True)
+    # annotated by donations.filters.with_activity_counts
+    donation_count = serializers.IntegerField(read_only=True)
+    order_count = serializers.IntegerField(read_only=True)
 
     class Meta:
         model = User
-        fields = ("id", "username", "email", "first_name", "last_name", "is_active", "is_staff", "last_login")
+        fields = (
+            "id", "username", "email", "first_name", "last_name", "role", "is_active", "is_staff",
+            "is_superuser", "last_login", "date_joined", "donation_count", "order_count",
+        )
 
 
 class DonationAdminSerializer(serializers.ModelSerializer):
@@ -116,7 +174,7 @@ class DonationAdminSerializer(serializers.ModelSerializer):
         model = Donation
         fields = [
             "id", "donor", "donor_username", "donor_email", "donor_name", "contact_number",
-            "name", "description", "quantity", "expiry_time", "location", "latitude", "longitude",
+            "name", "description", "quantity", "food_type", "expiry_time", "location", "latitude", "longitude",
             "is_claimed", "is_expired", "created_at", "images",
         ]
         read_only_fields = ["id", "donor", "donor_username", "donor_email", "created_at"]
@@ -124,19 +182,23 @@ class DonationAdminSerializer(serializers.ModelSerializer):
 
 # ---------------- Order serializers ---------------- #
 
-class OrderSerializer(serializers.ModelSerializer):
+class OrderSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """
     Serializer for Order model.
     - Accepts `donation` (id) in input.
-    - Returns nested `donation_details` for responses.
+    - Returns nested `donation_details` for responses (narrow it with
+      ?fields=donation_details.name,...).
     - `user` is read-only; view should attach user on save.
     """
     donation_details = DonationSerializer(source="donation", read_only=True)
+    # donor is needed for the nested response and the claimed event
+    donation = serializers.PrimaryKeyRelatedField(queryset=Donation.objects.select_related("donor"))
 
     class Meta:
         model = Order
         fields = ["id", "donation", "donation_details", "user", "confirmation_note", "latitude", "longitude", "created_at"]
         read_only_fields = ["id", "user", "donation_details", "created_at"]
+        expandable_fields = {"user": UserSummarySerializer}
 
     confirmation_note = serializers.CharField(required=True, allow_blank=False)
     latitude = serializers.FloatField(required=False, allow_null=True)
@@ -148,7 +210,8 @@ class OrderSerializer(serializers.ModelSerializer):
          - authenticated user
          - user role (NGO or Volunteer)
          - donation present and exists
-         - donation not expired or already claimed
+        Whether the donation is still open is decided by the view's
+        conditional claim UPDATE, not here.
         """
         request = self.context.get("request")
         user = getattr(request, "user", None)
@@ -181,20 +244,6 @@ class OrderSerializer(serializers.ModelSerializer):
                 except Donation.DoesNotExist:
                     raise serializers.ValidationError({"donation": "Donation not found."})
 
-        # Now validate donation state
-        donation_obj = attrs.get("donation")
-        # Ensure donation is up-to-date regarding expiry
-        try:
-            donation_obj.mark_if_expired()
-        except Exception:
-            # ignore if mark_if_expired fails; we'll still check flags below
-            pass
-
-        if getattr(donation_obj, "is_expired", False):
-            raise serializers.ValidationError({"detail": "This donation has expired and cannot be confirmed."})
-        if getattr(donation_obj, "is_claimed", False):
-            raise serializers.ValidationError({"detail": "This donation has already been claimed."})
-
         return attrs
 
     def create(self, validated_data):
@@ -205,9 +254,6 @@ class OrderSerializer(serializers.ModelSerializer):
         request = self.context.get("request")
         user = getattr(request, "user", None)
 
-        # Ensure donation is the instance (validate ensures this)
-        donation = validated_data.get("donation")
-
         # Remove any accidental user key
         validated_data.pop("user", None)
 
@@ -218,13 +264,7 @@ class OrderSerializer(serializers.ModelSerializer):
         else:
             order = Order.objects.create(**validated_data)
 
-        # Mark donation claimed — best practice: view does it in atomic transaction.
-        try:
-            donation.is_claimed = True
-            donation.save(update_fields=["is_claimed"])
-        except Exception:
-            pass
-
+        # The donation itself is claimed by the view (Donation.objects.claim) in the same transaction.
         return order
 
 
@@ -236,3 +276,80 @@ class OrderAdminSerializer(serializers.ModelSerializer):
         model = Order
         fields = ["id", "donation", "donation_details", "user", "user_username", "confirmation_note", "latitude", "longitude", "created_at"]
         read_only_fields = ["id", "created_at"]
+
+
+# ---------------- NGO request serializers ---------------- #
+
+class FoodRequestSerializer(serializers.ModelSerializer):
+    """
+    The window is either needed_from/needed_until or, as the request form
+    sends it, a single `date_needed` day.
+    """
+    ngo_username = serializers.ReadOnlyField(source="ngo.username")
+    date_needed = serializers.DateField(write_only=True, required=False)
+    needed_from = serializers.DateTimeField(required=False)
+    needed_until = serializers.DateTimeField(required=False)
+    distance_km = serializers.SerializerMethodField(read_only=True)
+
+    class Meta:
+        model = FoodRequest
+        fields = [
+            "id", "ngo", "ngo_username", "food_type", "quantity", "notes",
+            "location", "latitude", "longitude", "radius_km", "distance_km",
+            "date_needed", "needed_from", "needed_until", "status", "created_at",
+        ]
+        read_only_fields = ["ngo", "ngo_username", "distance_km", "created_at"]
+
+    def get_distance_km(self, obj):
+        # only set by the nearby list (see geo.within_radius)
+        return getattr(obj, "distance_km", None)
+
+    def validate_radius_km(self, value):
+        if not 0 < value <= MAX_REQUEST_RADIUS_KM:
+            raise serializers.ValidationError(f"Must be between 0 and {MAX_REQUEST_RADIUS_KM:g}.")
+        return value
+
+    def validate(self, attrs):
+        day = attrs.pop("date_needed", None)
+        if day is not None:
+            attrs["needed_from"] = timezone.make_aware(datetime.combine(day, time.min))
+            attrs["needed_until"] = timezone.make_aware(datetime.combine(day, time.max))
+
+        needed_from = attrs.get("needed_from", getattr(self.instance, "needed_from", None))
+        needed_until = attrs.get("needed_until", getattr(self.instance, "needed_until", None))
+        if needed_until is None:
+            raise serializers.ValidationError({"needed_until": "Give date_needed or needed_until."})
+        if needed_from is None:
+            attrs["needed_from"] = needed_from = timezone.now()
+        if needed_until < needed_from:
+            raise serializers.ValidationError({"needed_until": "Must not be before needed_from."})
+
+        lat = attrs.get("latitude", getattr(self.instance, "latitude", None))
+        lng = attrs.get("longitude", getattr(self.instance, "longitude", None))
+        if (lat is None) != (lng is None):
+            raise serializers.ValidationError({"latitude": "Give both latitude and longitude, or neither."})
+        return attrs
+
+
+class MatchedDonationSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Donation
+        fields = ["id", "name", "quantity", "food_type", "expiry_time", "location", "is_claimed", "donor"]
+
+
+class MatchedRequestSerializer(serializers.ModelSerializer):
+    ngo_username = serializers.ReadOnlyField(source="ngo.username")
+
+    class Meta:
+        model = FoodRequest
+        fields = ["id", "food_type", "quantity", "notes", "location", "needed_from", "needed_until",
+                  "status", "ngo", "ngo_username"]
+
+
+class RequestMatchSerializer(serializers.ModelSerializer):
+    donation = MatchedDonationSerializer(read_only=True)
+    request = MatchedRequestSerializer(read_only=True)
+
+    class Meta:
+        model = RequestMatch
+        fields = ["id", "request", "donation", "distance_km", "created_at"]
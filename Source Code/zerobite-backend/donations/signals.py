@@ -0,0 +1,40 @@
+# donations/signals.py
+import contextvars
+from contextlib import contextmanager
+
+from django.db import connections
+from django.db.models.signals import post_delete, post_migrate
+from django.dispatch import receiver
+
+from .models import Donation, DonationTableState
+from .search import FTS_TABLE, install_sqlite_index
+
+
+# set while deletes_batched() is active: its caller touches the table once
+_batched = contextvars.ContextVar("donation_deletes_batched", default=False)
+
+
+@contextmanager
+def deletes_batched():
+    """Skip the per-row touch_deleted() of donations deleted inside; the caller does it once."""
+    token = _batched.set(True)
+    try:
+        yield
+    finally:
+        _batched.reset(token)
+
+
+@receiver(post_delete, sender=Donation)
+def record_donation_deleted(sender, instance, **kwargs):
+    if not _batched.get():
+        DonationTableState.touch_deleted()
+
+
+@receiver(post_migrate)
+def restore_search_triggers(sender, using, **kwargs):
+    # SQLite loses triggers whenever a migration rebuilds donations_donation
+    if sender.name != "donations":
+        return
+    connection = connections[using]
+    if FTS_TABLE in connection.introspection.table_names():
+        install_sqlite_index(connection)
@@ -1,3 +1,2437 @@
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.http import QueryDict
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from .models import Donation, DonationImage, FoodRequest, Order
+from .response_cache import get_cache
+
+User = get_user_model()
+
+
+class QueryBudgetTests(TestCase):
+    """
+    Every list/detail endpoint must run a fixed number of queries,
+    independent of how many rows it returns.
+    """
+
+    def setUp(self):
+        self.client = APIClient()
+        self.admin = User.objects.create(username="admin", email="admin@example.com", is_staff=True)
+        self.ngo = User.objects.create(username="ngo", email="ngo@example.com", role="ngo")
+        self.donation_count = 0
+
+    def add_rows(self, count):
+        for _ in range(count):
+            self.donation_count += 1
+            donor = User.objects.create(
+                username=f"donor{self.donation_count}", email=f"donor{self.donation_count}@example.com",
+                role="restaurant",
+            )
+            donation = Donation.objects.create(donor=donor, name=f"Meal {self.donation_count}")
+            DonationImage.objects.create(donation=donation, image="donation_images/a.jpg")
+            DonationImage.objects.create(donation=donation, image="donation_images/b.jpg")
+            Order.objects.create(donation=donation, user=self.ngo, confirmation_note="pickup")
+
+    def count_queries(self, url, user=None):
+        # measure the uncached path
+        get_cache().clear()
+        self.client.force_authenticate(user)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, response.content)
+        return len(ctx.captured_queries)
+
+    def assertQueryBudget(self, url, budget, user=None):
+        self.add_rows(2)
+        small = self.count_queries(url, user)
+        self.add_rows(8)
+        large = self.count_queries(url, user)
+        self.assertEqual(small, large, f"{url} query count grows with row count ({small} -> {large})")
+        self.assertLessEqual(large, budget, f"{url} ran {large} queries, budget is {budget}")
+
+    # list/detail budgets include the ETag change-token lookups (donations/conditional.py)
+
+    def test_donation_list(self):
+        self.assertQueryBudget("/api/donations/?include_claimed=true", 5)
+
+    def test_donation_nearby(self):
+        Donation.objects.update(latitude=12.97, longitude=77.59)
+        self.add_rows(2)
+        Donation.objects.update(latitude=12.97, longitude=77.59)
+        small = self.count_queries("/api/donations/?lat=12.97&lng=77.59&include_claimed=true")
+        self.add_rows(8)
+        Donation.objects.update(latitude=12.97, longitude=77.59)
+        large = self.count_queries("/api/donations/?lat=12.97&lng=77.59&include_claimed=true")
+        self.assertEqual(small, large)
+        self.assertLessEqual(large, 5)
+
+    def test_donation_detail(self):
+        self.add_rows(1)
+        donation = Donation.objects.first()
+        self.assertLessEqual(self.count_queries(f"/api/donations/{donation.pk}/"), 3)
+
+    def test_user_stats(self):
+        self.add_rows(1)
+        donor = Donation.objects.first().donor
+        Donation.objects.update(donor=donor)
+        small = self.count_queries("/api/donations/user_stats/", donor)
+        self.add_rows(8)
+        Donation.objects.update(donor=donor)
+        large = self.count_queries("/api/donations/user_stats/", donor)
+        self.assertEqual(small, large)
+        # one aggregate each over the donation table and its archive
+        self.assertLessEqual(large, 2)
+
+    def test_user_posts(self):
+        self.add_rows(1)
+        donor = Donation.objects.first().donor
+        Donation.objects.update(donor=donor)
+        small = self.count_queries("/api/donations/user_stats/posts/", donor)
+        self.add_rows(8)
+        Donation.objects.update(donor=donor)
+        large = self.count_queries("/api/donations/user_stats/posts/", donor)
+        self.assertEqual(small, large)
+        # a page from the donation table and one from its archive, then the images of both
+        self.assertLessEqual(large, 3)
+
+    def test_order_list(self):
+        self.assertQueryBudget("/api/orders/", 3, self.ngo)
+
+    def test_admin_donation_list(self):
+        # a page each from the donation table and its archive, with their images
+        self.assertQueryBudget("/api/admin/donations/", 4, self.admin)
+
+    def test_admin_user_list(self):
+        self.assertQueryBudget("/api/admin/users/", 1, self.admin)
+
+
+class AdminListTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.admin = User.objects.create(username="admin", email="admin@example.com", is_staff=True)
+        self.client.force_authenticate(self.admin)
+        self.donor = User.objects.create(username="pizzeria", email="pizza@example.com", role="restaurant")
+        self.ngo = User.objects.create(username="shelter", email="shelter@example.com", role="ngo")
+        for name in ("Pasta", "Pizza", "Bread"):
+            Donation.objects.create(donor=self.donor, name=name)
+        Order.objects.create(donation=Donation.objects.get(name="Pasta"), user=self.ngo)
+        Donation.objects.filter(name="Pasta").update(is_claimed=True)
+
+    def get_results(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.data["results"]
+
+    def test_user_counts_and_search(self):
+        rows = {row["username"]: row for row in self.get_results("/api/admin/users/")}
+        self.assertEqual(rows["pizzeria"]["donation_count"], 3)
+        self.assertEqual(rows["shelter"]["order_count"], 1)
+        self.assertEqual(rows["admin"]["donation_count"], 0)
+
+        self.assertEqual([r["username"] for r in self.get_results("/api/admin/users/?q=SHEL")], ["shelter"])
+        self.assertEqual([r["username"] for r in self.get_results("/api/admin/users/?q=pizza@")], ["pizzeria"])
+        self.assertEqual([r["username"] for r in self.get_results("/api/admin/users/?role=ngo")], ["shelter"])
+
+    def test_user_pages(self):
+        first = self.client.get("/api/admin/users/?page_size=2").data
+        second = self.client.get(first["next"]).data
+        names = [r["username"] for r in first["results"] + second["results"]]
+        self.assertEqual(sorted(names), ["admin", "pizzeria", "shelter"])
+
+    def test_donation_filters(self):
+        names = lambda url: sorted(r["name"] for r in self.get_results(url))
+        self.assertEqual(names("/api/admin/donations/?q=pi"), ["Pizza"])
+        self.assertEqual(names("/api/admin/donations/?claimed=true"), ["Pasta"])
+        self.assertEqual(names(f"/api/admin/donations/?donor={self.donor.pk}&claimed=false"), ["Bread", "Pizza"])
+        self.assertEqual(names("/api/admin/donations/?role=ngo"), [])
+        self.assertEqual(self.client.get("/api/admin/donations/?claimed=maybe").status_code, 400)
+
+
+class SearchTests(TestCase):
+    def setUp(self):
+        self.donor = User.objects.create(username="bakery", email="bakery@example.com", role="restaurant")
+
+    def add(self, name, description="", location=""):
+        return Donation.objects.create(donor=self.donor, name=name, description=description, location=location)
+
+    def search(self, query):
+        get_cache().clear()
+        response = APIClient().get("/api/donations/", {"q": query})
+        self.assertEqual(response.status_code, 200, response.content)
+        return [row["name"] for row in response.data["results"]]
+
+    def test_ranks_name_matches_first(self):
+        self.add("Rice and curry", description="leftover bread rolls")
+        self.add("Fresh bread", description="sourdough")
+        self.assertEqual(self.search("bread"), ["Fresh bread", "Rice and curry"])
+        self.assertEqual(self.search("sourd"), ["Fresh bread"])
+        self.assertEqual(self.search("bread sourdough"), ["Fresh bread"])
+        self.assertEqual(self.search("pizza"), [])
+
+    def test_index_follows_edits_and_deletes(self):
+        donation = self.add("Vegetable soup", location="Market Street")
+        self.assertEqual(self.search("market"), ["Vegetable soup"])
+
+        donation.name = "Lentil stew"
+        donation.save()
+        self.assertEqual(self.search("soup"), [])
+        self.assertEqual(self.search("lentil"), ["Lentil stew"])
+
+        Donation.objects.filter(pk=donation.pk).update(description="spicy")
+        self.assertEqual(self.search("spicy"), ["Lentil stew"])
+
+        donation.delete()
+        self.assertEqual(self.search("lentil"), [])
+
+    def test_respects_open_filters(self):
+        self.add("Apple pie")
+        claimed = self.add("Apple crumble")
+        Donation.objects.claim(claimed.pk)
+        self.assertEqual(self.search("apple"), ["Apple pie"])
+
+    def test_reports_the_result_cap(self):
+        for n in range(3):
+            self.add(f"Bread loaf {n}")
+
+        response = APIClient().get("/api/donations/", {"q": "bread"})
+        self.assertEqual((response.data["limit"], response.data["truncated"]), (50, False))
+        self.assertEqual(len(response.data["results"]), 3)
+
+        get_cache().clear()
+        with override_settings(DONATION_SEARCH_LIMIT=2):
+            response = APIClient().get("/api/donations/", {"q": "bread"})
+        self.assertEqual((response.data["limit"], response.data["truncated"]), (2, True))
+        self.assertEqual(len(response.data["results"]), 2)
+        self.assertIsNone(response.data["next"])
+
+
+class MetricsTests(TestCase):
+    def setUp(self):
+        from backend.metrics import registry
+
+        registry.reset()
+
+    def test_records_view_latency_queries_and_size(self):
+        get_cache().clear()
+        client = APIClient()
+        body = client.get("/api/donations/").content
+        client.get("/api/donations/")
+
+        text = client.get("/metrics").content.decode()
+        labels = 'view="donation-list-create",method="GET",status="200"'
+        self.assertIn(f'zerobite_http_request_duration_seconds_count{{{labels}}} 2', text)
+        self.assertIn(f'zerobite_http_request_duration_seconds_bucket{{{labels},le="+Inf"}} 2', text)
+        self.assertIn(f"zerobite_http_response_bytes_total{{{labels}}} {2 * len(body)}", text)
+        self.assertRegex(text, rf"zerobite_http_db_queries_total\{{{labels}\}} [1-9]")
+        self.assertNotIn('view="metrics"', text)
+
+    def test_merges_other_worker_files(self):
+        import json
+        import tempfile
+
+        from backend.metrics import LATENCY_BUCKETS
+
+        with tempfile.TemporaryDirectory() as directory, self.settings(METRICS_DIR=directory):
+            other = [[["donation-list-create", "GET", "200"], [3, [3] + [0] * (len(LATENCY_BUCKETS) - 1), 0.01, 6, 0.002, 300]]]
+            with open(f"{directory}/999999.json", "w") as fh:
+                json.dump(other, fh)
+            get_cache().clear()
+            APIClient().get("/api/donations/")
+            text = APIClient().get("/metrics").content.decode()
+        self.assertIn('zerobite_http_request_duration_seconds_count{view="donation-list-create",method="GET",status="200"} 4', text)
+
+    def test_reused_pid_keeps_the_dead_workers_file(self):
+        import json
+        import os
+        import tempfile
+
+        from backend.metrics import LATENCY_BUCKETS, registry
+
+        with tempfile.TemporaryDirectory() as directory, self.settings(METRICS_DIR=directory):
+            # an exited worker that had this process's pid
+            dead = f"{directory}/{os.getpid()}-0badf00d.json"
+            other = [[["donation-list-create", "GET", "200"], [3, [3] + [0] * (len(LATENCY_BUCKETS) - 1), 0.01, 6, 0.002, 300]]]
+            with open(dead, "w") as fh:
+                json.dump(other, fh)
+            get_cache().clear()
+            APIClient().get("/api/donations/")
+            registry.flush()
+            self.assertEqual(sorted(os.listdir(directory)), sorted([os.path.basename(dead), registry.filename()]))
+            with open(dead) as fh:
+                self.assertEqual(json.load(fh), other)
+            text = APIClient().get("/metrics").content.decode()
+        self.assertIn('zerobite_http_request_duration_seconds_count{view="donation-list-create",method="GET",status="200"} 4', text)
+
+    def test_scrape_needs_the_token_or_an_allowed_address(self):
+        client = APIClient()
+        self.assertEqual(client.get("/metrics").status_code, 200)
+        self.assertEqual(client.get("/metrics", REMOTE_ADDR="203.0.113.7").status_code, 403)
+        with self.settings(METRICS_ALLOWED_IPS=["203.0.113.0/24"]):
+            self.assertEqual(client.get("/metrics", REMOTE_ADDR="203.0.113.7").status_code, 200)
+            self.assertEqual(client.get("/metrics").status_code, 403)
+
+        with self.settings(METRICS_TOKEN="s3cret"):
+            self.assertEqual(client.get("/metrics").status_code, 403)
+            self.assertEqual(client.get("/metrics", HTTP_AUTHORIZATION="Bearer wrong").status_code, 403)
+            response = client.get("/metrics", REMOTE_ADDR="203.0.113.7", HTTP_AUTHORIZATION="Bearer s3cret")
+            self.assertEqual(response.status_code, 200)
+
+
+class FoodRequestMatchingTests(TestCase):
+    def setUp(self):
+        self.ngo = User.objects.create(username="shelter", email="shelter@example.com", role="ngo")
+        self.donor = User.objects.create(username="cafe", email="cafe@example.com", role="restaurant")
+        self.ngo_client = APIClient()
+        self.ngo_client.force_authenticate(self.ngo)
+        self.donor_client = APIClient()
+        self.donor_client.force_authenticate(self.donor)
+
+    def post_request(self, **data):
+        body = {"food_type": "bakery", "latitude": "12.971600", "longitude": "77.594600", "radius_km": 5,
+                "date_needed": timezone.localdate().isoformat(), "notes": "evening meal"}
+        body.update(data)
+        response = self.ngo_client.post("/api/requests/", body, format="json")
+        self.assertEqual(response.status_code, 201, response.content)
+        return response.data
+
+    def post_donation(self, name, food_type, lat="12.972000", lng="77.595000", hours=3):
+        response = self.donor_client.post("/api/donations/", {
+            "name": name, "food_type": food_type, "latitude": lat, "longitude": lng,
+            "expiry_time": (timezone.now() + timedelta(hours=hours)).isoformat(),
+        })
+        self.assertEqual(response.status_code, 201, response.content)
+        return response.data
+
+    def matches(self, client, side=None):
+        response = client.get("/api/requests/matches/", {"as": side} if side else {})
+        self.assertEqual(response.status_code, 200, response.content)
+        return [(m["request"]["id"], m["donation"]["name"]) for m in response.data["results"]]
+
+    def test_new_donation_matches_open_requests(self):
+        request = self.post_request()
+        self.post_request(food_type="any", latitude="13.500000", longitude="77.594600")  # ~60 km away
+        self.post_donation("Bread rolls", "bakery")
+        self.post_donation("Curry", "cooked")
+        self.post_donation("Far bread", "bakery", lat="12.971600", lng="77.700000")  # ~11 km, outside 5 km
+
+        self.assertEqual(self.matches(self.ngo_client), [(request["id"], "Bread rolls")])
+        self.assertEqual(self.matches(self.donor_client), [(request["id"], "Bread rolls")])
+
+    def test_new_request_matches_open_donations(self):
+        self.post_donation("Croissants", "bakery")
+        self.post_donation("Rice", "cooked")
+        claimed = self.post_donation("Cake", "bakery")
+        Donation.objects.claim(claimed["id"])
+
+        bakery = self.post_request()
+        anything = self.post_request(food_type="any")
+        self.assertEqual(sorted(self.matches(self.ngo_client)), [
+            (bakery["id"], "Croissants"), (anything["id"], "Croissants"), (anything["id"], "Rice"),
+        ])
+
+    def test_time_window_must_overlap(self):
+        tomorrow = timezone.localdate() + timedelta(days=1)
+        self.post_request(date_needed=tomorrow.isoformat())
+        self.post_donation("Bagels", "bakery", hours=2)
+        self.assertEqual(self.matches(self.ngo_client), [])
+
+    def test_only_ngos_post_and_owners_edit(self):
+        response = self.donor_client.post("/api/requests/", {"date_needed": "2030-01-01"}, format="json")
+        self.assertEqual(response.status_code, 403)
+
+        request = self.post_request()
+        response = self.donor_client.patch(f"/api/requests/{request['id']}/", {"status": "cancelled"}, format="json")
+        self.assertEqual(response.status_code, 403)
+        response = self.ngo_client.patch(f"/api/requests/{request['id']}/", {"status": "cancelled"}, format="json")
+        self.assertEqual(response.status_code, 200, response.content)
+
+        self.post_donation("Muffins", "bakery")
+        self.assertEqual(self.matches(self.ngo_client), [])
+        self.assertEqual(self.ngo_client.get("/api/requests/").data["results"], [])
+
+    def test_nearby_list(self):
+        near = self.post_request()
+        self.post_request(latitude="13.500000")
+        rows = self.donor_client.get("/api/requests/", {"lat": "12.972", "lng": "77.595", "radius_km": 10}).data
+        self.assertEqual([r["id"] for r in rows], [near["id"]])
+        self.assertLess(rows[0]["distance_km"], 1)
+
+    def test_candidate_lookup_uses_grid_index(self):
+        from .matching import candidate_requests
+
+        plan = candidate_requests(12.97, 77.59, "bakery").explain()
+        self.assertIn("geo_cell=?", plan)
+        self.assertNotIn("SCAN", plan)
+
+
+class RoutePlannerTests(TestCase):
+    def km_east(self, km):
+        # points along the equator, `km` east of the origin
+        return 0.0, km / 111.195
+
+    def stop(self, key, km, deadline_minutes=None):
+        from .routing import Stop
+
+        lat, lng = self.km_east(km)
+        deadline = self.now + timedelta(minutes=deadline_minutes) if deadline_minutes else None
+        return Stop(key, lat, lng, deadline)
+
+    def setUp(self):
+        self.now = timezone.now()
+
+    def plan(self, stops, **kwargs):
+        from .routing import plan_route
+
+        return plan_route(stops, start=self.km_east(0), now=self.now, **kwargs)
+
+    def test_shortest_order_without_deadlines(self):
+        route = self.plan([self.stop("c", 3), self.stop("a", 1), self.stop("b", 2), self.stop("d", -1)])
+        self.assertEqual([s["key"] for s in route["stops"]], ["d", "a", "b", "c"])
+        self.assertAlmostEqual(route["distance_km"], 5, places=1)
+        self.assertEqual(route["late_stops"], 0)
+
+    def test_deadline_beats_distance(self):
+        # at 20 km/h the far stop is only reachable in time if visited first
+        stops = [self.stop("near", 1), self.stop("far", -10, deadline_minutes=35)]
+        route = self.plan(stops)
+        self.assertEqual([s["key"] for s in route["stops"]], ["far", "near"])
+        self.assertFalse(route["stops"][0]["late"])
+
+    def test_reports_unavoidable_lateness(self):
+        route = self.plan([self.stop("gone", 50, deadline_minutes=10)])
+        self.assertEqual(route["late_stops"], 1)
+
+    def test_numpy_and_python_paths_agree(self):
+        import random
+
+        from . import routing
+
+        if routing.np is None:
+            self.skipTest("numpy not installed")
+        rng = random.Random(3)
+        stops = [self.stop(i, rng.uniform(-8, 8), rng.uniform(60, 400)) for i in range(12)]
+        with_numpy = self.plan(stops, budget=5)
+        numpy, routing.np = routing.np, None
+        try:
+            without = self.plan(stops, budget=5)
+        finally:
+            routing.np = numpy
+        self.assertEqual([s["key"] for s in with_numpy["stops"]], [s["key"] for s in without["stops"]])
+
+    def test_endpoint_orders_pending_pickups(self):
+        volunteer = User.objects.create(username="rider", email="rider@example.com", role="volunteer")
+        donor = User.objects.create(username="deli", email="deli@example.com", role="restaurant")
+        orders = {}
+        for name, km in (("far", 3), ("near", 1), ("mid", 2)):
+            lat, lng = self.km_east(km)
+            donation = Donation.objects.create(donor=donor, name=name, latitude=round(lat, 6), longitude=round(lng, 6),
+                                               expiry_time=self.now + timedelta(hours=5), is_claimed=True)
+            orders[name] = Order.objects.create(donation=donation, user=volunteer, confirmation_note="on my way")
+        gone = Donation.objects.create(donor=donor, name="gone", expiry_time=self.now - timedelta(minutes=1))
+        Order.objects.create(donation=gone, user=volunteer)
+
+        client = APIClient()
+        client.force_authenticate(volunteer)
+        response = client.get("/api/orders/route/", {"lat": "0", "lng": "0"})
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual([s["name"] for s in response.data["stops"]], ["near", "mid", "far"])
+        self.assertEqual(response.data["stops"][0]["order"], orders["near"].pk)
+        self.assertEqual(client.get("/api/orders/route/", {"lat": "x", "lng": "0"}).status_code, 400)
+
+
+class SparseFieldsetTests(TestCase):
+    def setUp(self):
+        self.donor = User.objects.create(username="cafe", email="cafe@example.com", role="restaurant")
+        self.ngo = User.objects.create(username="shelter", email="shelter@example.com", role="ngo")
+        self.now = timezone.now()
+        soup = Donation.objects.create(donor=self.donor, name="Soup", latitude=12.5, longitude=77.25,
+                                       expiry_time=self.now + timedelta(hours=2))
+        DonationImage.objects.create(donation=soup, image="donation_images/a.jpg",
+                                     card="donation_images/variants/a_card.webp")
+        DonationImage.objects.create(donation=soup, image="donation_images/b.jpg")
+        bread = Donation.objects.create(donor=self.donor, name="Bread")
+        Order.objects.create(donation=soup, user=self.ngo, confirmation_note="pickup", latitude=12.5)
+        Order.objects.create(donation=bread, user=self.ngo, confirmation_note="later")
+
+    def compare(self, rows_class, serializer_class, queryset, query):
+        from unittest import mock
+
+        from rest_framework.request import Request
+        from rest_framework.test import APIRequestFactory
+
+        from .fieldsets import requested
+
+        request = Request(APIRequestFactory().get(f"/api/?{query}"))
+        with mock.patch("django.utils.timezone.now", return_value=self.now):
+            builder = rows_class(request, *requested(request))
+            rows = builder.build(builder.values(queryset))
+            serialized = serializer_class(queryset, many=True, context={"request": request}).data
+        self.assertEqual(rows, [dict(row) for row in serialized], query)
+
+    def test_rows_match_serializers(self):
+        from .rows import DonationRows, OrderRows
+        from .serializers import DonationSerializer, OrderSerializer
+
+        donations = Donation.objects.with_related().order_by("pk")
+        for query in ("", "fields=id,name,latitude,longitude,expiry_time", "expand=donor",
+                      "fields=donor,thumbnail,images.image_url,images.variants&expand=donor"):
+            self.compare(DonationRows, DonationSerializer, donations, query)
+        orders = Order.objects.with_related().order_by("pk")
+        for query in ("", "fields=id,donation_details.name,donation_details.thumbnail",
+                      "expand=user,donation_details.donor"):
+            self.compare(OrderRows, OrderSerializer, orders, query)
+
+    def test_rows_cover_every_serializer_field(self):
+        from django.core.exceptions import ImproperlyConfigured
+        from rest_framework import serializers
+
+        from . import rows
+
+        for builder_class in (rows.UserRows, rows.ImageRows, rows.DonationRows, rows.OrderRows,
+                              rows.DonationHistoryRows, rows.OrderHistoryRows):
+            # raises ImproperlyConfigured for a field with no getter
+            builder = builder_class(None)
+            fields = builder_class.serializer_class().fields
+            self.assertEqual([name for name, get in builder.getters], list(fields), builder_class.__name__)
+
+        class Extended(rows.DonationSerializer):
+            extra = serializers.CharField(default="")
+
+            class Meta(rows.DonationSerializer.Meta):
+                fields = rows.DonationSerializer.Meta.fields + ["extra"]
+
+        with self.assertRaises(ImproperlyConfigured):
+            type("ExtendedRows", (rows.DonationRows,), {"serializer_class": Extended})(None)
+
+    def test_list_fields_and_expand(self):
+        get_cache().clear()
+        client = APIClient()
+        rows = client.get("/api/donations/", {"fields": "id,name,expiry_time", "expand": "donor"}).data["results"]
+        self.assertEqual([list(row) for row in rows], [["id", "name", "expiry_time"]] * 2)
+
+        rows = client.get("/api/donations/", {"fields": "name,donor.username", "expand": "donor"}).data["results"]
+        self.assertEqual(rows[0], {"name": "Bread", "donor": {"username": "cafe"}})
+
+        # the serializer path (nearby search) takes the same parameters
+        response = client.get("/api/donations/", {"lat": "12.5", "lng": "77.25", "fields": "name,distance_km"})
+        self.assertEqual(response.data["results"], [{"name": "Soup", "distance_km": 0.0}])
+
+        for params in ({"fields": "id,nope"}, {"expand": "images"}, {"fields": "name.x"}):
+            self.assertEqual(client.get("/api/donations/", params).status_code, 400, params)
+            self.assertEqual(client.get("/api/donations/", {"lat": "12.5", "lng": "77.25", **params}).status_code, 400)
+
+    def test_order_list_narrows_nested_donation(self):
+        client = APIClient()
+        client.force_authenticate(self.ngo)
+        response = client.get("/api/orders/", {"fields": "id,donation_details.name", "expand": "user"})
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual([row["donation_details"] for row in response.data], [{"name": "Bread"}, {"name": "Soup"}])
+
+        response = client.get("/api/orders/", {"fields": "user", "expand": "user"})
+        self.assertEqual(response.data[0]["user"], {"id": self.ngo.pk, "username": "shelter", "avatar": "avatar1.png",
+                                                    "role": "ngo"})
+
+    def test_detail_cache_is_per_fieldset(self):
+        get_cache().clear()
+        client = APIClient()
+        pk = Donation.objects.get(name="Bread").pk
+        self.assertEqual(client.get(f"/api/donations/{pk}/", {"fields": "id"}).data, {"id": pk})
+        response = client.get(f"/api/donations/{pk}/")
+        self.assertEqual(response["X-Cache"], "MISS")
+        self.assertIn("images", response.data)
+
+    def test_fast_renderer_matches_json_renderer(self):
+        from decimal import Decimal
+
+        from django.utils.translation import gettext_lazy
+        from rest_framework.renderers import JSONRenderer
+
+        from backend import renderers
+
+        if renderers.orjson is None:
+            self.skipTest("orjson not installed")
+        data = {"a": [1, 2.5, None, True], "when": self.now, "price": Decimal("1.50"), "text": "caf\u00e9 \u2028 \u2029",
+                "lazy": gettext_lazy("Hello"), 3: "int key"}
+        self.assertEqual(renderers.FastJSONRenderer().render(data), JSONRenderer().render(data))
+
+
+class WireFormatTests(TestCase):
+    def setUp(self):
+        self.donor = User.objects.create(username="kitchen", email="kitchen@example.com", role="restaurant")
+        for i in range(30):
+            Donation.objects.create(donor=self.donor, name=f"Meal {i}", description="rice and dal " * 5)
+        self.client = APIClient()
+
+    def get(self, url="/api/donations/", **headers):
+        get_cache().clear()
+        return self.client.get(url, **headers)
+
+    def test_compression_follows_accept_encoding(self):
+        import gzip
+
+        from backend import compression
+
+        plain = self.get()
+        self.assertNotIn("Content-Encoding", plain)
+        self.assertGreater(len(plain.content), 1024)
+
+        zipped = self.get(HTTP_ACCEPT_ENCODING="gzip, deflate")
+        self.assertEqual(zipped["Content-Encoding"], "gzip")
+        self.assertIn("Accept-Encoding", zipped["Vary"])
+        self.assertLess(len(zipped.content), len(plain.content) // 3)
+        self.assertEqual(gzip.decompress(zipped.content), plain.content)
+
+        self.assertNotIn("Content-Encoding", self.get(HTTP_ACCEPT_ENCODING="gzip;q=0, identity"))
+        # below COMPRESSION_MIN_BYTES
+        self.assertNotIn("Content-Encoding", self.get("/api/donations/999999/", HTTP_ACCEPT_ENCODING="gzip"))
+
+        if compression.brotli is None:
+            self.assertEqual(self.get(HTTP_ACCEPT_ENCODING="br, gzip;q=0.5")["Content-Encoding"], "gzip")
+        else:
+            response = self.get(HTTP_ACCEPT_ENCODING="br, gzip;q=0.5")
+            self.assertEqual(response["Content-Encoding"], "br")
+            self.assertEqual(compression.brotli.decompress(response.content), plain.content)
+            self.assertEqual(self.get(HTTP_ACCEPT_ENCODING="br;q=0.5, gzip")["Content-Encoding"], "gzip")
+
+    def test_streamed_export_is_compressed(self):
+        import gzip
+
+        admin = User.objects.create(username="boss", email="boss@example.com", is_staff=True)
+        self.client.force_authenticate(admin)
+        plain = b"".join(self.client.get("/api/admin/export/donations.csv").streaming_content)
+        response = self.client.get("/api/admin/export/donations.csv", HTTP_ACCEPT_ENCODING="gzip")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertEqual(gzip.decompress(b"".join(response.streaming_content)), plain)
+
+    def test_columnar_and_msgpack_carry_the_same_rows(self):
+        from backend import renderers
+
+        rows = self.get().json()["results"]
+        response = self.get(HTTP_ACCEPT="application/vnd.zerobite.columnar+json")
+        self.assertEqual(response["Content-Type"], "application/vnd.zerobite.columnar+json")
+        page = response.json()
+        self.assertIn("next", page)
+        columns = page["results"]["columns"]
+        self.assertEqual([dict(zip(columns, values)) for values in page["results"]["rows"]], rows)
+        # single objects are not reshaped
+        detail = self.get(f"/api/donations/{rows[0]['id']}/", HTTP_ACCEPT="application/vnd.zerobite.columnar+json")
+        self.assertEqual(detail.json()["id"], rows[0]["id"])
+
+        response = self.get(HTTP_ACCEPT="application/msgpack")
+        if renderers.msgpack is None:
+            self.assertEqual(response.status_code, 406)
+            return
+        self.assertEqual(response["Content-Type"], "application/msgpack")
+        self.assertEqual(renderers.msgpack.unpackb(response.content)["results"], rows)
+
+    def test_etag_differs_per_format(self):
+        json_etag = self.get()["ETag"]
+        columnar = self.get(HTTP_ACCEPT="application/vnd.zerobite.columnar+json")
+        self.assertNotEqual(columnar["ETag"], json_etag)
+        self.assertIn("Accept", columnar["Vary"])
+        self.assertEqual(self.get(HTTP_IF_NONE_MATCH=json_etag).status_code, 304)
+        self.assertEqual(self.get(HTTP_ACCEPT="application/vnd.zerobite.columnar+json",
+                                  HTTP_IF_NONE_MATCH=json_etag).status_code, 200)
+
+
+def _add_replica_database(alias):
+    """
+    Register a second SQLite file as a database the test runner sets up
+    (and migrates) next to the test database, to stand in for a replica.
+    """
+    import os
+    import tempfile
+
+    from django.db import connections
+
+    if alias not in connections.settings:
+        name = os.path.join(tempfile.gettempdir(), f"zerobite_{alias}.sqlite3")
+        configured = connections.configure_settings({
+            "default": connections.settings["default"],
+            alias: {"ENGINE": "django.db.backends.sqlite3", "NAME": name, "TEST": {"NAME": name}},
+        })
+        connections.settings[alias] = configured[alias]
+    return alias
+
+
+@override_settings(REPLICA_HEALTH_INTERVAL=0)
+class ReplicaRoutingTests(TestCase):
+    replica = _add_replica_database("replica_test")
+    databases = {"default", replica}
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.enterClassContext(override_settings(DATABASE_REPLICAS=[cls.replica]))
+
+    def setUp(self):
+        from backend.database import health
+
+        health.reset()
+        get_cache().clear()
+        self.donor = User.objects.create(username="bakery", email="bakery@example.com", role="restaurant")
+        self.ngo = User.objects.create(username="pantry", email="pantry@example.com", role="ngo")
+        self.admin = User.objects.create(username="boss", email="boss@example.com", is_staff=True)
+        self.soup = Donation.objects.create(donor=self.donor, name="Soup on primary")
+        # the replica has the same users but "lags": its donation differs
+        for user in (self.donor, self.ngo, self.admin):
+            User.objects.using(self.replica).create(
+                pk=user.pk, username=user.username, email=user.email, role=user.role, is_staff=user.is_staff,
+            )
+        Donation.objects.using(self.replica).create(pk=self.soup.pk, donor_id=self.donor.pk, name="Soup on replica")
+
+    def client_for(self, user=None):
+        from rest_framework_simplejwt.tokens import AccessToken
+
+        client = APIClient()
+        if user is not None:
+            client.credentials(HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(user)}")
+        return client
+
+    def names(self, client, url="/api/donations/"):
+        response = client.get(url)
+        self.assertEqual(response.status_code, 200, response.content)
+        data = response.json()
+        return [row["name"] for row in data.get("results", [data])]
+
+    def test_settings_from_environment(self):
+        from django.core.exceptions import ImproperlyConfigured
+
+        from backend.database import databases_from_env
+
+        databases, replicas = databases_from_env({
+            "DB_ENGINE": "django.db.backends.sqlite3", "DB_NAME": "/data/primary.sqlite3",
+            "DB_REPLICAS": "/data/replica.sqlite3",
+        })
+        self.assertEqual(replicas, ["replica1"])
+        self.assertEqual(databases["default"]["NAME"], "/data/primary.sqlite3")
+        self.assertEqual(databases["replica1"]["NAME"], "/data/replica.sqlite3")
+        self.assertEqual(databases["replica1"]["TEST"], {"MIRROR": "default"})
+        self.assertEqual(databases["default"]["CONN_MAX_AGE"], 60)
+        self.assertTrue(databases["default"]["CONN_HEALTH_CHECKS"])
+
+        databases, replicas = databases_from_env({"DB_HOST": "db", "DB_REPLICAS": "db-r1:3307, db-r2",
+                                                  "DB_CONN_MAX_AGE": "none"})
+        self.assertEqual([(databases[a]["HOST"], databases[a]["PORT"]) for a in replicas],
+                         [("db-r1", "3307"), ("db-r2", "3306")])
+        self.assertIsNone(databases["replica2"]["CONN_MAX_AGE"])
+        with self.assertRaises(ImproperlyConfigured):
+            databases_from_env({"DB_POOL": "1"})
+        pooled, _ = databases_from_env({"DB_ENGINE": "django.db.backends.postgresql", "DB_POOL": "1"})
+        self.assertEqual((pooled["default"]["OPTIONS"], pooled["default"]["CONN_MAX_AGE"]), ({"pool": True}, 0))
+
+    def test_safe_views_read_from_replica(self):
+        import json
+
+        anonymous = self.client_for()
+        self.assertEqual(self.names(anonymous), ["Soup on replica"])
+        self.assertEqual(self.names(anonymous, f"/api/donations/{self.soup.pk}/"), ["Soup on replica"])
+        # not in REPLICA_READ_VIEWS
+        stats = self.client_for(self.donor).get("/api/donations/user_stats/posts/").json()
+        self.assertEqual([row["name"] for row in stats["results"]], ["Soup on primary"])
+
+        # exports read as they stream, after the view has returned
+        response = self.client_for(self.admin).get("/api/admin/export/donations.ndjson")
+        rows = [json.loads(line) for line in b"".join(response.streaming_content).splitlines()]
+        self.assertEqual([row["name"] for row in rows], ["Soup on replica"])
+
+        async def export():
+            from django.test import AsyncClient
+            from rest_framework_simplejwt.tokens import AccessToken
+
+            token = f"Bearer {AccessToken.for_user(self.admin)}"
+            response = await AsyncClient().get("/api/admin/export/donations.ndjson", headers={"authorization": token})
+            return b"".join([chunk async for chunk in response.streaming_content])
+
+        from asgiref.sync import async_to_sync
+
+        rows = [json.loads(line) for line in async_to_sync(export)().splitlines()]
+        self.assertEqual([row["name"] for row in rows], ["Soup on replica"])
+
+    def test_reads_follow_own_writes(self):
+        ngo, donor = self.client_for(self.ngo), self.client_for(self.donor)
+        self.assertEqual(self.names(ngo), ["Soup on replica"])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(ngo.patch(f"/api/donations/{self.soup.pk}/claim/").status_code, 200)
+
+        # the claim is on the primary only; the claimer reads it from there
+        self.assertEqual(self.names(ngo, "/api/donations/?include_claimed=true"), ["Soup on primary"])
+        self.assertEqual(self.names(donor), ["Soup on replica"])
+        get_cache().clear()  # the window has passed
+        self.assertEqual(self.names(ngo), ["Soup on replica"])
+
+    def test_async_pin_check_does_not_block_the_event_loop(self):
+        import asyncio
+        from unittest import mock
+
+        from asgiref.sync import async_to_sync
+        from django.core.cache.backends.locmem import LocMemCache
+        from django.test import AsyncClient
+        from rest_framework_simplejwt.tokens import AccessToken
+
+        from backend.database import PIN_PREFIX, pin_primary
+
+        on_the_loop = []
+        original = LocMemCache.get
+
+        def spy(cache, key, *args, **kwargs):
+            try:
+                asyncio.get_running_loop()
+                on_the_loop.append(key)
+            except RuntimeError:
+                pass
+            return original(cache, key, *args, **kwargs)
+
+        async def names(user):
+            token = f"Bearer {AccessToken.for_user(user)}"
+            response = await AsyncClient().get("/api/donations/", headers={"authorization": token})
+            return [row["name"] for row in response.json()["results"]]
+
+        pin_primary(self.ngo.pk)
+        with mock.patch.object(LocMemCache, "get", spy):
+            self.assertEqual(async_to_sync(names)(self.ngo), ["Soup on primary"])
+            get_cache().clear()
+            self.assertEqual(async_to_sync(names)(self.donor), ["Soup on replica"])
+        self.assertEqual([key for key in on_the_loop if PIN_PREFIX in key], [])
+
+    def test_rebuilds_from_a_lagging_replica_are_cached_briefly(self):
+        from unittest import mock
+
+        from django.core.cache.backends.locmem import LocMemCache
+
+        from .response_cache import invalidate_donation
+
+        timeouts = {}
+        original = LocMemCache.set
+
+        def spy(cache, key, value, timeout=None, **kwargs):
+            timeouts[key] = timeout
+            return original(cache, key, value, timeout, **kwargs)
+
+        anonymous = self.client_for()
+        with mock.patch.object(LocMemCache, "set", spy):
+            self.names(anonymous)
+            invalidate_donation(self.soup.pk)
+            # another user's change pins nobody: anonymous reads stay on the replica
+            self.assertEqual(self.names(anonymous), ["Soup on replica"])
+        rebuilt = [timeout for key, timeout in timeouts.items() if ":list:" in key]
+        self.assertEqual(len(rebuilt), 2)
+        self.assertEqual(rebuilt[0], 60)
+        self.assertLessEqual(rebuilt[1], 5)  # REPLICA_MAX_LAG_SECONDS
+
+    def test_lagging_replica_leaves_rotation(self):
+        from unittest import mock
+
+        from django.db import OperationalError
+
+        from backend.database import health
+
+        donor = self.client_for(self.donor)
+        with mock.patch("backend.database.replica_lag", return_value=30.0):
+            self.assertEqual(self.names(donor), ["Soup on primary"])
+        self.assertEqual(health.snapshot()[self.replica][:2], (30.0, False))
+        metrics = self.client.get("/metrics").content.decode()
+        self.assertIn(f'zerobite_db_replica_healthy{{alias="{self.replica}"}} 0', metrics)
+
+        with mock.patch("backend.database.replica_lag", side_effect=OperationalError("gone")), \
+                self.assertLogs("backend.database", "WARNING"):
+            self.assertEqual(self.names(donor), ["Soup on primary"])
+        # caught up again
+        with self.assertLogs("backend.database", "WARNING") as logs:
+            self.assertEqual(self.names(donor), ["Soup on replica"])
+        self.assertIn("back in rotation", logs.output[0])
+        self.assertEqual(health.snapshot()[self.replica][:2], (0.0, True))
+
+
+@override_settings(ROOT_URLCONF="backend.urls_async")
+class AsyncReadViewTests(TestCase):
+    """The async read views (served by backend/asgi.py) answer exactly like the DRF views."""
+
+    def setUp(self):
+        from rest_framework_simplejwt.tokens import AccessToken
+
+        get_cache().clear()
+        self.donor = User.objects.create(username="diner", email="diner@example.com", role="restaurant")
+        self.ngo = User.objects.create(username="kitchen", email="kitchen@example.com", role="ngo")
+        self.soup = Donation.objects.create(donor=self.donor, name="Soup", expiry_time=timezone.now() + timedelta(hours=2))
+        DonationImage.objects.create(donation=self.soup, image="donation_images/a.jpg")
+        self.bread = Donation.objects.create(donor=self.donor, name="Bread")
+        for i in range(3):
+            Donation.objects.create(donor=self.donor, name=f"Rice {i}")
+        Order.objects.create(donation=self.bread, user=self.ngo, confirmation_note="pickup")
+        self.tokens = {user: f"Bearer {AccessToken.for_user(user)}" for user in (self.donor, self.ngo)}
+
+    def headers(self, user=None, **headers):
+        if user is not None:
+            headers["authorization"] = self.tokens[user]
+        return headers
+
+    def responses(self, url, method="get", **headers):
+        """(sync, async) responses to the same request, each from a cold cache."""
+        from asgiref.sync import async_to_sync
+        from django.test import AsyncClient, Client
+
+        get_cache().clear()
+        with override_settings(ROOT_URLCONF="backend.urls"):
+            sync = getattr(Client(), method)(url, headers=headers)
+        get_cache().clear()
+        return sync, async_to_sync(getattr(AsyncClient(), method))(url, headers=headers)
+
+    def assertSameResponse(self, url, method="get", **headers):
+        sync, asynchronous = self.responses(url, method, **headers)
+        label = f"{method.upper()} {url}"
+        self.assertEqual(asynchronous.status_code, sync.status_code, label)
+        self.assertEqual(dict(asynchronous.items()), dict(sync.items()), label)
+        self.assertEqual(asynchronous.content, sync.content, label)
+        return asynchronous
+
+    def test_async_views_are_served(self):
+        from django.urls import resolve
+
+        from backend.asgi import ASYNC_URLCONF
+
+        from .async_views import DonationListAsyncView
+
+        self.assertIs(resolve("/api/donations/", ASYNC_URLCONF).func.view_class, DonationListAsyncView)
+
+    def test_responses_match_drf_views(self):
+        pages = self.assertSameResponse("/api/donations/?page_size=2").json()
+        self.assertSameResponse(pages["next"])
+        for url in ("/api/donations/?fields=id,name,thumbnail", "/api/donations/?include_claimed=true&expand=donor",
+                    f"/api/donations/{self.soup.pk}/", f"/api/donations/{self.soup.pk}/?fields=name,images",
+                    "/api/donations/?cursor=junk", "/api/donations/?fields=nope", "/api/donations/999999/"):
+            self.assertSameResponse(url)
+        self.assertSameResponse("/api/donations/", accept="application/vnd.zerobite.columnar+json")
+        self.assertSameResponse("/api/donations/", accept="image/png")
+        self.assertSameResponse("/api/donations/", method="head")
+
+        # authenticated: not cached, and bad or missing tokens fail the same way
+        self.assertSameResponse("/api/donations/", **self.headers(self.ngo))
+        self.assertEqual(self.assertSameResponse("/api/donations/user_stats/", **self.headers(self.donor))
+                         .json()["posted_count"], 5)
+        self.assertEqual(len(self.assertSameResponse("/api/orders/", **self.headers(self.ngo)).json()), 1)
+        self.assertSameResponse("/api/orders/?fields=id,donation_details.name", **self.headers(self.ngo))
+        self.assertSameResponse("/api/orders/")
+        self.assertSameResponse("/api/donations/user_stats/", authorization="Bearer junk")
+
+    def test_conditional_and_cached_reads(self):
+        from asgiref.sync import async_to_sync
+        from django.test import AsyncClient
+
+        client = AsyncClient()
+        url = f"/api/donations/{self.soup.pk}/"
+        first = async_to_sync(client.get)(url)
+        self.assertEqual(first["X-Cache"], "MISS")
+        self.assertEqual(async_to_sync(client.get)(url)["X-Cache"], "HIT")
+        not_modified = async_to_sync(client.get)(url, headers={"if-none-match": first["ETag"]})
+        self.assertEqual(not_modified.status_code, 304)
+
+    def test_other_requests_use_drf_views(self):
+        from asgiref.sync import async_to_sync
+        from django.test import AsyncClient
+
+        client = AsyncClient()
+        response = async_to_sync(client.post)("/api/orders/", {"donation": self.soup.pk, "confirmation_note": "now"},
+                                              content_type="application/json", headers=self.headers(self.ngo))
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertTrue(Order.objects.filter(donation=self.soup, user=self.ngo).exists())
+        # searches and the browsable API, too
+        self.assertSameResponse("/api/donations/?q=rice")
+        self.assertEqual(async_to_sync(client.get)("/api/donations/", headers={"accept": "text/html"}).status_code, 200)
+
+    def test_default_read_runs_the_drf_view(self):
+        import json
+
+        from asgiref.sync import async_to_sync
+        from django.test import AsyncRequestFactory
+
+        from .async_views import AsyncReadView
+        from .views import DonationUserStatsAPIView
+
+        class StatsView(AsyncReadView):
+            drf_view = DonationUserStatsAPIView
+
+        view = StatsView.as_view()
+        factory = AsyncRequestFactory()
+        response = async_to_sync(view)(factory.get("/api/donations/user_stats/", headers=self.headers(self.donor)))
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(json.loads(response.content)["posted_count"], 5)
+        self.assertEqual(async_to_sync(view)(factory.get("/api/donations/user_stats/")).status_code, 401)
+
+    def test_cache_calls_stay_off_the_event_loop(self):
+        import asyncio
+        from unittest import mock
+
+        from asgiref.sync import async_to_sync
+        from django.core.cache.backends.locmem import LocMemCache
+        from django.test import AsyncClient
+
+        blocking = []
+
+        def spy(name):
+            original = getattr(LocMemCache, name)
+
+            def call(cache, *args, **kwargs):
+                try:
+                    asyncio.get_running_loop()
+                    blocking.append(name)
+                except RuntimeError:  # in a thread: the async API's sync_to_async
+                    pass
+                return original(cache, *args, **kwargs)
+            return mock.patch.object(LocMemCache, name, call)
+
+        client = AsyncClient()
+        with spy("get"), spy("set"), spy("add"), spy("incr"), spy("delete"):
+            for _ in range(2):  # a miss, then a hit
+                response = async_to_sync(client.get)(f"/api/donations/{self.soup.pk}/")
+                self.assertEqual(response.status_code, 200)
+                async_to_sync(client.get)("/api/donations/")
+                async_to_sync(client.get)("/api/orders/", headers=self.headers(self.ngo))
+        self.assertEqual(response["X-Cache"], "HIT")
+        self.assertEqual(blocking, [])
+
+
+class ArchiveTests(TestCase):
+    def setUp(self):
+        self.donor = User.objects.create(username="deli", email="deli@example.com", role="restaurant")
+        self.ngo = User.objects.create(username="foodbank", email="foodbank@example.com", role="ngo")
+        self.admin = User.objects.create(username="root", email="root@example.com", is_staff=True)
+        now = timezone.now()
+        old = now - timedelta(days=40)
+
+        def donation(name, age_days, **fields):
+            created = now - timedelta(days=age_days)
+            donation = Donation.objects.create(donor=self.donor, name=name, **fields)
+            Donation.objects.filter(pk=donation.pk).update(created_at=created, updated_at=created)
+            DonationImage.objects.create(donation=donation, image=f"donation_images/{name}.jpg",
+                                         card=f"donation_images/variants/{name}_card.webp")
+            return donation
+
+        self.claimed = donation("claimed", 50, is_claimed=True)
+        Order.objects.create(donation=self.claimed, user=self.ngo, confirmation_note="picked up", latitude=12.5)
+        self.expired = donation("expired", 45, expiry_time=old)
+        self.flagged = donation("flagged", 44, is_expired=True, expiry_time=old)
+        recent = donation("recently-claimed", 41, is_claimed=True)
+        Donation.objects.filter(pk=recent.pk).update(updated_at=now - timedelta(days=1))
+        Order.objects.create(donation=recent, user=self.ngo, confirmation_note="on the way")
+        donation("open", 60)
+        donation("fresh", 1, expiry_time=now + timedelta(hours=3))
+        Order.objects.update(created_at=old)
+        self.archived_ids = {self.claimed.pk, self.expired.pk, self.flagged.pk}
+
+    def client_for(self, user):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client
+
+    def history(self):
+        """What the history and export endpoints return, with the posts paged through two at a time."""
+        donor, ngo, admin = self.client_for(self.donor), self.client_for(self.ngo), self.client_for(self.admin)
+        posts, url = [], "/api/donations/user_stats/posts/?page_size=2&fields=id,name,is_claimed,images,thumbnail"
+        while url:
+            page = donor.get(url).json()
+            posts.append(page["results"])
+            url = page["next"]
+        exports = [b"".join(admin.get(url).streaming_content) for url in (
+            "/api/admin/export/donations.ndjson", "/api/admin/export/orders.csv",
+            "/api/admin/export/donations.csv?claimed=true",
+        )]
+        return {
+            "posts": posts,
+            "stats": donor.get("/api/donations/user_stats/").json(),
+            "orders": ngo.get("/api/orders/").json(),
+            "exports": exports,
+            "users": admin.get("/api/admin/users/").json()["results"],
+            "admin_donations": self.admin_pages(admin, "/api/admin/donations/?page_size=2"),
+            "admin_claimed": self.admin_pages(admin, "/api/admin/donations/?claimed=true&expired=false"),
+        }
+
+    def admin_pages(self, client, url):
+        pages = []
+        while url:
+            page = client.get(url).json()
+            pages.append(page["results"])
+            url = page["next"]
+        return pages
+
+    def test_archive_moves_claimed_and_expired_rows(self):
+        from .archive import ARCHIVES, archive_donations, columns
+        from .models import ArchivedDonation, ArchivedDonationImage, ArchivedOrder
+
+        for model, archive in ARCHIVES:
+            self.assertLessEqual(set(columns(model)), set(columns(archive)), archive.__name__)
+        before = {model: {row["id"]: row for row in model.objects.values(*columns(model))} for model, _ in ARCHIVES}
+
+        self.assertEqual(archive_donations(batch_size=2), 3)
+        self.assertEqual(set(ArchivedDonation.objects.values_list("pk", flat=True)), self.archived_ids)
+        self.assertFalse(Donation.objects.filter(pk__in=self.archived_ids).exists())
+        self.assertFalse(DonationImage.objects.filter(donation_id__in=self.archived_ids).exists())
+        self.assertEqual(Donation.objects.count(), 3)
+        self.assertEqual(list(ArchivedOrder.objects.values_list("donation_id", flat=True)), [self.claimed.pk])
+        for model, archive in ARCHIVES:
+            for row in archive.objects.values(*columns(model)):
+                self.assertEqual(row, before[model][row["id"]], archive.__name__)
+        self.assertEqual(ArchivedDonationImage.objects.count(), 3)
+        # nothing left to do
+        self.assertEqual(archive_donations(), 0)
+
+    def test_batch_touches_the_table_once(self):
+        from unittest import mock
+
+        from django.core.cache.backends.locmem import LocMemCache
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        from .archive import archive_donations
+        from .models import DonationTableState
+
+        writes = []
+        original = LocMemCache.set_many
+
+        def spy(cache, data, *args, **kwargs):
+            writes.append(sorted(data))
+            return original(cache, data, *args, **kwargs)
+
+        DonationTableState.touch_deleted(timezone.now() - timedelta(days=1))
+        with CaptureQueriesContext(connection) as queries, mock.patch.object(LocMemCache, "set_many", spy):
+            self.assertEqual(archive_donations(batch_size=10), 3)
+        touches = [q["sql"] for q in queries if DonationTableState._meta.db_table in q["sql"]]
+        self.assertEqual(len(touches), 1, touches)
+        self.assertGreater(DonationTableState.objects.get(pk=1).last_deleted_at, timezone.now() - timedelta(minutes=1))
+        # the list token and the three detail tokens, in one write
+        self.assertEqual(len(writes), 1)
+        self.assertEqual(len(writes[0]), 4)
+
+    def test_history_reads_the_archive(self):
+        from .archive import archive_donations
+
+        before = self.history()
+        self.assertEqual(before["stats"]["posted_count"], 6)
+        archive_donations(batch_size=2)
+        self.assertEqual(self.history(), before)
+        # the feed and detail only read the hot table
+        feed = APIClient().get("/api/donations/?include_claimed=true&include_expired=true").json()
+        self.assertFalse(self.archived_ids & {row["id"] for row in feed["results"]})
+        self.assertEqual(APIClient().get(f"/api/donations/{self.claimed.pk}/").status_code, 404)
+
+    @override_settings(ROOT_URLCONF="backend.urls_async")
+    def test_async_views_read_the_archive(self):
+        # test_history_reads_the_archive covers the DRF views; these must match them
+        from asgiref.sync import async_to_sync
+        from django.test import AsyncClient
+        from rest_framework_simplejwt.tokens import AccessToken
+
+        from .archive import archive_donations
+
+        archive_donations()
+        for user, url in ((self.ngo, "/api/orders/"), (self.donor, "/api/donations/user_stats/")):
+            with override_settings(ROOT_URLCONF="backend.urls"):
+                expected = self.client_for(user).get(url).json()
+            response = async_to_sync(AsyncClient().get)(
+                url, headers={"authorization": f"Bearer {AccessToken.for_user(user)}"},
+            )
+            self.assertEqual(response.json(), expected, url)
+
+    def test_command(self):
+        from io import StringIO
+
+        from django.core.management import call_command
+
+        out = StringIO()
+        with override_settings(ARCHIVE_AFTER_DAYS=46):
+            call_command("archive_donations", "--batch-size=1", stdout=out)
+        # only the claim 50 days ago is old enough
+        self.assertIn("Archived 1 donation(s)", out.getvalue())
+        self.assertFalse(Donation.objects.filter(pk=self.claimed.pk).exists())
+        call_command("archive_donations", "--max-batches=1", "--batch-size=1", stdout=out)
+        self.assertEqual(Donation.objects.count(), 4)
+
+
+class NearbySearchTests(TestCase):
+    def setUp(self):
+        self.donor = User.objects.create(username="cafe", email="cafe@example.com", role="restaurant")
+        self.client = APIClient()
+
+    def add(self, name, lat, lng):
+        from decimal import Decimal
+
+        return Donation.objects.create(
+            donor=self.donor, name=name,
+            latitude=Decimal(f"{lat:.6f}"), longitude=Decimal(f"{lng:.6f}"),
+        )
+
+    def nearby(self, lat, lng, radius_km):
+        response = self.client.get("/api/donations/", {"lat": lat, "lng": lng, "radius_km": radius_km})
+        self.assertEqual(response.status_code, 200, response.content)
+        return [row["name"] for row in response.data["results"]]
+
+    def offset(self, lat, lng, km, bearing):
+        """The point `km` from (lat, lng) along `bearing` degrees, on haversine_km's sphere."""
+        import math
+
+        from .geo import EARTH_RADIUS_KM
+
+        angle = km / EARTH_RADIUS_KM
+        lat1, lng1, theta = math.radians(lat), math.radians(lng), math.radians(bearing)
+        lat2 = math.asin(math.sin(lat1) * math.cos(angle) + math.cos(lat1) * math.sin(angle) * math.cos(theta))
+        lng2 = lng1 + math.atan2(math.sin(theta) * math.sin(angle) * math.cos(lat1),
+                                 math.cos(angle) - math.sin(lat1) * math.sin(lat2))
+        return math.degrees(lat2), (math.degrees(lng2) + 540) % 360 - 180
+
+    def test_box_encloses_the_circle(self):
+        from .geo import bounding_box, haversine_km
+
+        for lat, lng in ((0, 0), (12.97, 77.59), (-60, 179.9), (84, -179.99), (89.9, 10)):
+            for radius_km in (0.5, 10, 200):
+                min_lat, max_lat, lng_ranges = bounding_box(lat, lng, radius_km)
+                for bearing in range(0, 360, 5):
+                    point_lat, point_lng = self.offset(lat, lng, radius_km, bearing)
+                    self.assertAlmostEqual(haversine_km(lat, lng, point_lat, point_lng), radius_km, places=6)
+                    self.assertTrue(min_lat <= point_lat <= max_lat, (lat, lng, radius_km, bearing))
+                    self.assertTrue(any(lo <= point_lng <= hi for lo, hi in lng_ranges),
+                                    (lat, lng, radius_km, bearing))
+
+    def test_rows_near_the_boundary(self):
+        lat, lng, radius_km = 12.97, 77.59, 10
+        for bearing in (0, 90, 180, 270, 45):
+            self.add(f"inside {bearing}", *self.offset(lat, lng, radius_km - 0.01, bearing))
+            self.add(f"outside {bearing}", *self.offset(lat, lng, radius_km + 0.01, bearing))
+        names = self.nearby(lat, lng, radius_km)
+        self.assertEqual(sorted(names), sorted(f"inside {b}" for b in (0, 90, 180, 270, 45)))
+
+    def test_row_on_the_boundary(self):
+        from .geo import haversine_km
+
+        edge = self.add("edge", 13.0, 77.59)
+        radius_km = haversine_km(12.97, 77.59, edge.latitude, edge.longitude)
+        self.assertEqual(self.nearby(12.97, 77.59, radius_km), ["edge"])
+        self.assertEqual(self.nearby(12.97, 77.59, radius_km - 0.001), [])
+
+    def test_antimeridian(self):
+        self.add("east", 0.5, 179.99)
+        self.add("west", 0.5, -179.99)
+        self.add("far", 0.5, 170.0)
+        self.assertEqual(sorted(self.nearby(0.5, 179.999, 5)), ["east", "west"])
+        self.assertEqual(sorted(self.nearby(0.5, -179.999, 5)), ["east", "west"])
+
+    def test_near_the_poles(self):
+        # across the pole is the short way round
+        self.add("across", 89.95, 180.0)
+        self.add("south", 89.80, 0.0)
+        self.assertEqual(self.nearby(89.95, 0.0, 12), ["across"])
+        self.add("antarctic", -89.95, -90.0)
+        self.assertEqual(self.nearby(-89.95, 90.0, 12), ["antarctic"])
+
+    def test_results_are_capped_nearest_first(self):
+        for km in (3, 1, 2):
+            self.add(f"{km} km", *self.offset(12.97, 77.59, km, 90))
+
+        get_cache().clear()
+        with override_settings(DONATION_NEARBY_LIMIT=2):
+            response = self.client.get("/api/donations/", {"lat": 12.97, "lng": 77.59})
+        self.assertEqual([row["name"] for row in response.data["results"]], ["1 km", "2 km"])
+        self.assertEqual((response.data["limit"], response.data["truncated"]), (2, True))
+        self.assertIsNone(response.data["next"])
+
+    def test_invalid_parameters(self):
+        for params in (
+            {"lat": 91, "lng": 0}, {"lat": 0, "lng": -181}, {"lat": "north", "lng": 0},
+            {"lat": "nan", "lng": 0}, {"lat": 12.97}, {"lng": 77.59}, {"lat": "", "lng": ""},
+            {"lat": 0, "lng": 0, "radius_km": 0}, {"lat": 0, "lng": 0, "radius_km": -5},
+            {"lat": 0, "lng": 0, "radius_km": 51}, {"lat": 0, "lng": 0, "radius_km": "far"},
+            {"lat": 0, "lng": 0, "radius_km": "nan"}, {"lat": 0, "lng": 0, "radius_km": "inf"},
+        ):
+            response = self.client.get("/api/donations/", params)
+            self.assertEqual(response.status_code, 400, params)
+
+
+class ExpirySweeperTests(TestCase):
+    def setUp(self):
+        self.donor = User.objects.create(username="cafe", email="cafe@example.com", role="restaurant")
+        self.now = timezone.now()
+
+    def add(self, name, minutes):
+        return Donation.objects.create(donor=self.donor, name=name, expiry_time=self.now + timedelta(minutes=minutes))
+
+    def sweeper(self):
+        from .expiry import ExpirySweeper
+
+        sweeper = ExpirySweeper(horizon=timedelta(minutes=15))
+        sweeper.refresh(self.now)
+        return sweeper
+
+    def flagged(self):
+        return set(Donation.objects.filter(is_expired=True).values_list("name", flat=True))
+
+    def test_due_rows_in_expiry_order(self):
+        for name, minutes in (("third", 3), ("first", 1), ("second", 2), ("later", 30)):
+            self.add(name, minutes)
+        sweeper = self.sweeper()
+        self.assertEqual(len(sweeper), 3)  # "later" is past the horizon
+        self.assertEqual(sweeper.seconds_until_next(self.now), 30)  # the next refresh comes first
+
+        self.assertEqual(sweeper.sweep(self.now), 0)
+        self.assertEqual(sweeper.sweep(self.now + timedelta(seconds=90)), 1)
+        self.assertEqual(self.flagged(), {"first"})
+        self.assertEqual(sweeper.sweep(self.now + timedelta(minutes=3)), 2)
+        self.assertEqual(self.flagged(), {"first", "second", "third"})
+        self.assertEqual(len(sweeper), 0)
+
+    def test_update_is_conditional(self):
+        flagged = self.add("flagged", 1)
+        deleted = self.add("deleted", 1)
+        moved = self.add("moved", 1)
+        self.add("due", 1)
+        sweeper = self.sweeper()
+        Donation.objects.filter(pk=flagged.pk).update(is_expired=True)
+        deleted.delete()
+        Donation.objects.filter(pk=moved.pk).update(expiry_time=self.now + timedelta(minutes=5))
+
+        self.assertEqual(sweeper.sweep(self.now + timedelta(minutes=2)), 1)
+        self.assertEqual(self.flagged(), {"flagged", "due"})
+        # re-read when popped and queued again at its new time
+        self.assertEqual(len(sweeper), 1)
+        self.assertEqual(sweeper.sweep(self.now + timedelta(minutes=5)), 1)
+        self.assertIn("moved", self.flagged())
+
+    def test_expiry_moved_earlier(self):
+        donation = self.add("soon", 10)
+        sweeper = self.sweeper()
+        Donation.objects.filter(pk=donation.pk).update(expiry_time=self.now + timedelta(minutes=1))
+        sweeper.refresh(self.now + timedelta(seconds=30))
+        self.assertEqual(len(sweeper), 1)
+        self.assertEqual(sweeper.sweep(self.now + timedelta(minutes=2)), 1)
+        # the entry for the old time is skipped
+        self.assertEqual(sweeper.sweep(self.now + timedelta(minutes=11)), 0)
+
+    def test_events(self):
+        import json
+
+        from .events import channel
+        from .models import DonationEvent
+        from .response_cache import list_key
+
+        donation = self.add("soup", 1)
+        self.add("bread", 10)
+        sweeper = self.sweeper()
+        messages = []
+        channel.subscribe(messages.append)
+        self.addCleanup(channel._listeners.remove, messages.append)
+        list_before = list_key(QueryDict())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            sweeper.sweep(self.now + timedelta(minutes=2))
+
+        self.assertEqual([json.loads(m)["type"] for m in messages], ["expired"])
+        self.assertEqual(json.loads(messages[0])["donation"]["id"], donation.pk)
+        # logged for other processes, and the response cache moved on
+        self.assertEqual(DonationEvent.objects.get().message, messages[0])
+        self.assertNotEqual(list_key(QueryDict()), list_before)
+
+    def test_follower_replays_other_processes_events(self):
+        import json
+
+        from asgiref.sync import async_to_sync
+
+        from .events import PROCESS_ID, EventLogFollower, LocalChannel
+        from .models import DonationEvent
+
+        channel = LocalChannel()
+        messages = []
+        channel.subscribe(messages.append)
+        follower = EventLogFollower(channel)
+        DonationEvent.objects.create(message=json.dumps({"type": "created", "origin": "before"}))
+        self.assertEqual(async_to_sync(follower.poll)(), 0)
+
+        sweeper_event = json.dumps({"type": "expired", "donation": {"id": 1}, "origin": "sweeper"})
+        DonationEvent.objects.create(message=sweeper_event)
+        DonationEvent.objects.create(message=json.dumps({"type": "claimed", "origin": PROCESS_ID}))
+        self.assertEqual(async_to_sync(follower.poll)(), 1)
+        self.assertEqual(messages, [sweeper_event])
+        self.assertEqual(async_to_sync(follower.poll)(), 0)
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        self.donor = User.objects.create(username="cafe", email="cafe@example.com", role="restaurant")
+        self.client = APIClient()
+        self.now = timezone.now()
+
+    def add(self, name, minutes_ago, **fields):
+        donation = Donation.objects.create(donor=self.donor, name=name, **fields)
+        Donation.objects.filter(pk=donation.pk).update(created_at=self.now - timedelta(minutes=minutes_ago))
+        return donation
+
+    def get(self, url, params=None):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.data
+
+    def walk(self, params):
+        """Every page following next links, then following previous links back."""
+        forward = [self.get("/api/donations/", params)]
+        while forward[-1]["next"]:
+            forward.append(self.get(forward[-1]["next"]))
+        backward = [forward[-1]]
+        while backward[-1]["previous"]:
+            backward.append(self.get(backward[-1]["previous"]))
+        names = lambda pages: [[row["name"] for row in page["results"]] for page in pages]  # noqa: E731
+        return names(forward), names(backward)
+
+    def test_next_and_previous(self):
+        for minutes in range(7):
+            self.add(f"meal {minutes}", minutes)
+        forward, backward = self.walk({"page_size": 3})
+        self.assertEqual(forward, [["meal 0", "meal 1", "meal 2"], ["meal 3", "meal 4", "meal 5"], ["meal 6"]])
+        self.assertEqual(backward, forward[::-1])
+
+    def test_ties_broken_by_id(self):
+        added = [self.add(f"meal {n}", 5) for n in range(5)]
+        self.add("newest", 1)
+        forward, backward = self.walk({"page_size": 2})
+        expected = ["newest"] + [d.name for d in sorted(added, key=lambda d: -d.pk)]
+        self.assertEqual(sum(forward, []), expected)
+        self.assertEqual(backward, forward[::-1])
+
+    def test_filters_carry_over(self):
+        self.add("open", 1)
+        self.add("claimed", 2, is_claimed=True)
+        self.add("expired", 3, expiry_time=self.now - timedelta(minutes=1))
+        self.add("old", 4)
+        self.assertEqual(sum(self.walk({"page_size": 1})[0], []), ["open", "old"])
+        self.assertEqual(sum(self.walk({"page_size": 1, "include_claimed": "true"})[0], []),
+                         ["open", "claimed", "old"])
+        both = {"page_size": 1, "include_claimed": "true", "include_expired": "true"}
+        forward, backward = self.walk(both)
+        self.assertEqual(sum(forward, []), ["open", "claimed", "expired", "old"])
+        self.assertEqual(backward, forward[::-1])
+
+    def test_invalid_cursor(self):
+        import base64
+        import json
+
+        def token(payload):
+            return base64.urlsafe_b64encode(payload.encode()).decode()
+
+        for cursor in (
+            "junk", "!!!", token("not json"), token("[1, 2]"), token("{}"),
+            token(json.dumps({"t": "yesterday", "i": 1, "r": 0})),
+            token(json.dumps({"t": "2026-01-01T00:00:00", "i": 1, "r": 0})),  # no offset
+            token(json.dumps({"t": "2026-01-01T00:00:00+00:00", "i": "one", "r": 0})),
+        ):
+            response = self.client.get("/api/donations/", {"cursor": cursor})
+            self.assertEqual(response.status_code, 400, cursor)
+            self.assertIn("cursor", response.data)
+
+    def test_page_size_setting(self):
+        for minutes in range(3):
+            self.add(f"meal {minutes}", minutes)
+        with override_settings(DONATION_FEED_PAGE_SIZE=2):
+            self.assertEqual(len(self.get("/api/donations/")["results"]), 2)
+        get_cache().clear()  # the cached anonymous response
+        self.assertEqual(len(self.get("/api/donations/")["results"]), 3)
+        self.assertEqual(len(self.get("/api/donations/", {"page_size": 1})["results"]), 1)
+
+
+class DonationEventTests(TestCase):
+    def setUp(self):
+        self.donor = User.objects.create(username="cafe", email="cafe@example.com", role="restaurant")
+        self.ngo = User.objects.create(username="shelter", email="shelter@example.com", role="ngo")
+
+    def event(self, event_type, **donation):
+        donation = {"id": 1, "donor_role": "restaurant", "latitude": 12.97, "longitude": 77.59, **donation}
+        return {"type": event_type, "donation": donation}
+
+    def test_filter(self):
+        from .events import EventFilter
+
+        everything = EventFilter.from_query_string("")
+        self.assertTrue(all(everything.matches(self.event(t)) for t in ("created", "claimed", "expired", "deleted")))
+        self.assertFalse(everything.matches({"type": "renamed", "donation": {}}))
+
+        claims = EventFilter.from_query_string("types=claimed,deleted&role=RESTAURANT")
+        self.assertTrue(claims.matches(self.event("claimed")))
+        self.assertFalse(claims.matches(self.event("created")))
+        self.assertFalse(claims.matches(self.event("claimed", donor_role="ngo")))
+
+        area = EventFilter.from_query_string("lat=12.97&lng=77.59&radius_km=5")
+        self.assertTrue(area.matches(self.event("created", latitude=13.0)))
+        self.assertFalse(area.matches(self.event("created", latitude=13.1)))
+        self.assertFalse(area.matches(self.event("created", latitude=None, longitude=None)))
+
+        for query in ("types=created,renamed", "lat=95&lng=0", "lat=1", "lat=1&lng=1&radius_km=0",
+                      "lat=1&lng=1&radius_km=far"):
+            with self.assertRaises(ValueError, msg=query):
+                EventFilter.from_query_string(query)
+
+    def test_local_channel(self):
+        from .events import LocalChannel
+
+        channel = LocalChannel()
+        heard = []
+
+        def broken(message):
+            raise RuntimeError(message)
+
+        channel.subscribe(broken)
+        channel.subscribe(heard.append)
+        with self.assertLogs("donations.events", "ERROR"):
+            channel.publish("one")
+        self.assertEqual(heard, ["one"])
+
+    def test_broker_fans_out_to_matching_subscribers(self):
+        import asyncio
+        import json
+        import threading
+
+        from .events import EventBroker, EventFilter, LocalChannel
+
+        channel = LocalChannel()
+        broker = EventBroker(channel)
+
+        async def scenario():
+            everything = broker.subscribe(EventFilter())
+            claims = broker.subscribe(EventFilter(types=["claimed"]))
+            gone = broker.subscribe(EventFilter())
+            broker.unsubscribe(gone)
+            self.assertEqual(len(broker), 2)
+            # publishers are view threads, not the loop
+            for event_type in ("created", "claimed"):
+                thread = threading.Thread(target=channel.publish, args=(json.dumps(self.event(event_type)),))
+                thread.start()
+                thread.join()
+            await asyncio.sleep(0.01)
+            drain = lambda s: [s.queue.get_nowait()["type"] for _ in range(s.queue.qsize())]  # noqa: E731
+            return drain(everything), drain(claims), drain(gone)
+
+        self.assertEqual(asyncio.run(scenario()), (["created", "claimed"], ["claimed"], []))
+
+    def test_slow_subscriber_drops_oldest(self):
+        import asyncio
+
+        from .events import EventFilter, Subscription
+
+        async def scenario():
+            subscription = Subscription(EventFilter(), maxsize=2)
+            for n in range(3):
+                subscription.offer({"n": n})
+            return [subscription.queue.get_nowait()["n"] for _ in range(2)]
+
+        self.assertEqual(asyncio.run(scenario()), [1, 2])
+
+    def stream(self, query_string=b"", method="GET"):
+        """Serve event_stream_app on a loop in another thread; (messages sent, stop())."""
+        import asyncio
+        import threading
+
+        from .events import event_stream_app
+
+        sent = []
+        started = threading.Event()
+        loop = asyncio.new_event_loop()
+        disconnect = asyncio.Event()
+
+        async def receive():
+            await disconnect.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            sent.append(message)
+            started.set()
+
+        scope = {"type": "http", "method": method, "path": "/api/events/", "query_string": query_string,
+                 "headers": [(b"origin", b"http://localhost:3000")]}
+        thread = threading.Thread(target=loop.run_until_complete, args=(event_stream_app(scope, receive, send),))
+        thread.start()
+        self.assertTrue(started.wait(5))
+
+        def stop():
+            loop.call_soon_threadsafe(disconnect.set)
+            thread.join(5)
+            loop.close()
+
+        return sent, stop
+
+    def wait_for_chunks(self, sent, count):
+        import time
+
+        deadline = time.monotonic() + 5
+        while time.monotonic() < deadline:
+            chunks = [m["body"].decode() for m in sent[1:] if not m["body"].startswith(b":")]
+            if len(chunks) >= count:
+                return chunks
+            time.sleep(0.01)
+        self.fail(f"expected {count} events, got {sent[1:]}")
+
+    def test_stream(self):
+        import json
+
+        sent, stop = self.stream(b"types=created,claimed,deleted")
+        try:
+            self.assertEqual(sent[0]["status"], 200)
+            headers = dict(sent[0]["headers"])
+            self.assertEqual(headers[b"content-type"], b"text/event-stream")
+            self.assertEqual(headers[b"access-control-allow-origin"], b"http://localhost:3000")
+
+            donor, ngo = APIClient(), APIClient()
+            donor.force_authenticate(self.donor)
+            ngo.force_authenticate(self.ngo)
+            with self.captureOnCommitCallbacks(execute=True):
+                created = donor.post("/api/donations/", {"name": "Soup", "quantity": 4})
+                self.assertEqual(created.status_code, 201, created.content)
+            pk = created.data["id"]
+            with self.captureOnCommitCallbacks(execute=True):
+                self.assertEqual(ngo.patch(f"/api/donations/{pk}/claim/").status_code, 200)
+            with self.captureOnCommitCallbacks(execute=True):
+                self.assertEqual(donor.delete(f"/api/donations/{pk}/").status_code, 204)
+
+            chunks = self.wait_for_chunks(sent, 3)
+        finally:
+            stop()
+        events = [chunk.split("\n") for chunk in chunks]
+        self.assertEqual([lines[0] for lines in events], ["event: created", "event: claimed", "event: deleted"])
+        for lines in events:
+            data = json.loads(lines[1].removeprefix("data: "))
+            self.assertEqual((data["id"], data["name"], data["donor_role"]), (pk, "Soup", "restaurant"))
+
+    def test_stream_filters(self):
+        import json
+
+        from .events import channel
+
+        sent, stop = self.stream(b"types=expired")
+        try:
+            channel.publish(json.dumps(self.event("created")))
+            channel.publish(json.dumps(self.event("expired", id=7)))
+            chunks = self.wait_for_chunks(sent, 1)
+        finally:
+            stop()
+        self.assertEqual(len(chunks), 1)
+        self.assertTrue(chunks[0].startswith("event: expired\n"))
+
+    def test_stream_rejects_bad_requests(self):
+        import asyncio
+
+        from .events import event_stream_app
+
+        async def request(method, query_string):
+            sent = []
+
+            async def send(message):
+                sent.append(message)
+
+            scope = {"type": "http", "method": method, "path": "/api/events/", "query_string": query_string}
+            await event_stream_app(scope, None, send)
+            return sent[0]["status"]
+
+        self.assertEqual(asyncio.run(request("POST", b"")), 405)
+        self.assertEqual(asyncio.run(request("GET", b"types=renamed")), 400)
+        self.assertEqual(asyncio.run(request("GET", b"lat=100&lng=0")), 400)
+
+
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        self.donor = User.objects.create(username="cafe", email="cafe@example.com", role="restaurant")
+        self.ngo = User.objects.create(username="shelter", email="shelter@example.com", role="ngo")
+        self.client = APIClient()
+        self.hour_ago = timezone.now() - timedelta(hours=1)
+        self.donations = [
+            Donation.objects.create(donor=self.donor, name=f"Meal {n}", expiry_time=timezone.now() + timedelta(hours=2))
+            for n in range(3)
+        ]
+        # Last-Modified has one-second resolution: start from an hour ago
+        Donation.objects.update(updated_at=self.hour_ago)
+        self.donation = self.donations[0]
+
+    def validators(self, url):
+        get_cache().clear()
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response["ETag"], response["Last-Modified"]
+
+    def assertChanges(self, change):
+        list_url, detail_url = "/api/donations/?include_expired=true", f"/api/donations/{self.donation.pk}/"
+        before = self.validators(list_url), self.validators(detail_url)
+        change()
+        after_list = self.validators(list_url)
+        self.assertNotEqual(after_list[0], before[0][0])
+        self.assertNotEqual(after_list[1], before[0][1])
+        if Donation.objects.filter(pk=self.donation.pk).exists():
+            after_detail = self.validators(detail_url)
+            self.assertNotEqual(after_detail[0], before[1][0])
+            self.assertNotEqual(after_detail[1], before[1][1])
+
+    def test_claim(self):
+        self.client.force_authenticate(self.ngo)
+        self.assertChanges(lambda: self.assertEqual(
+            self.client.patch(f"/api/donations/{self.donation.pk}/claim/").status_code, 200))
+
+    def test_edit(self):
+        def edit():
+            self.donation.name = "Soup"
+            self.donation.save()
+
+        self.assertChanges(edit)
+
+    def test_expire(self):
+        # passing expiry_time changes the validators before the sweeper flags the row
+        self.assertChanges(lambda: Donation.objects.filter(pk=self.donation.pk).update(
+            expiry_time=timezone.now() - timedelta(minutes=30)))
+
+    def test_delete(self):
+        self.assertChanges(lambda: self.donation.delete())
+
+    def test_not_modified_skips_serialization(self):
+        for url, token_queries in (("/api/donations/", 3), (f"/api/donations/{self.donation.pk}/", 1)):
+            etag, last_modified = self.validators(url)
+            get_cache().clear()
+            for headers in ({"HTTP_IF_NONE_MATCH": etag}, {"HTTP_IF_MODIFIED_SINCE": last_modified}):
+                with CaptureQueriesContext(connection) as ctx:
+                    response = self.client.get(url, **headers)
+                self.assertEqual(response.status_code, 304, url)
+                self.assertEqual(response["ETag"], etag)
+                self.assertEqual(len(ctx.captured_queries), token_queries, [q["sql"] for q in ctx.captured_queries])
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH='W/"other"').status_code, 200)
+
+    def test_views_without_a_token(self):
+        from django.test import RequestFactory
+        from rest_framework.response import Response
+        from rest_framework.views import APIView
+
+        from .conditional import ConditionalGetMixin
+
+        class Base(APIView):
+            def get(self, request):
+                return Response({"ok": True})
+
+        class View(ConditionalGetMixin, Base):
+            pass
+
+        response = View.as_view()(RequestFactory().get("/", HTTP_IF_NONE_MATCH="*"))
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("ETag", response)
+
+
+class ResponseCacheTests(TestCase):
+    def setUp(self):
+        get_cache().clear()
+        self.donor = User.objects.create(username="cafe", email="cafe@example.com", role="restaurant")
+        self.ngo = User.objects.create(username="shelter", email="shelter@example.com", role="ngo")
+        self.donation = Donation.objects.create(donor=self.donor, name="Soup")
+        self.client = APIClient()
+
+    def client_for(self, user):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client
+
+    def get(self, url="/api/donations/"):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response
+
+    def names(self, response):
+        return [row["name"] for row in response.data["results"]]
+
+    def test_miss_then_hit(self):
+        from .response_cache import cache_stats
+
+        for url in ("/api/donations/", f"/api/donations/{self.donation.pk}/"):
+            first, second = self.get(url), self.get(url)
+            self.assertEqual((first["X-Cache"], second["X-Cache"]), ("MISS", "HIT"), url)
+            self.assertEqual(first.json(), second.json())
+        self.assertEqual(self.get("/api/donations/?page_size=5")["X-Cache"], "MISS")
+        self.assertEqual(cache_stats(), {"hits": 2, "misses": 3})
+
+    def test_hits_count_remaining_seconds_down(self):
+        import time
+        from unittest import mock
+
+        Donation.objects.filter(pk=self.donation.pk).update(expiry_time=timezone.now() + timedelta(hours=2))
+        url = f"/api/donations/{self.donation.pk}/"
+        fresh = self.get(url).data["remaining_seconds"]
+        later = time.time() + 100
+        with mock.patch("donations.response_cache.time", mock.Mock(time=lambda: later)):
+            hit = self.get(url)
+        self.assertEqual(hit["X-Cache"], "HIT")
+        self.assertTrue(fresh - 102 <= hit.data["remaining_seconds"] <= fresh - 99, (fresh, hit.data))
+
+    def test_hit_runs_no_view_queries(self):
+        self.get()
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(self.get()["X-Cache"], "HIT")
+        # the three change-token lookups of the ETag only
+        self.assertEqual(len(ctx.captured_queries), 3, [q["sql"] for q in ctx.captured_queries])
+
+    def test_changes_bump_the_generations(self):
+        detail = f"/api/donations/{self.donation.pk}/"
+        other = Donation.objects.create(donor=self.donor, name="Bread")
+        other_detail = f"/api/donations/{other.pk}/"
+        for url in ("/api/donations/", detail, other_detail):
+            self.get(url)
+
+        donor, ngo = self.client_for(self.donor), self.client_for(self.ngo)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(donor.post("/api/donations/", {"name": "Rice"}).status_code, 201)
+        response = self.get()
+        self.assertEqual((response["X-Cache"], self.names(response)), ("MISS", ["Rice", "Bread", "Soup"]))
+        # only the list moved on
+        self.assertEqual(self.get(detail)["X-Cache"], "HIT")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(ngo.patch(f"/api/donations/{self.donation.pk}/claim/").status_code, 200)
+        response = self.get()
+        self.assertEqual((response["X-Cache"], self.names(response)), ("MISS", ["Rice", "Bread"]))
+        response = self.get(detail)
+        self.assertEqual((response["X-Cache"], response.data["is_claimed"]), ("MISS", True))
+        self.assertEqual(self.get(other_detail)["X-Cache"], "HIT")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(donor.delete(other_detail).status_code, 204)
+        response = self.get()
+        self.assertEqual((response["X-Cache"], self.names(response)), ("MISS", ["Rice"]))
+        self.assertEqual(self.client.get(other_detail).status_code, 404)
+
+    def test_rebuild_lock(self):
+        from .response_cache import rebuild_lock
+
+        with rebuild_lock("key") as first:
+            with rebuild_lock("key") as second:
+                self.assertEqual((first, second), (True, False))
+        with rebuild_lock("key") as again:
+            self.assertTrue(again)
+
+    def test_waits_for_a_rebuild_in_progress(self):
+        import threading
+
+        from .response_cache import _entry, list_key
+
+        key = list_key(QueryDict())
+        cache = get_cache()
+        cache.add(f"{key}:lock", 1)
+        rebuilt = {"next": None, "previous": None, "results": [{"name": "from the other request"}]}
+        threading.Timer(0.1, cache.set, args=(key, _entry(rebuilt))).start()
+        response = self.get()
+        self.assertEqual((response["X-Cache"], response.data), ("HIT", rebuilt))
+
+    def test_stops_waiting(self):
+        from unittest import mock
+
+        from .response_cache import list_key
+
+        get_cache().add(f"{list_key(QueryDict())}:lock", 1)
+        with mock.patch("donations.response_cache.LOCK_WAIT_SECONDS", 0.1):
+            response = self.get()
+        self.assertEqual((response["X-Cache"], self.names(response)), ("MISS", ["Soup"]))
+
+    def test_authenticated_requests_bypass_the_cache(self):
+        from .response_cache import cache_stats, list_key
+
+        client = self.client_for(self.ngo)
+        response = client.get("/api/donations/")
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("X-Cache", response)
+        self.assertIsNone(get_cache().get(list_key(QueryDict())))
+        self.assertEqual(cache_stats(), {"hits": 0, "misses": 0})
+
+    def test_views_without_a_key(self):
+        from django.test import RequestFactory
+        from rest_framework.response import Response
+        from rest_framework.views import APIView
+
+        from .response_cache import CachedAnonymousGetMixin
+
+        class Base(APIView):
+            def get(self, request):
+                return Response({"ok": True})
+
+        class View(CachedAnonymousGetMixin, Base):
+            pass
+
+        response = View.as_view()(RequestFactory().get("/"))
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("X-Cache", response)
+
+
+class ClaimTests(TestCase):
+    def setUp(self):
+        self.donor = User.objects.create(username="cafe", email="cafe@example.com", role="restaurant")
+        self.ngo = User.objects.create(username="shelter", email="shelter@example.com", role="ngo")
+        self.volunteer = User.objects.create(username="rider", email="rider@example.com", role="volunteer")
+        self.donation = Donation.objects.create(
+            donor=self.donor, name="Soup", expiry_time=timezone.now() + timedelta(hours=1),
+        )
+        Donation.objects.update(updated_at=timezone.now() - timedelta(hours=1))
+        self.messages = []
+        from .events import channel
+
+        channel.subscribe(self.messages.append)
+        self.addCleanup(channel._listeners.remove, self.messages.append)
+
+    def client_for(self, user):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client
+
+    def order(self, user):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client_for(user).post("/api/orders/", {"donation": self.donation.pk, "confirmation_note": "6pm"})
+
+    def claim(self, user):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client_for(user).patch(f"/api/donations/{self.donation.pk}/claim/")
+
+    def events(self):
+        import json
+
+        return [(m["type"], m["donation"]["id"]) for m in map(json.loads, self.messages)]
+
+    def test_second_order_conflicts(self):
+        self.assertEqual(self.order(self.ngo).status_code, 201)
+        response = self.order(self.volunteer)
+        self.assertEqual(response.status_code, 409, response.content)
+        self.assertEqual(list(Order.objects.values_list("user__username", flat=True)), ["shelter"])
+        self.assertEqual(self.events(), [("claimed", self.donation.pk)])
+
+    def test_second_claim_conflicts(self):
+        self.assertEqual(self.claim(self.ngo).status_code, 200)
+        self.assertEqual(self.claim(self.volunteer).status_code, 409)
+        self.assertEqual(self.order(self.volunteer).status_code, 409)
+        self.assertFalse(Order.objects.exists())
+        self.assertEqual(self.events(), [("claimed", self.donation.pk)])
+
+    def test_claim_sets_updated_at(self):
+        before = timezone.now()
+        response = self.claim(self.ngo)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.data["is_claimed"])
+        self.donation.refresh_from_db()
+        self.assertTrue(self.donation.is_claimed)
+        self.assertGreaterEqual(self.donation.updated_at, before)
+
+    def test_expired_donation_cannot_be_claimed(self):
+        # expiry_time has passed; the sweeper has not flagged it yet
+        Donation.objects.update(expiry_time=timezone.now() - timedelta(minutes=1))
+        self.assertEqual(self.claim(self.ngo).status_code, 400)
+        self.assertEqual(self.order(self.ngo).status_code, 403)
+        Donation.objects.update(expiry_time=timezone.now() + timedelta(hours=1), is_expired=True)
+        self.assertEqual(self.claim(self.ngo).status_code, 400)
+        self.donation.refresh_from_db()
+        self.assertFalse(self.donation.is_claimed)
+        self.assertFalse(Order.objects.exists())
+        self.assertEqual(self.events(), [])
+
+    def test_missing_donation(self):
+        response = self.client_for(self.ngo).patch("/api/donations/999999/claim/")
+        self.assertEqual(response.status_code, 404)
+
+    def test_donors_cannot_order(self):
+        # OrderSerializer.validate turns other roles away
+        self.assertEqual(self.order(self.donor).status_code, 400)
+        self.donation.refresh_from_db()
+        self.assertFalse(self.donation.is_claimed)
+
+
+class DonationImageTests(TestCase):
+    def setUp(self):
+        import shutil
+        import tempfile
+
+        media = tempfile.mkdtemp(prefix="zerobite-media-")
+        self.addCleanup(shutil.rmtree, media, ignore_errors=True)
+        media_settings = override_settings(MEDIA_ROOT=media, DONATION_IMAGE_WORKERS=0)
+        media_settings.enable()
+        self.addCleanup(media_settings.disable)
+        get_cache().clear()
+        self.donor = User.objects.create(username="cafe", email="cafe@example.com", role="restaurant")
+        self.client = APIClient()
+        self.client.force_authenticate(self.donor)
+
+    def image_bytes(self, size=(800, 600), fmt="PNG", orientation=None):
+        from io import BytesIO
+
+        from PIL import Image
+
+        buf = BytesIO()
+        im = Image.new("RGB", size, (200, 80, 40))
+        exif = Image.Exif()
+        if orientation:
+            exif[0x0112] = orientation
+        im.save(buf, fmt, exif=exif) if fmt == "JPEG" else im.save(buf, fmt)
+        return buf.getvalue()
+
+    def upload(self, data, name="photo.png"):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+
+        return SimpleUploadedFile(name, data, content_type="image/png")
+
+    def post(self, *uploads):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post("/api/donations/", {"name": "Soup", "images": list(uploads)}, format="multipart")
+
+    def open_variant(self, field):
+        from PIL import Image
+
+        field.open("rb")
+        self.addCleanup(field.close)
+        return Image.open(field)
+
+    def test_render_variants(self):
+        from io import BytesIO
+
+        from PIL import Image
+
+        from .images import render_variants
+
+        size, rendered = render_variants(BytesIO(self.image_bytes((2000, 1000), "JPEG")))
+        self.assertEqual(size, (2000, 1000))
+        sizes = {name: Image.open(BytesIO(data)).size for name, data in rendered.items()}
+        self.assertEqual(sizes, {"full": (1600, 800), "card": (640, 320), "thumbnail": (240, 120)})
+
+    def test_orientation_is_applied_and_exif_dropped(self):
+        from io import BytesIO
+
+        from PIL import Image
+
+        from .images import render_variants
+
+        size, rendered = render_variants(BytesIO(self.image_bytes((400, 200), "JPEG", orientation=6)))
+        self.assertEqual(size, (200, 400))
+        card = Image.open(BytesIO(rendered["card"]))
+        self.assertEqual(card.size, (200, 400))
+        self.assertNotIn(0x0112, card.getexif())
+
+    def test_upload_is_processed_after_commit(self):
+        response = self.post(self.upload(self.image_bytes()), self.upload(self.image_bytes((300, 900), "JPEG"), "b.jpg"))
+        self.assertEqual(response.status_code, 201, response.content)
+        images = list(DonationImage.objects.order_by("pk"))
+        self.assertEqual([(i.width, i.height) for i in images], [(800, 600), (300, 900)])
+        for image in images:
+            self.assertIsNotNone(image.processed_at)
+            self.assertEqual(self.open_variant(image.thumbnail).size[1], 240 if image.height > image.width else 180)
+
+    def test_processing_invalidates_cached_responses(self):
+        from .images import process_image
+
+        with self.captureOnCommitCallbacks(execute=False):
+            response = self.client.post("/api/donations/", {"name": "Soup", "images": [self.upload(self.image_bytes())]},
+                                        format="multipart")
+        pk = response.data["id"]
+        anonymous = APIClient()
+        url = f"/api/donations/{pk}/"
+        self.assertEqual(anonymous.get(url)["X-Cache"], "MISS")
+        original = anonymous.get(url)
+        self.assertEqual(original["X-Cache"], "HIT")
+
+        self.assertTrue(process_image(DonationImage.objects.get().pk))
+        processed = anonymous.get(url)
+        self.assertEqual(processed["X-Cache"], "MISS")
+        self.assertNotEqual(processed.data["thumbnail"], original.data["thumbnail"])
+        self.assertIn("card", processed.data["thumbnail"])
+        self.assertFalse(process_image(999999))
+
+    def test_processing_changes_the_etags(self):
+        from .images import process_image
+
+        with self.captureOnCommitCallbacks(execute=False):
+            response = self.client.post("/api/donations/", {"name": "Soup", "images": [self.upload(self.image_bytes())]},
+                                        format="multipart")
+        anonymous = APIClient()
+        urls = ("/api/donations/", f"/api/donations/{response.data['id']}/")
+        etags = {url: anonymous.get(url)["ETag"] for url in urls}
+        for url in urls:
+            self.assertEqual(anonymous.get(url, HTTP_IF_NONE_MATCH=etags[url]).status_code, 304, url)
+
+        self.assertTrue(process_image(DonationImage.objects.get().pk))
+        for url in urls:
+            response = anonymous.get(url, HTTP_IF_NONE_MATCH=etags[url])
+            self.assertEqual(response.status_code, 200, url)
+            self.assertNotEqual(response["ETag"], etags[url], url)
+
+    def test_thread_pool(self):
+        import threading
+        from unittest import mock
+
+        from . import images
+
+        done = threading.Semaphore(0)
+        threads = []
+
+        def process(image_id):
+            threads.append((image_id, threading.current_thread().name))
+            done.release()
+
+        old_executor = images._executor
+        images._executor = None
+
+        def restore():
+            if images._executor:
+                images._executor.shutdown(wait=True)
+            images._executor = old_executor
+
+        self.addCleanup(restore)
+        with override_settings(DONATION_IMAGE_WORKERS=2), mock.patch.object(images, "process_image", process):
+            with self.captureOnCommitCallbacks(execute=True):
+                images.enqueue([1, 2, 3])
+                # nothing runs before the commit
+                self.assertEqual(threads, [])
+            for _ in range(3):
+                self.assertTrue(done.acquire(timeout=5))
+        self.assertEqual(sorted(image_id for image_id, _ in threads), [1, 2, 3])
+        self.assertTrue(all(name.startswith("donation-images") for _, name in threads))
+        self.assertEqual(images._executor._max_workers, 2)
+
+    def test_rejects_anything_but_images(self):
+        from io import BytesIO
+
+        from PIL import Image
+
+        gif = BytesIO()
+        Image.new("RGB", (10, 10)).save(gif, "GIF")
+        truncated = self.image_bytes()[:100]
+        for upload in (
+            self.upload(b"#!/bin/sh\necho hello\n", "photo.jpg"),
+            self.upload(gif.getvalue(), "photo.gif"),
+            self.upload(truncated),
+            self.upload(b"", "empty.png"),
+        ):
+            response = self.post(self.upload(self.image_bytes()), upload)
+            self.assertEqual(response.status_code, 400, upload.name)
+            self.assertIn("images", response.data)
+        self.assertFalse(Donation.objects.exists())
+        self.assertFalse(DonationImage.objects.exists())
+
+    def test_rejects_large_uploads(self):
+        with override_settings(DONATION_IMAGE_MAX_BYTES=1024 * 1024):
+            response = self.post(self.upload(self.image_bytes() + b"\0" * 1024 * 1024))
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(str(response.data["images"][0]), "Images must be at most 1 MB.")
+        self.assertFalse(Donation.objects.exists())
+
+
+class BulkIntakeTests(TestCase):
+    def setUp(self):
+        import shutil
+        import tempfile
+
+        media = tempfile.mkdtemp(prefix="zerobite-media-")
+        self.addCleanup(shutil.rmtree, media, ignore_errors=True)
+        media_settings = override_settings(MEDIA_ROOT=media)
+        media_settings.enable()
+        self.addCleanup(media_settings.disable)
+        self.donor = User.objects.create(username="cafe", email="cafe@example.com", role="restaurant")
+        self.client = APIClient()
+        self.client.force_authenticate(self.donor)
+
+    def items(self, count, start=0):
+        return [{"name": f"Meal {n}", "quantity": n + 1, "food_type": "bakery"} for n in range(start, start + count)]
+
+    def post(self, data, format="json"):
+        with self.captureOnCommitCallbacks(execute=False):
+            return self.client.post("/api/donations/bulk/", data, format=format)
+
+    def png(self, name="photo.png"):
+        from io import BytesIO
+
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        from PIL import Image
+
+        buf = BytesIO()
+        Image.new("RGB", (64, 48)).save(buf, "PNG")
+        return SimpleUploadedFile(name, buf.getvalue(), content_type="image/png")
+
+    def assertCreated(self, response, count, start=0):
+        created = [r for r in response.data["results"] if r["status"] == "created"]
+        self.assertEqual(len(created), count)
+        # every result points at its own row
+        for result in created:
+            self.assertEqual(Donation.objects.get(pk=result["id"]).name, f"Meal {start + result['index']}")
+
+    def test_creates_every_item(self):
+        response = self.post({"donations": self.items(3)})
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual((response.data["created"], response.data["failed"]), (3, 0))
+        self.assertCreated(response, 3)
+        self.assertEqual(set(Donation.objects.values_list("donor", flat=True)), {self.donor.pk})
+
+    def test_per_item_errors(self):
+        items = self.items(4)
+        items[1] = {"quantity": 2}  # no name
+        items[2] = "Meal 2"
+        items[3]["expiry_time"] = "tomorrow"
+        response = self.post({"donations": items})
+        self.assertEqual(response.status_code, 207, response.content)
+        statuses = [r["status"] for r in response.data["results"]]
+        self.assertEqual(statuses, ["created", "error", "error", "error"])
+        self.assertIn("name", response.data["results"][1]["errors"])
+        self.assertIn("expiry_time", response.data["results"][3]["errors"])
+        self.assertCreated(response, 1)
+
+        response = self.post({"donations": [{"quantity": 1}]})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Donation.objects.count(), 1)
+
+    def test_bad_batches(self):
+        for data in ({}, {"donations": []}, {"donations": "nope"}, {"donations": self.items(101)}):
+            self.assertEqual(self.post(data).status_code, 400, data)
+        self.assertFalse(Donation.objects.exists())
+
+    def test_images_per_item(self):
+        import json
+
+        from django.core.files.uploadedfile import SimpleUploadedFile
+
+        response = self.post({
+            "donations": json.dumps(self.items(3)),
+            "images_0": [self.png("a.png"), self.png("b.png")],
+            "images_1": [SimpleUploadedFile("c.jpg", b"not an image", content_type="image/jpeg")],
+            "images_2": [self.png("d.png")],
+        }, format="multipart")
+        self.assertEqual(response.status_code, 207, response.content)
+        self.assertIn("images_1", response.data["results"][1]["errors"])
+        self.assertCreated(response, 2)
+        images = {d.name: d.images.count() for d in Donation.objects.all()}
+        self.assertEqual(images, {"Meal 0": 2, "Meal 2": 1})
+
+    def test_atomic(self):
+        from unittest import mock
+
+        with mock.patch("donations.views.match_donations", side_effect=RuntimeError("matching failed")):
+            with self.assertRaises(RuntimeError):
+                self.post({"donations": self.items(3)})
+        self.assertFalse(Donation.objects.exists())
+
+    def count_queries(self, count, start):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.post({"donations": self.items(count, start)})
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertCreated(response, count, start)
+        return len(ctx.captured_queries)
+
+    def test_query_count(self):
+        self.assertEqual(self.count_queries(2, 0), self.count_queries(20, 10))
+
+    def test_without_returning_bulk_insert(self):
+        # MySQL cannot return ids from a multi-row INSERT; they are re-selected
+        import json
+        from unittest import mock
+
+        self.post({"donations": self.items(2, 100)})  # other rows of the same donor
+        with mock.patch.object(type(connection.features), "can_return_rows_from_bulk_insert",
+                               new_callable=mock.PropertyMock, return_value=False):
+            small, large = self.count_queries(2, 0), self.count_queries(20, 10)
+            self.assertEqual(small, large)
+            response = self.post({"donations": json.dumps(self.items(2, 50)), "images_1": [self.png()]},
+                                 format="multipart")
+        self.assertCreated(response, 2, 50)
+        self.assertEqual(DonationImage.objects.get().donation.name, "Meal 51")
+
+
+class ExportTests(TestCase):
+    def setUp(self):
+        self.donor = User.objects.create(username="deli", email="deli@example.com", role="restaurant")
+        self.ngo = User.objects.create(username="foodbank", email="foodbank@example.com", role="ngo")
+        self.admin = User.objects.create(username="root", email="root@example.com", is_staff=True)
+        now = timezone.now()
+        self.donations = []
+        for n, day in enumerate((1, 5, 10, 20, 60)):
+            donation = Donation.objects.create(donor=self.donor, name=f"Meal {n}", quantity=n)
+            created = now - timedelta(days=day)
+            Donation.objects.filter(pk=donation.pk).update(created_at=created, updated_at=created)
+            self.donations.append(donation)
+        Order.objects.create(donation=self.donations[4], user=self.ngo, confirmation_note="picked up, 6pm")
+        Order.objects.update(created_at=now - timedelta(days=59))
+        # claimed two months ago: archivable
+        Donation.objects.filter(pk=self.donations[4].pk).update(is_claimed=True)
+
+    def export(self, path, params=None, user=None):
+        client = APIClient()
+        client.force_authenticate(user or self.admin)
+        response = client.get(f"/api/admin/export/{path}", params or {})
+        self.assertEqual(response.status_code, 200, getattr(response, "content", b""))
+        return b"".join(response.streaming_content).decode("utf-8"), response
+
+    def csv_rows(self, path, params=None):
+        import csv
+        from io import StringIO
+
+        body, response = self.export(path, params)
+        self.assertEqual(response["Content-Type"], "text/csv; charset=utf-8")
+        return list(csv.DictReader(StringIO(body)))
+
+    def test_csv(self):
+        from .exports import DONATION_COLUMNS
+
+        body, response = self.export("donations.csv")
+        self.assertRegex(response["Content-Disposition"], r'attachment; filename="donations-\d{8}-\d{6}\.csv"')
+        self.assertEqual(body.splitlines()[0], ",".join(DONATION_COLUMNS))
+        rows = self.csv_rows("donations.csv")
+        self.assertEqual([r["name"] for r in rows], [f"Meal {n}" for n in range(5)])
+        self.assertEqual(rows[0]["donor__username"], "deli")
+        orders = self.csv_rows("orders.csv")
+        self.assertEqual([(o["donation__name"], o["confirmation_note"]) for o in orders],
+                         [("Meal 4", "picked up, 6pm")])
+
+    def test_ndjson(self):
+        import json
+
+        body, response = self.export("orders.ndjson")
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        (order,) = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual((order["user__username"], order["donation_id"]), ("foodbank", self.donations[4].pk))
+        body, _ = self.export("donations.ndjson")
+        rows = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual([r["quantity"] for r in rows], [0, 1, 2, 3, 4])
+        self.assertEqual(rows[0]["created_at"], Donation.objects.get(pk=rows[0]["id"]).created_at.isoformat())
+
+    def test_date_filters(self):
+        today = timezone.localdate()
+        since = (today - timedelta(days=12)).isoformat()
+        until = (today - timedelta(days=3)).isoformat()
+        names = lambda params: [r["name"] for r in self.csv_rows("donations.csv", params)]  # noqa: E731
+        self.assertEqual(names({"from": since}), ["Meal 0", "Meal 1", "Meal 2"])
+        self.assertEqual(names({"from": since, "to": until}), ["Meal 1", "Meal 2"])
+        self.assertEqual(names({"claimed": "true"}), ["Meal 4"])
+        self.assertEqual(self.csv_rows("orders.csv", {"to": since}), self.csv_rows("orders.csv"))
+        self.assertEqual(self.csv_rows("orders.csv", {"from": until}), [])
+
+        client = APIClient()
+        client.force_authenticate(self.admin)
+        self.assertEqual(client.get("/api/admin/export/donations.csv", {"from": "last week"}).status_code, 400)
+
+    def test_order_filters(self):
+        from .models import ArchivedDonation, ArchivedOrder
+
+        notes = lambda params: [o["confirmation_note"] for o in self.csv_rows("orders.csv", params)]  # noqa: E731
+        self.assertEqual(notes({"claimed": "true"}), ["picked up, 6pm"])
+        self.assertEqual(notes({"claimed": "false"}), [])
+        self.assertEqual(notes({"expired": "false"}), ["picked up, 6pm"])
+        self.assertEqual(notes({"expired": "true"}), [])
+
+        Donation.objects.filter(pk=self.donations[4].pk).update(expiry_time=timezone.now() - timedelta(days=50))
+        self.assertEqual(notes({"expired": "true"}), ["picked up, 6pm"])
+        self.assertEqual(notes({"expired": "false"}), [])
+
+        # the same filters apply to archived orders
+        archived = ArchivedDonation.objects.create(
+            id=9000, donor=self.donor, name="Old meal", quantity=1, is_claimed=False,
+            created_at=timezone.now(), updated_at=timezone.now(),
+        )
+        ArchivedOrder.objects.create(
+            id=9000, donation=archived, user=self.ngo, confirmation_note="archived", created_at=timezone.now(),
+        )
+        self.assertEqual(notes({"claimed": "false"}), ["archived"])
+        self.assertEqual(notes({"claimed": "false", "expired": "true"}), [])
+
+        client = APIClient()
+        client.force_authenticate(self.admin)
+        self.assertEqual(client.get("/api/admin/export/orders.csv", {"expired": "soon"}).status_code, 400)
+
+    def test_escapes_csv_formulas(self):
+        import json
+
+        Donation.objects.filter(pk=self.donations[0].pk).update(name='=HYPERLINK("http://evil.example","x")')
+        Donation.objects.filter(pk=self.donations[1].pk).update(name="-2+3")
+        Donation.objects.filter(pk=self.donations[2].pk).update(name="@SUM(A1)")
+        rows = self.csv_rows("donations.csv")
+        self.assertEqual([r["name"] for r in rows[:4]],
+                         ['\'=HYPERLINK("http://evil.example","x")', "'-2+3", "'@SUM(A1)", "Meal 3"])
+        # numbers are not text: a negative quantity would stay a number
+        self.assertEqual(rows[0]["quantity"], "0")
+        # NDJSON is data, not a spreadsheet: unchanged
+        body, _ = self.export("donations.ndjson")
+        self.assertEqual(json.loads(body.splitlines()[1])["name"], "-2+3")
+
+    def test_streams_under_asgi(self):
+        import warnings
+
+        from asgiref.sync import async_to_sync
+        from django.test import AsyncClient
+        from rest_framework_simplejwt.tokens import AccessToken
+
+        from .archive import archive_donations
+
+        Donation.objects.bulk_create(
+            [Donation(donor=self.donor, name=f"Bulk {n}") for n in range(3000)], batch_size=500,
+        )
+        archive_donations()  # hot and archived rows are merged as they stream
+        expected = self.csv_rows("donations.csv")
+
+        async def export():
+            token = f"Bearer {AccessToken.for_user(self.admin)}"
+            response = await AsyncClient().get("/api/admin/export/donations.csv", headers={"authorization": token})
+            self.assertEqual(response.status_code, 200, getattr(response, "content", None))
+            self.assertTrue(response.is_async)
+            return response, b"".join([chunk async for chunk in response.streaming_content])
+
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter("always")
+            response, body = async_to_sync(export)()
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse([w for w in caught if "synchronous iterators" in str(w.message)])
+
+        import csv
+        from io import StringIO
+
+        self.assertEqual(list(csv.DictReader(StringIO(body.decode("utf-8")))), expected)
+        self.assertEqual(len(expected), 3005)
+
+    def test_keyset_chunks(self):
+        from .exports import iter_rows
+
+        with CaptureQueriesContext(connection) as ctx:
+            rows = list(iter_rows(Donation.objects.all(), ("id", "name"), chunk_size=2))
+        self.assertEqual(rows, [(d.pk, d.name) for d in self.donations])
+        # three chunks, then one empty read
+        self.assertEqual(len(ctx.captured_queries), 4)
+        self.assertIn('"id" > ', ctx.captured_queries[1]["sql"])
+
+    def test_merges_the_archive(self):
+        from .archive import archive_donations
+
+        before = self.csv_rows("donations.csv"), self.csv_rows("orders.csv")
+        self.assertEqual(archive_donations(), 1)
+        self.assertFalse(Donation.objects.filter(pk=self.donations[4].pk).exists())
+        after = self.csv_rows("donations.csv"), self.csv_rows("orders.csv")
+        self.assertEqual(after, before)
+
+        # hot and archived rows interleave by id
+        later = Donation.objects.create(donor=self.donor, name="Meal 5")
+        ids = [int(r["id"]) for r in self.csv_rows("donations.csv")]
+        self.assertEqual(ids, sorted(ids))
+        self.assertEqual(ids[-1], later.pk)
+
+    def test_admin_only(self):
+        for user, status in ((None, 401), (self.donor, 403), (self.ngo, 403)):
+            client = APIClient()
+            if user:
+                client.force_authenticate(user)
+            self.assertEqual(client.get("/api/admin/export/donations.csv").status_code, status)
+        client = APIClient()
+        client.force_authenticate(self.admin)
+        self.assertEqual(client.get("/api/admin/export/donations.xlsx").status_code, 404)
+
+
+class SearchDatabaseTests(TestCase):
+    replica = _add_replica_database("replica_test")
+    databases = {"default", replica}
+
+    def test_matches_on_the_querysets_database(self):
+        from unittest import mock
+
+        from donations.search import ranked, search_donations
+
+        donor = User.objects.using(self.replica).create(username="bakery", email="bakery@example.com")
+        Donation.objects.using(self.replica).create(donor_id=donor.pk, name="Replica soup")
 
-# Create your tests here.
+        # SQL built for the default connection's backend would not run on the replica
+        with mock.patch.object(connection, "vendor", "mysql"):
+            rows = ranked(search_donations(Donation.objects.using(self.replica), "soup"))
+        self.assertEqual([row.name for row in rows], ["Replica soup"])
+        self.assertFalse(ranked(search_donations(Donation.objects.all(), "soup")))
@@ -1,15 +1,22 @@
 from django.urls import path
 from .views import (
-    DonationListCreateAPIView, DonationRetrieveDestroyAPIView,
-    DonationClaimAPIView, DonationUserStatsAPIView, OrderListCreateView
+    DonationListCreateAPIView, DonationBulkCreateAPIView, DonationRetrieveDestroyAPIView,
+    DonationClaimAPIView, DonationUserStatsAPIView, DonationUserPostsAPIView, OrderListCreateView,
+    OrderRouteView, FoodRequestListCreateView, FoodRequestDetailView, RequestMatchListView,
 )
 
 urlpatterns = [
     path('donations/', DonationListCreateAPIView.as_view(), name='donation-list-create'),
+    path('donations/bulk/', DonationBulkCreateAPIView.as_view(), name='donation-bulk-create'),
     path('donations/<int:pk>/', DonationRetrieveDestroyAPIView.as_view(), name='donation-detail-delete'),
     path('donations/<int:pk>/claim/', DonationClaimAPIView.as_view(), name='donation-claim'),
     path('donations/user_stats/', DonationUserStatsAPIView.as_view(), name='donation-user-stats'),
+    path('donations/user_stats/posts/', DonationUserPostsAPIView.as_view(), name='donation-user-posts'),
     path("donations/", DonationListCreateAPIView.as_view(), name="donations-list"),
     path("orders/", OrderListCreateView.as_view(), name="orders-list-create"),
+    path("orders/route/", OrderRouteView.as_view(), name="orders-route"),
+    path("requests/", FoodRequestListCreateView.as_view(), name="food-request-list-create"),
+    path("requests/matches/", RequestMatchListView.as_view(), name="food-request-matches"),
+    path("requests/<int:pk>/", FoodRequestDetailView.as_view(), name="food-request-detail"),
 
 ]
@@ -1,8 +1,11 @@
 from django.urls import path
+from .exports import DonationExportView, OrderExportView
 from .views_admin import AdminUserListView, AdminDonationListView, AdminDonationDeleteView
 
 urlpatterns = [
     path("admin/users/", AdminUserListView.as_view(), name="admin-user-list"),
     path("admin/donations/", AdminDonationListView.as_view(), name="admin-donation-list"),
     path("admin/donations/<int:pk>/", AdminDonationDeleteView.as_view(), name="admin-donation-delete"),
+    path("admin/export/donations.<str:fmt>", DonationExportView.as_view(), name="admin-export-donations"),
+    path("admin/export/orders.<str:fmt>", OrderExportView.as_view(), name="admin-export-orders"),
 ]
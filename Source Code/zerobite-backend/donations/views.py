@@ -1,24 +1,130 @@
+import json
+
 from rest_framework import generics, permissions, status
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from rest_framework.parsers import MultiPartParser, FormParser
-from rest_framework.exceptions import PermissionDenied
+from rest_framework.parsers import JSONParser, MultiPartParser, FormParser
+from rest_framework.exceptions import APIException, PermissionDenied, ValidationError
+from django.db import DatabaseError, transaction
+from django.db.models import Count, F, Q
+from django.urls import reverse
 from django.utils import timezone
-from django.db import transaction
 
-from .models import Donation, Order
-from .serializers import DonationSerializer, OrderSerializer
+from .conditional import ConditionalGetMixin, donation_detail_change_token, donation_list_change_token
+from .events import donation_payload, publish_event, publish_events
+from .geo import DEFAULT_RADIUS_KM, MAX_RADIUS_KM, bounding_box_q, nearby_limit, parse_coordinate, within_radius
+from .images import enqueue as enqueue_image_processing
+from .matching import match_donation, match_donations, match_request
+from .models import ArchivedDonation, ArchivedOrder, Donation, DonationImage, FoodRequest, Order, RequestMatch
+from .pagination import CappedResults, KeysetPagination
+from .response_cache import CachedAnonymousGetMixin, detail_key, list_key
+from .rows import DonationHistoryRows, DonationRows, OrderHistoryRows, ValuesListMixin
+from .routing import DEFAULT_SPEED_KMH, MAX_ROUTE_STOPS, Stop, plan_route
+from .search import ranked, search_donations
+from .serializers import (
+    DonationSerializer, FoodRequestSerializer, OrderSerializer, RequestMatchSerializer,
+)
+
+
+class Conflict(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = 'This donation has already been claimed.'
+    default_code = 'conflict'
+
+
+def claim_failure_reason(pk):
+    """After a lost claim, tell 'missing', 'expired' and 'claimed' apart."""
+    donation = Donation.objects.filter(pk=pk).only('is_claimed', 'is_expired', 'expiry_time').first()
+    if donation is None:
+        return 'missing'
+    if donation.has_expired:
+        return 'expired'
+    return 'claimed'
+
+
+class NearbyParamsMixin:
+    def get_nearby_params(self):
+        """Return (lat, lng, radius_km) when a nearby search was requested."""
+        params = self.request.query_params
+        if 'lat' not in params and 'lng' not in params:
+            return None
+
+        lat = parse_coordinate(params.get('lat'), 90)
+        lng = parse_coordinate(params.get('lng'), 180)
+        if lat is None or lng is None:
+            raise ValidationError({'detail': 'lat and lng must be valid coordinates.'})
+
+        radius_km = DEFAULT_RADIUS_KM
+        if params.get('radius_km'):
+            try:
+                radius_km = float(params.get('radius_km'))
+            except ValueError:
+                raise ValidationError({'radius_km': 'Must be a number.'})
+            if not 0 < radius_km <= MAX_RADIUS_KM:
+                raise ValidationError({'radius_km': f'Must be between 0 and {MAX_RADIUS_KM:g}.'})
+
+        return lat, lng, radius_km
 
 
 # ---------------- Existing Donation APIs ---------------- #
 
-class DonationListCreateAPIView(generics.ListCreateAPIView):
+def donation_feed(params):
+    """Donations the list shows by default, before search, nearby and ordering."""
+    # read-only: expired rows are filtered by expiry_time, the sweeper
+    # (manage.py expire_donations) flips is_expired in the background
+    q = Donation.objects.with_related()
+    if params.get('include_expired') != 'true':
+        q = q.not_expired()
+    if params.get('include_claimed') != 'true':
+        q = q.filter(is_claimed=False)
+    return q
+
+
+def donation_counts(now):
+    """Aggregates of DonationUserStatsAPIView, over Donation or ArchivedDonation."""
+    return {
+        'posted_count': Count('id'),
+        'claimed_count': Count('id', filter=Q(is_claimed=True)),
+        'expired_count': Count('id', filter=Q(is_expired=True) | Q(expiry_time__lte=now)),
+    }
+
+
+def add_counts(*counts):
+    return {name: sum(c[name] for c in counts) for name in counts[0]}
+
+
+def user_orders(user):
+    return Order.objects.filter(user=user).with_related().order_by("-created_at")
+
+
+def archived_orders(user):
+    return ArchivedOrder.objects.filter(user=user)
+
+
+class DonationListCreateAPIView(ConditionalGetMixin, CachedAnonymousGetMixin, NearbyParamsMixin,
+                                ValuesListMixin, generics.ListCreateAPIView):
     """
-    GET: List all donations (auto-mark expired)
-    POST: Create new donation (requires authentication)
+    GET: List open donations, newest first, in keyset-paginated pages
+         (?cursor=&page_size=). Supports ETag / If-Modified-Since;
+         anonymous responses come from the shared response cache.
+         ?lat=&lng=&radius_km= returns only donations within the radius
+         (at most MAX_RADIUS_KM), nearest first, with `distance_km` on each
+         row, in one page of at most DONATION_NEARBY_LIMIT rows (`limit`
+         and `truncated` as for ?q=).
+         ?q= full-text searches name, description and location; results
+         are best match first with a `relevance` score, in one page of at
+         most DONATION_SEARCH_LIMIT rows: `limit` is the cap and
+         `truncated` is true when more matched (refine the query).
+         Combines with the filters above.
+         ?fields=id,name,... / ?expand=donor pick the fields of each row
+         (see donations/fieldsets.py).
+    POST: Create new donation (requires authentication); open NGO
+          requests it can serve are matched right away
     """
     serializer_class = DonationSerializer
+    rows_class = DonationRows
     parser_classes = (MultiPartParser, FormParser)
+    pagination_class = KeysetPagination
 
     def get_permissions(self):
         if self.request.method == 'POST':
@@ -26,39 +132,146 @@ class DonationListCreateAPIView(generics.ListCreateAPIView):
         return [permissions.AllowAny()]
 
     def get_queryset(self):
-        qs = Donation.objects.all()
-        now = timezone.now()
-
-        # Mark expired donations automatically
-        expired_qs = qs.filter(
-            expiry_time__isnull=False,
-            expiry_time__lte=now,
-            is_expired=False
-        )
-        if expired_qs.exists():
-            expired_qs.update(is_expired=True)
+        q = donation_feed(self.request.query_params)
+        text = self.request.query_params.get('q', '').strip()
+        if text:
+            q = search_donations(q, text)
+
+        nearby = self.get_nearby_params()
+        if nearby:
+            lat, lng, radius_km = nearby
+            # bounding box on the indexed coordinates first, exact distance after
+            candidates = q.filter(bounding_box_q(lat, lng, radius_km))
+            return CappedResults(within_radius(candidates, lat, lng, radius_km), nearby_limit())
+
+        if text:
+            return ranked(q)
+        return q.order_by('-created_at')
 
-        include_expired = self.request.query_params.get('include_expired') == 'true'
-        include_claimed = self.request.query_params.get('include_claimed') == 'true'
+    def get_change_token(self, request, *args, **kwargs):
+        return donation_list_change_token(request)
 
-        q = qs
-        if not include_expired:
-            q = q.filter(is_expired=False)
-        if not include_claimed:
-            q = q.filter(is_claimed=False)
+    def get_response_cache_key(self, request, *args, **kwargs):
+        return list_key(request.query_params)
 
-        return q.order_by('-created_at')
+    def paginate_queryset(self, queryset):
+        # nearby and search results are already bounded and sorted
+        if isinstance(queryset, list):
+            return None
+        return super().paginate_queryset(queryset)
 
     def perform_create(self, serializer):
-        serializer.save(donor=self.request.user)
+        donation = serializer.save(donor=self.request.user)
+        match_donation(donation)
+        publish_event('created', donation_payload(donation))
+
+
+def bulk_insert(model, objs, inserted):
+    """
+    bulk_create that always leaves primary keys set. Backends that cannot
+    return ids from a multi-row INSERT (MySQL) re-select them inside the
+    caller's transaction: `inserted(objs)` is a queryset of exactly the new
+    rows, whose ids follow insert order.
+    """
+    objs = model.objects.bulk_create(objs, batch_size=500)
+    if not objs or objs[0].pk is not None:
+        return objs
+    pks = list(inserted(objs).order_by('pk').values_list('pk', flat=True))
+    if len(pks) != len(objs):
+        raise DatabaseError(f'bulk insert of {len(objs)} {model._meta.model_name} rows found {len(pks)}')
+    for obj, pk in zip(objs, pks):
+        obj.pk = pk
+    return objs
+
 
+def inserted_donations(donor):
+    # created_at is set on each object by bulk_create; (donor, created_at, id) is indexed
+    return lambda objs: Donation.objects.filter(donor=donor, created_at__in={obj.created_at for obj in objs})
 
-class DonationRetrieveDestroyAPIView(generics.RetrieveDestroyAPIView):
+
+def inserted_images(donations):
+    # the donations were created in this transaction, so these are all their images
+    return lambda objs: DonationImage.objects.filter(donation__in=donations)
+
+
+class DonationBulkCreateAPIView(APIView):
     """
-    Retrieve a donation (anyone)
+    POST: Create a batch of donations in one request and one transaction.
+
+    Body: {"donations": [{...}, ...]} as JSON, or multipart with a
+    `donations` JSON string and photos under `images_<index>`.
+    Every item, photos included, is validated like a single POST; valid
+    ones are inserted with bulk_create and each item gets its own result.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    parser_classes = (JSONParser, MultiPartParser, FormParser)
+    max_batch_size = 100
+
+    def get_items(self, request):
+        items = request.data.get('donations')
+        if isinstance(items, str):
+            try:
+                items = json.loads(items)
+            except ValueError:
+                raise ValidationError({'donations': 'Must be a JSON list.'})
+        if not isinstance(items, list) or not items:
+            raise ValidationError({'donations': 'Expected a non-empty list of donations.'})
+        if len(items) > self.max_batch_size:
+            raise ValidationError({'donations': f'At most {self.max_batch_size} donations per request.'})
+        return items
+
+    def post(self, request, format=None):
+        items = self.get_items(request)
+        context = {'request': request}
+
+        results = [None] * len(items)
+        valid = []
+        for index, item in enumerate(items):
+            serializer = DonationSerializer(
+                data=item if isinstance(item, dict) else {},
+                context={**context, 'images_field': f'images_{index}'},
+            )
+            if serializer.is_valid():
+                valid.append((index, serializer.validated_data, serializer.get_uploads()))
+            else:
+                results[index] = {'index': index, 'status': 'error', 'errors': serializer.errors}
+
+        with transaction.atomic():
+            donations = bulk_insert(Donation, [
+                Donation(donor=request.user, **data) for _, data, _ in valid
+            ], inserted_donations(request.user))
+            images = [
+                DonationImage(donation=donation, image=upload)
+                for (_, _, uploads), donation in zip(valid, donations) for upload in uploads
+            ]
+            images = bulk_insert(DonationImage, images, inserted_images(donations))
+            enqueue_image_processing(img.pk for img in images)
+            match_donations(donations)
+
+            for (index, _, _), donation in zip(valid, donations):
+                results[index] = {'index': index, 'status': 'created', 'id': donation.pk}
+            publish_events('created', [donation_payload(d, donor_role=request.user.role) for d in donations])
+
+        if not valid:
+            code = status.HTTP_400_BAD_REQUEST
+        elif len(valid) < len(items):
+            code = status.HTTP_207_MULTI_STATUS
+        else:
+            code = status.HTTP_201_CREATED
+        return Response({
+            'created': len(valid),
+            'failed': len(items) - len(valid),
+            'results': results,
+        }, status=code)
+
+
+class DonationRetrieveDestroyAPIView(ConditionalGetMixin, CachedAnonymousGetMixin, generics.RetrieveDestroyAPIView):
+    """
+    Retrieve a donation (anyone; supports ETag / If-Modified-Since, cached for anonymous users;
+    ?fields= / ?expand= as on the list)
     Delete: Only donor or admin
     """
-    queryset = Donation.objects.all()
+    queryset = Donation.objects.with_related()
     serializer_class = DonationSerializer
 
     def get_permissions(self):
@@ -66,87 +279,100 @@ class DonationRetrieveDestroyAPIView(generics.RetrieveDestroyAPIView):
             return [permissions.IsAuthenticated()]
         return [permissions.AllowAny()]
 
+    def get_change_token(self, request, *args, **kwargs):
+        return donation_detail_change_token(request, kwargs['pk'])
+
+    def get_response_cache_key(self, request, *args, **kwargs):
+        return detail_key(kwargs['pk'], request.query_params)
+
     def delete(self, request, *args, **kwargs):
         donation = self.get_object()
         user = request.user
         if not user.is_authenticated:
             raise PermissionDenied("Authentication required to delete.")
         if user == donation.donor or user.is_staff:
-            return super().delete(request, *args, **kwargs)
+            payload = donation_payload(donation)
+            response = super().delete(request, *args, **kwargs)
+            publish_event('deleted', payload)
+            return response
         raise PermissionDenied("Only the donor or admin can remove this donation.")
 
 
 class DonationClaimAPIView(APIView):
     """
-    PATCH: Mark a donation as claimed
+    PATCH: Mark a donation as claimed (409 if someone else got it first)
     """
     permission_classes = [permissions.IsAuthenticated]
 
     def patch(self, request, pk, format=None):
-        try:
-            donation = Donation.objects.get(pk=pk)
-        except Donation.DoesNotExist:
-            return Response({'detail': 'Not found'}, status=status.HTTP_404_NOT_FOUND)
-
-        donation.mark_if_expired()
-        if donation.is_expired:
-            return Response({'detail': 'This donation has expired.'}, status=status.HTTP_400_BAD_REQUEST)
-        if donation.is_claimed:
-            return Response({'detail': 'Already claimed.'}, status=status.HTTP_400_BAD_REQUEST)
-
-        donation.is_claimed = True
-        donation.save(update_fields=['is_claimed'])
+        # the conditional UPDATE decides the winner; no read-check-save race
+        if not Donation.objects.claim(pk):
+            reason = claim_failure_reason(pk)
+            if reason == 'missing':
+                return Response({'detail': 'Not found'}, status=status.HTTP_404_NOT_FOUND)
+            if reason == 'expired':
+                return Response({'detail': 'This donation has expired.'}, status=status.HTTP_400_BAD_REQUEST)
+            return Response({'detail': 'Already claimed.'}, status=status.HTTP_409_CONFLICT)
+
+        donation = Donation.objects.with_related().get(pk=pk)
+        publish_event('claimed', donation_payload(donation))
         return Response(DonationSerializer(donation, context={'request': request}).data)
 
 
 class DonationUserStatsAPIView(APIView):
     """
-    GET: Return user's donation stats & list
+    GET: Return the user's donation counts, archived donations included
+    (one aggregate query per table).
+    The posts themselves are paginated at donations/user_stats/posts/.
     """
     permission_classes = [permissions.IsAuthenticated]
 
     def get(self, request, format=None):
-        user = request.user
-        qs = Donation.objects.filter(donor=user)
-        now = timezone.now()
+        counts = donation_counts(timezone.now())
+        stats = add_counts(
+            Donation.objects.filter(donor=request.user).aggregate(**counts),
+            ArchivedDonation.objects.filter(donor=request.user).aggregate(**counts),
+        )
+        stats['posts_url'] = request.build_absolute_uri(reverse('donation-user-posts'))
+        return Response(stats)
+
 
-        # auto-mark expired
-        Donation.objects.filter(
-            donor=user,
-            expiry_time__isnull=False,
-            expiry_time__lte=now,
-            is_expired=False
-        ).update(is_expired=True)
+class DonationUserPostsAPIView(ValuesListMixin, generics.ListAPIView):
+    """
+    GET: The user's own donations, archived ones included, newest first,
+         keyset-paginated (?cursor=&page_size=); ?fields= / ?expand= as
+         on the donation list
+    """
+    serializer_class = DonationSerializer
+    rows_class = DonationHistoryRows
+    permission_classes = [permissions.IsAuthenticated]
+    pagination_class = KeysetPagination
 
-        posted = qs.count()
-        claimed = qs.filter(is_claimed=True).count()
-        expired = qs.filter(is_expired=True).count()
-        posts = DonationSerializer(qs.order_by('-created_at'), many=True, context={'request': request}).data
+    def get_queryset(self):
+        return Donation.objects.filter(donor=self.request.user).with_related()
 
-        return Response({
-            'posted_count': posted,
-            'claimed_count': claimed,
-            'expired_count': expired,
-            'posts': posts
-        })
+    def get_archive_queryset(self):
+        return ArchivedDonation.objects.filter(donor=self.request.user)
 
 
 # ---------------- New Order (Pickup Confirmation) API ---------------- #
 
-class OrderListCreateView(generics.ListCreateAPIView):
+class OrderListCreateView(ValuesListMixin, generics.ListCreateAPIView):
     """
-    GET: List confirmed orders of the logged-in user
+    GET: List confirmed orders of the logged-in user, archived ones
+         included; ?fields= narrows each order (e.g.
+         id,created_at,donation_details.name), ?expand=user
     POST: Confirm a donation order (only for NGO/Volunteer)
     """
     serializer_class = OrderSerializer
+    rows_class = OrderHistoryRows
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
-        return (
-            Order.objects.filter(user=self.request.user)
-            .select_related("donation", "user")
-            .order_by("-created_at")
-        )
+        return user_orders(self.request.user)
+
+    def get_archive_queryset(self):
+        return archived_orders(self.request.user)
 
     @transaction.atomic
     def perform_create(self, serializer):
@@ -161,14 +387,162 @@ class OrderListCreateView(generics.ListCreateAPIView):
         if not donation:
             raise PermissionDenied("Donation field is required.")
 
-        # ✅ Donation validation
-        donation.mark_if_expired()
-        if donation.is_expired:
-            raise PermissionDenied("This donation has expired and cannot be confirmed.")
-        if donation.is_claimed:
-            raise PermissionDenied("This donation has already been claimed.")
+        # ✅ Claim first with one conditional UPDATE; only the winner gets an Order
+        if not Donation.objects.claim(donation.pk):
+            if claim_failure_reason(donation.pk) == "expired":
+                raise PermissionDenied("This donation has expired and cannot be confirmed.")
+            raise Conflict()
 
-        # ✅ Save order and mark donation claimed atomically
-        serializer.save(user=user)
         donation.is_claimed = True
-        donation.save(update_fields=["is_claimed"])
+        serializer.save(user=user)
+        publish_event("claimed", donation_payload(donation))
+
+
+class OrderRouteView(APIView):
+    """
+    GET: Visiting order for the user's pending pickups (orders whose
+         donation has not expired), shortest trip that meets each
+         donation's expiry_time where possible. Starts at ?lat=&lng=,
+         else where the user confirmed their latest order; ?speed_kmh=
+         sets the average travel speed.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, format=None):
+        params = request.query_params
+        now = timezone.now()
+        orders = list(
+            Order.objects.filter(user=request.user, donation__is_expired=False)
+            .filter(Q(donation__expiry_time__isnull=True) | Q(donation__expiry_time__gt=now))
+            .select_related('donation')
+            .order_by(F('donation__expiry_time').asc(nulls_last=True), 'pk')[:MAX_ROUTE_STOPS]
+        )
+
+        start = None
+        if 'lat' in params or 'lng' in params:
+            lat = parse_coordinate(params.get('lat'), 90)
+            lng = parse_coordinate(params.get('lng'), 180)
+            if lat is None or lng is None:
+                raise ValidationError({'detail': 'lat and lng must be valid coordinates.'})
+            start = (lat, lng)
+        else:
+            latest = max((o for o in orders if o.latitude is not None), key=lambda o: o.created_at, default=None)
+            if latest is not None:
+                start = (float(latest.latitude), float(latest.longitude))
+
+        speed_kmh = DEFAULT_SPEED_KMH
+        if params.get('speed_kmh'):
+            try:
+                speed_kmh = float(params['speed_kmh'])
+            except ValueError:
+                raise ValidationError({'speed_kmh': 'Must be a number.'})
+            if not 0 < speed_kmh <= 200:
+                raise ValidationError({'speed_kmh': 'Must be between 0 and 200.'})
+
+        stops, unplaced = [], []
+        for order in orders:
+            donation = order.donation
+            # pick up where the food is; the confirmer's position only if the donation has none
+            lat = donation.latitude if donation.latitude is not None else order.latitude
+            lng = donation.longitude if donation.longitude is not None else order.longitude
+            if lat is None or lng is None:
+                unplaced.append(order.pk)
+            else:
+                stops.append(Stop(order, lat, lng, donation.expiry_time))
+
+        route = plan_route(stops, start=start, now=now, speed_kmh=speed_kmh)
+        for stop in route['stops']:
+            order = stop.pop('key')
+            stop.update(order=order.pk, donation=order.donation_id, name=order.donation.name)
+        route['start'] = {'latitude': start[0], 'longitude': start[1]} if start else None
+        route['unplaced_orders'] = unplaced
+        return Response(route)
+
+
+# ---------------- NGO requests ---------------- #
+
+class FoodRequestListCreateView(NearbyParamsMixin, generics.ListCreateAPIView):
+    """
+    GET: Open NGO requests, newest first, keyset-paginated (?cursor=&page_size=).
+         ?mine=true lists your own requests in any state instead;
+         ?food_type= filters; ?lat=&lng=&radius_km= returns only requests
+         within the radius, nearest first (not paginated).
+    POST: Create a request (NGO users only); open donations that fit it
+          are matched right away
+    """
+    serializer_class = FoodRequestSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    pagination_class = KeysetPagination
+
+    def get_queryset(self):
+        params = self.request.query_params
+        if params.get('mine') == 'true':
+            q = FoodRequest.objects.filter(ngo=self.request.user)
+        else:
+            q = FoodRequest.objects.open()
+        q = q.select_related('ngo')
+
+        food_type = params.get('food_type')
+        if food_type:
+            q = q.filter(food_type=food_type)
+
+        nearby = self.get_nearby_params()
+        if nearby:
+            lat, lng, radius_km = nearby
+            # bounding box on the indexed coordinates first, exact distance after
+            return within_radius(q.filter(bounding_box_q(lat, lng, radius_km)), lat, lng, radius_km)
+        return q
+
+    def paginate_queryset(self, queryset):
+        if isinstance(queryset, list):
+            return None
+        return super().paginate_queryset(queryset)
+
+    def perform_create(self, serializer):
+        if getattr(self.request.user, 'role', '').lower() != 'ngo':
+            raise PermissionDenied("Only NGO users can post requests.")
+        food_request = serializer.save(ngo=self.request.user)
+        match_request(food_request)
+
+
+class FoodRequestDetailView(generics.RetrieveUpdateDestroyAPIView):
+    """
+    GET: Any request
+    PATCH/PUT: Edit, fulfil or cancel your own request (re-matched while open)
+    DELETE: Only the NGO that posted it, or admin
+    """
+    queryset = FoodRequest.objects.select_related('ngo')
+    serializer_class = FoodRequestSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def check_owner(self, food_request):
+        user = self.request.user
+        if user.pk != food_request.ngo_id and not user.is_staff:
+            raise PermissionDenied("Only the NGO that posted this request can change it.")
+
+    def perform_update(self, serializer):
+        self.check_owner(serializer.instance)
+        food_request = serializer.save()
+        match_request(food_request)
+
+    def perform_destroy(self, instance):
+        self.check_owner(instance)
+        instance.delete()
+
+
+class RequestMatchListView(generics.ListAPIView):
+    """
+    GET: Your matches, newest first, keyset-paginated (?cursor=&page_size=).
+         NGO users see donations matched to their requests, everyone else
+         requests matched to their donations; ?as=ngo|donor overrides.
+    """
+    serializer_class = RequestMatchSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    pagination_class = KeysetPagination
+
+    def get_queryset(self):
+        user = self.request.user
+        side = self.request.query_params.get('as') or ('ngo' if getattr(user, 'role', '').lower() == 'ngo' else 'donor')
+        if side not in ('ngo', 'donor'):
+            raise ValidationError({'as': 'Use ngo or donor.'})
+        return RequestMatch.objects.filter(**{side: user}).select_related('request__ngo', 'donation')
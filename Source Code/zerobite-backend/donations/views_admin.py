@@ -4,7 +4,10 @@ from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.exceptions import NotFound
-from .models import Donation
+from .events import donation_payload, publish_event
+from .filters import filter_donations, filter_users, with_activity_counts
+from .models import ArchivedDonation, Donation
+from .pagination import KeysetPagination, UserKeysetPagination
 from .serializers import UserListSerializer, DonationAdminSerializer
 
 User = get_user_model()
@@ -13,19 +16,38 @@ User = get_user_model()
 class AdminUserListView(generics.ListAPIView):
     """
     GET /api/admin/users/  (admin only)
+    Newest first, keyset-paginated. Filters: role, is_staff, is_active,
+    q (username/email prefix). Rows carry donation_count and order_count.
     """
-    queryset = User.objects.all().order_by("-last_login")
     serializer_class = UserListSerializer
     permission_classes = [IsAuthenticated, IsAdminUser]
+    pagination_class = UserKeysetPagination
+
+    def get_queryset(self):
+        return with_activity_counts(filter_users(User.objects.all(), self.request.query_params))
 
 
 class AdminDonationListView(generics.ListAPIView):
     """
     GET /api/admin/donations/  (admin only)
+    Newest first, keyset-paginated, archived donations included. Filters:
+    from, to, claimed, expired, donor, role, q (name prefix); see
+    donations/filters.py.
     """
-    queryset = Donation.objects.all().order_by("-created_at")
     serializer_class = DonationAdminSerializer
     permission_classes = [IsAuthenticated, IsAdminUser]
+    pagination_class = KeysetPagination
+
+    def get_queryset(self):
+        return filter_donations(Donation.objects.with_related(), self.request.query_params)
+
+    def get_archive_queryset(self):
+        return filter_donations(ArchivedDonation.objects.with_related(), self.request.query_params)
+
+    def list(self, request, *args, **kwargs):
+        querysets = [self.filter_queryset(self.get_queryset()), self.get_archive_queryset()]
+        page = self.paginator.paginate_querysets(querysets, request, view=self)
+        return self.get_paginated_response(self.get_serializer(page, many=True).data)
 
 
 class AdminDonationDeleteView(APIView):
@@ -36,9 +58,11 @@ class AdminDonationDeleteView(APIView):
 
     def delete(self, request, pk, format=None):
         try:
-            donation = Donation.objects.get(pk=pk)
+            donation = Donation.objects.select_related("donor").get(pk=pk)
         except Donation.DoesNotExist:
             raise NotFound(detail="Donation not found")
 
+        payload = donation_payload(donation)
         donation.delete()
+        publish_event("deleted", payload)
         return Response(status=status.HTTP_204_NO_CONTENT)
@@ -0,0 +1,129 @@
+# users/authentication.py
+"""
+JWT authentication that skips the per-request User query.
+
+The fields views actually read from request.user are cached per user id
+on Django's cache framework (USER_AUTH_CACHE_ALIAS). Saving or deleting
+a user drops its entry (users/signals.py), so a role, is_staff,
+is_active or password change applies to the next request. With a
+per-process cache other workers catch up within USER_AUTH_CACHE_TIMEOUT;
+point the alias at a shared backend to make invalidation global.
+
+aload_user() and CachedJWTAuthentication.aauthenticate() are the same
+for async views (donations/async_views.py): a cache hit needs no thread,
+a miss reads through the async ORM.
+"""
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import router
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+User = get_user_model()
+
+KEY_PREFIX = "users:auth:v1"
+
+# loaded on the cached instance; anything else is fetched lazily on access.
+# Kept in model field order, which Model.from_db() expects.
+CACHED_FIELDS = tuple(
+    f.attname for f in User._meta.concrete_fields
+    if f.attname in {"id", "username", "email", "role", "avatar", "is_active", "is_staff", "is_superuser"}
+)
+
+
+def get_cache():
+    return caches[getattr(settings, "USER_AUTH_CACHE_ALIAS", "default")]
+
+
+def cache_key(user_id):
+    return f"{KEY_PREFIX}:{user_id}"
+
+
+def invalidate_user(user_id):
+    get_cache().delete(cache_key(user_id))
+
+
+def _user_values(user_id):
+    return User.objects.filter(**{api_settings.USER_ID_FIELD: user_id}).values_list(*CACHED_FIELDS)
+
+
+def cache_timeout():
+    return getattr(settings, "USER_AUTH_CACHE_TIMEOUT", 60)
+
+
+def _cache_values(key, values):
+    get_cache().set(key, values, timeout=cache_timeout())
+
+
+def _from_values(values):
+    # from_db marks the rest as deferred: reading them costs a query, and
+    # save() only writes the loaded fields instead of clobbering the others
+    return User.from_db(router.db_for_read(User), CACHED_FIELDS, values)
+
+
+def load_user(user_id):
+    """Return a User with CACHED_FIELDS loaded, or None if it doesn't exist."""
+    key = cache_key(user_id)
+    values = get_cache().get(key)
+    if values is None:
+        values = _user_values(user_id).first()
+        if values is None:
+            return None
+        _cache_values(key, values)
+    return _from_values(values)
+
+
+async def aload_user(user_id):
+    """load_user() for async views, through the cache's async API."""
+    key = cache_key(user_id)
+    values = await get_cache().aget(key)
+    if values is None:
+        values = await _user_values(user_id).afirst()
+        if values is None:
+            return None
+        await get_cache().aset(key, values, timeout=cache_timeout())
+    return _from_values(values)
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    def get_user(self, validated_token):
+        if api_settings.CHECK_REVOKE_TOKEN:
+            # revocation compares against the password hash, which is not cached
+            return super().get_user(validated_token)
+
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken("Token contained no recognizable user identification")
+
+        return self.check_user(load_user(user_id))
+
+    def check_user(self, user):
+        if user is None:
+            raise AuthenticationFailed("User not found", code="user_not_found")
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed("User is inactive", code="user_inactive")
+        return user
+
+    async def aget_user(self, validated_token):
+        if api_settings.CHECK_REVOKE_TOKEN:
+            return await sync_to_async(super().get_user)(validated_token)
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken("Token contained no recognizable user identification")
+        return self.check_user(await aload_user(user_id))
+
+    async def aauthenticate(self, request):
+        """authenticate() for async views: (user, token) or None."""
+        header = self.get_header(request)
+        if header is None:
+            return None
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+        validated_token = self.get_validated_token(raw_token)
+        return await self.aget_user(validated_token), validated_token
@@ -0,0 +1,41 @@
+# users/backends.py
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.db.models import Q
+
+User = get_user_model()
+
+
+class UsernameOrEmailBackend(ModelBackend):
+    """
+    Authenticate with a username or an email address (any case).
+
+    Both identifiers are resolved in one query over the unique username
+    and email_normalized indexes, and the password is hashed exactly once
+    whether or not an account matches.
+    """
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        if username is None:
+            username = kwargs.get(User.USERNAME_FIELD)
+        if not username or password is None:
+            return None
+
+        identifier = username.strip()
+        candidates = list(
+            User._default_manager.filter(
+                Q(username=identifier) | Q(email_normalized=User.normalize_email_key(identifier))
+            )[:2]
+        )
+        # someone's username may look like another account's email; the username wins
+        user = next((u for u in candidates if u.username == identifier), None)
+        if user is None and candidates:
+            user = candidates[0]
+
+        if user is None:
+            # same hashing cost as a real attempt, so response time doesn't reveal which accounts exist
+            User().set_password(password)
+            return None
+        if user.check_password(password) and self.user_can_authenticate(user):
+            return user
+        return None
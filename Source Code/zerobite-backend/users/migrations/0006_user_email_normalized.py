@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:20
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+from django.db.models.functions import Lower, Trim
+
+
+def backfill_email_normalized(apps, schema_editor):
+    User = apps.get_model("users", "User")
+    User.objects.exclude(email="").update(email_normalized=Lower(Trim("email")))
+    # emails that differ only by case: the oldest account keeps the key,
+    # the others can still sign in by username
+    clashes = (
+        User.objects.exclude(email_normalized=None)
+        .values("email_normalized")
+        .annotate(n=Count("pk"), keep=Min("pk"))
+        .filter(n__gt=1)
+    )
+    for clash in clashes:
+        User.objects.filter(email_normalized=clash["email_normalized"]).exclude(pk=clash["keep"]).update(
+            email_normalized=None
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0005_user_list_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='email_normalized',
+            field=models.CharField(editable=False, max_length=254, null=True),
+        ),
+        migrations.RunPython(backfill_email_normalized, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='user',
+            name='email_normalized',
+            field=models.CharField(editable=False, max_length=254, null=True, unique=True),
+        ),
+    ]
@@ -12,6 +12,10 @@ class User(AbstractUser):
 
     # keep username from AbstractUser; make email unique
     email = models.EmailField(unique=True)
+    # lowercased copy of email, kept in sync by save(); its unique index serves
+    # case-insensitive lookups (login, registration) without a table scan.
+    # Writes that skip save() (bulk_create, update) must set it too.
+    email_normalized = models.CharField(max_length=254, unique=True, null=True, editable=False)
 
     # role information
     role = models.CharField(max_length=50, choices=ROLE_CHOICES, default="other")
@@ -23,6 +27,24 @@ class User(AbstractUser):
     # small avatar filename or URL; you can replace with ImageField if you want uploads
     avatar = models.CharField(max_length=200, default="avatar1.png")
 
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            # keyset pagination of the admin user lists (donations/pagination.py)
+            models.Index(fields=["date_joined", "id"]),
+            models.Index(fields=["role", "date_joined", "id"]),
+        ]
+
+    @staticmethod
+    def normalize_email_key(email):
+        return (email or "").strip().lower() or None
+
+    def save(self, *args, **kwargs):
+        self.email_normalized = self.normalize_email_key(self.email)
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and "email" in update_fields:
+            kwargs["update_fields"] = {*update_fields, "email_normalized"}
+        super().save(*args, **kwargs)
+
     def __str__(self):
         # return username and role for clarity
         return f"{self.username} ({self.role})"
@@ -19,7 +19,7 @@ class RegisterSerializer(serializers.ModelSerializer):
 
     def validate_email(self, value):
         value = value.lower()
-        if User.objects.filter(email__iexact=value).exists():
+        if User.objects.filter(email_normalized=User.normalize_email_key(value)).exists():
             raise serializers.ValidationError("A user with that email already exists.")
         return value
 
@@ -0,0 +1,20 @@
+# users/signals.py
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .authentication import invalidate_user
+
+User = get_user_model()
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def drop_cached_auth_user(sender, instance, **kwargs):
+    # role, is_staff, is_active and password changes all go through save();
+    # bulk .update() calls must invalidate explicitly
+    pk = instance.pk
+    invalidate_user(pk)
+    # again after commit, in case a concurrent request re-cached the old row meanwhile
+    transaction.on_commit(lambda: invalidate_user(pk))
@@ -1,3 +1,117 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
 
-# Create your tests here.
+from .authentication import load_user
+
+User = get_user_model()
+
+
+class LoginTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create(username="kitchen", email="Chef@Example.com", role="restaurant")
+        self.user.set_password("s3cret-pass")
+        self.user.save()
+
+    def login(self, identifier, password="s3cret-pass"):
+        return self.client.post("/api/login/", {"username": identifier, "password": password}, format="json")
+
+    def test_email_key_follows_email(self):
+        self.assertEqual(self.user.email_normalized, "chef@example.com")
+        self.user.email = "Cook@Example.com"
+        self.user.save(update_fields=["email"])
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.email_normalized, "cook@example.com")
+
+    def test_username_or_email_in_any_case(self):
+        for identifier in ("kitchen", "chef@example.com", " CHEF@example.COM "):
+            response = self.login(identifier)
+            self.assertEqual(response.status_code, 200, identifier)
+            self.assertEqual(response.data["user"]["username"], "kitchen")
+
+    def test_failures(self):
+        self.assertEqual(self.login("kitchen", "wrong").status_code, 401)
+        self.assertEqual(self.login("nobody@example.com").status_code, 401)
+
+    def test_one_lookup_query(self):
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(self.login("chef@example.com").status_code, 200)
+        lookups = [q for q in ctx.captured_queries if q["sql"].startswith("SELECT")]
+        self.assertEqual(len(lookups), 1, [q["sql"] for q in lookups])
+
+    def test_register_rejects_email_in_other_case(self):
+        response = self.client.post("/api/register/", {
+            "username": "other", "email": "CHEF@EXAMPLE.COM", "password": "an0ther-pass!",
+        }, format="json")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("email", response.data)
+
+
+class CachedJWTAuthenticationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.admin = User.objects.create(username="admin", email="admin@example.com", is_staff=True)
+        self.user = User.objects.create(username="helper", email="helper@example.com", role="volunteer")
+        self.user.set_password("0ld-password!")
+        self.user.save()
+        token = RefreshToken.for_user(self.user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+
+    def user_queries(self, url="/api/orders/"):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        table = User._meta.db_table
+        return response, [q for q in ctx.captured_queries if f'FROM "{table}"' in q["sql"]]
+
+    def test_second_request_skips_user_query(self):
+        response, first = self.user_queries()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(first), 1)
+        response, second = self.user_queries()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(second, [])
+
+    def test_role_change_applies_to_next_request(self):
+        self.user_queries()
+        self.user.role = "ngo"
+        self.user.save(update_fields=["role"])
+        response = self.client.post("/api/orders/", {"donation": 999}, format="json")
+        # NGO passes the role check and fails on the missing donation instead
+        self.assertEqual(response.status_code, 400)
+
+    def test_deactivation_and_delete_lock_out(self):
+        self.user_queries()
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get("/api/orders/").status_code, 401)
+
+        self.user.is_active = True
+        self.user.save()
+        self.assertEqual(self.client.get("/api/orders/").status_code, 200)
+
+        admin = APIClient()
+        admin.force_authenticate(self.admin)
+        self.assertEqual(admin.delete(f"/api/users/{self.user.pk}/").status_code, 204)
+        self.assertEqual(self.client.get("/api/orders/").status_code, 401)
+
+    def test_password_reset_invalidates(self):
+        self.user_queries()
+        admin = APIClient()
+        admin.force_authenticate(self.admin)
+        response = admin.post("/api/reset-password-direct/", {"username": "helper", "password": "n3w-password!"})
+        self.assertEqual(response.status_code, 200)
+        _, queries = self.user_queries()
+        self.assertEqual(len(queries), 1)
+
+    def test_cached_user_fields(self):
+        self.user_queries()
+        _, queries = self.user_queries("/api/donations/user_stats/")
+        self.assertEqual(queries, [])
+        cached = load_user(self.user.pk)
+        self.assertEqual((cached.username, cached.email, cached.role), ("helper", "helper@example.com", "volunteer"))
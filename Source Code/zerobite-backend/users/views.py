@@ -9,6 +9,9 @@ from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAdminUser, IsAuthenticated
 
+from donations.filters import filter_users
+from donations.pagination import UserKeysetPagination
+
 from .serializers import RegisterSerializer, UserSerializer
 
 User = get_user_model()
@@ -32,17 +35,8 @@ class LoginView(APIView):
         if not username_or_email or not password:
             return Response({"detail": "username and password required"}, status=400)
 
-        # Try authenticate by username
-        user = authenticate(username=username_or_email, password=password)
-
-        # Try by email if not found
-        if user is None:
-            try:
-                lookup = User.objects.get(email__iexact=username_or_email)
-            except User.DoesNotExist:
-                lookup = None
-            if lookup:
-                user = authenticate(username=lookup.username, password=password)
+        # username or email, resolved in one query (users/backends.py)
+        user = authenticate(request, username=username_or_email, password=password)
 
         if user is None:
             return Response({"detail": "Invalid credentials"}, status=401)
@@ -63,10 +57,13 @@ class LoginView(APIView):
 
 
 class UserListView(generics.ListAPIView):
-    """Admin-only: list all users ordered by newest first."""
-    queryset = User.objects.all().order_by("-date_joined")
+    """Admin-only: list users newest first, keyset-paginated. Filters: role, is_staff, is_active, q."""
     serializer_class = UserSerializer
     permission_classes = [permissions.IsAdminUser]
+    pagination_class = UserKeysetPagination
+
+    def get_queryset(self):
+        return filter_users(User.objects.all(), self.request.query_params)
 
 
 class UserDeleteView(APIView):
@@ -2,30 +2,129 @@
 import React, { useEffect, useState } from "react";
 import authFetch from "../utils/authFetch";
 
-export default function AvailableDonationsList({ sourceFilter = "all" }) {
+const API_BASE = process.env.REACT_APP_API_URL || "http://127.0.0.1:8000/api";
+// donations within this distance of the user, when the browser shares a position
+const AREA_RADIUS_KM = 10;
+
+export default function AvailableDonationsList({ sourceFilter = "all", query = "" }) {
   const [items, setItems] = useState(null);
+  const [nextUrl, setNextUrl] = useState(null);
+  // undefined while the browser is asked, null if it gives no position
+  const [coords, setCoords] = useState(undefined);
+
+  useEffect(() => {
+    if (!navigator.geolocation) {
+      setCoords(null);
+      return;
+    }
+    navigator.geolocation.getCurrentPosition(
+      (pos) => setCoords({ lat: pos.coords.latitude.toFixed(6), lng: pos.coords.longitude.toFixed(6) }),
+      () => setCoords(null),
+      { timeout: 10000, maximumAge: 300000 }
+    );
+  }, []);
+
+  // the same area for the list and the event stream, so the stream
+  // carries the claims and expiries of every listed donation
+  const areaParams = () => {
+    const params = new URLSearchParams();
+    if (coords) {
+      params.set("lat", coords.lat);
+      params.set("lng", coords.lng);
+      params.set("radius_km", AREA_RADIUS_KM);
+    }
+    return params;
+  };
 
   const fetchItems = async (source) => {
     setItems(null);
     try {
-      let url = `/api/donations/`;
+      const params = areaParams();
       // you can add filters: ?role=RESTAURANT or ?include_expired=true
-      if (source && source !== "all") url += `?source=${encodeURIComponent(source)}`;
-      const res = await authFetch(url);
+      if (source && source !== "all") params.set("source", source);
+      if (query.trim()) params.set("q", query.trim());
+      const qs = params.toString();
+      const res = await authFetch(`/api/donations/${qs ? `?${qs}` : ""}`);
       if (!res.ok) throw new Error(`Fetch failed: ${res.status}`);
       const data = await res.json();
-      setItems(data);
+      // the feed is cursor-paginated ({ next, previous, results }); ?q= and
+      // area searches are one ranked page, `truncated` when more matched
+      setItems(Array.isArray(data) ? data : (data.results || []));
+      setNextUrl(Array.isArray(data) ? null : data.next);
     } catch (e) {
       console.error("fetchItems error", e);
       setItems([]); // show empty on error
+      setNextUrl(null);
+    }
+  };
+
+  const loadMore = async () => {
+    if (!nextUrl) return;
+    try {
+      const res = await authFetch(nextUrl);
+      if (!res.ok) throw new Error(`Fetch failed: ${res.status}`);
+      const data = await res.json();
+      setItems(prev => [...(prev || []), ...(data.results || [])]);
+      setNextUrl(data.next);
+    } catch (e) {
+      console.error("loadMore error", e);
     }
   };
 
   useEffect(() => {
+    if (coords === undefined) return undefined;
     fetchItems(sourceFilter);
-    const id = setInterval(() => fetchItems(sourceFilter), 60000); // refresh every 60s
-    return () => clearInterval(id);
-  }, [sourceFilter]);
+
+    // live updates pushed by the server (served by the ASGI app only); poll
+    // every 60s while the stream is unavailable, e.g. under runserver
+    let pollId = null;
+    const startPolling = () => {
+      if (!pollId) pollId = setInterval(() => fetchItems(sourceFilter), 60000);
+    };
+    const stopPolling = () => {
+      clearInterval(pollId);
+      pollId = null;
+    };
+    if (!window.EventSource) {
+      startPolling();
+      return stopPolling;
+    }
+    const streamParams = areaParams();
+    if (sourceFilter && sourceFilter !== "all") streamParams.set("role", sourceFilter);
+    const qs = streamParams.toString();
+    const events = new EventSource(`${API_BASE}/events/${qs ? `?${qs}` : ""}`);
+    const openTimer = setTimeout(startPolling, 10000);
+    events.onopen = () => {
+      clearTimeout(openTimer);
+      // reconnected after an error: catch up on what the stream missed
+      if (pollId) fetchItems(sourceFilter);
+      stopPolling();
+    };
+    // the browser retries dropped streams, but not a 404 or a non-stream response
+    events.onerror = startPolling;
+    const removeItem = (e) => {
+      const { id } = JSON.parse(e.data);
+      setItems(prev => (prev ? prev.filter(i => i.id !== id) : prev));
+    };
+    // add new donations from the event itself: a refetch per event by every
+    // open client would cost more than the polling this replaces. Searches
+    // are ranked by the server, so they only pick them up on the next fetch
+    const addItem = (e) => {
+      if (query.trim()) return;
+      const donation = JSON.parse(e.data);
+      setItems(prev => (prev && !prev.some(i => i.id === donation.id) ? [donation, ...prev] : prev));
+    };
+    events.addEventListener("created", addItem);
+    events.addEventListener("claimed", removeItem);
+    events.addEventListener("expired", removeItem);
+    events.addEventListener("deleted", removeItem);
+    return () => {
+      clearTimeout(openTimer);
+      stopPolling();
+      events.close();
+    };
+    // eslint-disable-next-line react-hooks/exhaustive-deps
+  }, [sourceFilter, query, coords]);
 
   const handleClaim = (id) => {
     setItems(prev => prev.filter(i => i.id !== id));
@@ -37,6 +136,7 @@ export default function AvailableDonationsList({ sourceFilter = "all" }) {
   return (
     <div>
       {items.map(i => <DonationCard key={i.id} donation={i} onClaimed={handleClaim} />)}
+      {nextUrl && <button onClick={loadMore}>Load more</button>}
     </div>
   );
 }
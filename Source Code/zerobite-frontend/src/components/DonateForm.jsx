@@ -10,12 +10,24 @@ const GOOGLE_KEY =
 const defaultCenter = { lat: 13.0827, lng: 80.2707 };
 const mapLibraries = ["places"];
 
+// keep in sync with FOOD_TYPE_CHOICES in donations/models.py
+export const FOOD_TYPES = [
+  ["cooked", "Cooked meals"],
+  ["bakery", "Bakery"],
+  ["produce", "Fruit & vegetables"],
+  ["dairy", "Dairy"],
+  ["packaged", "Packaged food"],
+  ["beverages", "Beverages"],
+  ["other", "Other"],
+];
+
 export default function DonateForm({ onSuccess, onCancel }) {
   const [form, setForm] = useState({
     donor_name: "",
     contact_number: "",
     name: "",
     quantity: 1,
+    food_type: "other",
     location: "",
     latitude: "",
     longitude: "",
@@ -271,6 +283,7 @@ export default function DonateForm({ onSuccess, onCancel }) {
       fd.append("contact_number", form.contact_number || "");
       fd.append("name", form.name || "");
       fd.append("quantity", Number(form.quantity));
+      fd.append("food_type", form.food_type || "other");
       // always send location string (human readable) when available
       fd.append("location", form.location || "");
 
@@ -319,6 +332,7 @@ export default function DonateForm({ onSuccess, onCancel }) {
         contact_number: "",
         name: "",
         quantity: 1,
+        food_type: "other",
         location: "",
         latitude: "",
         longitude: "",
@@ -349,6 +363,9 @@ export default function DonateForm({ onSuccess, onCancel }) {
         <input name="contact_number" placeholder="Contact number" value={form.contact_number} onChange={handleChange} required />
         <input name="name" placeholder="Food name" value={form.name} onChange={handleChange} required />
         <input type="number" name="quantity" min="1" placeholder="Amount of food" value={form.quantity} onChange={handleChange} required />
+        <select name="food_type" value={form.food_type} onChange={handleChange}>
+          {FOOD_TYPES.map(([value, label]) => <option key={value} value={value}>{label}</option>)}
+        </select>
 
         {isLoaded && !loadError ? (
           <div style={{ position: "relative" }}>
@@ -124,7 +124,8 @@ export default function DonationsList({ className = "" }) {
         const res = await authFetch(url);
         if (!res.ok) throw new Error(`Could not fetch donations (${res.status})`);
         const data = await res.json();
-        if (mounted) setDonations(Array.isArray(data) ? data : []);
+        // list is cursor-paginated: { next, previous, results }
+        if (mounted) setDonations(Array.isArray(data) ? data : (data.results || []));
       } catch (err) {
         console.error("fetchDonations error:", err);
         if (mounted) setError(err.message || "Could not fetch donations");
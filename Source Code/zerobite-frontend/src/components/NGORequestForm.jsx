@@ -1,14 +1,28 @@
 // src/components/NGORequestForm.jsx
-import React, { useState, useContext } from 'react';
+import React, { useState, useContext, useEffect } from 'react';
 import { AuthContext } from '../context/AuthContext';
+import { FOOD_TYPES } from './DonateForm';
 
 export default function NGORequestForm({ onSuccess }) {
   const [dateNeeded, setDateNeeded] = useState('');
   const [notes, setNotes] = useState('');
+  const [foodType, setFoodType] = useState('any');
+  const [quantity, setQuantity] = useState(1);
+  const [coords, setCoords] = useState(null);
   const [loading, setLoading] = useState(false);
   const { accessToken } = useContext(AuthContext);
   const apiUrl = process.env.REACT_APP_API_URL || 'http://127.0.0.1:8000/api';
 
+  // requests are matched to donations near this point (server side)
+  useEffect(() => {
+    if (!navigator.geolocation) return;
+    navigator.geolocation.getCurrentPosition(
+      (pos) => setCoords({ latitude: pos.coords.latitude.toFixed(6), longitude: pos.coords.longitude.toFixed(6) }),
+      () => setCoords(null),
+      { timeout: 10000 }
+    );
+  }, []);
+
   const submit = async (e) => {
     e.preventDefault();
     if (!accessToken && !localStorage.getItem('access')) { alert('Login as NGO to request'); return; }
@@ -20,7 +34,9 @@ export default function NGORequestForm({ onSuccess }) {
           'Content-Type': 'application/json',
           'Authorization': `Bearer ${accessToken || localStorage.getItem('access')}`,
         },
-        body: JSON.stringify({ date_needed: dateNeeded, notes }),
+        body: JSON.stringify({
+          date_needed: dateNeeded, notes, food_type: foodType, quantity: Number(quantity), ...(coords || {}),
+        }),
       });
       if (!res.ok) throw new Error('Request failed');
       const data = await res.json();
@@ -37,6 +53,14 @@ export default function NGORequestForm({ onSuccess }) {
     <form className="ngo-request-form" onSubmit={submit}>
       <label>Date needed</label>
       <input type="date" value={dateNeeded} onChange={e=>setDateNeeded(e.target.value)} required />
+      <label>Food type</label>
+      <select value={foodType} onChange={e=>setFoodType(e.target.value)}>
+        <option value="any">Any</option>
+        {FOOD_TYPES.map(([value, label]) => <option key={value} value={value}>{label}</option>)}
+      </select>
+      <label>Quantity</label>
+      <input type="number" min="1" value={quantity} onChange={e=>setQuantity(e.target.value)} required />
+      {!coords && <small>Allow location access so nearby donations can be matched.</small>}
       <label>Notes (optional)</label>
       <textarea value={notes} onChange={e=>setNotes(e.target.value)} />
       <button type="submit" disabled={loading}>{loading ? 'Sending...' : 'Request'}</button>
@@ -5,18 +5,27 @@ import { useNavigate } from "react-router-dom";
 
 export default function ProfileSidebar({ onClose }) {
   const [stats, setStats] = useState(null);
+  const [recent, setRecent] = useState([]);
   const navigate = useNavigate();
 
   useEffect(() => {
     let mounted = true;
     async function load() {
-      const res = await authFetch("/api/donations/user_stats/");
+      // counts and the first few posts are separate, small requests
+      const [res, postsRes] = await Promise.all([
+        authFetch("/api/donations/user_stats/"),
+        authFetch("/api/donations/user_stats/posts/?page_size=6"),
+      ]);
       if (!mounted) return;
       if (!res.ok) {
         setStats(null); return;
       }
       const data = await res.json();
       setStats(data);
+      if (postsRes.ok) {
+        const posts = await postsRes.json();
+        if (mounted) setRecent(posts.results || []);
+      }
     }
     load();
     return () => mounted = false;
@@ -32,7 +41,7 @@ export default function ProfileSidebar({ onClose }) {
       <div>Claimed: {stats.claimed_count}</div>
       <div>Expired: {stats.expired_count}</div>
       <h4>Recent</h4>
-      {stats.posts.slice(0,6).map(p => (
+      {recent.map(p => (
         <div key={p.id} style={{padding:"8px 0", borderBottom:"1px dashed #eee"}} onClick={() => { navigate("/available"); onClose && onClose(); }}>
           <div>{p.name} ×{p.quantity}</div>
           <div style={{fontSize:12, color:"#666"}}>{p.is_expired ? "Expired" : (p.is_claimed ? "Claimed" : "Available")}</div>
@@ -14,6 +14,11 @@ function getAuthHeaders() {
 export default function AdminDashboard() {
   const [users, setUsers] = useState([]);
   const [donations, setDonations] = useState([]);
+  // admin lists are cursor-paginated and filtered server-side
+  const [usersNext, setUsersNext] = useState(null);
+  const [donationsNext, setDonationsNext] = useState(null);
+  const [userSearch, setUserSearch] = useState("");
+  const [donationSearch, setDonationSearch] = useState("");
   const [loadingUsers, setLoadingUsers] = useState(true);
   const [loadingDonations, setLoadingDonations] = useState(true);
   const [error, setError] = useState("");
@@ -35,14 +40,16 @@ export default function AdminDashboard() {
     await Promise.all([fetchUsers(), fetchDonations()]);
   };
 
-  const fetchUsers = async () => {
+  const fetchUsers = async (url = null) => {
     setLoadingUsers(true);
     setError("");
     try {
-      const res = await axios.get(`${API_BASE}/users/`, {
+      const res = await axios.get(url || `${API_BASE}/admin/users/`, {
         headers: { ...getAuthHeaders() },
+        params: url ? undefined : { q: userSearch || undefined },
       });
-      setUsers(res.data);
+      setUsers((prev) => (url ? [...prev, ...res.data.results] : res.data.results));
+      setUsersNext(res.data.next);
     } catch (err) {
       console.error("fetchUsers error", err?.response?.data || err.message);
       if (err.response && err.response.status === 401) {
@@ -57,14 +64,15 @@ export default function AdminDashboard() {
     }
   };
 
-  const fetchDonations = async () => {
+  const fetchDonations = async (url = null) => {
     setLoadingDonations(true);
     try {
-      const res = await axios.get(`${API_BASE}/donations/`, {
+      const res = await axios.get(url || `${API_BASE}/admin/donations/`, {
         headers: { ...getAuthHeaders() },
+        params: url ? undefined : { q: donationSearch || undefined },
       });
-      // API returns list of donations (not paginated here)
-      setDonations(res.data);
+      setDonations((prev) => (url ? [...prev, ...res.data.results] : res.data.results));
+      setDonationsNext(res.data.next);
     } catch (err) {
       console.error("fetchDonations error", err?.response?.data || err.message);
       if (err.response && err.response.status === 401) {
@@ -115,7 +123,7 @@ export default function AdminDashboard() {
   const confirmAndDeleteDonation = async (id, name) => {
     if (!window.confirm(`Delete donation "${name}" (id ${id})? This is permanent.`)) return;
     try {
-      const url = `${API_BASE}/donations/${id}/`;
+      const url = `${API_BASE}/admin/donations/${id}/`;
       console.log("Deleting donation URL:", url);
       await axios.delete(url, {
         headers: { ...getAuthHeaders() },
@@ -142,7 +150,19 @@ export default function AdminDashboard() {
 
       <section className="admin-section">
         <h2>Users</h2>
-        {loadingUsers ? (
+        <form
+          className="admin-search"
+          onSubmit={(e) => { e.preventDefault(); fetchUsers(); }}
+        >
+          <input
+            type="search"
+            placeholder="Username or email starts with…"
+            value={userSearch}
+            onChange={(e) => setUserSearch(e.target.value)}
+          />
+          <button type="submit">Search</button>
+        </form>
+        {loadingUsers && users.length === 0 ? (
           <p>Loading users…</p>
         ) : (
           <div className="table-wrap">
@@ -155,12 +175,14 @@ export default function AdminDashboard() {
                   <th>Role</th>
                   <th>Staff</th>
                   <th>Superuser</th>
+                  <th>Donations</th>
+                  <th>Orders</th>
                   <th>Actions</th>
                 </tr>
               </thead>
               <tbody>
                 {users.length === 0 ? (
-                  <tr><td colSpan="7">No users found.</td></tr>
+                  <tr><td colSpan="9">No users found.</td></tr>
                 ) : users.map((u) => (
                   <tr key={u.id}>
                     <td>{u.id}</td>
@@ -169,6 +191,8 @@ export default function AdminDashboard() {
                     <td>{u.role}</td>
                     <td>{u.is_staff ? "✅" : "—"}</td>
                     <td>{u.is_superuser ? "✅" : "—"}</td>
+                    <td>{u.donation_count}</td>
+                    <td>{u.order_count}</td>
                     <td>
                       {!u.is_superuser && (
                         <button
@@ -183,13 +207,28 @@ export default function AdminDashboard() {
                 ))}
               </tbody>
             </table>
+            {usersNext && (
+              <button disabled={loadingUsers} onClick={() => fetchUsers(usersNext)}>Load more</button>
+            )}
           </div>
         )}
       </section>
 
       <section className="admin-section">
         <h2>Donations</h2>
-        {loadingDonations ? (
+        <form
+          className="admin-search"
+          onSubmit={(e) => { e.preventDefault(); fetchDonations(); }}
+        >
+          <input
+            type="search"
+            placeholder="Donation name starts with…"
+            value={donationSearch}
+            onChange={(e) => setDonationSearch(e.target.value)}
+          />
+          <button type="submit">Search</button>
+        </form>
+        {loadingDonations && donations.length === 0 ? (
           <p>Loading donations…</p>
         ) : (
           <div className="table-wrap">
@@ -232,6 +271,9 @@ export default function AdminDashboard() {
                 ))}
               </tbody>
             </table>
+            {donationsNext && (
+              <button disabled={loadingDonations} onClick={() => fetchDonations(donationsNext)}>Load more</button>
+            )}
           </div>
         )}
       </section>
@@ -11,7 +11,7 @@ export default function DonationHistory() {
     setLoading(true);
     setErr(null);
     try {
-      const res = await authFetch("http://127.0.0.1:8000/api/orders/", { method: "GET" });
+      const res = await authFetch("http://127.0.0.1:8000/api/orders/?fields=id,donation,confirmation_note,latitude,longitude,created_at,donation_details.name", { method: "GET" });
       if (!res.ok) throw new Error(`HTTP ${res.status}`);
       const data = await res.json();
       setOrders(Array.isArray(data) ? data : []);
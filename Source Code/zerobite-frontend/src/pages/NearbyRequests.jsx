@@ -3,19 +3,6 @@ import React, { useEffect, useState, useContext } from "react";
 import axios from "axios";
 import { AuthContext } from "../context/AuthContext";
 
-function haversineDistance(lat1, lon1, lat2, lon2) {
-  const toRad = (v) => (v * Math.PI) / 180;
-  const R = 6371; // km
-  const dLat = toRad(lat2 - lat1);
-  const dLon = toRad(lon2 - lon1);
-  const a =
-    Math.sin(dLat / 2) * Math.sin(dLat / 2) +
-    Math.cos(toRad(lat1)) * Math.cos(toRad(lat2)) *
-    Math.sin(dLon / 2) * Math.sin(dLon / 2);
-  const c = 2 * Math.atan2(Math.sqrt(a), Math.sqrt(1 - a));
-  return R * c;
-}
-
 const NearbyRequests = ({ radiusKm = 10 }) => {
   const { token } = useContext(AuthContext);
   const [coords, setCoords] = useState(null);
@@ -41,25 +28,13 @@ const NearbyRequests = ({ radiusKm = 10 }) => {
     const load = async () => {
       setLoading(true);
       try {
-        // Option A (recommended): server-side endpoint accepts lat/lng/radius
-        // const res = await axios.get(`/api/requests?lat=${coords.lat}&lng=${coords.lng}&radius=${radiusKm}`, { headers: { Authorization: `Bearer ${token}` }});
-
-        // Option B: fetch all and filter client-side (OK for prototyping)
-        const res = await axios.get("/api/requests", { headers: { Authorization: `Bearer ${token}` }});
+        // the server filters by distance and returns rows nearest first with distance_km
+        const res = await axios.get("/api/requests/", {
+          params: { lat: coords.lat, lng: coords.lng, radius_km: radiusKm },
+          headers: { Authorization: `Bearer ${token}` },
+        });
         const list = res.data || [];
-
-        // filter for nearby (ensure each item has .lat and .lng or .location.coords)
-        const nearbyList = list
-          .map((r) => {
-            const lat = r.lat || (r.location && r.location.lat);
-            const lng = r.lng || (r.location && r.location.lng);
-            if (lat == null || lng == null) return null;
-            const distance = haversineDistance(coords.lat, coords.lng, Number(lat), Number(lng));
-            return { ...r, distance };
-          })
-          .filter(Boolean)
-          .filter((r) => r.distance <= radiusKm)
-          .sort((a, b) => a.distance - b.distance);
+        const nearbyList = list.map((r) => ({ ...r, distance: r.distance_km }));
 
         setRequests(list);
         setNearby(nearbyList);
@@ -82,9 +57,9 @@ const NearbyRequests = ({ radiusKm = 10 }) => {
       {!nearby.length && <p>No nearby requests found right now.</p>}
       <ul>
         {nearby.map((r) => (
-          <li key={r.id || `${r.lat}-${r.lng}-${r.id}`}>
-            <strong>{r.title || r.item || "Request"}</strong>
-            <div>{r.quantity ? `${r.quantity}` : ""} • {r.address || r.location?.label || ""}</div>
+          <li key={r.id}>
+            <strong>{r.notes || `${r.food_type} request`}</strong>
+            <div>{r.quantity ? `${r.quantity}` : ""} • {r.location || r.ngo_username || ""}</div>
             <div>{r.distance.toFixed(1)} km away</div>
             <button onClick={() => console.info("Accept request", r.id)}>Accept</button>
           </li>
@@ -7,7 +7,7 @@ export default function OrderHistory() {
 
   useEffect(() => {
     async function loadOrders() {
-      const res = await authFetch("/orders/");
+      const res = await authFetch("/orders/?fields=id,confirmation_note,donation_details.name");
       if (res.ok) {
         const data = await res.json();
         setOrders(data);